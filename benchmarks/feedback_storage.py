@@ -0,0 +1,179 @@
+"""
+Armazenamento do feedback das predições: TEXT[] vs bitmask
+Grava as mesmas predições sintéticas em duas tabelas de rascunho com as
+colunas de predictions (uma com feedback_suggestions TEXT[], como antes, e
+outra com feedback_mask INTEGER) e compara tamanho em disco, volume de WAL e
+throughput de INSERT (execute_values) e COPY. As tabelas são removidas no fim.
+
+    # PostgreSQL do docker-compose (porta 5433 no host)
+    POSTGRES_PORT=5433 python benchmarks/feedback_storage.py --rows 200000
+
+Também mostra o tamanho médio das duas colunas na tabela predictions real.
+"""
+
+import os
+import sys
+import time
+import argparse
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FASTAPI_DIR = os.path.join(ROOT_DIR, "fastapi")
+DATA_PATH = os.path.join(ROOT_DIR, "data", "hubfolio_mock_data.json")
+sys.path.insert(0, FASTAPI_DIR)
+
+from psycopg2.extras import execute_values
+
+from postgres_client import PostgreSQLClient
+from feedback_rules import FeedbackEngine
+from synthetic_data import SyntheticPortfolioGenerator
+
+LAYOUTS = {
+    'text': ('feedback_suggestions', 'TEXT[]'),
+    'mask': ('feedback_mask', 'INTEGER'),
+}
+
+SCRATCH_DDL = """
+CREATE TABLE {table} (
+    prediction_id SERIAL PRIMARY KEY,
+    portfolio_id INTEGER NOT NULL,
+    predicted_iq FLOAT NOT NULL,
+    model_name VARCHAR(100) NOT NULL,
+    model_version VARCHAR(50),
+    classification VARCHAR(50),
+    {column} {column_type},
+    predicted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def synthetic_predictions(rows: int, seed: int = 42) -> Dict[str, List[tuple]]:
+    """Linhas de predição com o feedback nos dois formatos (mesmo conteúdo)"""
+    engine = FeedbackEngine()
+    columns = SyntheticPortfolioGenerator(reference_file=DATA_PATH, seed=seed).generate_columns(rows)
+    masks = engine.masks(columns).tolist()
+    iq = columns['consistencia_visual_score'].astype(float).tolist()
+    labels = engine.classify(iq).tolist()
+
+    base = [
+        (i + 1, iq[i], "LinearRegression", "LinearRegression_v1", labels[i])
+        for i in range(rows)
+    ]
+    return {
+        'text': [row + (engine.decode(mask),) for row, mask in zip(base, masks)],
+        'mask': [row + (mask,) for row, mask in zip(base, masks)],
+    }
+
+
+def measure_layout(pg_client: PostgreSQLClient, layout: str, rows: List[tuple],
+                   method: str, batch_size: int) -> Dict:
+    """Grava as linhas numa tabela de rascunho e mede tempo, WAL e tamanho"""
+    column, column_type = LAYOUTS[layout]
+    table = f"bench_feedback_{layout}_{method}"
+    columns = ['portfolio_id', 'predicted_iq', 'model_name', 'model_version', 'classification', column]
+
+    conn = pg_client.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(SCRATCH_DDL.format(table=table, column=column, column_type=column_type))
+        conn.commit()
+
+        cursor.execute("SELECT pg_current_wal_insert_lsn()")
+        wal_start = cursor.fetchone()[0]
+        start = time.perf_counter()
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            if method == 'copy':
+                pg_client.copy_rows(cursor, table, columns, batch)
+            else:
+                execute_values(
+                    cursor,
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s",
+                    batch,
+                    page_size=batch_size
+                )
+            conn.commit()
+        duration = time.perf_counter() - start
+
+        cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s)", (wal_start,))
+        wal_bytes = int(cursor.fetchone()[0])
+        cursor.execute(
+            f"SELECT pg_total_relation_size(%s), pg_relation_size(%s), AVG(pg_column_size({column})) FROM {table}",
+            (table, table)
+        )
+        total_size, heap_size, avg_column = cursor.fetchone()
+
+        cursor.execute(f"DROP TABLE {table}")
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+    return {
+        'layout': layout,
+        'method': method,
+        'rows_per_sec': round(len(rows) / duration),
+        'duration_s': round(duration, 3),
+        'wal_bytes': wal_bytes,
+        'total_bytes': total_size,
+        'heap_bytes': heap_size,
+        'avg_column_bytes': round(float(avg_column or 0), 1),
+    }
+
+
+def current_table_stats(pg_client: PostgreSQLClient) -> Dict:
+    """Tamanho médio das colunas de feedback na tabela predictions existente"""
+    results = pg_client.execute_query("""
+        SELECT
+            COUNT(*) AS predictions,
+            COUNT(feedback_suggestions) AS rows_with_text,
+            COUNT(feedback_mask) AS rows_with_mask,
+            AVG(pg_column_size(feedback_suggestions)) AS avg_text_bytes,
+            AVG(pg_column_size(feedback_mask)) AS avg_mask_bytes
+        FROM predictions
+    """)
+    return results[0] if results else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feedback em predictions: TEXT[] vs bitmask")
+    parser.add_argument("--rows", type=int, default=200000, help="Predições sintéticas por tabela")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Linhas por transação")
+    parser.add_argument("--methods", default="insert,copy", help="Caminhos de escrita medidos (insert,copy)")
+    args = parser.parse_args()
+
+    pg_client = PostgreSQLClient()
+    if not pg_client.check_connection():
+        print("❌ PostgreSQL não está acessível")
+        return 1
+
+    data = synthetic_predictions(args.rows)
+    results = [
+        measure_layout(pg_client, layout, data[layout], method, args.batch_size)
+        for method in args.methods.split(",")
+        for layout in LAYOUTS
+    ]
+
+    print(f"\n{'formato':8s} {'escrita':8s} {'linhas/s':>10s} {'WAL (MB)':>10s} {'tabela (MB)':>12s} {'coluna (B)':>11s}")
+    for r in results:
+        print(f"{r['layout']:8s} {r['method']:8s} {r['rows_per_sec']:>10d} {r['wal_bytes'] / 1e6:>10.1f} "
+              f"{r['total_bytes'] / 1e6:>12.1f} {r['avg_column_bytes']:>11.1f}")
+
+    for method in args.methods.split(","):
+        text, mask = (next(r for r in results if r['layout'] == layout and r['method'] == method) for layout in LAYOUTS)
+        print(f"\n{method}: tabela {mask['total_bytes'] / text['total_bytes']:.0%} do tamanho, "
+              f"WAL {mask['wal_bytes'] / text['wal_bytes']:.0%}, "
+              f"throughput {mask['rows_per_sec'] / text['rows_per_sec']:.2f}x")
+
+    stats = current_table_stats(pg_client)
+    if stats.get('predictions'):
+        print(f"\npredictions: {stats['predictions']} linhas "
+              f"({stats['rows_with_text']} com texto, {stats['rows_with_mask']} com bitmask); "
+              f"média {float(stats['avg_text_bytes'] or 0):.1f} B (texto) vs "
+              f"{float(stats['avg_mask_bytes'] or 0):.1f} B (bitmask)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
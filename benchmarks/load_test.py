@@ -0,0 +1,268 @@
+"""
+Gerador de carga assíncrono para a API HubFólio
+Mede throughput e latência (p50/p95/p99) dos cenários definidos em scenarios.py
+e grava o resultado em JSON para comparação entre execuções.
+
+Exemplos:
+    # Contra a stack do docker-compose
+    python benchmarks/load_test.py --scenario predict --rps 100 --duration 30
+
+    # Contra a API real com MinIO/PostgreSQL em memória (sem containers)
+    python benchmarks/load_test.py --scenario predict --standin --output results/predict.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from scenarios import SCENARIOS
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+
+from stream_simulator_local import generate_random_portfolio, map_item  # noqa: E402
+
+DATA_PATH = os.path.join(ROOT_DIR, "data", "hubfolio_mock_data.json")
+BASE_URL = "http://localhost:8001"
+
+
+def build_payloads(source: str, count: int, seed: int) -> List[Dict]:
+    """
+    Monta a lista de payloads de /predict
+
+    Args:
+        source: 'mock' (dataset de exemplo), 'random' (generate_random_portfolio) ou 'mix'
+        count: Quantidade de payloads aleatórios a gerar
+        seed: Semente para reprodutibilidade
+
+    Returns:
+        Lista de payloads no formato do PortfolioInput
+    """
+    random.seed(seed)
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    mock_payloads = [map_item(item, i) for i, item in enumerate(data)]
+    user_ids = [p["user_id"] for p in mock_payloads]
+
+    if source == "mock":
+        return mock_payloads
+
+    # user_id precisa existir no banco: sorteia entre os usuários do dataset
+    random_payloads = [generate_random_portfolio(random.choice(user_ids)) for _ in range(count)]
+    if source == "random":
+        return random_payloads
+
+    mixed = mock_payloads + random_payloads
+    random.shuffle(mixed)
+    return mixed
+
+
+def summarize(latencies: List[float], statuses: Counter, errors: int, elapsed: float) -> Dict:
+    """Calcula estatísticas de latência (ms) e throughput"""
+    total = sum(statuses.values()) + errors
+    ok = sum(n for code, n in statuses.items() if 200 <= code < 300)
+
+    summary = {
+        "requests": total,
+        "successful": ok,
+        "errors": errors,
+        "status_codes": {str(code): n for code, n in sorted(statuses.items())},
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        "successful_rps": round(ok / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+    if latencies:
+        arr = np.asarray(latencies) * 1000.0
+        p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+        summary["latency_ms"] = {
+            "min": round(float(arr.min()), 3),
+            "mean": round(float(arr.mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(arr.max()), 3),
+        }
+    return summary
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    scenario: Dict,
+    payloads: List[Dict],
+    rps: float,
+    concurrency: int,
+    duration: float,
+    max_requests: Optional[int],
+) -> Dict:
+    """
+    Executa a carga de um cenário
+
+    Com rps > 0 a carga é de laço aberto: as requisições são agendadas em
+    intervalos fixos e a latência é medida a partir do horário agendado, para
+    não esconder filas quando a API satura (coordinated omission). Com rps = 0
+    a carga é de laço fechado, limitada apenas pela concorrência.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    errors = 0
+    method = scenario["method"]
+    path = scenario["path"]
+
+    async def send(index: int, scheduled_at: float):
+        nonlocal errors
+        payload = payloads[index % len(payloads)] if payloads else None
+        try:
+            response = await client.request(method, path, json=payload)
+            statuses[response.status_code] += 1
+            latencies.append(time.perf_counter() - scheduled_at)
+        except Exception:
+            errors += 1
+        finally:
+            semaphore.release()
+
+    tasks = []
+    start = time.perf_counter()
+    interval = 1.0 / rps if rps > 0 else 0.0
+    index = 0
+
+    while True:
+        if max_requests is not None and index >= max_requests:
+            break
+        if duration > 0 and time.perf_counter() - start >= duration:
+            break
+
+        scheduled_at = start + index * interval if interval else time.perf_counter()
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(send(index, scheduled_at)))
+        index += 1
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    return summarize(latencies, statuses, errors, elapsed)
+
+
+async def main_async(args) -> Dict:
+    scenario = SCENARIOS[args.scenario]
+    started_at = datetime.utcnow().isoformat()
+
+    rps = args.rps if args.rps is not None else scenario["rps"]
+    concurrency = args.concurrency or scenario["concurrency"]
+    duration = args.duration if args.duration is not None else scenario["duration"]
+
+    payloads = []
+    if scenario["payload"] == "portfolio":
+        payloads = build_payloads(args.payloads, args.random_count, args.seed)
+
+    max_requests = args.requests or scenario.get("requests")
+    if scenario.get("replay_dataset") and max_requests is None:
+        max_requests = len(payloads)
+    if max_requests is None and duration <= 0:
+        raise SystemExit("Cenário sem duração nem número de requisições definido")
+
+    if args.standin:
+        from standins import build_standin_app
+        app = build_standin_app(commit_latency_ms=args.standin_latency_ms)
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://standin"
+    else:
+        transport = None
+        base_url = args.base_url
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, transport=transport, limits=limits, timeout=args.timeout
+    ) as client:
+        # Aquecimento: tira do resultado o custo de conexões e caches frios
+        for payload in payloads[:args.warmup] if payloads else [None] * min(args.warmup, 1):
+            await client.request(scenario["method"], scenario["path"], json=payload)
+
+        result = await run_load(client, scenario, payloads, rps, concurrency, duration, max_requests)
+
+    return {
+        "scenario": args.scenario,
+        "description": scenario["description"],
+        "target": "standin" if args.standin else base_url,
+        "config": {
+            "method": scenario["method"],
+            "path": scenario["path"],
+            "rps": rps,
+            "concurrency": concurrency,
+            "duration": duration,
+            "max_requests": max_requests,
+            "payloads": args.payloads if payloads else None,
+            "seed": args.seed,
+            "standin_latency_ms": args.standin_latency_ms if args.standin else None,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "started_at": started_at,
+        "results": result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga da API HubFólio")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="predict", help="Cenário a executar")
+    parser.add_argument("--list", action="store_true", help="Lista os cenários disponíveis")
+    parser.add_argument("--base-url", default=BASE_URL, help=f"URL da API (default: {BASE_URL})")
+    parser.add_argument("--rps", type=float, default=None, help="Requisições por segundo (0 = vazão máxima)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Máximo de requisições simultâneas")
+    parser.add_argument("--duration", type=float, default=None, help="Duração em segundos")
+    parser.add_argument("--requests", type=int, default=None, help="Número fixo de requisições")
+    parser.add_argument("--payloads", choices=["mock", "random", "mix"], default="mix", help="Origem dos payloads")
+    parser.add_argument("--random-count", type=int, default=500, help="Payloads aleatórios gerados (default: 500)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente dos payloads aleatórios")
+    parser.add_argument("--warmup", type=int, default=5, help="Requisições de aquecimento (fora da medição)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por requisição em segundos")
+    parser.add_argument("--standin", action="store_true", help="Usa a API em processo com MinIO/PostgreSQL em memória")
+    parser.add_argument("--standin-latency-ms", type=float, default=0.0, help="Latência simulada de commit no stand-in")
+    parser.add_argument("--output", default=None, help="Arquivo JSON de saída (default: stdout)")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:16s} {scenario['method']:5s} {scenario['path']:36s} {scenario['description']}")
+        return 0
+
+    report = asyncio.run(main_async(args))
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        latency = report["results"].get("latency_ms", {})
+        print(
+            f"✅ {args.scenario}: {report['results']['throughput_rps']} req/s | "
+            f"p50={latency.get('p50')}ms p95={latency.get('p95')}ms p99={latency.get('p99')}ms "
+            f"→ {args.output}"
+        )
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,437 @@
+"""
+Microbenchmarks dos componentes internos do HubFólio
+Mede isoladamente o preditor (preprocessar/prever/_gerar_feedback/_classificar_iq),
+os caminhos de INSERT do PostgreSQLClient, o ETL sobre datasets sintéticos e a
+serialização JSON de payloads grandes (stdlib + jsonable_encoder vs orjson).
+
+Cada benchmark roda em várias rodadas calibradas (estilo pytest-benchmark) e o
+resultado pode ser salvo como baseline e comparado em outra branch:
+
+    # Na main
+    python benchmarks/microbench.py --save baselines/main.json
+
+    # Na branch do PR (falha com código 1 se algum benchmark ficar >10% mais lento)
+    python benchmarks/microbench.py --compare baselines/main.json --threshold 0.10
+
+    # Incluir PostgreSQL local (docker-compose up -d postgres) e ETL maior
+    POSTGRES_PORT=5433 python benchmarks/microbench.py --postgres --etl-sizes 1000,100000,1000000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FASTAPI_DIR = os.path.join(ROOT_DIR, "fastapi")
+MODEL_PATH = os.path.join(FASTAPI_DIR, "models", "hubfolio_model.pkl")
+DATA_PATH = os.path.join(ROOT_DIR, "data", "hubfolio_mock_data.json")
+sys.path.insert(0, FASTAPI_DIR)
+
+BENCH_USER_ID = 900001
+
+SAMPLE_PORTFOLIO = {
+    "user_id": BENCH_USER_ID,
+    "projetos_min": 2,
+    "habilidades_min": 8,
+    "kw_contexto": 3,
+    "kw_processo": 2,
+    "kw_resultado": 3,
+    "consistencia_visual_score": 75.0,
+    "bio": True,
+    "contatos": False,
+}
+
+
+# ====================================================================
+# REGISTRO DE BENCHMARKS
+# ====================================================================
+
+BENCHMARKS: List[Dict] = []
+
+
+def benchmark(group: str, name: str = None, requires: str = None, rounds: int = None):
+    """
+    Registra uma função de setup de benchmark
+
+    A função recebe o contexto e devolve o callable a ser medido; o tempo de
+    setup fica fora da medição.
+
+    Args:
+        group: Grupo do benchmark (predictor, postgres, etl)
+        name: Nome (padrão: nome da função sem o prefixo bench_)
+        requires: Recurso externo necessário ('postgres')
+        rounds: Número fixo de rodadas (para benchmarks pesados)
+    """
+    def decorator(fn):
+        BENCHMARKS.append({
+            "group": group,
+            "name": name or fn.__name__.replace("bench_", ""),
+            "setup": fn,
+            "requires": requires,
+            "rounds": rounds,
+        })
+        return fn
+    return decorator
+
+
+class BenchContext:
+    """Recursos compartilhados entre benchmarks, criados sob demanda"""
+
+    def __init__(self, use_postgres: bool):
+        self.use_postgres = use_postgres
+        self._predictor = None
+        self._pg_client = None
+
+    @property
+    def predictor(self):
+        if self._predictor is None:
+            from predictor import HubFolioPredictor
+            self._predictor = HubFolioPredictor()
+            self._predictor.load_model(MODEL_PATH)
+        return self._predictor
+
+    @property
+    def pg_client(self):
+        if self._pg_client is None:
+            from postgres_client import PostgreSQLClient
+            self._pg_client = PostgreSQLClient()
+            self._pg_client.insert_user({"user_id": BENCH_USER_ID, "nome": "Benchmark"})
+        return self._pg_client
+
+    def cleanup(self):
+        """Remove as linhas criadas pelos benchmarks (ON DELETE CASCADE)"""
+        if self._pg_client is not None:
+            conn = self._pg_client.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM users WHERE user_id >= %s", (BENCH_USER_ID,))
+            conn.commit()
+            cursor.close()
+            conn.close()
+
+
+# ====================================================================
+# DATASETS SINTÉTICOS
+# ====================================================================
+
+def synthetic_payload(n: int, seed: int = 42) -> bytes:
+    """Gera um JSON com n registros no schema do hubfolio_mock_data.json"""
+    from synthetic_data import SyntheticPortfolioGenerator
+
+    generator = SyntheticPortfolioGenerator(reference_file=DATA_PATH, seed=seed)
+    lines = []
+    for columns in generator.iter_blocks(n, 100_000, start_id=BENCH_USER_ID + 1):
+        lines.extend(generator.to_json_lines(columns))
+    return ("[" + ",\n".join(lines) + "]").encode("utf-8")
+
+
+# ====================================================================
+# BENCHMARKS - PREDITOR
+# ====================================================================
+
+@benchmark("predictor")
+def bench_preprocessar(ctx):
+    predictor = ctx.predictor
+    return lambda: predictor.preprocessar(dict(SAMPLE_PORTFOLIO))
+
+
+@benchmark("predictor")
+def bench_prever(ctx):
+    predictor = ctx.predictor
+    return lambda: predictor.prever(dict(SAMPLE_PORTFOLIO))
+
+
+@benchmark("predictor")
+def bench_model_predict(ctx):
+    predictor = ctx.predictor
+    X = predictor.preprocessar(dict(SAMPLE_PORTFOLIO))
+    return lambda: predictor.modelo.predict(X)
+
+
+@benchmark("predictor")
+def bench_gerar_feedback(ctx):
+    predictor = ctx.predictor
+    return lambda: predictor._gerar_feedback(55.0, SAMPLE_PORTFOLIO)
+
+
+@benchmark("predictor")
+def bench_classificar_iq(ctx):
+    predictor = ctx.predictor
+    return lambda: predictor._classificar_iq(55.0)
+
+
+# ====================================================================
+# BENCHMARKS - POSTGRESQL
+# ====================================================================
+
+@benchmark("postgres", requires="postgres")
+def bench_insert_user(ctx):
+    pg = ctx.pg_client
+    return lambda: pg.insert_user({"user_id": BENCH_USER_ID, "nome": "Benchmark"})
+
+
+@benchmark("postgres", requires="postgres")
+def bench_insert_portfolio(ctx):
+    pg = ctx.pg_client
+    return lambda: pg.insert_portfolio(dict(SAMPLE_PORTFOLIO))
+
+
+@benchmark("postgres", requires="postgres")
+def bench_create_portfolio_with_metrics(ctx):
+    pg = ctx.pg_client
+    return lambda: pg.create_portfolio_with_metrics(dict(SAMPLE_PORTFOLIO))
+
+
+@benchmark("postgres", requires="postgres")
+def bench_save_prediction(ctx):
+    pg = ctx.pg_client
+    portfolio_id = pg.create_portfolio_with_metrics(dict(SAMPLE_PORTFOLIO))
+    feedback = ctx.predictor._gerar_feedback(55.0, SAMPLE_PORTFOLIO)
+    return lambda: pg.save_prediction(portfolio_id, 55.0, "LinearRegression", "Regular", feedback)
+
+
+@benchmark("postgres", requires="postgres")
+def bench_save_prediction_mask(ctx):
+    pg = ctx.pg_client
+    portfolio_id = pg.create_portfolio_with_metrics(dict(SAMPLE_PORTFOLIO))
+    feedback_mask = ctx.predictor.feedback_engine.mask(SAMPLE_PORTFOLIO)
+    return lambda: pg.save_prediction(portfolio_id, 55.0, "LinearRegression", "Regular",
+                                      feedback_mask=feedback_mask)
+
+
+# ====================================================================
+# BENCHMARKS - SERIALIZAÇÃO JSON
+# ====================================================================
+
+SERIALIZATION_ROWS = 20000
+
+
+def large_response(rows: int = SERIALIZATION_ROWS, seed: int = 42) -> Dict:
+    """Resposta no formato de /postgres/top-portfolios com os tipos que vêm do banco e do modelo"""
+    from decimal import Decimal
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    iq = rng.uniform(0, 100, rows)
+    created_at = datetime(2025, 1, 1)
+    return {
+        "total_results": rows,
+        "top_portfolios": [
+            {
+                "user_id": i + 1,
+                "nome": f"Usuário {i + 1}",
+                "portfolio_id": i + 1,
+                "indice_qualidade": float(iq[i]),
+                "predicted_iq": np.float64(iq[i]),  # Escalar NumPy (model.predict)
+                "completude_score": Decimal("75.00"),
+                "classificacao": "Bom",
+                "created_at": created_at,
+            }
+            for i in range(rows)
+        ],
+    }
+
+
+@benchmark("serialization")
+def bench_encode_stdlib(ctx):
+    """Caminho padrão do FastAPI: jsonable_encoder + json.dumps (JSONResponse)"""
+    from fastapi.encoders import jsonable_encoder
+
+    payload = large_response()
+    return lambda: json.dumps(jsonable_encoder(payload), ensure_ascii=False).encode("utf-8")
+
+
+@benchmark("serialization")
+def bench_encode_orjson(ctx):
+    from serialization import dumps
+
+    payload = large_response()
+    return lambda: dumps(payload)
+
+
+@benchmark("serialization")
+def bench_parse_stdlib(ctx):
+    payload = synthetic_payload(SERIALIZATION_ROWS)
+    return lambda: json.loads(payload.decode("utf-8"))
+
+
+@benchmark("serialization")
+def bench_parse_orjson(ctx):
+    from serialization import loads
+
+    payload = synthetic_payload(SERIALIZATION_ROWS)
+    return lambda: loads(payload)
+
+
+# ====================================================================
+# BENCHMARKS - ETL
+# ====================================================================
+
+def register_etl_benchmarks(sizes: List[int]):
+    """Registra um benchmark de ETL (load_portfolios) por tamanho de dataset"""
+    for size in sizes:
+        def setup(ctx, size=size):
+            from etl_minio_postgres import HubFolioETL
+
+            payload = synthetic_payload(size)
+            etl = HubFolioETL()
+            etl.extract_from_minio = lambda object_name: payload
+            if ctx.use_postgres:
+                etl.pg_client = ctx.pg_client
+            else:
+                from standins import InMemoryPostgreSQLClient
+                etl.pg_client = InMemoryPostgreSQLClient()
+            return etl.load_portfolios
+
+        BENCHMARKS.append({
+            "group": "etl",
+            "name": f"load_portfolios_{size}",
+            "setup": setup,
+            "requires": None,
+            "rounds": 1 if size >= 100000 else 3,
+        })
+
+
+# ====================================================================
+# EXECUÇÃO E COMPARAÇÃO
+# ====================================================================
+
+def measure(fn: Callable, rounds: Optional[int], min_round_time: float, max_time: float) -> Dict:
+    """
+    Mede o callable em rodadas calibradas
+
+    Cada rodada executa o callable N vezes, com N escolhido para que a rodada
+    dure pelo menos min_round_time (reduz o ruído do timer em chamadas rápidas).
+
+    Returns:
+        Estatísticas por execução em segundos
+    """
+    iterations = 1
+    if rounds is None:
+        fn()  # aquecimento (benchmarks com rodadas fixas são pesados demais para isso)
+        while True:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            if time.perf_counter() - start >= min_round_time:
+                break
+            iterations *= 2
+
+    samples = []
+    budget_start = time.perf_counter()
+    target_rounds = rounds or 1000
+    while len(samples) < target_rounds:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations)
+        if rounds is None and len(samples) >= 5 and time.perf_counter() - budget_start >= max_time:
+            break
+
+    return {
+        "rounds": len(samples),
+        "iterations": iterations,
+        "min": min(samples),
+        "max": max(samples),
+        "mean": statistics.fmean(samples),
+        "median": statistics.median(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "ops": 1.0 / statistics.median(samples),
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """Compara medianas com o baseline e retorna os benchmarks com regressão"""
+    regressions = []
+    print(f"\n{'benchmark':45s} {'baseline':>12s} {'atual':>12s} {'variação':>10s}")
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if not base:
+            print(f"{key:45s} {'-':>12s} {fmt(stats['median']):>12s} {'novo':>10s}")
+            continue
+        change = (stats["median"] - base["median"]) / base["median"]
+        flag = " ❌" if change > threshold else ""
+        print(f"{key:45s} {fmt(base['median']):>12s} {fmt(stats['median']):>12s} {change:>+9.1%}{flag}")
+        if change > threshold:
+            regressions.append({"benchmark": key, "baseline": base["median"], "current": stats["median"], "change": change})
+    return regressions
+
+
+def fmt(seconds: float) -> str:
+    """Formata duração com unidade adequada"""
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.2f}µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.2f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks do HubFólio")
+    parser.add_argument("--group", action="append", help="Roda apenas os grupos informados (predictor, postgres, serialization, etl)")
+    parser.add_argument("-k", "--filter", default=None, help="Roda apenas benchmarks cujo nome contém o texto")
+    parser.add_argument("--postgres", action="store_true", help="Inclui benchmarks contra o PostgreSQL local")
+    parser.add_argument("--etl-sizes", default="1000,10000", help="Tamanhos dos datasets do ETL (default: 1000,10000)")
+    parser.add_argument("--min-round-time", type=float, default=0.005, help="Duração mínima de cada rodada (s)")
+    parser.add_argument("--max-time", type=float, default=1.0, help="Tempo máximo por benchmark (s)")
+    parser.add_argument("--save", default=None, help="Salva os resultados como baseline (JSON)")
+    parser.add_argument("--compare", default=None, help="Baseline para comparação (JSON)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Regressão tolerada na mediana (default: 0.10)")
+    args = parser.parse_args()
+
+    register_etl_benchmarks([int(s) for s in args.etl_sizes.split(",") if s])
+
+    ctx = BenchContext(use_postgres=args.postgres)
+    results = {}
+
+    try:
+        for bench in BENCHMARKS:
+            key = f"{bench['group']}::{bench['name']}"
+            if args.group and bench["group"] not in args.group:
+                continue
+            if args.filter and args.filter not in key:
+                continue
+            if bench["requires"] == "postgres" and not args.postgres:
+                continue
+
+            fn = bench["setup"](ctx)
+            stats = measure(fn, bench["rounds"], args.min_round_time, args.max_time)
+            results[key] = stats
+            print(f"{key:45s} median={fmt(stats['median']):>10s}  mean={fmt(stats['mean']):>10s}  "
+                  f"stddev={fmt(stats['stddev']):>10s}  rounds={stats['rounds']}")
+    finally:
+        ctx.cleanup()
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.utcnow().isoformat(),
+                "environment": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpu_count": os.cpu_count(),
+                },
+                "benchmarks": results,
+            }, f, indent=2)
+        print(f"\n💾 Baseline salvo em {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["benchmarks"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} benchmark(s) com regressão acima de {args.threshold:.0%}")
+            return 1
+        print(f"\n✅ Nenhuma regressão acima de {args.threshold:.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Cenários de carga da API HubFólio
+Cada cenário descreve o endpoint alvo, o tipo de payload e os parâmetros padrão
+do gerador de carga (podem ser sobrescritos pela linha de comando)
+"""
+
+SCENARIOS = {
+    "predict": {
+        "description": "Predição individual (POST /predict) com mix de payloads",
+        "method": "POST",
+        "path": "/predict",
+        "payload": "portfolio",
+        "rps": 50,
+        "concurrency": 16,
+        "duration": 30,
+    },
+    "batch": {
+        "description": "Scoring em lote: replay do dataset completo em /predict na vazão máxima",
+        "method": "POST",
+        "path": "/predict",
+        "payload": "portfolio",
+        "rps": 0,
+        "concurrency": 32,
+        "duration": 0,
+        "replay_dataset": True,
+    },
+    "etl": {
+        "description": "Execução do pipeline ETL (POST /etl/run)",
+        "method": "POST",
+        "path": "/etl/run",
+        "payload": None,
+        "rps": 0,
+        "concurrency": 1,
+        "duration": 0,
+        "requests": 3,
+    },
+    "summary": {
+        "description": "Sumário do banco (GET /postgres/summary)",
+        "method": "GET",
+        "path": "/postgres/summary",
+        "payload": None,
+        "rps": 20,
+        "concurrency": 8,
+        "duration": 20,
+    },
+    "top_portfolios": {
+        "description": "Ranking de portfólios (GET /postgres/top-portfolios)",
+        "method": "GET",
+        "path": "/postgres/top-portfolios?limit=20",
+        "payload": None,
+        "rps": 50,
+        "concurrency": 8,
+        "duration": 20,
+    },
+}
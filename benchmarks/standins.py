@@ -0,0 +1,311 @@
+"""
+Stand-ins locais para benchmark da API HubFólio
+Substituem MinIO e PostgreSQL por implementações em memória, permitindo medir
+o custo da API + modelo sem depender dos containers
+"""
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FASTAPI_DIR = os.path.join(ROOT_DIR, "fastapi")
+DATA_PATH = os.path.join(ROOT_DIR, "data", "hubfolio_mock_data.json")
+MODEL_PATH = os.path.join(FASTAPI_DIR, "models", "hubfolio_model.pkl")
+
+if FASTAPI_DIR not in sys.path:
+    sys.path.insert(0, FASTAPI_DIR)
+
+
+class InMemoryMinIOClient:
+    """Stand-in do MinIOClient com objetos em um dicionário"""
+
+    def __init__(self, bucket_name: str = "hubfolio-data"):
+        self.bucket_name = bucket_name
+        self.objects: Dict[str, bytes] = {}
+        self.modified: Dict[str, datetime] = {}
+
+    def check_connection(self) -> bool:
+        return True
+
+    def bucket_exists(self) -> bool:
+        return True
+
+    def create_bucket_if_not_exists(self) -> bool:
+        return True
+
+    def upload_file(self, file_data: bytes, object_name: str, content_type: str = 'application/json') -> bool:
+        self.objects[object_name] = file_data
+        self.modified[object_name] = datetime.utcnow()
+        return True
+
+    def upload_parquet(self, table, prefix: Optional[str] = None, ingest_date=None) -> Optional[Dict]:
+        import uuid
+        from parquet_storage import PARQUET_PREFIX, validate_table, table_to_parquet_bytes, partition_path
+
+        table = validate_table(table)
+        data = table_to_parquet_bytes(table)
+        object_key = f"{partition_path(prefix or PARQUET_PREFIX, ingest_date)}part-{uuid.uuid4().hex}.parquet"
+        self.upload_file(data, object_key, content_type='application/vnd.apache.parquet')
+        return {'object_key': object_key, 'size_bytes': len(data), 'rows': table.num_rows}
+
+    def download_file(self, object_name: str) -> Optional[bytes]:
+        return self.objects.get(object_name)
+
+    def get_object_bytes(self, object_name: str) -> bytes:
+        return self.objects[object_name]
+
+    def list_objects(self, prefix: str = '') -> List[Dict]:
+        return [
+            {
+                'Key': key,
+                'Size': len(data),
+                'LastModified': self.modified[key],
+                'ContentType': 'unknown'
+            }
+            for key, data in self.objects.items() if key.startswith(prefix)
+        ]
+
+    def delete_file(self, object_name: str) -> bool:
+        self.objects.pop(object_name, None)
+        self.modified.pop(object_name, None)
+        return True
+
+
+class InMemoryPostgreSQLClient:
+    """
+    Stand-in do PostgreSQLClient
+
+    commit_latency_ms simula o custo de commit (fsync) de cada operação de escrita,
+    bloqueando a thread como o psycopg2 faria.
+    """
+
+    def __init__(self, commit_latency_ms: float = 0.0):
+        self.commit_latency = commit_latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.users: Dict[int, str] = {}
+        self.portfolios: Dict[int, Dict] = {}
+        self.metrics: Dict[int, Dict] = {}
+        self.predictions: Dict[int, Dict] = {}
+        self.sequences: Dict[str, int] = {}
+
+    def _commit(self):
+        if self.commit_latency > 0:
+            time.sleep(self.commit_latency)
+
+    def check_connection(self) -> bool:
+        return True
+
+    def user_exists(self, user_id: int) -> bool:
+        return user_id in self.users
+
+    def insert_user(self, user_data: Dict) -> Optional[int]:
+        with self.lock:
+            self.users[user_data['user_id']] = user_data['nome']
+        self._commit()
+        return user_data['user_id']
+
+    def insert_portfolio(self, portfolio_data: Dict) -> Optional[int]:
+        with self.lock:
+            portfolio_id = self._next_id('portfolios')
+            self.portfolios[portfolio_id] = dict(portfolio_data, created_at=datetime.utcnow())
+        self._commit()
+        return portfolio_id
+
+    def calculate_metrics(self, portfolio_id: int) -> bool:
+        from metrics import calculate_portfolio_metrics, METRIC_INPUTS
+
+        p = self.portfolios[portfolio_id]
+        metrics = calculate_portfolio_metrics({name: [p[name]] for name in METRIC_INPUTS})
+        with self.lock:
+            self.metrics[portfolio_id] = {name: float(values[0]) for name, values in metrics.items()}
+        self._commit()
+        return True
+
+    def load_portfolio_batch(self, records: List[Dict], page_size: int = 1000) -> Dict[str, int]:
+        from metrics import calculate_portfolio_metrics, METRIC_INPUTS
+
+        users = {record['user_id']: record['nome'] for record in records}
+        with self.lock:
+            self.users.update(users)
+            portfolio_ids = []
+            for record in records:
+                portfolio_id = self._next_id('portfolios')
+                self.portfolios[portfolio_id] = dict(
+                    {name: record[name] for name in METRIC_INPUTS},
+                    user_id=record['user_id'], created_at=datetime.utcnow()
+                )
+                portfolio_ids.append(portfolio_id)
+            metrics = calculate_portfolio_metrics(
+                {name: [record[name] for record in records] for name in METRIC_INPUTS}
+            )
+            for i, portfolio_id in enumerate(portfolio_ids):
+                self.metrics[portfolio_id] = {name: float(values[i]) for name, values in metrics.items()}
+        self._commit()
+        return {"users": len(users), "portfolios": len(portfolio_ids), "metrics": len(portfolio_ids)}
+
+    def create_portfolio_with_metrics(self, portfolio_data: Dict) -> Optional[int]:
+        with self.lock:
+            portfolio_id = self._next_id('portfolios')
+            self.portfolios[portfolio_id] = dict(portfolio_data, created_at=datetime.utcnow())
+        self.calculate_metrics(portfolio_id)
+        return portfolio_id
+
+    def _next_id(self, table: str) -> int:
+        """Próximo valor da "sequência" da tabela (chamar com self.lock)"""
+        self.sequences[table] = self.sequences.get(table, 0) + 1
+        return self.sequences[table]
+
+    def reserve_ids(self, table: str, column: str, count: int) -> List[int]:
+        with self.lock:
+            start = self.sequences.get(table, 0) + 1
+            self.sequences[table] = start + count - 1
+        return list(range(start, start + count))
+
+    def load_prediction_batch(self, records: List[Dict], page_size: int = 1000) -> Dict[str, int]:
+        from metrics import calculate_portfolio_metrics, METRIC_INPUTS
+
+        inserted = {"portfolios": 0, "predictions": 0}
+        metrics = calculate_portfolio_metrics(
+            {name: [record[name] for record in records] for name in METRIC_INPUTS}
+        )
+        with self.lock:
+            for i, record in enumerate(records):
+                if record['portfolio_id'] not in self.portfolios:
+                    self.portfolios[record['portfolio_id']] = dict(
+                        {name: record[name] for name in METRIC_INPUTS},
+                        user_id=record['user_id'], created_at=datetime.utcnow()
+                    )
+                    inserted["portfolios"] += 1
+                self.metrics[record['portfolio_id']] = {name: float(values[i]) for name, values in metrics.items()}
+                if record['prediction_id'] not in self.predictions:
+                    self.predictions[record['prediction_id']] = {
+                        name: record[name] for name in (
+                            'portfolio_id', 'predicted_iq', 'model_name', 'model_version',
+                            'classification', 'feedback_mask', 'predicted_at'
+                        )
+                    }
+                    inserted["predictions"] += 1
+        self._commit()
+        return inserted
+
+    def save_prediction(self, portfolio_id: int, predicted_iq: float, model_name: str,
+                        classification: str = None, feedback: List[str] = None,
+                        feedback_mask: Optional[int] = None,
+                        model_version: Optional[str] = None) -> Optional[int]:
+        with self.lock:
+            prediction_id = self._next_id('predictions')
+            self.predictions[prediction_id] = {
+                'portfolio_id': portfolio_id,
+                'predicted_iq': predicted_iq,
+                'model_name': model_name,
+                'model_version': model_version or f"{model_name}_v1",
+                'classification': classification,
+                'feedback_suggestions': None if feedback_mask is not None else (feedback or []),
+                'feedback_mask': feedback_mask,
+                'predicted_at': datetime.utcnow()
+            }
+        self._commit()
+        return prediction_id
+
+    def save_shadow_predictions(self, records: List[Dict], page_size: int = 1000) -> List[tuple]:
+        inserted = []
+        with self.lock:
+            for record in records:
+                if record['portfolio_id'] not in self.portfolios:
+                    continue
+                self.predictions[self._next_id('predictions')] = {
+                    name: record[name] for name in (
+                        'portfolio_id', 'predicted_iq', 'model_name', 'model_version',
+                        'classification', 'feedback_mask', 'predicted_at'
+                    )
+                }
+                inserted.append((record['portfolio_id'], record['model_version']))
+        self._commit()
+        return inserted
+
+    def get_table_info(self) -> Dict[str, int]:
+        return {
+            'portfolio_metrics': len(self.metrics),
+            'portfolios': len(self.portfolios),
+            'predictions': len(self.predictions),
+            'users': len(self.users)
+        }
+
+    def get_portfolio_stats(self) -> Dict:
+        iqs = [m['indice_qualidade'] for m in self.metrics.values()]
+        if not iqs:
+            return {'total_portfolios': len(self.portfolios)}
+        return {
+            'total_portfolios': len(self.portfolios),
+            'avg_iq': sum(iqs) / len(iqs),
+            'min_iq': min(iqs),
+            'max_iq': max(iqs)
+        }
+
+    def get_top_portfolios(self, limit: int = 10) -> List[Dict]:
+        ranked = sorted(self.metrics.items(), key=lambda item: item[1]['indice_qualidade'], reverse=True)
+        results = []
+        for portfolio_id, metrics in ranked[:min(limit, 20)]:
+            p = self.portfolios[portfolio_id]
+            results.append({
+                'nome': self.users.get(p['user_id']),
+                'indice_qualidade': metrics['indice_qualidade'],
+                'projetos_min': p['projetos_min'],
+                'habilidades_min': p['habilidades_min'],
+                'consistencia_visual_score': p['consistencia_visual_score']
+            })
+        return results
+
+
+def build_standin_app(commit_latency_ms: float = 0.0):
+    """
+    Monta a aplicação FastAPI real com MinIO/PostgreSQL em memória
+
+    Os usuários do dataset de exemplo são pré-cadastrados e o dataset é
+    colocado em hubfolio/data/portfolios.json, como faria o /ingest/hubfolio.
+
+    Returns:
+        Instância ASGI pronta para uso com httpx.ASGITransport
+    """
+    import main
+    from etl_minio_postgres import HubFolioETL, ETL_BATCH_SIZE
+
+    minio_standin = InMemoryMinIOClient()
+    pg_standin = InMemoryPostgreSQLClient(commit_latency_ms=commit_latency_ms)
+
+    with open(DATA_PATH, 'rb') as f:
+        raw = f.read()
+    for record in json.loads(raw):
+        pg_standin.users[record['user_id']] = record['nome']
+    minio_standin.upload_file(raw, "hubfolio/data/portfolios.json")
+
+    class StandInETL(HubFolioETL):
+        """ETL apontando para os stand-ins em memória"""
+
+        def __init__(self):
+            self.minio_client = minio_standin
+            self.pg_client = pg_standin
+            self.batch_size = ETL_BATCH_SIZE
+            self.stats = {
+                "users_inserted": 0,
+                "portfolios_inserted": 0,
+                "metrics_calculated": 0,
+                "errors": 0
+            }
+
+        def extract_from_minio(self, object_name: str) -> bytes:
+            return minio_standin.objects[object_name]
+
+    main.minio_client = minio_standin
+    main.profiler.minio_client = minio_standin
+    main.pg_client = pg_standin
+    main.model_router.pg_client = pg_standin
+    main.model_registry.start(None, minio_standin)
+    main.HubFolioETL = StandInETL
+    main.predictor.load_model(MODEL_PATH)
+
+    return main.app
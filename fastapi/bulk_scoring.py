@@ -0,0 +1,383 @@
+"""
+Re-score em lote dos portfólios HubFólio
+Lê a tabela portfolios em lotes (cursor do lado do servidor), prevê o IQ com o
+modelo atual em um pool de processos e grava predictions via COPY, marcando a
+versão do modelo. O progresso fica na tabela scoring_jobs, permitindo retomar
+um job interrompido a partir do último lote gravado.
+
+Uso:
+    python bulk_scoring.py --batch-size 5000 --workers 4
+    python bulk_scoring.py --job-id <id>   # retoma do checkpoint
+"""
+import os
+import sys
+import time
+import uuid
+import pickle
+import logging
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from feedback_rules import FeedbackEngine
+from postgres_client import PostgreSQLClient
+from predictor import HubFolioPredictor, model_version_tag
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.getenv('MODEL_PATH', '/app/models/hubfolio_model.pkl')
+SCORING_BATCH_SIZE = int(os.getenv('SCORING_BATCH_SIZE', 5000))
+SCORING_WORKERS = int(os.getenv('SCORING_WORKERS', os.cpu_count() or 1))
+
+PORTFOLIO_COLUMNS = [
+    'portfolio_id', 'projetos_min', 'habilidades_min',
+    'kw_contexto', 'kw_processo', 'kw_resultado',
+    'consistencia_visual_score', 'bio', 'contatos'
+]
+PREDICTION_COLUMNS = [
+    'portfolio_id', 'predicted_iq', 'model_name', 'model_version',
+    'classification', 'feedback_mask'
+]
+
+# Mesmo DDL do postgres/init.sql, para bancos criados antes da tabela existir
+SCORING_JOBS_DDL = """
+CREATE TABLE IF NOT EXISTS scoring_jobs (
+    job_id VARCHAR(64) PRIMARY KEY,
+    model_name VARCHAR(100) NOT NULL,
+    model_version VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    last_portfolio_id INTEGER NOT NULL DEFAULT 0,
+    max_portfolio_id INTEGER NOT NULL DEFAULT 0,
+    portfolios_total INTEGER NOT NULL DEFAULT 0,
+    portfolios_scored INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Jobs em execução neste processo (evita duas execuções do mesmo job)
+_running_jobs = set()
+_running_lock = threading.Lock()
+
+
+class ScoringJobError(Exception):
+    """Job não pode ser iniciado/retomado"""
+
+
+# ====================================================================
+# WORKERS (executam em processos separados)
+# ====================================================================
+
+_worker_predictor: Optional[HubFolioPredictor] = None
+
+
+def _init_worker(model_bytes: bytes, model_name: str, feedback_engine: FeedbackEngine):
+    """Carrega o modelo (e as regras de feedback do processo principal) uma vez por processo do pool"""
+    global _worker_predictor
+    _worker_predictor = HubFolioPredictor(feedback_engine=feedback_engine)
+    _worker_predictor.set_model(pickle.loads(model_bytes), model_bytes=model_bytes)
+    _worker_predictor.model_name = model_name
+
+
+def _score_rows(predictor: HubFolioPredictor, rows: List[tuple]) -> Tuple[int, List[tuple]]:
+    """
+    Prevê o IQ de um lote de linhas da tabela portfolios
+
+    Returns:
+        (maior portfolio_id do lote, linhas (portfolio_id, iq, classificação, feedback_mask))
+    """
+    df = pd.DataFrame(rows, columns=PORTFOLIO_COLUMNS)
+    result = predictor.prever_lote(df)
+    scored = list(zip(
+        df['portfolio_id'].tolist(),
+        result['indice_qualidade'],
+        result['classificacao'],
+        result['feedback_mask']
+    ))
+    return int(df['portfolio_id'].iloc[-1]), scored
+
+
+def _score_batch(rows: List[tuple]) -> Tuple[int, List[tuple]]:
+    """Ponto de entrada do pool de processos"""
+    return _score_rows(_worker_predictor, rows)
+
+
+# ====================================================================
+# JOB
+# ====================================================================
+
+class BulkScoringJob:
+    """Re-score de todos os portfólios com checkpoint por lote"""
+
+    def __init__(
+        self,
+        pg_client: PostgreSQLClient,
+        predictor: HubFolioPredictor,
+        batch_size: int = SCORING_BATCH_SIZE,
+        workers: int = SCORING_WORKERS,
+        model_version: Optional[str] = None
+    ):
+        if predictor.modelo is None:
+            raise ScoringJobError("Modelo de ML não está carregado")
+
+        self.pg_client = pg_client
+        self.predictor = predictor
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.model_name = predictor.model_name
+        self.model_bytes = pickle.dumps(predictor.modelo)
+        self.model_version = (
+            model_version or predictor.model_version
+            or model_version_tag(self.model_name, self.model_bytes)
+        )
+        self.job_id: Optional[str] = None
+        self.checkpoint: Dict = {}
+
+    def prepare(self, job_id: Optional[str] = None) -> Dict:
+        """
+        Cria o job ou carrega o checkpoint de um job existente
+
+        Args:
+            job_id: ID de um job anterior para retomar (None = novo job)
+
+        Returns:
+            Registro do job na tabela scoring_jobs
+        """
+        if job_id:
+            with _running_lock:
+                if job_id in _running_jobs:
+                    raise ScoringJobError(f"Job {job_id} já está em execução")
+
+        conn = self.pg_client.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SCORING_JOBS_DDL)
+
+            if job_id:
+                checkpoint = self._fetch_job(cursor, job_id)
+                if not checkpoint:
+                    raise ScoringJobError(f"Job {job_id} não encontrado")
+                if checkpoint['model_version'] != self.model_version:
+                    raise ScoringJobError(
+                        f"Job {job_id} foi iniciado com o modelo {checkpoint['model_version']}, "
+                        f"mas o modelo atual é {self.model_version}"
+                    )
+                cursor.execute(
+                    "UPDATE scoring_jobs SET status = 'running', error = NULL, updated_at = CURRENT_TIMESTAMP "
+                    "WHERE job_id = %s AND status <> 'completed'",
+                    (job_id,)
+                )
+            else:
+                job_id = uuid.uuid4().hex[:16]
+                # Limite superior fixo: portfólios criados depois já recebem predição via /predict
+                cursor.execute("SELECT COALESCE(MAX(portfolio_id), 0), COUNT(*) FROM portfolios")
+                max_id, total = cursor.fetchone()
+                cursor.execute(
+                    """
+                    INSERT INTO scoring_jobs (job_id, model_name, model_version, max_portfolio_id, portfolios_total)
+                    VALUES (%s, %s, %s, %s, %s)
+                    """,
+                    (job_id, self.model_name, self.model_version, max_id, total)
+                )
+
+            self.checkpoint = self._fetch_job(cursor, job_id)
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+        self.job_id = job_id
+        return self.checkpoint
+
+    @staticmethod
+    def _fetch_job(cursor, job_id: str) -> Optional[Dict]:
+        cursor.execute("SELECT * FROM scoring_jobs WHERE job_id = %s", (job_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return dict(zip([col[0] for col in cursor.description], row))
+
+    def run(self) -> Dict:
+        """
+        Executa (ou continua) o re-score a partir do checkpoint
+
+        Cada lote é gravado com COPY e o checkpoint é atualizado na mesma
+        transação, então uma interrupção nunca duplica nem perde predições.
+        """
+        if self.job_id is None:
+            self.prepare()
+
+        with _running_lock:
+            if self.job_id in _running_jobs:
+                raise ScoringJobError(f"Job {self.job_id} já está em execução")
+            _running_jobs.add(self.job_id)
+
+        start_time = time.time()
+        logger.info(
+            f"🚀 Re-score {self.job_id} ({self.model_version}) a partir do portfolio_id "
+            f"{self.checkpoint['last_portfolio_id']} (batch={self.batch_size}, workers={self.workers})"
+        )
+
+        read_conn = self.pg_client.get_connection()
+        write_conn = self.pg_client.get_connection()
+        pool = None
+        try:
+            batches = self.pg_client.iter_batches(
+                read_conn,
+                f"SELECT {', '.join(PORTFOLIO_COLUMNS)} FROM portfolios "
+                "WHERE portfolio_id > %s AND portfolio_id <= %s ORDER BY portfolio_id",
+                (self.checkpoint['last_portfolio_id'], self.checkpoint['max_portfolio_id']),
+                batch_size=self.batch_size,
+                cursor_name=f"scoring_{self.job_id}"
+            )
+
+            if self.workers == 1:
+                for rows in batches:
+                    self._write_batch(write_conn, *_score_rows(self.predictor, rows))
+            else:
+                pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.model_bytes, self.model_name, self.predictor.feedback_engine)
+                )
+                # Lotes são gravados na ordem de leitura para o checkpoint ser monotônico
+                pending = deque()
+                for rows in batches:
+                    pending.append(pool.submit(_score_batch, rows))
+                    if len(pending) >= self.workers * 2:
+                        self._write_batch(write_conn, *pending.popleft().result())
+                while pending:
+                    self._write_batch(write_conn, *pending.popleft().result())
+
+            self._set_status(write_conn, 'completed')
+        except Exception as e:
+            write_conn.rollback()
+            logger.error(f"❌ Erro no re-score {self.job_id}: {e}")
+            self._set_status(write_conn, 'failed', str(e))
+            raise
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+            read_conn.close()
+            write_conn.close()
+            with _running_lock:
+                _running_jobs.discard(self.job_id)
+
+        duration = time.time() - start_time
+        self.checkpoint['duration_seconds'] = round(duration, 2)
+        logger.info(
+            f"✅ Re-score {self.job_id} concluído: {self.checkpoint['portfolios_scored']} portfólios "
+            f"em {duration:.2f}s"
+        )
+        return self.checkpoint
+
+    def _write_batch(self, conn, last_portfolio_id: int, scored: List[tuple]):
+        """Grava um lote de predições e avança o checkpoint (mesma transação)"""
+        cursor = conn.cursor()
+        count = self.pg_client.copy_rows(
+            cursor,
+            'predictions',
+            PREDICTION_COLUMNS,
+            (
+                (portfolio_id, iq, self.model_name, self.model_version, classification, feedback_mask)
+                for portfolio_id, iq, classification, feedback_mask in scored
+            )
+        )
+        cursor.execute(
+            """
+            UPDATE scoring_jobs
+            SET last_portfolio_id = %s,
+                portfolios_scored = portfolios_scored + %s,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = %s
+            """,
+            (last_portfolio_id, count, self.job_id)
+        )
+        conn.commit()
+        cursor.close()
+
+        self.checkpoint['last_portfolio_id'] = last_portfolio_id
+        self.checkpoint['portfolios_scored'] += count
+        logger.info(
+            f"📦 Re-score {self.job_id}: {self.checkpoint['portfolios_scored']}/"
+            f"{self.checkpoint['portfolios_total']} portfólios (até portfolio_id {last_portfolio_id})"
+        )
+
+    def _set_status(self, conn, status: str, error: Optional[str] = None):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE scoring_jobs SET status = %s, error = %s, updated_at = CURRENT_TIMESTAMP WHERE job_id = %s",
+                (status, error, self.job_id)
+            )
+            conn.commit()
+            cursor.close()
+            self.checkpoint['status'] = status
+            self.checkpoint['error'] = error
+        except Exception as e:
+            logger.error(f"Erro ao atualizar status do job {self.job_id}: {e}")
+
+
+def get_job(pg_client: PostgreSQLClient, job_id: str) -> Optional[Dict]:
+    """Retorna o estado de um job de re-score"""
+    results = pg_client.execute_query("SELECT * FROM scoring_jobs WHERE job_id = %s", (job_id,))
+    return results[0] if results else None
+
+
+def list_jobs(pg_client: PostgreSQLClient, limit: int = 20) -> List[Dict]:
+    """Lista os jobs de re-score mais recentes"""
+    return pg_client.execute_query(
+        "SELECT * FROM scoring_jobs ORDER BY started_at DESC LIMIT %s", (limit,)
+    )
+
+
+def main():
+    """Executa o re-score pela linha de comando"""
+    parser = argparse.ArgumentParser(description="Re-score em lote dos portfólios HubFólio")
+    parser.add_argument("--model-path", default=MODEL_PATH, help=f"Modelo .pkl (default: {MODEL_PATH})")
+    parser.add_argument("--model-version", default=None, help="Versão gravada em predictions (default: hash do modelo)")
+    parser.add_argument("--batch-size", type=int, default=SCORING_BATCH_SIZE, help="Portfólios por lote")
+    parser.add_argument("--workers", type=int, default=SCORING_WORKERS, help="Processos de inferência (1 = sem pool)")
+    parser.add_argument("--job-id", default=None, help="Retoma um job a partir do checkpoint")
+    args = parser.parse_args()
+
+    predictor = HubFolioPredictor()
+    if not predictor.load_model(args.model_path):
+        return 1
+
+    try:
+        job = BulkScoringJob(
+            PostgreSQLClient(),
+            predictor,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            model_version=args.model_version
+        )
+        checkpoint = job.prepare(args.job_id)
+        if checkpoint['status'] == 'completed':
+            print(f"Job {job.job_id} já concluído ({checkpoint['portfolios_scored']} portfólios)")
+            return 0
+        result = job.run()
+    except ScoringJobError as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"\n{'=' * 60}")
+    print(f"Job: {job.job_id}")
+    print(f"Modelo: {job.model_version}")
+    print(f"Portfólios: {result['portfolios_scored']}/{result['portfolios_total']}")
+    print(f"Duração: {result['duration_seconds']}s")
+    print(f"{'=' * 60}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
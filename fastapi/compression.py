@@ -0,0 +1,309 @@
+"""
+Compressão gzip/zstd da API e dos objetos do MinIO
+
+- Respostas: CompressionMiddleware comprime respostas de tipos textuais (JSON,
+  NDJSON, CSV, texto) a partir de COMPRESSION_MIN_BYTES, conforme o
+  Accept-Encoding do cliente (zstd tem preferência sobre gzip). Respostas em
+  streaming são comprimidas pedaço a pedaço, com flush a cada pedaço.
+- Requisições: corpos com Content-Encoding gzip/zstd são descomprimidos em
+  streaming antes de chegar ao endpoint (ex: /ingest/stream, /predict), com
+  limite de COMPRESSION_MAX_REQUEST_BYTES descomprimidos
+  (COMPRESSION_MAX_STREAM_REQUEST_BYTES nos endpoints de streaming). O limite
+  vale durante a descompressão: nenhum pedaço é expandido além dele.
+- MinIO: com MINIO_COMPRESSION=gzip|zstd o MinIOClient grava objetos textuais
+  comprimidos com o metadado Content-Encoding (ver compress_object/decode_object).
+"""
+import os
+import zlib
+import logging
+from typing import Optional
+
+import zstandard
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+COMPRESSION_MAX_REQUEST_BYTES = int(os.getenv('COMPRESSION_MAX_REQUEST_BYTES', 8 * 1024 * 1024))
+COMPRESSION_MAX_STREAM_REQUEST_BYTES = int(os.getenv('COMPRESSION_MAX_STREAM_REQUEST_BYTES', 1024 * 1024 * 1024))
+STREAMING_PATHS = ('/ingest/stream',)  # Consomem o corpo pedaço a pedaço (limite próprio)
+GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3))
+
+ENCODINGS = ('zstd', 'gzip')  # Ordem de preferência na negociação
+
+# Maior expansão de um byte zstd (bloco RLE: 4 bytes viram 128 KiB)
+ZSTD_MAX_EXPANSION = 32 * 1024
+
+# Tipos que valem a pena comprimir (Parquet, pickle e .prof já são binários/comprimidos)
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/x-ndjson', 'application/xml',
+    'application/javascript', 'text/',
+)
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.split(';')[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+
+# ====================================================================
+# CODECS
+# ====================================================================
+
+def compressor(encoding: str):
+    """Compressor incremental (compress(chunk) + flush())"""
+    if encoding == 'gzip':
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+def sync_flush(encoding: str, codec) -> bytes:
+    """Esvazia o compressor sem finalizar o fluxo (cliente já consegue decodificar o pedaço)"""
+    if encoding == 'gzip':
+        return codec.flush(zlib.Z_SYNC_FLUSH)
+    return codec.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+def decompressor(encoding: str):
+    """Descompressor incremental (decompress(chunk))"""
+    if encoding == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+class DecompressionLimitExceeded(Exception):
+    """Saída descomprimida passou do limite"""
+
+
+class BoundedDecompressor:
+    """
+    Descompressor incremental que não expande além de limit bytes
+
+    gzip usa max_length do zlib. O decompressobj do zstd não tem limite de
+    saída, então a entrada é passada em fatias de no máximo
+    restante / ZSTD_MAX_EXPANSION bytes: cada fatia gera no máximo o que resta
+    do limite (mais um bloco de 128 KiB quando resta pouco).
+    """
+
+    def __init__(self, encoding: str, limit: int):
+        self.encoding = encoding
+        self.limit = limit
+        self.total = 0
+        self.codec = decompressor(encoding)
+
+    @property
+    def eof(self) -> bool:
+        """Fluxo comprimido completo (gzip com trailer, frame zstd fechado)"""
+        return self.codec.eof
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.encoding == 'gzip':
+            remaining = self.limit - self.total
+            out = self.codec.decompress(data, remaining + 1)
+            self._count(len(out))
+            return out
+        parts = []
+        offset = 0
+        while offset < len(data) and not self.codec.eof:
+            step = max((self.limit - self.total) // ZSTD_MAX_EXPANSION, 1)
+            out = self.codec.decompress(data[offset:offset + step])
+            self._count(len(out))
+            parts.append(out)
+            offset += step
+        return b''.join(parts)
+
+    def _count(self, size: int):
+        self.total += size
+        if self.total > self.limit:
+            raise DecompressionLimitExceeded(f"Corpo descomprimido excede {self.limit} bytes")
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    codec = compressor(encoding)
+    return codec.compress(data) + codec.flush()
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    # Frames gravados em streaming não trazem o tamanho; decompressobj não precisa dele
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Escolhe a codificação da resposta a partir do Accept-Encoding (q=0 recusa)"""
+    accepted = {}
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+# ====================================================================
+# OBJETOS NO MINIO
+# ====================================================================
+
+def compress_object(data: bytes, content_type: str, encoding: Optional[str]) -> tuple:
+    """
+    Comprime um objeto antes do upload, se a codificação estiver configurada
+
+    Returns:
+        (bytes a gravar, Content-Encoding ou None)
+    """
+    if encoding not in ENCODINGS or not is_compressible(content_type):
+        return data, None
+    return compress(data, encoding), encoding
+
+
+def decode_object(data: bytes, content_encoding: Optional[str]) -> bytes:
+    """Descomprime um objeto baixado do MinIO conforme o Content-Encoding gravado"""
+    if content_encoding in ENCODINGS:
+        return decompress(data, content_encoding)
+    return data
+
+
+# ====================================================================
+# MIDDLEWARE
+# ====================================================================
+
+class CompressionMiddleware:
+    """Middleware ASGI: descomprime requisições e comprime respostas"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES,
+                 max_request_bytes: int = COMPRESSION_MAX_REQUEST_BYTES,
+                 max_stream_request_bytes: int = COMPRESSION_MAX_STREAM_REQUEST_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.max_request_bytes = max_request_bytes
+        self.max_stream_request_bytes = max_stream_request_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        request_encoding = headers.get('content-encoding', '').strip().lower()
+        if request_encoding and request_encoding != 'identity':
+            if request_encoding not in ENCODINGS:
+                response = PlainTextResponse(
+                    f"Content-Encoding não suportado: {request_encoding} (use {', '.join(ENCODINGS)})",
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+                )
+                await response(scope, receive, send)
+                return
+            scope = dict(scope, headers=[
+                (name, value) for name, value in scope['headers']
+                if name not in (b'content-encoding', b'content-length')
+            ])
+            limit = self.max_stream_request_bytes if scope['path'] in STREAMING_PATHS else self.max_request_bytes
+            receive = self._decompressing_receive(receive, request_encoding, limit)
+
+        encoding = negotiate(headers.get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressingResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+    @staticmethod
+    def _decompressing_receive(receive: Receive, encoding: str, limit: int) -> Receive:
+        codec = BoundedDecompressor(encoding, limit)
+
+        async def wrapped() -> Message:
+            message = await receive()
+            if message['type'] != 'http.request':
+                return message
+            try:
+                body = codec.decompress(message.get('body', b''))
+            except DecompressionLimitExceeded as e:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+            except (zlib.error, zstandard.ZstdError) as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Corpo {encoding} inválido: {e}"
+                )
+            if not message.get('more_body', False) and not codec.eof:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Corpo {encoding} incompleto (fluxo comprimido truncado)"
+                )
+            return dict(message, body=body)
+
+        return wrapped
+
+
+class _CompressingResponder:
+    """Comprime a resposta de uma requisição (inteira ou em streaming)"""
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message: Optional[Message] = None
+        self.codec = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message):
+        if message['type'] == 'http.response.start':
+            self.start_message = message
+            headers = Headers(raw=message['headers'])
+            self.passthrough = 'content-encoding' in headers or not is_compressible(headers.get('content-type'))
+            return
+
+        if message['type'] != 'http.response.body':
+            await self.send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if self.passthrough or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=start['headers'])
+            headers['Content-Encoding'] = self.encoding
+            headers.add_vary_header('Accept-Encoding')
+            if more_body:
+                del headers['Content-Length']
+                self.codec = compressor(self.encoding)
+            else:
+                body = compress(body, self.encoding)
+                headers['Content-Length'] = str(len(body))
+                await self.send(start)
+                await self.send({'type': 'http.response.body', 'body': body})
+                return
+            await self.send(start)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if more_body:
+            data = self.codec.compress(body) + sync_flush(self.encoding, self.codec)
+        else:
+            data = self.codec.compress(body) + self.codec.flush()
+        await self.send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
@@ -0,0 +1,315 @@
+"""
+Monitor de drift das entradas e do score do /predict
+Mantém, para cada uma das 8 features de HubFolioPredictor.features e para o
+score previsto, um histograma com faixas fixas calculadas a partir do
+baseline de treino (hubfolio_mock_data.json). As contagens ficam em um ring
+buffer de baldes de DRIFT_BUCKET_SECONDS, que forma a janela deslizante de
+DRIFT_WINDOW_SECONDS: cada predição custa uma busca binária em ~10 faixas por
+feature e um incremento, sem guardar os valores.
+
+A cada DRIFT_CHECK_SECONDS a janela é comparada com o baseline:
+- PSI (Population Stability Index) por feature e do score
+- KS (maior distância entre as CDFs), calculado sobre as faixas do histograma
+
+O score do baseline é a predição do modelo primário sobre o próprio arquivo
+de baseline, recalculada quando a versão do modelo muda. Só entram na
+distribuição de score as predições servidas por essa versão (variantes A/B e
+modelos do registro ficam de fora).
+"""
+import os
+import time
+import bisect
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from parquet_storage import flatten_record
+from serialization import loads
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DRIFT_BASELINE_FILE = os.getenv('DRIFT_BASELINE_FILE', '/data/archive/hubfolio_mock_data.json')
+DRIFT_WINDOW_SECONDS = int(os.getenv('DRIFT_WINDOW_SECONDS', 3600))
+DRIFT_BUCKET_SECONDS = int(os.getenv('DRIFT_BUCKET_SECONDS', 60))
+DRIFT_CHECK_SECONDS = int(os.getenv('DRIFT_CHECK_SECONDS', 300))
+DRIFT_BINS = int(os.getenv('DRIFT_BINS', 10))
+DRIFT_MIN_SAMPLES = int(os.getenv('DRIFT_MIN_SAMPLES', 100))
+DRIFT_PSI_ALERT = float(os.getenv('DRIFT_PSI_ALERT', 0.2))  # > 0.2: mudança significativa
+
+SCORE = 'score'
+SCORE_CUTS = [10.0, 20.0, 30.0, 40.0, 50.0, 60.0, 70.0, 80.0, 90.0]  # IQ em [0, 100]
+PSI_EPSILON = 1e-4  # Proporção mínima por faixa (faixas vazias não levam o PSI ao infinito)
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> float:
+    """PSI entre duas distribuições de contagens nas mesmas faixas"""
+    e = np.maximum(expected / expected.sum(), PSI_EPSILON)
+    a = np.maximum(actual / actual.sum(), PSI_EPSILON)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def ks_statistic(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Estatística KS sobre as CDFs das faixas (limite inferior do KS exato)"""
+    return float(np.max(np.abs(np.cumsum(expected) / expected.sum() - np.cumsum(actual) / actual.sum())))
+
+
+class DriftMonitor:
+    """
+    Histogramas em janela deslizante das entradas e do score, comparados ao baseline
+
+    Desativado por padrão (DRIFT_MONITOR_ENABLED=false). observe() é chamado
+    pelo /predict no event loop e check() fora dele; um lock protege o ring
+    buffer.
+    """
+
+    def __init__(
+        self,
+        baseline_file: str = DRIFT_BASELINE_FILE,
+        window_seconds: int = DRIFT_WINDOW_SECONDS,
+        bucket_seconds: int = DRIFT_BUCKET_SECONDS
+    ):
+        self.enabled = os.getenv('DRIFT_MONITOR_ENABLED', 'false').lower() == 'true'
+        self.baseline_file = baseline_file
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.n_buckets = max(1, window_seconds // self.bucket_seconds)
+        self.window_seconds = self.n_buckets * self.bucket_seconds
+
+        self.predictor = None
+        self.features: List[str] = []
+        self.cuts: Dict[str, List[float]] = {}  # Limites internos das faixas de cada histograma
+        self.baseline: Dict[str, np.ndarray] = {}
+        self.baseline_means: Dict[str, float] = {}
+        self.baseline_rows = 0
+        self.baseline_model_version: Optional[str] = None
+        self._baseline_df: Optional[pd.DataFrame] = None
+
+        self._lock = threading.Lock()
+        self._counts: Optional[np.ndarray] = None  # [balde, histograma, faixa]
+        self._sums: Optional[np.ndarray] = None    # [balde, histograma] (para a média)
+        self._window: Optional[np.ndarray] = None  # Soma dos baldes válidos
+        self._window_sums: Optional[np.ndarray] = None
+        self._epoch = 0  # Balde atual (now // bucket_seconds)
+
+        # Métricas
+        self.observed_total = 0
+        self.scores_total = 0
+        self.checks_total = 0
+        self.last_report: Optional[Dict] = None
+
+        logger.info(
+            f"DriftMonitor initialized - Enabled: {self.enabled}, "
+            f"window: {self.window_seconds}s ({self.n_buckets} x {self.bucket_seconds}s)"
+        )
+
+    @property
+    def active(self) -> bool:
+        return self._counts is not None
+
+    # ----------------------------------------------------------------
+    # Baseline
+    # ----------------------------------------------------------------
+
+    def start(self, predictor):
+        """Carrega o baseline de treino e cria os histogramas (bloqueante)"""
+        self.predictor = predictor
+        with open(self.baseline_file, 'rb') as f:
+            records = loads(f.read())
+        df = pd.DataFrame([flatten_record(record) for record in records])
+
+        self.features = list(predictor.features)
+        df = df[self.features].astype(float)
+        for feature in self.features:
+            values = df[feature].to_numpy()
+            # Faixas por quantis do baseline (repetidos são unidos: contagens e booleanos têm poucas faixas)
+            quantiles = np.quantile(values, np.linspace(0, 1, DRIFT_BINS + 1)[1:-1])
+            self.cuts[feature] = sorted(set(float(q) for q in quantiles)) or [float(values[0])]
+            self.baseline[feature] = self._histogram(feature, values)
+            self.baseline_means[feature] = float(values.mean())
+        self.cuts[SCORE] = SCORE_CUTS
+        self.baseline_rows = len(df)
+        self._baseline_df = df
+
+        n_hist = len(self.features) + 1
+        n_bins = max(len(cuts) for cuts in self.cuts.values()) + 1
+        with self._lock:
+            self._counts = np.zeros((self.n_buckets, n_hist, n_bins), dtype=np.int64)
+            self._sums = np.zeros((self.n_buckets, n_hist), dtype=np.float64)
+            self._window = np.zeros((n_hist, n_bins), dtype=np.int64)
+            self._window_sums = np.zeros(n_hist, dtype=np.float64)
+            self._epoch = int(time.time() // self.bucket_seconds)
+        self._refresh_score_baseline()
+
+        logger.info(
+            f"✅ Baseline de drift carregado: {self.baseline_rows} portfólios de {self.baseline_file}"
+        )
+
+    def _histogram(self, name: str, values: np.ndarray) -> np.ndarray:
+        cuts = self.cuts[name]
+        return np.bincount(np.searchsorted(cuts, values, side='right'), minlength=len(cuts) + 1)
+
+    def _refresh_score_baseline(self):
+        """Score do baseline pelo modelo primário atual (refeito quando a versão muda)"""
+        predictor = self.predictor
+        if predictor is None or predictor.modelo is None:
+            return
+        version = predictor.model_version
+        if version == self.baseline_model_version and SCORE in self.baseline:
+            return
+        scores = np.clip(predictor.modelo.predict(self._baseline_df), 0, 100)
+        self.baseline[SCORE] = self._histogram(SCORE, scores)
+        self.baseline_means[SCORE] = float(scores.mean())
+        self.baseline_model_version = version
+        # Scores da janela vieram da versão anterior: não são comparáveis
+        with self._lock:
+            self._clear_histogram(len(self.features))
+        logger.info(f"Baseline de score recalculado para o modelo {version}")
+
+    # ----------------------------------------------------------------
+    # Janela deslizante
+    # ----------------------------------------------------------------
+
+    def _advance(self, now: float):
+        """Descarta da janela os baldes que expiraram até now (chamar com o lock)"""
+        epoch = int(now // self.bucket_seconds)
+        if epoch == self._epoch:
+            return
+        if epoch - self._epoch >= self.n_buckets:
+            self._counts.fill(0)
+            self._sums.fill(0)
+            self._window.fill(0)
+            self._window_sums.fill(0)
+        else:
+            for e in range(self._epoch + 1, epoch + 1):
+                slot = e % self.n_buckets
+                self._window -= self._counts[slot]
+                self._window_sums -= self._sums[slot]
+                self._counts[slot] = 0
+                self._sums[slot] = 0
+        self._epoch = epoch
+
+    def _clear_histogram(self, index: int):
+        if self._counts is None:
+            return
+        self._counts[:, index] = 0
+        self._sums[:, index] = 0
+        self._window[index] = 0
+        self._window_sums[index] = 0
+
+    def observe(self, dados: Dict, resultado: Optional[Dict] = None):
+        """
+        Registra as features de uma predição (e o score, se veio do modelo do baseline)
+
+        Args:
+            dados: Entrada do preditor (bio/contatos bool ou int)
+            resultado: Saída de prever(), com indice_qualidade e model_version
+        """
+        if self._counts is None:
+            return
+        with self._lock:
+            self._advance(time.time())
+            slot = self._epoch % self.n_buckets
+            counts, sums, window = self._counts[slot], self._sums[slot], self._window
+            for i, feature in enumerate(self.features):
+                value = float(dados[feature])
+                b = bisect.bisect_right(self.cuts[feature], value)
+                counts[i, b] += 1
+                window[i, b] += 1
+                sums[i] += value
+                self._window_sums[i] += value
+            self.observed_total += 1
+
+            if resultado is not None and resultado.get('model_version') == self.baseline_model_version:
+                i = len(self.features)
+                score = float(resultado['indice_qualidade'])
+                b = bisect.bisect_right(SCORE_CUTS, score)
+                counts[i, b] += 1
+                window[i, b] += 1
+                sums[i] += score
+                self._window_sums[i] += score
+                self.scores_total += 1
+
+    # ----------------------------------------------------------------
+    # Estatísticas de drift
+    # ----------------------------------------------------------------
+
+    def check(self) -> Dict:
+        """Compara a janela atual com o baseline (PSI/KS por feature e do score)"""
+        if self._counts is None:
+            return {"enabled": self.enabled, "active": False}
+        self._refresh_score_baseline()
+        with self._lock:
+            self._advance(time.time())
+            window = self._window.copy()
+            window_sums = self._window_sums.copy()
+
+        report_features = {}
+        for i, name in enumerate(self.features + [SCORE]):
+            expected = self.baseline.get(name)
+            n_bins = len(self.cuts[name]) + 1
+            actual = window[i, :n_bins]
+            samples = int(actual.sum())
+            entry = {
+                "samples": samples,
+                "baseline_mean": round(self.baseline_means[name], 4) if name in self.baseline_means else None,
+                "window_mean": round(float(window_sums[i]) / samples, 4) if samples else None,
+            }
+            if expected is not None and samples >= DRIFT_MIN_SAMPLES:
+                psi = population_stability_index(expected, actual)
+                entry.update({
+                    "psi": round(psi, 4),
+                    "ks": round(ks_statistic(expected, actual), 4),
+                    "drift": psi > DRIFT_PSI_ALERT,
+                })
+            report_features[name] = entry
+
+        psis = {name: entry["psi"] for name, entry in report_features.items() if "psi" in entry}
+        report = {
+            "checked_at": time.time(),
+            "window_seconds": self.window_seconds,
+            "min_samples": DRIFT_MIN_SAMPLES,
+            "psi_alert": DRIFT_PSI_ALERT,
+            "baseline_rows": self.baseline_rows,
+            "baseline_model_version": self.baseline_model_version,
+            "max_psi": max(psis.values()) if psis else None,
+            "drifted": sorted(name for name, entry in report_features.items() if entry.get("drift")),
+            "features": report_features,
+        }
+        self.checks_total += 1
+        self.last_report = report
+        if report["drifted"]:
+            logger.warning(f"⚠️ Drift detectado em: {report['drifted']} (PSI > {DRIFT_PSI_ALERT})")
+        return report
+
+    @staticmethod
+    def telemetry(report: Dict) -> Dict:
+        """Chaves de telemetria do ThingsBoard de um relatório de check()"""
+        telemetry = {
+            'drift_max_psi': report.get('max_psi'),
+            'drift_alert': bool(report.get('drifted')),
+        }
+        for name, entry in report.get('features', {}).items():
+            telemetry[f'drift_samples_{name}'] = entry['samples']
+            if 'psi' in entry:
+                telemetry[f'drift_psi_{name}'] = entry['psi']
+                telemetry[f'drift_ks_{name}'] = entry['ks']
+        return telemetry
+
+    def stats(self) -> Dict:
+        """Configuração, contadores e o último relatório de drift"""
+        return {
+            "enabled": self.enabled,
+            "active": self.active,
+            "baseline_file": self.baseline_file,
+            "window_seconds": self.window_seconds,
+            "bucket_seconds": self.bucket_seconds,
+            "check_seconds": DRIFT_CHECK_SECONDS,
+            "bins": {name: len(cuts) + 1 for name, cuts in self.cuts.items()},
+            "observed_total": self.observed_total,
+            "scores_total": self.scores_total,
+            "checks_total": self.checks_total,
+            "last_report": self.last_report,
+        }
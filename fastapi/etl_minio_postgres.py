@@ -3,26 +3,35 @@ ETL Script: MinIO -> PostgreSQL
 Extrai dados do MinIO e carrega no PostgreSQL de forma estruturada
 """
 
+import os
 import io
-import json
 import logging
+import argparse
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple, Any
 import pandas as pd
+import pyarrow as pa
 
 from minio_client import MinIOClient
 from postgres_client import PostgreSQLClient
+from profiling import RequestProfiler
+from parquet_storage import PARQUET_PREFIX, ETL_COLUMNS, flatten_record
+from serialization import loads
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Portfólios gravados por transação no ETL
+ETL_BATCH_SIZE = int(os.getenv('ETL_BATCH_SIZE', 5000))
+
 
 class HubFolioETL:
     """Pipeline ETL para transferir dados do MinIO para PostgreSQL"""
     
-    def __init__(self):
+    def __init__(self, batch_size: int = ETL_BATCH_SIZE):
         self.minio_client = MinIOClient()
         self.pg_client = PostgreSQLClient()
+        self.batch_size = batch_size
         self.stats = {
             "users_inserted": 0,
             "portfolios_inserted": 0,
@@ -38,84 +47,125 @@ class HubFolioETL:
             object_name: Caminho do objeto no MinIO (ex: 'hubfolio/data/portfolios.json')
             
         Returns:
-            Bytes com os dados do arquivo
+            Bytes com os dados do arquivo (memoryview do cache local para objetos grandes)
         """
         try:
             logger.info(f"Extraindo dados de {object_name}")
             
-            # Download do objeto usando boto3 (s3_client)
-            response = self.minio_client.s3_client.get_object(
-                Bucket=self.minio_client.bucket_name,
-                Key=object_name
-            )
-            
-            # Ler conteúdo
-            data = response['Body'].read()
-            
-            return data
+            # Download do objeto (descomprimido se gravado com Content-Encoding);
+            # com OBJECT_CACHE_ENABLED, só trafega se o ETag mudou
+            return self.minio_client.get_object_view(object_name)
             
         except Exception as e:
             logger.error(f"Erro ao extrair dados de {object_name}: {e}")
             raise
     
-    def load_portfolios(self) -> int:
+    def extract_parquet(
+        self,
+        prefix: str = PARQUET_PREFIX,
+        filters: Optional[List[Tuple[str, str, Any]]] = None
+    ) -> pa.Table:
+        """
+        Extrai portfólios de um dataset Parquet particionado no MinIO
+        
+        Lê apenas as colunas usadas pelo ETL e aplica os filtros com pushdown
+        (partições ingest_date e row groups descartados sem download completo).
+        
+        Args:
+            prefix: Prefixo do dataset
+            filters: Filtros [(coluna, operador, valor)]
+            
+        Returns:
+            Tabela Arrow com os portfólios
+        """
+        try:
+            logger.info(f"Extraindo dataset Parquet de {prefix} (filtros: {filters})")
+            return self.minio_client.read_parquet_dataset(prefix, columns=ETL_COLUMNS, filters=filters)
+        except Exception as e:
+            logger.error(f"Erro ao extrair dataset Parquet de {prefix}: {e}")
+            raise
+    
+    def extract_parquet_batches(
+        self,
+        prefix: str = PARQUET_PREFIX,
+        filters: Optional[List[Tuple[str, str, Any]]] = None
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Extrai portfólios do dataset Parquet em lotes de até batch_size linhas
+        
+        Mesma projeção (ETL_COLUMNS) e pushdown de extract_parquet, sem
+        carregar o dataset inteiro.
+        """
+        logger.info(f"Extraindo dataset Parquet de {prefix} em lotes de {self.batch_size} (filtros: {filters})")
+        return self.minio_client.iter_parquet_batches(
+            prefix, columns=ETL_COLUMNS, filters=filters, batch_size=self.batch_size
+        )
+    
+    def load_portfolios(
+        self,
+        source: str = "json",
+        filters: Optional[List[Tuple[str, str, Any]]] = None
+    ) -> int:
         """
         Carrega portfólios do MinIO para PostgreSQL
         
+        Args:
+            source: 'json' (hubfolio/data/portfolios.json) ou 'parquet' (dataset particionado)
+            filters: Filtros do dataset Parquet, ex: [('ingest_date', '=', '2025-01-31')]
+        
         Returns:
             Número de portfólios inseridos
         """
         try:
-            logger.info("Iniciando carga de portfólios...")
+            logger.info(f"Iniciando carga de portfólios (fonte: {source})...")
             
-            # Extrair dados
-            data = self.extract_from_minio("hubfolio/data/portfolios.json")
-            
-            # Parsear JSON
-            portfolios = json.loads(data.decode('utf-8'))
-            
-            logger.info(f"Total de {len(portfolios)} portfólios encontrados")
+            if source == "parquet":
+                # Record batches já achatados no schema do dataset, lidos sob demanda
+                batches = self.extract_parquet_batches(filters=filters)
+            else:
+                # Extrair dados
+                data = self.extract_from_minio("hubfolio/data/portfolios.json")
+                
+                # Parsear JSON (orjson direto dos bytes)
+                portfolios = loads(data)
+                logger.info(f"Total de {len(portfolios)} portfólios encontrados")
+                batches = (
+                    portfolios[start:start + self.batch_size]
+                    for start in range(0, len(portfolios), self.batch_size)
+                )
             
             inserted_portfolios = 0
             inserted_users = 0
             metrics_calculated = 0
+            start = 0
             
-            for portfolio in portfolios:
+            # Lotes gravados em uma transação cada, com métricas calculadas em Python
+            for batch in batches:
                 try:
-                    # 1. Inserir usuário
-                    user_data = {
-                        'user_id': portfolio['user_id'],
-                        'nome': portfolio['nome']
-                    }
-                    
-                    user_id = self.pg_client.insert_user(user_data)
-                    if user_id:
-                        inserted_users += 1
-                    
-                    # 2. Inserir portfólio
-                    portfolio_data = {
-                        'user_id': portfolio['user_id'],
-                        'bio': portfolio['secoes_preenchidas']['bio'],
-                        'projetos_min': portfolio['secoes_preenchidas']['projetos_min'],
-                        'habilidades_min': portfolio['secoes_preenchidas']['habilidades_min'],
-                        'contatos': portfolio['secoes_preenchidas']['contatos'],
-                        'kw_contexto': portfolio['palavras_chave_clareza']['contexto'],
-                        'kw_processo': portfolio['palavras_chave_clareza']['processo'],
-                        'kw_resultado': portfolio['palavras_chave_clareza']['resultado'],
-                        'consistencia_visual_score': portfolio['consistencia_visual_score']
-                    }
-                    
-                    portfolio_id = self.pg_client.insert_portfolio(portfolio_data)
-                    if portfolio_id:
-                        inserted_portfolios += 1
-                        
-                        # 3. Calcular métricas
-                        if self.pg_client.calculate_metrics(portfolio_id):
-                            metrics_calculated += 1
-                    
+                    if source == "parquet":
+                        result = self.pg_client.load_portfolio_columns(
+                            {name: batch.column(name) for name in ETL_COLUMNS}
+                        )
+                    else:
+                        result = self.pg_client.load_portfolio_batch(
+                            [flatten_record(portfolio) for portfolio in batch]
+                        )
+                    inserted_users += result["users"]
+                    inserted_portfolios += result["portfolios"]
+                    metrics_calculated += result["metrics"]
                 except Exception as e:
-                    logger.error(f"Erro ao processar portfólio {portfolio.get('user_id')}: {e}")
-                    self.stats["errors"] += 1
+                    # Lote inválido: refaz registro a registro para isolar os erros
+                    logger.warning(f"Lote {start}-{start + len(batch)} falhou ({e}), processando por registro")
+                    rows = batch.to_pylist() if source == "parquet" else batch
+                    for portfolio in rows:
+                        users, portfolios_ok, metrics_ok = self._load_portfolio_row(portfolio, source)
+                        inserted_users += users
+                        inserted_portfolios += portfolios_ok
+                        metrics_calculated += metrics_ok
+                start += len(batch)
+            
+            if source == "parquet":
+                logger.info(f"Total de {start} portfólios encontrados")
             
             self.stats["users_inserted"] = inserted_users
             self.stats["portfolios_inserted"] = inserted_portfolios
@@ -131,10 +181,60 @@ class HubFolioETL:
             logger.error(f"Erro ao carregar portfólios: {e}")
             raise
     
-    def run_full_etl(self) -> Dict:
+    def _load_portfolio_row(self, portfolio: Dict, source: str) -> Tuple[int, int, int]:
+        """
+        Carrega um único portfólio (caminho de fallback dos lotes)
+        
+        Returns:
+            (usuários, portfólios, métricas) gravados
+        """
+        try:
+            if source != "parquet":
+                portfolio = flatten_record(portfolio)
+            
+            # 1. Inserir usuário
+            user_data = {
+                'user_id': portfolio['user_id'],
+                'nome': portfolio['nome']
+            }
+            user_id = self.pg_client.insert_user(user_data)
+            
+            # 2. Inserir portfólio
+            portfolio_data = {
+                'user_id': portfolio['user_id'],
+                'bio': portfolio['bio'],
+                'projetos_min': portfolio['projetos_min'],
+                'habilidades_min': portfolio['habilidades_min'],
+                'contatos': portfolio['contatos'],
+                'kw_contexto': portfolio['kw_contexto'],
+                'kw_processo': portfolio['kw_processo'],
+                'kw_resultado': portfolio['kw_resultado'],
+                'consistencia_visual_score': portfolio['consistencia_visual_score']
+            }
+            portfolio_id = self.pg_client.insert_portfolio(portfolio_data)
+            
+            # 3. Calcular métricas
+            metrics_ok = bool(portfolio_id) and self.pg_client.calculate_metrics(portfolio_id)
+            if not portfolio_id:
+                self.stats["errors"] += 1
+            return int(bool(user_id)), int(bool(portfolio_id)), int(metrics_ok)
+        except Exception as e:
+            logger.error(f"Erro ao processar portfólio {portfolio.get('user_id')}: {e}")
+            self.stats["errors"] += 1
+            return 0, 0, 0
+    
+    def run_full_etl(
+        self,
+        source: str = "json",
+        filters: Optional[List[Tuple[str, str, Any]]] = None
+    ) -> Dict:
         """
         Executa o pipeline ETL completo
         
+        Args:
+            source: 'json' ou 'parquet'
+            filters: Filtros do dataset Parquet (apenas source='parquet')
+        
         Returns:
             Dicionário com estatísticas da execução
         """
@@ -152,7 +252,8 @@ class HubFolioETL:
                 raise Exception("PostgreSQL não está conectado")
             
             # Carregar portfólios
-            self.load_portfolios()
+            self.stats["source"] = source
+            self.load_portfolios(source=source, filters=filters)
             
             # Calcular tempo de execução
             end_time = datetime.now()
@@ -196,11 +297,23 @@ class HubFolioETL:
 
 def main():
     """Função principal para execução do ETL via CLI"""
+    parser = argparse.ArgumentParser(description="ETL MinIO -> PostgreSQL (HubFólio)")
+    parser.add_argument("--source", choices=["json", "parquet"], default="json", help="Formato de origem no MinIO")
+    parser.add_argument("--ingest-date", default=None, help="Partição Parquet a carregar (YYYY-MM-DD)")
+    args = parser.parse_args()
+    
     etl = HubFolioETL()
     
+    # Com PROFILING_ENABLED=true a execução via CLI é sempre perfilada
+    profiler = RequestProfiler(etl.minio_client)
+    
     try:
         # Executar ETL completo
-        stats = etl.run_full_etl()
+        with profiler.profile("etl_cli", kind="etl", forced=True) as result:
+            filters = [('ingest_date', '=', args.ingest_date)] if args.ingest_date else None
+            stats = etl.run_full_etl(source=args.source, filters=filters)
+        if result and result.get('object_key'):
+            print(f"\n🔬 Profile do ETL salvo em: {result['object_key']}")
         
         # Exibir sumário
         print("\n📊 SUMÁRIO DO BANCO DE DADOS:")
@@ -0,0 +1,326 @@
+"""
+Regras de feedback e classificação do IQ declaradas como dados
+As regras (limiares e mensagens) vêm do padrão abaixo, de um arquivo JSON
+(FEEDBACK_RULES_PATH) ou da tabela feedback_catalog do PostgreSQL
+(FEEDBACK_RULES_SOURCE=db). A mensagem de "nenhuma sugestão" (ok_message) é a
+linha code = -1 do catálogo; regras carregadas de arquivo são gravadas no
+catálogo para que feedback_messages() no banco decodifique igual. As regras são
+avaliadas em lote com máscaras NumPy e cada portfólio recebe um bitmask (bit =
+código da regra), que é o que fica gravado em predictions.feedback_mask.
+
+Formato do JSON:
+    {
+      "rules": [{"code": 0, "message": "...", "features": ["projetos_min"],
+                 "operator": "<", "threshold": 3}, ...],
+      "classifications": [{"label": "Excelente", "min_iq": 80}, ...,
+                          {"label": "Precisa Melhorar", "min_iq": null}],
+      "ok_message": "..."
+    }
+"""
+import os
+import json
+import logging
+import operator
+from typing import Dict, List, Mapping, Optional, Sequence, Any
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FEEDBACK_RULES_SOURCE = os.getenv('FEEDBACK_RULES_SOURCE', 'default')  # default | file | db
+FEEDBACK_RULES_PATH = os.getenv('FEEDBACK_RULES_PATH', '/app/config/feedback_rules.json')
+
+# Bits de 0 a 30 (feedback_mask é INTEGER); o código de uma regra não deve ser reaproveitado
+MAX_RULE_CODE = 30
+# Linha do feedback_catalog com a mensagem de feedback_mask 0
+OK_MESSAGE_CODE = -1
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+DEFAULT_FEEDBACK_RULES = [
+    {"code": 0, "message": "Adicione mais projetos ao seu portfólio (mínimo 3 recomendado)",
+     "features": ["projetos_min"], "operator": "<", "threshold": 3},
+    {"code": 1, "message": "Liste mais habilidades técnicas (mínimo 5)",
+     "features": ["habilidades_min"], "operator": "<", "threshold": 5},
+    {"code": 2, "message": "Adicione uma bio/sobre você",
+     "features": ["bio"], "operator": "==", "threshold": 0},
+    {"code": 3, "message": "Inclua informações de contato",
+     "features": ["contatos"], "operator": "==", "threshold": 0},
+    {"code": 4, "message": "Melhore a narrativa dos projetos (contexto, processo, resultado)",
+     "features": ["kw_contexto", "kw_processo", "kw_resultado"], "operator": "<", "threshold": 9},
+    {"code": 5, "message": "Trabalhe na consistência visual do portfólio",
+     "features": ["consistencia_visual_score"], "operator": "<", "threshold": 70},
+]
+
+# Em ordem decrescente de min_iq; a última (min_iq null) é a classe padrão
+DEFAULT_CLASSIFICATIONS = [
+    {"label": "Excelente", "min_iq": 80},
+    {"label": "Bom", "min_iq": 60},
+    {"label": "Regular", "min_iq": 40},
+    {"label": "Precisa Melhorar", "min_iq": None},
+]
+
+DEFAULT_OK_MESSAGE = "Seu portfólio está bem estruturado!"
+
+
+class FeedbackRulesError(ValueError):
+    """Definição de regras inválida"""
+
+
+class FeedbackEngine:
+    """Avalia regras de feedback e faixas de classificação sobre lotes de portfólios"""
+
+    def __init__(
+        self,
+        rules: Optional[List[Dict]] = None,
+        classifications: Optional[List[Dict]] = None,
+        ok_message: str = DEFAULT_OK_MESSAGE,
+        source: str = 'default'
+    ):
+        self.rules = self._validate_rules(DEFAULT_FEEDBACK_RULES if rules is None else rules)
+        self.classifications = self._validate_classifications(
+            DEFAULT_CLASSIFICATIONS if classifications is None else classifications
+        )
+        self.ok_message = ok_message
+        self.source = source
+
+        self.messages = {rule['code']: rule['message'] for rule in self.rules}
+        self._ops = [OPERATORS[rule['operator']] for rule in self.rules]
+        self._bits = [1 << rule['code'] for rule in self.rules]
+        self._compiled = [
+            (tuple(rule['features']), op, rule['threshold'], bit)
+            for rule, op, bit in zip(self.rules, self._ops, self._bits)
+        ]
+        self._labels = [c['label'] for c in self.classifications]
+        self._limits = [c['min_iq'] for c in self.classifications[:-1]]
+        self._decoded: Dict[int, List[str]] = {}
+
+    @staticmethod
+    def _validate_rules(rules: List[Dict]) -> List[Dict]:
+        if not rules:
+            raise FeedbackRulesError("Nenhuma regra de feedback definida")
+        validated = []
+        for rule in rules:
+            try:
+                code = int(rule['code'])
+                entry = {
+                    'code': code,
+                    'message': str(rule['message']),
+                    'features': list(rule['features']),
+                    'operator': rule['operator'],
+                    'threshold': float(rule['threshold']),
+                }
+            except (KeyError, TypeError, ValueError) as e:
+                raise FeedbackRulesError(f"Regra inválida {rule}: {e}")
+            if not 0 <= code <= MAX_RULE_CODE:
+                raise FeedbackRulesError(f"Código de regra fora de 0-{MAX_RULE_CODE}: {code}")
+            if entry['operator'] not in OPERATORS:
+                raise FeedbackRulesError(f"Operador inválido na regra {code}: {entry['operator']}")
+            if not entry['features']:
+                raise FeedbackRulesError(f"Regra {code} sem features")
+            validated.append(entry)
+
+        codes = [rule['code'] for rule in validated]
+        if len(set(codes)) != len(codes):
+            raise FeedbackRulesError(f"Códigos de regra repetidos: {codes}")
+        # Mensagens saem na ordem dos códigos, independente da ordem de declaração
+        return sorted(validated, key=lambda rule: rule['code'])
+
+    @staticmethod
+    def _validate_classifications(classifications: List[Dict]) -> List[Dict]:
+        if not classifications or classifications[-1].get('min_iq') is not None:
+            raise FeedbackRulesError("A última classificação deve ter min_iq null (classe padrão)")
+        limits = [float(c['min_iq']) for c in classifications[:-1]]
+        if limits != sorted(limits, reverse=True):
+            raise FeedbackRulesError("Classificações devem estar em ordem decrescente de min_iq")
+        return [
+            {'label': c['label'], 'min_iq': limit}
+            for c, limit in zip(classifications, limits + [None])
+        ]
+
+    # ----------------------------------------------------------------
+    # Carregamento
+    # ----------------------------------------------------------------
+
+    @classmethod
+    def from_file(cls, path: str) -> 'FeedbackEngine':
+        """Carrega regras de um arquivo JSON (chaves ausentes usam o padrão)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(
+            rules=config.get('rules'),
+            classifications=config.get('classifications'),
+            ok_message=config.get('ok_message', DEFAULT_OK_MESSAGE),
+            source=f"file:{path}"
+        )
+
+    @classmethod
+    def from_db(cls, pg_client) -> 'FeedbackEngine':
+        """Carrega as regras ativas e a ok_message da tabela feedback_catalog"""
+        rows = pg_client.execute_query(
+            "SELECT code, message, features, operator, threshold "
+            "FROM feedback_catalog WHERE active ORDER BY code"
+        )
+        rules = [row for row in rows if row['code'] != OK_MESSAGE_CODE]
+        if not rules:
+            raise FeedbackRulesError("Nenhuma regra ativa em feedback_catalog")
+        ok_message = next(
+            (row['message'] for row in rows if row['code'] == OK_MESSAGE_CODE), DEFAULT_OK_MESSAGE
+        )
+        return cls(rules=rules, ok_message=ok_message, source='db')
+
+    def save_to_db(self, pg_client):
+        """
+        Grava regras e ok_message no feedback_catalog (upsert por código)
+
+        Regras do catálogo que não estão no engine são desativadas, não
+        apagadas: predições antigas continuam decodificáveis.
+        """
+        rows = [
+            (rule['code'], rule['message'], rule['features'], rule['operator'], rule['threshold'])
+            for rule in self.rules
+        ]
+        rows.append((OK_MESSAGE_CODE, self.ok_message, None, None, None))
+        conn = pg_client.get_connection()
+        try:
+            cursor = conn.cursor()
+            execute_values(
+                cursor,
+                """
+                INSERT INTO feedback_catalog (code, message, features, operator, threshold)
+                VALUES %s
+                ON CONFLICT (code) DO UPDATE SET
+                    message = EXCLUDED.message,
+                    features = EXCLUDED.features,
+                    operator = EXCLUDED.operator,
+                    threshold = EXCLUDED.threshold,
+                    active = TRUE
+                """,
+                rows,
+                template="(%s, %s, %s::TEXT[], %s, %s)"
+            )
+            cursor.execute(
+                "UPDATE feedback_catalog SET active = FALSE WHERE active AND code <> ALL(%s)",
+                ([row[0] for row in rows],)
+            )
+            conn.commit()
+            cursor.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # ----------------------------------------------------------------
+    # Avaliação
+    # ----------------------------------------------------------------
+
+    def masks(self, columns: Mapping[str, Sequence[Any]]) -> np.ndarray:
+        """
+        Avalia todas as regras para um lote de portfólios
+
+        Args:
+            columns: Colunas de features (dict de listas, DataFrame ou tabela)
+
+        Returns:
+            Array int32 com o bitmask de sugestões de cada portfólio
+        """
+        arrays: Dict[str, np.ndarray] = {}
+        result = None
+        for rule, op, bit in zip(self.rules, self._ops, self._bits):
+            values = None
+            for name in rule['features']:
+                if name not in arrays:
+                    arrays[name] = np.asarray(columns[name], dtype=np.float64)
+                values = arrays[name] if values is None else values + arrays[name]
+            hit = np.where(op(values, rule['threshold']), bit, 0).astype(np.int32)
+            result = hit if result is None else result | hit
+        return result
+
+    def mask(self, dados: Mapping[str, Any]) -> int:
+        """Bitmask de um único portfólio (sem NumPy; features ausentes valem 0)"""
+        mask = 0
+        for features, op, threshold, bit in self._compiled:
+            if len(features) == 1:
+                value = dados.get(features[0]) or 0
+            else:
+                value = sum(dados.get(name) or 0 for name in features)
+            if op(value, threshold):
+                mask |= bit
+        return mask
+
+    def decode(self, mask: int) -> List[str]:
+        """Mensagens correspondentes a um bitmask (ordem dos códigos)"""
+        mask = int(mask)
+        decoded = self._decoded.get(mask)
+        if decoded is None:
+            decoded = [
+                message for code, message in self.messages.items() if mask >> code & 1
+            ] or [self.ok_message]
+            self._decoded[mask] = decoded
+        return list(decoded)
+
+    def suggestions(self, masks: Sequence[int]) -> List[List[str]]:
+        """Listas de mensagens de um lote de bitmasks"""
+        return [self.decode(mask) for mask in masks]
+
+    def classify(self, iq: Sequence[float]) -> np.ndarray:
+        """Classificação vetorizada de um lote de IQs"""
+        iq = np.asarray(iq, dtype=np.float64)
+        return np.select(
+            [iq >= limit for limit in self._limits],
+            self._labels[:-1],
+            default=self._labels[-1]
+        )
+
+    def classify_one(self, iq: float) -> str:
+        """Classificação de um único IQ"""
+        for label, limit in zip(self._labels, self._limits):
+            if iq >= limit:
+                return label
+        return self._labels[-1]
+
+    def describe(self) -> Dict:
+        """Regras e classificações em uso (formato do arquivo JSON)"""
+        return {
+            'source': self.source,
+            'rules': [dict(rule, bit=1 << rule['code']) for rule in self.rules],
+            'classifications': self.classifications,
+            'ok_message': self.ok_message,
+        }
+
+
+def load_feedback_engine(pg_client=None, source: str = FEEDBACK_RULES_SOURCE) -> FeedbackEngine:
+    """
+    Carrega o FeedbackEngine da fonte configurada
+
+    Em caso de erro na fonte (arquivo ausente, tabela vazia, banco fora do ar)
+    usa as regras padrão, para a API continuar respondendo.
+    """
+    try:
+        if source == 'file':
+            engine = FeedbackEngine.from_file(FEEDBACK_RULES_PATH)
+            if pg_client is not None:
+                try:
+                    engine.save_to_db(pg_client)
+                except Exception as e:
+                    logger.warning(f"⚠️ Regras de {FEEDBACK_RULES_PATH} não gravadas no feedback_catalog: {e}")
+        elif source == 'db' and pg_client is not None:
+            engine = FeedbackEngine.from_db(pg_client)
+        else:
+            engine = FeedbackEngine()
+    except Exception as e:
+        logger.warning(f"⚠️ Regras de feedback ({source}) indisponíveis, usando padrão: {e}")
+        engine = FeedbackEngine()
+
+    logger.info(f"✅ {len(engine.rules)} regras de feedback carregadas ({engine.source})")
+    return engine
@@ -0,0 +1,289 @@
+"""
+Chaves de idempotência (header Idempotency-Key) para endpoints com escrita
+A primeira requisição com uma chave executa normalmente e a resposta fica
+guardada por IDEMPOTENCY_TTL_SECONDS; repetições da mesma chave (retry de
+cliente após timeout) recebem a resposta guardada, com o header
+Idempotent-Replayed: true, sem nova inferência nem novas linhas no banco.
+
+- Memória: LRU limitado a IDEMPOTENCY_MAX_KEYS chaves por processo
+- PostgreSQL (IDEMPOTENCY_POSTGRES=true): tabela idempotency_keys, que
+  sobrevive a restarts e é compartilhada entre réplicas da API
+- Requisições concorrentes com a mesma chave no mesmo processo esperam a
+  primeira terminar e recebem a mesma resposta
+- Mesma chave com payload diferente: 422 (a chave foi reutilizada por engano)
+
+Respostas de erro não são guardadas: um retry depois de uma falha executa de novo.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from psycopg2.extras import Json
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+PURGE_EVERY = 1000  # Gravações no PostgreSQL entre limpezas das chaves expiradas
+
+# Mesmo DDL do postgres/init.sql, para bancos criados antes da tabela existir
+IDEMPOTENCY_KEYS_DDL = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope VARCHAR(50) NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    response JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, idempotency_key)
+)
+"""
+
+
+def request_fingerprint(payload: Any) -> str:
+    """SHA-256 do payload em JSON canônico (chaves ordenadas)"""
+    encoded = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Respostas guardadas por (escopo, chave) com TTL
+
+    O escopo separa endpoints: a mesma chave em /predict e /etl/run são
+    operações diferentes.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_keys: Optional[int] = None):
+        self.ttl = ttl_seconds or int(os.getenv('IDEMPOTENCY_TTL_SECONDS', 86400))
+        self.max_keys = max(1, max_keys or int(os.getenv('IDEMPOTENCY_MAX_KEYS', 10000)))
+        self.use_postgres = os.getenv('IDEMPOTENCY_POSTGRES', 'false').lower() == 'true'
+        self.pg_client = None
+
+        # (escopo, chave) -> (expira_em, hash do payload, resposta), em ordem de uso
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str, Any]]" = OrderedDict()
+        # (escopo, chave) -> (hash do payload, future com a resposta) das execuções em andamento
+        self._inflight: Dict[Tuple[str, str], Tuple[str, asyncio.Future]] = {}
+        self._puts_since_purge = 0
+
+        # Métricas
+        self.executed = 0
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+        self.evictions = 0
+        self.postgres_errors = 0
+
+        logger.info(
+            f"IdempotencyStore initialized - TTL: {self.ttl}s, max_keys: {self.max_keys}, "
+            f"postgres: {self.use_postgres}"
+        )
+
+    def start(self, pg_client):
+        """Ativa a tabela idempotency_keys (IDEMPOTENCY_POSTGRES=true)"""
+        if not self.use_postgres:
+            return
+        conn = pg_client.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(IDEMPOTENCY_KEYS_DDL)
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        self.pg_client = pg_client
+        logger.info("✅ Chaves de idempotência persistidas em idempotency_keys")
+
+    # ----------------------------------------------------------------
+    # Execução
+    # ----------------------------------------------------------------
+
+    async def run(
+        self,
+        scope: str,
+        key: str,
+        payload: Any,
+        handler: Callable[[], Awaitable[Any]],
+        response: Optional[Response] = None
+    ) -> Any:
+        """
+        Executa handler uma única vez por chave
+
+        Args:
+            scope: Endpoint ao qual a chave pertence
+            key: Valor do header Idempotency-Key
+            payload: Parâmetros da requisição (comparados com os da primeira execução)
+            handler: Corrotina que produz a resposta
+            response: Response do FastAPI, recebe o header Idempotent-Replayed
+
+        Returns:
+            Resposta do handler, ou a resposta guardada (JSON) de uma execução anterior
+        """
+        self._validate_key(key)
+        entry_key = (scope, key)
+        fingerprint = request_fingerprint(payload)
+
+        stored = self._get_memory(entry_key)
+        if stored is None and self.pg_client is not None:
+            stored = await asyncio.to_thread(self._get_postgres, scope, key)
+        if stored is not None:
+            return self._replay(stored[0], fingerprint, stored[1], key, response)
+
+        inflight = self._inflight.get(entry_key)
+        if inflight is not None:
+            self._check_fingerprint(inflight[0], fingerprint, key)
+            self.waited += 1
+            body = await asyncio.shield(inflight[1])
+            return self._replay(inflight[0], fingerprint, body, key, response)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[entry_key] = (fingerprint, future)
+        try:
+            result = await handler()
+            body = jsonable_encoder(result)
+            self.executed += 1
+            self._put_memory(entry_key, fingerprint, body)
+            if self.pg_client is not None:
+                await asyncio.to_thread(self._put_postgres, scope, key, fingerprint, body)
+            future.set_result(body)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            # Quem esperava pela mesma chave recebe o mesmo erro; nada é guardado
+            future.set_exception(e)
+            future.exception()  # Marca como consumida (evita aviso sem aguardadores)
+            raise
+        finally:
+            del self._inflight[entry_key]
+
+    @staticmethod
+    def _validate_key(key: str):
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{IDEMPOTENCY_HEADER} deve ter entre 1 e {MAX_KEY_LENGTH} caracteres"
+            )
+
+    def _check_fingerprint(self, stored: str, fingerprint: str, key: str):
+        if stored != fingerprint:
+            self.conflicts += 1
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"{IDEMPOTENCY_HEADER} '{key}' já foi usado com outro payload"
+            )
+
+    def _replay(self, stored: str, fingerprint: str, body: Any, key: str,
+                response: Optional[Response]) -> Any:
+        self._check_fingerprint(stored, fingerprint, key)
+        self.replayed += 1
+        if response is not None:
+            response.headers[REPLAYED_HEADER] = "true"
+        return body
+
+    # ----------------------------------------------------------------
+    # Memória (LRU com TTL)
+    # ----------------------------------------------------------------
+
+    def _get_memory(self, entry_key: Tuple[str, str]) -> Optional[Tuple[str, Any]]:
+        entry = self._entries.get(entry_key)
+        if entry is None:
+            return None
+        expires_at, fingerprint, body = entry
+        if expires_at <= time.monotonic():
+            del self._entries[entry_key]
+            return None
+        self._entries.move_to_end(entry_key)
+        return fingerprint, body
+
+    def _put_memory(self, entry_key: Tuple[str, str], fingerprint: str, body: Any,
+                    ttl: Optional[float] = None):
+        self._entries[entry_key] = (time.monotonic() + (self.ttl if ttl is None else ttl), fingerprint, body)
+        self._entries.move_to_end(entry_key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # ----------------------------------------------------------------
+    # PostgreSQL (opcional)
+    # ----------------------------------------------------------------
+
+    def _get_postgres(self, scope: str, key: str) -> Optional[Tuple[str, Any]]:
+        """Busca a chave na tabela e a traz para a memória pelo tempo que ainda resta"""
+        try:
+            rows = self.pg_client.execute_query(
+                """
+                SELECT request_hash, response,
+                       EXTRACT(EPOCH FROM expires_at - CURRENT_TIMESTAMP) AS ttl
+                FROM idempotency_keys
+                WHERE scope = %s AND idempotency_key = %s AND expires_at > CURRENT_TIMESTAMP
+                """,
+                (scope, key)
+            )
+        except Exception as e:
+            self.postgres_errors += 1
+            logger.warning(f"⚠️ Erro ao consultar idempotency_keys (usando só a memória): {e}")
+            return None
+        if not rows:
+            return None
+        row = rows[0]
+        self._put_memory((scope, key), row['request_hash'], row['response'], ttl=float(row['ttl']))
+        return row['request_hash'], row['response']
+
+    def _put_postgres(self, scope: str, key: str, fingerprint: str, body: Any):
+        """Grava a resposta (uma chave expirada pode ser reutilizada)"""
+        conn = None
+        try:
+            conn = self.pg_client.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO idempotency_keys (scope, idempotency_key, request_hash, response, expires_at)
+                VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP + make_interval(secs => %s))
+                ON CONFLICT (scope, idempotency_key) DO UPDATE
+                SET request_hash = EXCLUDED.request_hash,
+                    response = EXCLUDED.response,
+                    created_at = CURRENT_TIMESTAMP,
+                    expires_at = EXCLUDED.expires_at
+                WHERE idempotency_keys.expires_at <= CURRENT_TIMESTAMP
+                """,
+                (scope, key, fingerprint, Json(body), self.ttl)
+            )
+            self._puts_since_purge += 1
+            if self._puts_since_purge >= PURGE_EVERY:
+                cursor.execute("DELETE FROM idempotency_keys WHERE expires_at <= CURRENT_TIMESTAMP")
+                self._puts_since_purge = 0
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            self.postgres_errors += 1
+            logger.warning(f"⚠️ Erro ao gravar em idempotency_keys (chave só na memória): {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def stats(self) -> Dict:
+        """Chaves guardadas e quantas requisições foram respondidas sem reexecução"""
+        return {
+            "ttl_seconds": self.ttl,
+            "max_keys": self.max_keys,
+            "postgres": self.pg_client is not None,
+            "keys_in_memory": len(self._entries),
+            "inflight": len(self._inflight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "waited_inflight": self.waited,
+            "conflicts": self.conflicts,
+            "evictions": self.evictions,
+            "postgres_errors": self.postgres_errors,
+        }
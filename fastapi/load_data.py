@@ -3,9 +3,9 @@ Script de Carga Inicial de Dados
 Carrega hubfolio_mock_data.json para o MinIO
 """
 import os
-import json
 import logging
 from minio_client import MinIOClient
+from serialization import loads, JSONDecodeError
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -34,14 +34,14 @@ def load_data_to_minio():
     
     # Ler arquivo
     logger.info(f"📖 Lendo arquivo: {data_file}")
-    with open(data_file, 'r', encoding='utf-8') as f:
+    with open(data_file, 'rb') as f:
         data = f.read()
     
     # Validar JSON
     try:
-        json_data = json.loads(data)
+        json_data = loads(data)
         logger.info(f"✅ JSON válido com {len(json_data)} registros")
-    except json.JSONDecodeError as e:
+    except JSONDecodeError as e:
         logger.error(f"❌ JSON inválido: {e}")
         return False
     
@@ -50,7 +50,7 @@ def load_data_to_minio():
     logger.info(f"📤 Fazendo upload para MinIO: {object_name}")
     
     success = minio_client.upload_file(
-        file_data=data.encode('utf-8'),
+        file_data=data,
         object_name=object_name,
         content_type="application/json"
     )
@@ -3,32 +3,62 @@ FastAPI - Sistema de Ingestão e Predição HubFólio
 API para gerenciamento de dados e inferência do modelo de ML
 """
 import os
-import json
+import io
+import csv
 import pickle
+import asyncio
 import logging
-from typing import List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, status, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, status, Form, Request, BackgroundTasks, Header, Query
+from fastapi.responses import JSONResponse, Response, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-import pandas as pd
-import numpy as np
 
 from minio_client import MinIOClient
-from postgres_client import PostgreSQLClient
+from postgres_client import (
+    PostgreSQLClient, EXPORT_QUERIES, STREAM_BATCH_SIZE, ROLLUP_GRANULARITIES, to_pg_array
+)
 from etl_minio_postgres import HubFolioETL
 from mlflow_client import MLflowClient
 from thingsboard_client import ThingsBoardClient
+from profiling import RequestProfiler, PROFILE_HEADER
+from predictor import HubFolioPredictor, model_version_tag
+from feedback_rules import load_feedback_engine, FEEDBACK_RULES_SOURCE
+from micro_batching import PredictionBatcher
+from write_behind import PredictionWriteBehind, DURABILITY_HEADER, DURABILITY_MODES
+from idempotency import IdempotencyStore, IDEMPOTENCY_HEADER
+from bulk_scoring import (
+    BulkScoringJob, ScoringJobError, get_job, list_jobs, SCORING_BATCH_SIZE, SCORING_WORKERS
+)
+from partition_manager import (
+    PredictionPartitionManager, PARTITION_MONTHS_AHEAD, RETENTION_MONTHS, MAINTENANCE_INTERVAL_HOURS
+)
+from parquet_storage import (
+    records_to_table, table_to_parquet_bytes, compare_formats, SchemaValidationError
+)
+from stream_ingest import NDJSONStreamIngestor, StreamIngestError, STREAM_INGEST_BATCH_SIZE
+from serialization import ORJSONResponse, dumps, loads
+from object_cache import object_cache
+from model_sync import ModelVersionWatcher, MODEL_REGISTRY_NAME
+from model_serving import ModelRouter
+from model_registry import ModelRegistry, MODEL_HEADER
+from drift_monitor import DriftMonitor, DRIFT_CHECK_SECONDS
+from model_training import (
+    TrainingJob, TrainingJobError, get_training_job, list_training_jobs, running_training_job,
+    TRAINING_SOURCE, TRAINING_MINIO_KEY, TRAINING_CV_FOLDS, TRAINING_N_JOBS, TRAINING_STAGE
+)
+from compression import CompressionMiddleware, COMPRESSION_ENABLED
 
 # Inicializar FastAPI
 app = FastAPI(
     title="HubFólio Data & ML API",
     description="API para ingestão de dados e predição de Índice de Qualidade de Portfólios",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Inicializar clientes
@@ -36,6 +66,10 @@ minio_client = MinIOClient()
 pg_client = None  # Será inicializado no startup
 mlflow_client = None  # Será inicializado no startup
 tb_client = None  # Será inicializado no startup
+partition_manager = None  # Será inicializado no startup
+maintenance_task: Optional[asyncio.Task] = None  # Manutenção periódica de partições
+drift_task: Optional[asyncio.Task] = None  # Verificação periódica de drift
+profiler = RequestProfiler(minio_client)
 
 
 # ====================================================================
@@ -85,118 +119,82 @@ class PredictionResponse(BaseModel):
     classificacao: str
     feedback: List[str]
     model_name: str
+    model_version: Optional[str] = None
     predicted_at: str
     portfolio_id: Optional[int] = None
     prediction_id: Optional[int] = None
 
 
-# ====================================================================
-# CLASSE DE INFERÊNCIA DO MODELO
-# ====================================================================
+class TrainingRequest(BaseModel):
+    source: str = TRAINING_SOURCE  # postgres ou minio
+    object_key: str = TRAINING_MINIO_KEY
+    folds: int = TRAINING_CV_FOLDS
+    n_jobs: int = TRAINING_N_JOBS
+    n_iter: Optional[int] = None  # Sorteia n combinações da grade (padrão: todas)
+    search_space: Optional[Dict[str, Dict[str, list]]] = None  # {estimador: {parâmetro: [valores]}}
+    register: bool = True
+    stage: str = TRAINING_STAGE
 
-class HubFolioPredictor:
-    """Classe para realizar inferências do Índice de Qualidade"""
-    
-    def __init__(self, modelo=None):
-        self.modelo = modelo
-        self.features = [
-            'projetos_min', 'habilidades_min',
-            'kw_contexto', 'kw_processo', 'kw_resultado',
-            'consistencia_visual_score',
-            'bio', 'contatos'
-        ]
-        self.model_name = "LinearRegression"  # Padrão
-    
-    def load_model(self, model_path: str):
-        """Carrega modelo salvo do disco"""
-        try:
-            with open(model_path, 'rb') as f:
-                self.modelo = pickle.load(f)
-            print(f"✅ Modelo carregado: {model_path}")
-            return True
-        except Exception as e:
-            print(f"❌ Erro ao carregar modelo: {e}")
-            return False
-    
-    def validar_entrada(self, dados: dict):
-        """Valida se todos os campos obrigatórios estão presentes"""
-        campos_faltantes = [f for f in self.features if f not in dados]
-        if campos_faltantes:
-            return False, f"Campos obrigatórios faltando: {campos_faltantes}"
-        return True, "OK"
-    
-    def preprocessar(self, dados: dict):
-        """Converte dados de entrada para formato do modelo"""
-        # Converter booleanos para int
-        if isinstance(dados.get('bio'), bool):
-            dados['bio'] = int(dados['bio'])
-        if isinstance(dados.get('contatos'), bool):
-            dados['contatos'] = int(dados['contatos'])
-        
-        # Criar DataFrame com as features na ordem correta
-        df_input = pd.DataFrame([dados])[self.features].astype(float)
-        return df_input
-    
-    def prever(self, dados_portfolio: dict):
-        """Realiza a predição do Índice de Qualidade"""
-        # Validar entrada
-        valido, mensagem = self.validar_entrada(dados_portfolio)
-        if not valido:
-            return {"erro": mensagem, "sucesso": False}
-        
-        # Preprocessar e prever
-        X_input = self.preprocessar(dados_portfolio)
-        iq_previsto = self.modelo.predict(X_input)[0]
-        
-        # Limitar entre 0 e 100
-        iq_previsto = max(0, min(100, iq_previsto))
-        
-        # Gerar feedback baseado no score
-        feedback = self._gerar_feedback(iq_previsto, dados_portfolio)
-        
-        return {
-            "sucesso": True,
-            "indice_qualidade": round(float(iq_previsto), 2),
-            "classificacao": self._classificar_iq(iq_previsto),
-            "feedback": feedback,
-            "model_name": self.model_name,
-            "predicted_at": datetime.utcnow().isoformat()
-        }
-    
-    def _classificar_iq(self, iq: float) -> str:
-        """Classifica o IQ em categorias"""
-        if iq >= 80:
-            return "Excelente"
-        elif iq >= 60:
-            return "Bom"
-        elif iq >= 40:
-            return "Regular"
-        else:
-            return "Precisa Melhorar"
-    
-    def _gerar_feedback(self, iq: float, dados: dict) -> List[str]:
-        """Gera feedback personalizado baseado nos dados"""
-        sugestoes = []
-        
-        if dados.get('projetos_min', 0) < 3:
-            sugestoes.append("Adicione mais projetos ao seu portfólio (mínimo 3 recomendado)")
-        if dados.get('habilidades_min', 0) < 5:
-            sugestoes.append("Liste mais habilidades técnicas (mínimo 5)")
-        if not dados.get('bio'):
-            sugestoes.append("Adicione uma bio/sobre você")
-        if not dados.get('contatos'):
-            sugestoes.append("Inclua informações de contato")
-        if (dados.get('kw_contexto', 0) + dados.get('kw_processo', 0) + dados.get('kw_resultado', 0)) < 9:
-            sugestoes.append("Melhore a narrativa dos projetos (contexto, processo, resultado)")
-        if dados.get('consistencia_visual_score', 0) < 70:
-            sugestoes.append("Trabalhe na consistência visual do portfólio")
-        
-        return sugestoes if sugestoes else ["Seu portfólio está bem estruturado!"]
 
+# ====================================================================
+# PREDITOR (ver predictor.py)
+# ====================================================================
 
 # Instância global do preditor
 predictor = HubFolioPredictor()
 
+# Micro-batching opcional das inferências do /predict (PREDICT_BATCHING_ENABLED=true)
+predict_batcher = PredictionBatcher(predictor)
+
+# Gravação write-behind opcional das predições do /predict (WRITE_BEHIND_ENABLED=true)
+write_behind = PredictionWriteBehind()
+
+# Respostas guardadas por Idempotency-Key (retries não repetem inferência nem gravação)
+idempotency_store = IdempotencyStore()
+
+# Versão do Model Registry servida pelo predictor (MODEL_SYNC_ENABLED=true)
+model_watcher = ModelVersionWatcher(predictor)
+
+# Variantes A/B e shadow ao lado do preditor (ver model_serving.py)
+model_router = ModelRouter(predictor, predict_batcher)
+
+# Modelos escolhidos por requisição (header X-Model ou /predict/{modelo}), carregados sob demanda
+model_registry = ModelRegistry()
+
+# Drift das entradas e do score em relação ao baseline de treino (DRIFT_MONITOR_ENABLED=true)
+drift_monitor = DriftMonitor()
+
+
+# ====================================================================
+# PROFILING (opcional)
+# ====================================================================
+
+# Middleware só é registrado com PROFILING_ENABLED=true (custo zero quando desativado)
+if profiler.enabled:
+    @app.middleware("http")
+    async def profiling_middleware(request: Request, call_next):
+        """Perfila requisições com header X-Profile ou sorteadas pela amostragem"""
+        forced = request.headers.get(PROFILE_HEADER, '').lower() in ('1', 'true')
+        with profiler.capture(forced=forced) as captured:
+            response = await call_next(request)
+        if captured is not None:
+            # Upload fora do event loop (o lock de captura já foi liberado)
+            object_key = await asyncio.to_thread(
+                profiler.store, captured, f"{request.method} {request.url.path}", "request"
+            )
+            if object_key:
+                response.headers['X-Profile-Key'] = object_key
+        return response
+
+
+# ====================================================================
+# COMPRESSÃO (gzip/zstd)
+# ====================================================================
+
+# Respostas textuais >= COMPRESSION_MIN_BYTES conforme Accept-Encoding; corpos com Content-Encoding
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 
 # ====================================================================
 # EVENTOS DE STARTUP/SHUTDOWN
@@ -205,7 +203,7 @@ predictor = HubFolioPredictor()
 @app.on_event("startup")
 async def startup_event():
     """Inicializa recursos na inicialização da aplicação"""
-    global pg_client, predictor, mlflow_client, tb_client
+    global pg_client, predictor, mlflow_client, tb_client, partition_manager, maintenance_task, drift_task
     
     # MinIO
     minio_client.create_bucket_if_not_exists()
@@ -237,6 +235,31 @@ async def startup_event():
         pg_client = PostgreSQLClient()
         if pg_client.check_connection():
             print(f"✅ PostgreSQL conectado com sucesso!")
+            
+            # Write-behind: regrava o log que sobrou de uma queda antes de aceitar predições
+            if write_behind.enabled:
+                try:
+                    await asyncio.to_thread(write_behind.start, pg_client)
+                except Exception as e:
+                    print(f"⚠️ Erro ao iniciar write-behind (usando gravação síncrona): {e}")
+            
+            # Predições dos modelos shadow
+            model_router.pg_client = pg_client
+            
+            # Chaves de idempotência no PostgreSQL (IDEMPOTENCY_POSTGRES=true)
+            try:
+                await asyncio.to_thread(idempotency_store.start, pg_client)
+            except Exception as e:
+                print(f"⚠️ Erro ao criar idempotency_keys (usando só a memória): {e}")
+            
+            # Partições mensais de predictions (criação automática + retenção)
+            partition_manager = PredictionPartitionManager(pg_client, minio_client)
+            try:
+                partition_manager.ensure_future_partitions()
+                if MAINTENANCE_INTERVAL_HOURS > 0:
+                    maintenance_task = asyncio.create_task(partition_maintenance_loop())
+            except Exception as e:
+                print(f"⚠️ Erro ao criar partições de predictions: {e}")
         else:
             print(f"⚠️ PostgreSQL não está acessível")
     except Exception as e:
@@ -265,6 +288,12 @@ async def startup_event():
         print(f"⚠️ Erro ao conectar ThingsBoard: {e}")
         tb_client = None
     
+    # Regras de feedback/classificação (padrão, arquivo JSON ou feedback_catalog)
+    predictor.feedback_engine = load_feedback_engine(pg_client)
+    
+    if predict_batcher.enabled:
+        predict_batcher.start()
+    
     # Tentar carregar modelo
     model_path = "/app/models/hubfolio_model.pkl"
     if os.path.exists(model_path):
@@ -272,6 +301,75 @@ async def startup_event():
     else:
         print(f"⚠️ Modelo não encontrado em: {model_path}")
         print("   Use o endpoint POST /model/upload para enviar o modelo")
+    
+    # Versão do Model Registry tem precedência sobre o .pkl local
+    if model_watcher.enabled and mlflow_client:
+        await model_watcher.start(mlflow_client)
+    
+    # Variantes A/B e shadow (MODEL_VARIANTS)
+    model_router.load_from_env()
+    
+    # Registro de modelos por requisição (MODEL_REGISTRY_CATALOG)
+    model_registry.start(mlflow_client, minio_client)
+    model_registry.set_feedback_engine(predictor.feedback_engine)
+    
+    # Monitor de drift (baseline do hubfolio_mock_data.json + verificação periódica)
+    if drift_monitor.enabled:
+        try:
+            await asyncio.to_thread(drift_monitor.start, predictor)
+            if DRIFT_CHECK_SECONDS > 0:
+                drift_task = asyncio.create_task(drift_check_loop())
+        except Exception as e:
+            print(f"⚠️ Erro ao iniciar o monitor de drift: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Libera recursos no encerramento da aplicação"""
+    global maintenance_task, drift_task
+    
+    # Tarefas periódicas (manutenção de partições e drift)
+    for task in (maintenance_task, drift_task):
+        if task is not None:
+            task.cancel()
+    maintenance_task = drift_task = None
+    
+    # Responde as predições que ainda estão na fila do micro-batching
+    await predict_batcher.stop()
+    
+    await model_watcher.stop()
+    
+    # Grava no PostgreSQL o que ainda está no log do write-behind
+    await asyncio.to_thread(write_behind.stop)
+    
+    # Avaliações shadow pendentes (depois do write-behind: os portfólios já existem)
+    await model_router.stop()
+
+
+async def partition_maintenance_loop():
+    """Executa a manutenção de partições periodicamente (fora do event loop)"""
+    while True:
+        await asyncio.sleep(MAINTENANCE_INTERVAL_HOURS * 3600)
+        try:
+            result = await asyncio.to_thread(partition_manager.run_maintenance)
+            logger.info(f"Manutenção de partições: {result}")
+        except Exception as e:
+            logger.error(f"Erro na manutenção de partições: {e}")
+
+
+async def drift_check_loop():
+    """Calcula o drift periodicamente e envia as estatísticas ao ThingsBoard"""
+    while True:
+        await asyncio.sleep(DRIFT_CHECK_SECONDS)
+        try:
+            report = await asyncio.to_thread(drift_monitor.check)
+            if tb_client:
+                device_token = os.getenv('THINGSBOARD_DEVICE_TOKEN', 'hubfolio-device-token')
+                await asyncio.to_thread(
+                    tb_client.send_telemetry, device_token, drift_monitor.telemetry(report)
+                )
+        except Exception as e:
+            logger.error(f"Erro na verificação de drift: {e}")
 
 
 # ====================================================================
@@ -290,20 +388,45 @@ async def root():
             "minio": {
                 "upload": "/upload",
                 "files": "/files",
-                "ingest": "/ingest/hubfolio"
+                "ingest": "/ingest/hubfolio",
+                "ingest_stream": "/ingest/stream",
+                "cache": "/files/cache"
             },
             "postgres": {
                 "summary": "/postgres/summary",
-                "top_portfolios": "/postgres/top-portfolios"
+                "top_portfolios": "/postgres/top-portfolios",
+                "export": "/postgres/export/{dataset}",
+                "partitions": "/postgres/partitions"
             },
             "etl": {
                 "run": "/etl/run"
             },
+            "analytics": {
+                "timeseries": "/analytics/timeseries"
+            },
             "ml": {
                 "predict": "/predict",
+                "predict_batching": "/predict/batching",
+                "predict_write_behind": "/predict/write-behind",
+                "predict_idempotency": "/predict/idempotency",
+                "predict_drift": "/predict/drift",
                 "model_info": "/model/info",
+                "model_version": "/model/version",
+                "model_variants": "/model/variants",
+                "models_registry": "/models",
                 "model_upload": "/model/upload",
-                "export_to_s3": "/model/export-to-s3"
+                "export_to_s3": "/model/export-to-s3",
+                "feedback_rules": "/model/feedback-rules"
+            },
+            "jobs": {
+                "scoring": "/jobs/scoring",
+                "scoring_status": "/jobs/scoring/{job_id}",
+                "training": "/jobs/training",
+                "training_status": "/jobs/training/{job_id}"
+            },
+            "profiling": {
+                "list": "/profiles",
+                "download": "/profiles/{object_key}"
             }
         }
     }
@@ -379,16 +502,18 @@ async def list_files(prefix: Optional[str] = ""):
     try:
         objects = minio_client.list_objects(prefix=prefix)
         
-        files = []
-        for obj in objects:
-            files.append(FileInfo(
-                filename=obj['Key'],
-                size=obj['Size'],
-                last_modified=obj['LastModified'].isoformat(),
-                content_type=obj.get('ContentType', 'unknown')
-            ))
+        # Lista pode ter milhares de objetos: serializa direto, sem jsonable_encoder
+        files = [
+            {
+                "filename": obj['Key'],
+                "size": obj['Size'],
+                "last_modified": obj['LastModified'],
+                "content_type": obj.get('ContentType', 'unknown')
+            }
+            for obj in objects
+        ]
         
-        return files
+        return ORJSONResponse(files)
         
     except Exception as e:
         raise HTTPException(
@@ -397,9 +522,48 @@ async def list_files(prefix: Optional[str] = ""):
         )
 
 
+@app.get("/files/cache", tags=["Data Management"])
+async def object_cache_stats():
+    """
+    Estatísticas do cache local de objetos do MinIO (OBJECT_CACHE_ENABLED=true)
+    
+    hits são leituras validadas com GET condicional (304) e servidas do disco;
+    refreshes são objetos que mudaram no MinIO e foram baixados de novo.
+    """
+    return object_cache.stats()
+
+
 @app.post("/ingest/hubfolio", tags=["Data Ingestion"])
-async def ingest_hubfolio_dataset():
-    """Ingere o dataset HubFólio completo para o MinIO"""
+async def ingest_hubfolio_dataset(
+    response: Response,
+    format: str = "json",
+    compare: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
+    """
+    Ingere o dataset HubFólio completo para o MinIO
+    
+    Args:
+        format: 'json' (hubfolio/data/portfolios.json) ou 'parquet' (dataset particionado por data)
+        compare: Inclui comparação de tamanho e tempo de parse JSON vs Parquet
+        idempotency_key: Repetições da chave devolvem a resposta da primeira ingestão
+    """
+    if idempotency_key:
+        return await idempotency_store.run(
+            "ingest_hubfolio", idempotency_key, {"format": format, "compare": compare},
+            lambda: _ingest_hubfolio(format, compare), response
+        )
+    return await _ingest_hubfolio(format, compare)
+
+
+async def _ingest_hubfolio(format: str, compare: bool):
+    """Ingestão do dataset (ver ingest_hubfolio_dataset)"""
+    if format not in ("json", "parquet"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format deve ser 'json' ou 'parquet'"
+        )
+    
     try:
         data_file = "/data/archive/hubfolio_mock_data.json"
         
@@ -409,28 +573,52 @@ async def ingest_hubfolio_dataset():
                 detail=f"Arquivo não encontrado: {data_file}"
             )
         
-        # Ler arquivo
-        with open(data_file, 'r', encoding='utf-8') as f:
+        # Ler arquivo (bytes: parse e upload sem decodificar/recodificar)
+        with open(data_file, 'rb') as f:
             data = f.read()
         
         # Validar JSON
-        json_data = json.loads(data)
+        json_data = loads(data)
+        
+        if format == "parquet":
+            # Converter para Parquet com schema imposto
+            table = records_to_table(json_data)
+            result = minio_client.upload_parquet(table)
+            if not result:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Falha ao enviar dados para MinIO"
+                )
+            
+            response = {
+                "message": "Ingestão do dataset HubFólio concluída (Parquet)",
+                "object_key": result['object_key'],
+                "total_records": result['rows'],
+                "size_bytes": result['size_bytes']
+            }
+            if compare:
+                response["comparison"] = compare_formats(data, table_to_parquet_bytes(table))
+            return response
         
         # Upload para MinIO
         object_key = "hubfolio/data/portfolios.json"
         success = minio_client.upload_file(
-            file_data=data.encode('utf-8'),
+            file_data=data,
             object_name=object_key,
             content_type="application/json"
         )
         
         if success:
-            return {
+            response = {
                 "message": "Ingestão do dataset HubFólio concluída",
                 "object_key": object_key,
                 "total_records": len(json_data),
                 "size_bytes": len(data)
             }
+            if compare:
+                table = records_to_table(json_data)
+                response["comparison"] = compare_formats(data, table_to_parquet_bytes(table))
+            return response
         else:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -439,6 +627,11 @@ async def ingest_hubfolio_dataset():
         
     except HTTPException:
         raise
+    except SchemaValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Dataset fora do schema: {str(e)}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -446,6 +639,75 @@ async def ingest_hubfolio_dataset():
         )
 
 
+@app.post("/ingest/stream", tags=["Data Ingestion"])
+async def ingest_stream(
+    request: Request,
+    etl: bool = False,
+    batch_size: int = STREAM_INGEST_BATCH_SIZE,
+    ingest_date: Optional[str] = None
+):
+    """
+    Ingere portfólios enviados como NDJSON (um portfólio por linha) em streaming
+    
+    O corpo é lido em pedaços (aceita Transfer-Encoding: chunked); cada linha
+    é validada ao chegar e os registros válidos são gravados em lotes Parquet
+    no dataset particionado (mesmo formato de /ingest/hubfolio?format=parquet).
+    
+    Args:
+        etl: Carrega cada lote no PostgreSQL logo após gravá-lo no MinIO
+        batch_size: Registros por objeto Parquet
+        ingest_date: Partição de destino (YYYY-MM-DD, padrão: hoje)
+    """
+    if not 1 <= batch_size <= 100000:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="batch_size deve estar entre 1 e 100000"
+        )
+    
+    try:
+        partition_date = datetime.strptime(ingest_date, "%Y-%m-%d").date() if ingest_date else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"ingest_date inválida: {ingest_date} (use YYYY-MM-DD)"
+        )
+    
+    if etl and not pg_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="PostgreSQL não está disponível para o ETL incremental"
+        )
+    
+    ingestor = NDJSONStreamIngestor(
+        minio_client,
+        pg_client=pg_client,
+        batch_size=batch_size,
+        run_etl=etl,
+        ingest_date=partition_date
+    )
+    try:
+        result = await ingestor.ingest(request.stream())
+    except HTTPException:
+        raise
+    except StreamIngestError as e:
+        # Lotes anteriores ao erro já estão no MinIO (listados em 'objects')
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": str(e), **ingestor.summary()}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro durante ingestão em streaming: {str(e)}"
+        )
+    
+    logger.info(
+        f"✅ Ingestão NDJSON: {result['valid_records']} registros válidos, "
+        f"{result['invalid_records']} inválidos, {result['records_per_sec']} registros/s"
+    )
+    return {"message": "Ingestão em streaming concluída", **result}
+
+
 # ====================================================================
 # ENDPOINTS - POSTGRESQL
 # ====================================================================
@@ -481,12 +743,12 @@ async def get_database_summary():
         table_info = pg_client.get_table_info()
         stats = pg_client.get_portfolio_stats()
         
-        return {
+        return ORJSONResponse({
             "database": "hubfolio",
             "tables": table_info,
             "statistics": stats,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+            "timestamp": datetime.utcnow()
+        })
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -506,10 +768,10 @@ async def get_top_portfolios(limit: int = 10):
     try:
         portfolios = pg_client.get_top_portfolios(limit=limit)
         
-        return {
+        return ORJSONResponse({
             "total_results": len(portfolios),
             "top_portfolios": portfolios
-        }
+        })
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -517,13 +779,249 @@ async def get_top_portfolios(limit: int = 10):
         )
 
 
+@app.get("/postgres/partitions", tags=["PostgreSQL"])
+async def list_prediction_partitions():
+    """Lista as partições mensais da tabela predictions"""
+    if not partition_manager:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Cliente PostgreSQL não inicializado"
+        )
+    
+    try:
+        partitions = partition_manager.list_partitions()
+        return {
+            "total_partitions": len(partitions),
+            "months_ahead": PARTITION_MONTHS_AHEAD,
+            "retention_months": RETENTION_MONTHS,
+            "partitions": partitions
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao listar partições: {str(e)}"
+        )
+
+
+@app.post("/postgres/partitions/maintenance", tags=["PostgreSQL"])
+async def run_partition_maintenance(
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+    retention_months: int = RETENTION_MONTHS
+):
+    """
+    Cria partições futuras e arquiva no MinIO (Parquet) as mais antigas que a retenção
+    
+    Args:
+        months_ahead: Meses futuros com partição criada
+        retention_months: Meses mantidos no PostgreSQL (0 = não arquiva)
+    """
+    if not partition_manager:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Cliente PostgreSQL não inicializado"
+        )
+    
+    try:
+        result = await asyncio.to_thread(
+            partition_manager.run_maintenance, months_ahead, retention_months
+        )
+        return {
+            "message": "Manutenção de partições executada",
+            **result,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro na manutenção de partições: {str(e)}"
+        )
+
+
+def _json_default(value):
+    """Serializa tipos do PostgreSQL que o orjson não conhece (Decimal vira texto)"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _export_ndjson(batches):
+    """Gera um chunk NDJSON por lote de linhas"""
+    for columns, rows in batches:
+        yield b''.join(
+            dumps(dict(zip(columns, row)), default=_json_default) + b'\n'
+            for row in rows
+        )
+
+
+def _export_csv(batches):
+    """Gera um chunk CSV por lote de linhas (cabeçalho no primeiro)"""
+    header_sent = False
+    for columns, rows in batches:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not header_sent:
+            writer.writerow(columns)
+            header_sent = True
+        for row in rows:
+            writer.writerow([
+                to_pg_array(value) if isinstance(value, list) else
+                (value.isoformat() if hasattr(value, 'isoformat') else value)
+                for value in row
+            ])
+        yield buffer.getvalue()
+
+
+@app.get("/postgres/export/{dataset}", tags=["PostgreSQL"])
+async def export_dataset(dataset: str, format: str = "ndjson", batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Exporta portfolio_summary ou predictions em streaming (NDJSON ou CSV)
+    
+    As linhas são lidas por cursor do lado do servidor e enviadas lote a lote,
+    então a memória da API não cresce com o tamanho da tabela.
+    
+    Args:
+        dataset: 'portfolio_summary' ou 'predictions'
+        format: 'ndjson' ou 'csv'
+        batch_size: Linhas por lote lido do PostgreSQL
+    """
+    if not pg_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Cliente PostgreSQL não inicializado"
+        )
+    
+    if dataset not in EXPORT_QUERIES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Dataset não exportável: {dataset}. Opções: {sorted(EXPORT_QUERIES)}"
+        )
+    
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format deve ser 'ndjson' ou 'csv'"
+        )
+    
+    batches = pg_client.export_dataset(dataset, batch_size=max(1, batch_size))
+    if format == "csv":
+        content, media_type = _export_csv(batches), "text/csv"
+    else:
+        content, media_type = _export_ndjson(batches), "application/x-ndjson"
+    
+    filename = f"{dataset}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+# ====================================================================
+# ENDPOINTS - ANALYTICS
+# ====================================================================
+
+# Janela padrão de /analytics/timeseries por granularidade
+TIMESERIES_DEFAULT_WINDOW = {
+    'minute': timedelta(hours=1),
+    'hour': timedelta(days=2),
+    'day': timedelta(days=30),
+}
+
+
+@app.get("/analytics/timeseries", tags=["Analytics"])
+async def get_prediction_timeseries(
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    model_version: Optional[str] = None,
+    by_model_version: bool = False
+):
+    """
+    Série temporal do IQ previsto (count, média, min/max e classificações por bucket)
+    
+    Servida a partir de predictions_rollup, atualizada a cada predição gravada.
+    
+    Args:
+        granularity: 'minute', 'hour' ou 'day'
+        start: Início da janela (padrão: 1h, 2 dias ou 30 dias antes de end)
+        end: Fim da janela (padrão: agora)
+        model_version: Filtra uma versão do modelo
+        by_model_version: Uma série por versão do modelo
+    """
+    if not pg_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Cliente PostgreSQL não inicializado"
+        )
+    
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"granularity deve ser uma de {list(ROLLUP_GRANULARITIES)}"
+        )
+    
+    # Buckets são gravados em UTC sem fuso: datas com fuso são convertidas para comparar
+    start, end = (
+        value.astimezone(timezone.utc).replace(tzinfo=None) if value and value.tzinfo else value
+        for value in (start, end)
+    )
+    end = end or datetime.utcnow()
+    start = start or end - TIMESERIES_DEFAULT_WINDOW[granularity]
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start deve ser anterior a end"
+        )
+    
+    try:
+        points = await asyncio.to_thread(
+            pg_client.get_prediction_timeseries,
+            granularity, start, end, model_version, by_model_version
+        )
+        return {
+            "granularity": granularity,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "model_version": model_version,
+            "total_points": len(points),
+            "points": points
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao consultar série temporal: {str(e)}"
+        )
+
+
 # ====================================================================
 # ENDPOINTS - ETL
 # ====================================================================
 
 @app.post("/etl/run", tags=["ETL"])
-async def run_etl_pipeline():
-    """Executa o pipeline ETL completo: MinIO -> PostgreSQL"""
+async def run_etl_pipeline(
+    response: Response,
+    source: str = "json",
+    ingest_date: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
+    """
+    Executa o pipeline ETL completo: MinIO -> PostgreSQL
+    
+    Args:
+        source: 'json' (portfolios.json) ou 'parquet' (dataset particionado)
+        ingest_date: Com source='parquet', carrega apenas a partição dessa data (YYYY-MM-DD)
+        idempotency_key: Repetições da chave devolvem o resultado da primeira carga (sem reinserir)
+    """
+    if idempotency_key:
+        return await idempotency_store.run(
+            "etl_run", idempotency_key, {"source": source, "ingest_date": ingest_date},
+            lambda: _run_etl(source, ingest_date), response
+        )
+    return await _run_etl(source, ingest_date)
+
+
+async def _run_etl(source: str, ingest_date: Optional[str]):
+    """Carga MinIO -> PostgreSQL (ver run_etl_pipeline)"""
     if not pg_client:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -533,11 +1031,13 @@ async def run_etl_pipeline():
     try:
         # Executar ETL
         etl = HubFolioETL()
-        stats = etl.run_full_etl()
+        filters = [('ingest_date', '=', ingest_date)] if ingest_date else None
+        stats = etl.run_full_etl(source=source, filters=filters)
         
         return {
             "message": "ETL executado com sucesso!",
             "status": stats.get("status", "unknown"),
+            "source": stats.get("source", source),
             "statistics": {
                 "users_inserted": stats.get("users_inserted", 0),
                 "portfolios_inserted": stats.get("portfolios_inserted", 0),
@@ -560,7 +1060,13 @@ async def run_etl_pipeline():
 # ====================================================================
 
 @app.post("/predict", response_model=PredictionResponse, tags=["Machine Learning"])
-async def predict_portfolio_quality(portfolio: PortfolioInput):
+async def predict_portfolio_quality(
+    portfolio: PortfolioInput,
+    response: Response,
+    x_durability: Optional[str] = Header(None, alias=DURABILITY_HEADER),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    x_model: Optional[str] = Header(None, alias=MODEL_HEADER)
+):
     """
     Prediz o Índice de Qualidade de um portfólio e salva no PostgreSQL
     
@@ -569,8 +1075,38 @@ async def predict_portfolio_quality(portfolio: PortfolioInput):
     2. Realiza predição com modelo ML
     3. Salva portfólio e calcula métricas
     4. Salva predição
+    
+    Com write-behind ativo, 3 e 4 são gravados depois, em lote; o header
+    X-Durability (sync/async) escolhe se a resposta espera o fsync do log.
+    Com Idempotency-Key, um retry da mesma chave recebe a resposta (e os IDs)
+    da primeira requisição, sem nova predição nem novas linhas.
+    O header X-Model escolhe um modelo do registro (ver GET /models).
     """
-    if not predictor.modelo:
+    return await _predict_with_idempotency(portfolio, response, x_durability, idempotency_key, x_model)
+
+
+async def _predict_with_idempotency(
+    portfolio: PortfolioInput,
+    response: Response,
+    x_durability: Optional[str],
+    idempotency_key: Optional[str],
+    model_ref: Optional[str]
+):
+    if idempotency_key:
+        payload = portfolio.dict()
+        if model_ref:
+            payload['model'] = model_ref
+        return await idempotency_store.run(
+            "predict", idempotency_key, payload,
+            lambda: _predict_portfolio(portfolio, x_durability, model_ref), response
+        )
+    return await _predict_portfolio(portfolio, x_durability, model_ref)
+
+
+async def _predict_portfolio(portfolio: PortfolioInput, x_durability: Optional[str],
+                             model_ref: Optional[str] = None):
+    """Predição + gravação de um portfólio (ver predict_portfolio_quality)"""
+    if not model_ref and not predictor.modelo:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Modelo de ML não está carregado. Use POST /model/upload primeiro."
@@ -582,6 +1118,13 @@ async def predict_portfolio_quality(portfolio: PortfolioInput):
             detail="PostgreSQL não está disponível"
         )
     
+    # Validado antes da inferência: um header inválido não gasta uma predição
+    if x_durability and x_durability not in DURABILITY_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{DURABILITY_HEADER} inválido: {x_durability}. Opções: {list(DURABILITY_MODES)}"
+        )
+    
     try:
         # Converter para dict
         dados = portfolio.dict()
@@ -597,7 +1140,13 @@ async def predict_portfolio_quality(portfolio: PortfolioInput):
         # 2. Realizar predição ANTES de inserir no banco
         # IMPORTANTE: Criar cópia para não alterar tipos de dados do original (bool -> int)
         dados_para_predicao = dados.copy()
-        resultado = predictor.prever(dados_para_predicao)
+        if model_ref:
+            # Modelo pedido pelo cliente (registro de modelos): sem A/B nem shadow
+            selected = await model_registry.get(model_ref)
+            resultado = selected.prever(dados_para_predicao)
+        else:
+            # O modelo (primário ou variante A/B) é escolhido pelo user_id
+            resultado = await model_router.predict(dados_para_predicao)
         
         if not resultado.get("sucesso"):
             raise HTTPException(
@@ -605,35 +1154,56 @@ async def predict_portfolio_quality(portfolio: PortfolioInput):
                 detail=resultado.get("erro", "Erro desconhecido na predição")
             )
         
-        # 3. Inserir portfólio no banco (portfolios + portfolio_metrics)
-        # Usa 'dados' original que contém booleanos corretos
-        try:
-            portfolio_id = pg_client.create_portfolio_with_metrics(dados)
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Erro ao criar portfólio no banco de dados: {str(e)}"
-            )
-        
-        if not portfolio_id:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Erro ao criar portfólio no banco de dados (retornou None)"
+        if write_behind.active:
+            # 3-4. Write-behind: portfólio e predição vão para o log local e são
+            # gravados em lote pela thread de flush (IDs já reservados)
+            try:
+                ids = await asyncio.to_thread(write_behind.enqueue, dados, resultado, x_durability)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Erro ao registrar predição no write-behind: {str(e)}"
+                )
+            portfolio_id = ids['portfolio_id']
+            prediction_id = ids['prediction_id']
+        else:
+            # 3. Inserir portfólio no banco (portfolios + portfolio_metrics)
+            # Usa 'dados' original que contém booleanos corretos
+            try:
+                portfolio_id = pg_client.create_portfolio_with_metrics(dados)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Erro ao criar portfólio no banco de dados: {str(e)}"
+                )
+            
+            if not portfolio_id:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Erro ao criar portfólio no banco de dados (retornou None)"
+                )
+            
+            # 4. Salvar predição no PostgreSQL
+            prediction_id = pg_client.save_prediction(
+                portfolio_id=portfolio_id,
+                predicted_iq=resultado['indice_qualidade'],
+                model_name=resultado['model_name'],
+                classification=resultado.get('classificacao'),
+                feedback_mask=resultado.get('feedback_mask'),
+                model_version=resultado.get('model_version')
             )
         
-        # 4. Salvar predição no PostgreSQL
-        prediction_id = pg_client.save_prediction(
-            portfolio_id=portfolio_id,
-            predicted_iq=resultado['indice_qualidade'],
-            model_name=resultado['model_name'],
-            classification=resultado.get('classificacao'),
-            feedback=resultado.get('feedback')
-        )
-        
         # Adicionar IDs na resposta
         resultado['portfolio_id'] = portfolio_id
         resultado['prediction_id'] = prediction_id
         
+        # Modelos shadow avaliam o mesmo portfólio em background
+        if not model_ref:
+            model_router.shadow(dados_para_predicao, resultado, portfolio_id)
+        
+        # Histogramas da janela de drift (entradas e score)
+        drift_monitor.observe(dados_para_predicao, resultado)
+        
         # Enviar dados para ThingsBoard se disponível
         if tb_client:
             try:
@@ -645,6 +1215,7 @@ async def predict_portfolio_quality(portfolio: PortfolioInput):
                         'predicted_iq': resultado['indice_qualidade'],
                         'classification': resultado['classificacao'],
                         'model_name': resultado['model_name'],
+                        'model_version': resultado.get('model_version'),
                         'user_id': user_id,
                         'prediction_id': prediction_id
                     }
@@ -663,12 +1234,181 @@ async def predict_portfolio_quality(portfolio: PortfolioInput):
         )
 
 
+@app.get("/models", tags=["Machine Learning"])
+async def get_model_registry():
+    """Catálogo do registro de modelos, modelos residentes e métricas de hit/cold load"""
+    return model_registry.stats()
+
+
+@app.put("/models/{alias:path}", tags=["Machine Learning"])
+async def register_model_alias(alias: str, source: str):
+    """
+    Cadastra um apelido no registro de modelos (carregado no primeiro uso)
+    
+    - **source**: mlflow:<modelo>/<versão ou stage> ou minio:<chave do .pkl>
+    """
+    model_registry.register(alias, source)
+    return {"alias": alias, "source": source}
+
+
+@app.delete("/models/{alias:path}", tags=["Machine Learning"])
+async def unregister_model_alias(alias: str):
+    """Remove um apelido do catálogo (e descarrega o modelo se ninguém mais o usa)"""
+    if not model_registry.unregister(alias):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Apelido '{alias}' não está no catálogo"
+        )
+    return {"removed": alias}
+
+
+@app.get("/model/variants", tags=["Machine Learning"])
+async def get_model_variants():
+    """Modelo primário, variantes A/B e shadow, divisão de tráfego e latência por modelo"""
+    return model_router.stats()
+
+
+@app.post("/model/variants", tags=["Machine Learning"])
+async def add_model_variant(
+    name: str = Form(...),
+    mode: str = Form("shadow"),
+    weight: float = Form(0.0),
+    file: Optional[UploadFile] = File(None),
+    mlflow_version: Optional[str] = Form(None)
+):
+    """
+    Adiciona (ou substitui) um modelo servido ao lado do primário
+    
+    - **mode**: 'shadow' (avalia em background, não afeta a resposta) ou 'ab' (recebe tráfego)
+    - **weight**: Fração do tráfego da variante 'ab' (0-1, por user_id)
+    - **file**: Modelo .pkl, ou **mlflow_version**: versão do MODEL_REGISTRY_NAME no MLflow
+    """
+    if mlflow_version:
+        if not mlflow_client:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="MLflow não está disponível"
+            )
+        try:
+            modelo = await asyncio.to_thread(
+                mlflow_client.load_model_version, MODEL_REGISTRY_NAME, mlflow_version
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Versão {mlflow_version} de '{MODEL_REGISTRY_NAME}' não pôde ser carregada: {str(e)}"
+            )
+        model_version = f"{MODEL_REGISTRY_NAME}_v{mlflow_version}"
+    elif file is not None:
+        try:
+            contents = await file.read()
+            modelo = pickle.loads(contents)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Arquivo não é um modelo pickle válido: {str(e)}"
+            )
+        model_version = model_version_tag(type(modelo).__name__, contents)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Envie o arquivo .pkl (file) ou a versão do MLflow (mlflow_version)"
+        )
+    
+    variant = model_router.add_variant(name, modelo, mode, weight, model_version)
+    if mlflow_client:
+        if mlflow_version:
+            mlflow_client.serve(f"variant:{name}", MODEL_REGISTRY_NAME, mlflow_version)
+        else:
+            mlflow_client.release(f"variant:{name}")
+    return variant.describe()
+
+
+@app.delete("/model/variants/{name}", tags=["Machine Learning"])
+async def remove_model_variant(name: str):
+    """Remove uma variante (o tráfego A/B volta para o primário)"""
+    if not model_router.remove_variant(name):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Variante '{name}' não encontrada"
+        )
+    if mlflow_client:
+        mlflow_client.release(f"variant:{name}")
+    return {"removed": name}
+
+
+@app.get("/predict/batching", tags=["Machine Learning"])
+async def get_predict_batching_stats():
+    """Métricas do micro-batching do /predict (tamanho dos lotes e latência da fila)"""
+    return predict_batcher.stats()
+
+
+@app.get("/predict/write-behind", tags=["Machine Learning"])
+async def get_write_behind_stats():
+    """Estado do write-behind do /predict (registros pendentes, flushes, fsyncs)"""
+    return await asyncio.to_thread(write_behind.stats)
+
+
+@app.post("/predict/write-behind/flush", tags=["Machine Learning"])
+async def flush_write_behind():
+    """Grava imediatamente no PostgreSQL as predições pendentes no log"""
+    if not write_behind.active:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Write-behind não está ativo (WRITE_BEHIND_ENABLED=true)"
+        )
+    flushed = await asyncio.to_thread(write_behind.flush)
+    return {"flushed": flushed, **await asyncio.to_thread(write_behind.stats)}
+
+
+# Depois das demais rotas POST /predict/...: o modelo pode conter "/" (ex: hubfolio-model/3)
+@app.post("/predict/{model_ref:path}", response_model=PredictionResponse, tags=["Machine Learning"])
+async def predict_portfolio_with_model(
+    model_ref: str,
+    portfolio: PortfolioInput,
+    response: Response,
+    x_durability: Optional[str] = Header(None, alias=DURABILITY_HEADER),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
+    """
+    Mesmo que POST /predict, com o modelo do registro escolhido pelo caminho
+    
+    - **model_ref**: apelido do catálogo, mlflow:<modelo>/<versão> ou <modelo>/<versão>
+    """
+    return await _predict_with_idempotency(portfolio, response, x_durability, idempotency_key, model_ref)
+
+
+@app.get("/predict/drift", tags=["Machine Learning"])
+async def get_prediction_drift(refresh: bool = False):
+    """
+    Drift das entradas e do score do /predict em relação ao baseline de treino
+    
+    Retorna o último relatório (PSI/KS por feature e do score na janela
+    deslizante); refresh=true recalcula agora em vez de esperar o próximo ciclo.
+    """
+    if refresh:
+        if not drift_monitor.active:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Monitor de drift não está ativo (DRIFT_MONITOR_ENABLED=true)"
+            )
+        await asyncio.to_thread(drift_monitor.check)
+    return drift_monitor.stats()
+
+
+@app.get("/predict/idempotency", tags=["Machine Learning"])
+async def get_idempotency_stats():
+    """Chaves de idempotência guardadas e requisições respondidas sem reexecução"""
+    return idempotency_store.stats()
+
+
 @app.get("/model/info", tags=["Machine Learning"])
 async def get_model_info():
     """Retorna informações sobre o modelo carregado e no MLflow"""
     info = {
         "model_loaded": predictor.modelo is not None,
         "model_name": predictor.model_name,
+        "model_version": predictor.model_version,
         "features": predictor.features,
         "num_features": len(predictor.features)
     }
@@ -682,9 +1422,80 @@ async def get_model_info():
         except Exception as e:
             logger.warning(f"Erro ao obter informações do MLflow: {e}")
     
+    if model_watcher.enabled:
+        info["sync"] = model_watcher.stats()
+    
     return info
 
 
+@app.get("/model/version", tags=["Machine Learning"])
+async def get_model_version():
+    """Versão servida, versão fixada e estatísticas do polling/cache de modelos"""
+    return model_watcher.stats()
+
+
+@app.post("/model/version/sync", tags=["Machine Learning"])
+async def sync_model_version():
+    """Consulta o Model Registry agora e troca o modelo se a versão do stage mudou"""
+    if not model_watcher.enabled or not mlflow_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sincronização com o MLflow desativada (MODEL_SYNC_ENABLED=true)"
+        )
+    try:
+        return await model_watcher.sync()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Erro ao consultar o Model Registry: {str(e)}"
+        )
+
+
+@app.post("/model/version/pin", tags=["Machine Learning"])
+async def pin_model_version(version: Optional[str] = None):
+    """
+    Fixa a versão servida do modelo
+    
+    - **version**: Versão do Model Registry (omitida = volta a seguir o stage)
+    """
+    if not model_watcher.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sincronização com o MLflow desativada (MODEL_SYNC_ENABLED=true)"
+        )
+    return await model_watcher.pin(version)
+
+
+@app.get("/model/feedback-rules", tags=["Machine Learning"])
+async def get_feedback_rules():
+    """Regras de feedback e faixas de classificação em uso pelo preditor"""
+    return predictor.feedback_engine.describe()
+
+
+@app.post("/model/feedback-rules/reload", tags=["Machine Learning"])
+async def reload_feedback_rules(source: str = FEEDBACK_RULES_SOURCE):
+    """
+    Recarrega as regras de feedback sem reiniciar a API
+    
+    - **source**: 'default', 'file' (FEEDBACK_RULES_PATH) ou 'db' (tabela feedback_catalog)
+    """
+    if source not in ('default', 'file', 'db'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="source deve ser 'default', 'file' ou 'db'"
+        )
+    if source == 'db' and not pg_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="PostgreSQL não está disponível"
+        )
+    
+    predictor.feedback_engine = await asyncio.to_thread(load_feedback_engine, pg_client, source)
+    model_router.set_feedback_engine(predictor.feedback_engine)
+    model_registry.set_feedback_engine(predictor.feedback_engine)
+    return predictor.feedback_engine.describe()
+
+
 @app.post("/model/upload", tags=["Machine Learning"])
 async def upload_model(
     file: UploadFile = File(...),
@@ -837,15 +1648,22 @@ async def upload_model(
                     response_data["mlflow_run_id"] = run_id
                     response_data["mlflow_model_version"] = version
                     
+                    # Modelo enviado já é o servido: o próximo poll não precisa baixá-lo
+                    if version and model_watcher.enabled:
+                        response_data["model_sync_adopted"] = model_watcher.adopt(
+                            model_name, version, model, stage="Production"
+                        )
+                    
                     # Exportar para S3 se solicitado
                     if export_to_s3:
-                        s3_key = mlflow_client.export_model_to_s3(
+                        export = mlflow_client.export_model_to_s3(
                             model_name=model_name,
                             stage="Production"
                         )
-                        if s3_key:
+                        if export:
                             response_data["s3_exported"] = True
-                            response_data["s3_key"] = s3_key
+                            response_data["s3_key"] = export['s3_key']
+                            response_data["s3_export"] = export
                 
             except Exception as e:
                 logger.error(f"Erro ao registrar modelo no MLflow: {e}")
@@ -870,6 +1688,9 @@ async def export_model_to_s3(
     """
     Exporta modelo do MLflow para S3 (MinIO)
     
+    O artefato é copiado sem desserializar o modelo (cópia no servidor quando o
+    artifact store é o mesmo MinIO); a resposta traz método, bytes e duração.
+    
     Args:
         model_name: Nome do modelo no MLflow
         stage: Stage do modelo (Production, Staging, Archived)
@@ -881,17 +1702,18 @@ async def export_model_to_s3(
         )
     
     try:
-        s3_key = mlflow_client.export_model_to_s3(
+        export = await asyncio.to_thread(
+            mlflow_client.export_model_to_s3,
             model_name=model_name,
             stage=stage
         )
         
-        if s3_key:
+        if export:
             return {
                 "message": "Modelo exportado para S3 com sucesso!",
                 "model_name": model_name,
                 "stage": stage,
-                "s3_key": s3_key
+                **export
             }
         else:
             raise HTTPException(
@@ -906,6 +1728,259 @@ async def export_model_to_s3(
         )
 
 
+# ====================================================================
+# ENDPOINTS - JOBS
+# ====================================================================
+
+def _run_scoring_job(job: BulkScoringJob):
+    """Executa o re-score em background (erros ficam registrados em scoring_jobs)"""
+    try:
+        job.run()
+    except Exception as e:
+        logger.error(f"Job de re-score {job.job_id} falhou: {e}")
+
+
+@app.post("/jobs/scoring", tags=["Jobs"])
+async def start_scoring_job(
+    background_tasks: BackgroundTasks,
+    job_id: Optional[str] = None,
+    batch_size: int = SCORING_BATCH_SIZE,
+    workers: int = SCORING_WORKERS,
+    model_version: Optional[str] = None
+):
+    """
+    Inicia o re-score de todos os portfólios com o modelo carregado
+    
+    As predições são gravadas em predictions com a versão do modelo, sem criar
+    novos portfólios. Informe job_id para retomar um job interrompido.
+    
+    Args:
+        job_id: Job a retomar a partir do checkpoint (None = novo job)
+        batch_size: Portfólios por lote
+        workers: Processos de inferência (1 = sem pool)
+        model_version: Versão gravada em predictions (padrão: hash do modelo)
+    """
+    if not predictor.modelo:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Modelo de ML não está carregado. Use POST /model/upload primeiro."
+        )
+    
+    if not pg_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="PostgreSQL não está disponível"
+        )
+    
+    try:
+        job = BulkScoringJob(
+            pg_client, predictor,
+            batch_size=batch_size,
+            workers=workers,
+            model_version=model_version
+        )
+        checkpoint = job.prepare(job_id)
+    except ScoringJobError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao iniciar job de re-score: {str(e)}"
+        )
+    
+    if checkpoint['status'] != 'completed':
+        background_tasks.add_task(_run_scoring_job, job)
+    
+    return {
+        "message": "Job de re-score iniciado" if checkpoint['status'] != 'completed' else "Job já concluído",
+        "job_id": job.job_id,
+        "model_version": job.model_version,
+        "resumed_from_portfolio_id": checkpoint['last_portfolio_id'],
+        "portfolios_total": checkpoint['portfolios_total'],
+        "status_url": f"/jobs/scoring/{job.job_id}"
+    }
+
+
+@app.get("/jobs/scoring", tags=["Jobs"])
+async def list_scoring_jobs(limit: int = 20):
+    """Lista os jobs de re-score mais recentes"""
+    if not pg_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="PostgreSQL não está disponível"
+        )
+    return {"jobs": list_jobs(pg_client, limit=limit)}
+
+
+@app.get("/jobs/scoring/{job_id}", tags=["Jobs"])
+async def get_scoring_job(job_id: str):
+    """Retorna o progresso de um job de re-score"""
+    if not pg_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="PostgreSQL não está disponível"
+        )
+    
+    job = get_job(pg_client, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} não encontrado"
+        )
+    
+    total = job['portfolios_total']
+    job['progress_percent'] = round(100 * job['portfolios_scored'] / total, 2) if total else 100.0
+    return job
+
+
+def _run_training_job(job: TrainingJob):
+    """Executa o treino em background (erros ficam no estado do job)"""
+    try:
+        job.run()
+    except Exception as e:
+        logger.error(f"Job de treino {job.job_id} falhou: {e}")
+
+
+@app.post("/jobs/training", tags=["Jobs"])
+async def start_training_job(background_tasks: BackgroundTasks, request: Optional[TrainingRequest] = None):
+    """
+    Treina o modelo com busca de hiperparâmetros (validação cruzada) em background
+    
+    Os dados vêm do PostgreSQL (portfolios + portfolio_metrics) ou do MinIO
+    (portfolios.json). Cada combinação da grade vira um run no MLflow e o
+    melhor modelo é registrado como nova versão no stage pedido; o modelo
+    servido só muda quando essa versão for adotada (ex: MODEL_STAGE + polling
+    do Model Registry ou POST /model/version/pin).
+    
+    Args:
+        request: Origem dos dados, folds, n_jobs (processos), n_iter e espaço de busca
+    """
+    request = request or TrainingRequest()
+    
+    if request.register and not mlflow_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="MLflow não está disponível (use register=false para só avaliar)"
+        )
+    
+    running = running_training_job()
+    if running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Treino {running.job_id} já está em execução"
+        )
+    
+    try:
+        job = TrainingJob(
+            mlflow_client, pg_client, minio_client,
+            source=request.source,
+            object_key=request.object_key,
+            search_space=request.search_space,
+            n_iter=request.n_iter,
+            folds=request.folds,
+            n_jobs=request.n_jobs,
+            register=request.register,
+            stage=request.stage
+        )
+    except TrainingJobError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    background_tasks.add_task(_run_training_job, job)
+    
+    return {
+        "message": "Job de treino iniciado",
+        "job_id": job.job_id,
+        "trials_total": len(job.trials),
+        "status_url": f"/jobs/training/{job.job_id}"
+    }
+
+
+@app.get("/jobs/training", tags=["Jobs"])
+async def list_training(limit: int = 20):
+    """Lista os jobs de treino desta instância, mais recentes primeiro"""
+    return {"jobs": list_training_jobs(limit=limit)}
+
+
+@app.get("/jobs/training/{job_id}", tags=["Jobs"])
+async def get_training(job_id: str, trials: bool = False):
+    """Progresso de um job de treino (trials=true inclui todos os trials, do melhor ao pior)"""
+    job = get_training_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} não encontrado"
+        )
+    return job.progress(include_trials=trials)
+
+
+# ====================================================================
+# ENDPOINTS - PROFILING
+# ====================================================================
+
+@app.get("/profiles", tags=["Profiling"])
+async def list_profiles(kind: Optional[str] = ""):
+    """Lista profiles capturados (requisições e ETL) armazenados no MinIO"""
+    try:
+        objects = profiler.list_profiles(kind=kind)
+        
+        return {
+            "profiling_enabled": profiler.enabled,
+            "sample_rate": profiler.sample_rate,
+            "total_profiles": len(objects),
+            "profiles": [
+                {
+                    "object_key": obj['Key'],
+                    "size": obj['Size'],
+                    "last_modified": obj['LastModified'].isoformat()
+                }
+                for obj in objects
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao listar profiles: {str(e)}"
+        )
+
+
+@app.get("/profiles/{object_key:path}", tags=["Profiling"])
+async def download_profile(
+    object_key: str,
+    output_format: str = Query("prof", alias="format"),
+    sort_by: str = "cumulative"
+):
+    """
+    Baixa um profile
+    
+    Args:
+        object_key: Chave do profile (ex: profiles/request/..._POST_predict.prof)
+        output_format: Query ?format= 'prof' (binário pstats, abre no snakeviz) ou 'text' (relatório pstats)
+        sort_by: Ordenação do relatório texto (cumulative, tottime, calls)
+    """
+    data = profiler.download_profile(object_key)
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile não encontrado: {object_key}"
+        )
+    
+    if output_format == "text":
+        try:
+            return PlainTextResponse(profiler.render_text(data, sort_by=sort_by))
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Erro ao gerar relatório do profile: {str(e)}"
+            )
+    
+    filename = object_key.rsplit('/', 1)[-1]
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
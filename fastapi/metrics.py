@@ -0,0 +1,204 @@
+"""
+Métricas de qualidade dos portfólios HubFólio (completude, clareza, IQ)
+Implementação vetorizada (NumPy) das fórmulas da função SQL
+calculate_portfolio_metrics, usada pela API e pelo ETL para calcular e gravar
+métricas em lote. O resultado é idêntico bit a bit ao da função SQL (mesmas
+operações em float64, na mesma ordem). tests/test_metrics.py compara com
+saídas gravadas da função SQL; com o banco no ar, confira com:
+
+    python metrics.py --check-parity
+"""
+import sys
+import logging
+import argparse
+from typing import Dict, Mapping, Sequence, Any, List
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METRIC_INPUTS = [
+    'bio', 'projetos_min', 'habilidades_min', 'contatos',
+    'kw_contexto', 'kw_processo', 'kw_resultado', 'consistencia_visual_score'
+]
+PARITY_USER_ID = -1  # Usuário temporário da verificação de paridade (rollback no fim)
+
+
+def calculate_portfolio_metrics(columns: Mapping[str, Sequence[Any]]) -> Dict[str, np.ndarray]:
+    """
+    Calcula as métricas de vários portfólios de uma vez
+
+    Mesmas fórmulas de calculate_portfolio_metrics (postgres/init.sql):
+        completude = 25 * (bio + projetos >= 1 + habilidades >= 5 + contatos)
+        clareza    = LEAST(100, total_kw / 15.0 * 100)
+        iq         = completude * 0.4 + clareza * 0.4 + visual * 0.2
+
+    Args:
+        columns: Colunas de METRIC_INPUTS (dict de listas, DataFrame ou tabela)
+
+    Returns:
+        Dicionário com arrays float64 completude_score, clareza_score e indice_qualidade
+    """
+    bio = np.asarray(columns['bio']).astype(np.int64)
+    contatos = np.asarray(columns['contatos']).astype(np.int64)
+    projetos = np.asarray(columns['projetos_min'])
+    habilidades = np.asarray(columns['habilidades_min'])
+    visual = np.asarray(columns['consistencia_visual_score'], dtype=np.float64)
+
+    completude = (
+        (bio * 25) +
+        np.where(projetos >= 1, 25, 0) +
+        np.where(habilidades >= 5, 25, 0) +
+        (contatos * 25)
+    ).astype(np.float64)
+
+    total_kw = (
+        np.asarray(columns['kw_contexto'], dtype=np.int64) +
+        np.asarray(columns['kw_processo'], dtype=np.int64) +
+        np.asarray(columns['kw_resultado'], dtype=np.int64)
+    )
+    clareza = np.minimum(100.0, (total_kw.astype(np.float64) / 15.0) * 100)
+
+    iq = (completude * 0.4) + (clareza * 0.4) + (visual * 0.2)
+
+    return {
+        'completude_score': completude,
+        'clareza_score': clareza,
+        'indice_qualidade': iq,
+    }
+
+
+def metrics_rows(portfolio_ids: Sequence[int], columns: Mapping[str, Sequence[Any]]) -> List[tuple]:
+    """Linhas (portfolio_id, completude, clareza, iq) prontas para gravar em portfolio_metrics"""
+    metrics = calculate_portfolio_metrics(columns)
+    return list(zip(
+        [int(pid) for pid in portfolio_ids],
+        metrics['completude_score'].tolist(),
+        metrics['clareza_score'].tolist(),
+        metrics['indice_qualidade'].tolist()
+    ))
+
+
+def check_sql_parity(pg_client, sample_size: int = 2000, seed: int = 42) -> Dict:
+    """
+    Compara calculate_portfolio_metrics (NumPy) com a função SQL no PostgreSQL
+
+    Dentro de uma transação que é desfeita no final: insere portfólios
+    sintéticos cobrindo os limites das fórmulas, executa a função SQL para
+    eles e para uma amostra dos portfólios existentes e compara os valores
+    gravados com os calculados em Python (igualdade exata de float64).
+
+    Returns:
+        Dicionário com total comparado e divergências (no máximo 20 exemplos)
+    """
+    rng = np.random.default_rng(seed)
+    n = sample_size
+    synthetic = {
+        'bio': rng.random(n) < 0.5,
+        'projetos_min': rng.integers(0, 4, n),
+        'habilidades_min': rng.integers(3, 8, n),
+        'contatos': rng.random(n) < 0.5,
+        'kw_contexto': rng.integers(0, 9, n),
+        'kw_processo': rng.integers(0, 9, n),
+        'kw_resultado': rng.integers(0, 9, n),
+        'consistencia_visual_score': np.concatenate([
+            [0.0, 100.0, 69.99, 70.0, 33.333333333333336],
+            rng.uniform(0, 100, n - 5)
+        ])[:n],
+    }
+
+    conn = pg_client.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO users (user_id, nome) VALUES (%s, 'Paridade de métricas') ON CONFLICT DO NOTHING",
+            (PARITY_USER_ID,)
+        )
+        execute_values(
+            cursor,
+            f"INSERT INTO portfolios (user_id, {', '.join(METRIC_INPUTS)}) VALUES %s",
+            [
+                (PARITY_USER_ID, *[synthetic[name][i].item() for name in METRIC_INPUTS])
+                for i in range(n)
+            ]
+        )
+
+        # Portfólios sintéticos + amostra dos existentes
+        cursor.execute(
+            """
+            SELECT portfolio_id FROM portfolios WHERE user_id = %s
+            UNION ALL
+            (SELECT portfolio_id FROM portfolios WHERE user_id <> %s ORDER BY random() LIMIT %s)
+            """,
+            (PARITY_USER_ID, PARITY_USER_ID, sample_size)
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT calculate_portfolio_metrics(id) FROM unnest(%s) AS id", (ids,))
+
+        cursor.execute(
+            f"""
+            SELECT p.portfolio_id, {', '.join('p.' + name for name in METRIC_INPUTS)},
+                   m.completude_score, m.clareza_score, m.indice_qualidade
+            FROM portfolios p
+            JOIN portfolio_metrics m ON m.portfolio_id = p.portfolio_id
+            WHERE p.portfolio_id = ANY(%s)
+            ORDER BY p.portfolio_id
+            """,
+            (ids,)
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.rollback()
+        conn.close()
+
+    names = ['portfolio_id', *METRIC_INPUTS, 'completude_score', 'clareza_score', 'indice_qualidade']
+    columns = {name: [row[i] for row in rows] for i, name in enumerate(names)}
+    python_metrics = calculate_portfolio_metrics(columns)
+
+    mismatches = []
+    for metric, values in python_metrics.items():
+        sql_values = np.asarray(columns[metric], dtype=np.float64)
+        for index in np.flatnonzero(values != sql_values):
+            mismatches.append({
+                'portfolio_id': columns['portfolio_id'][index],
+                'metric': metric,
+                'sql': float(sql_values[index]),
+                'python': float(values[index]),
+            })
+
+    return {
+        'compared': len(rows),
+        'mismatches': len(mismatches),
+        'examples': mismatches[:20],
+    }
+
+
+def main():
+    """Verificação de paridade com a função SQL pela linha de comando"""
+    parser = argparse.ArgumentParser(description="Métricas de portfólio (NumPy) vs calculate_portfolio_metrics (SQL)")
+    parser.add_argument("--check-parity", action="store_true", help="Compara com a função SQL no PostgreSQL")
+    parser.add_argument("--sample-size", type=int, default=2000, help="Portfólios sintéticos e reais comparados")
+    args = parser.parse_args()
+
+    if not args.check_parity:
+        parser.print_help()
+        return 0
+
+    from postgres_client import PostgreSQLClient
+
+    result = check_sql_parity(PostgreSQLClient(), sample_size=args.sample_size)
+    for example in result['examples']:
+        print(f"  ❌ portfolio {example['portfolio_id']} {example['metric']}: "
+              f"SQL={example['sql']!r} Python={example['python']!r}")
+    if result['mismatches']:
+        print(f"❌ {result['mismatches']} divergências em {result['compared']} portfólios")
+        return 1
+    print(f"✅ Paridade exata em {result['compared']} portfólios")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Micro-batching das inferências do /predict
+Agrupa predições concorrentes em uma fila por até PREDICT_BATCH_MAX_SIZE itens
+ou PREDICT_BATCH_MAX_WAIT_MS milissegundos e executa uma única chamada
+vetorizada (HubFolioPredictor.prever_lote), resolvendo a future de cada
+requisição com o mesmo resultado que prever() daria.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from predictor import HubFolioPredictor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PredictionBatcher:
+    """
+    Coalescedor de inferências em lotes
+
+    Desativado por padrão (PREDICT_BATCHING_ENABLED=false): o /predict chama
+    prever() diretamente. Quando ativo, o primeiro item da fila abre uma janela
+    de max_wait_ms; o lote é executado quando a janela fecha ou quando atinge
+    max_batch_size itens, o que vier primeiro.
+    """
+
+    def __init__(
+        self,
+        predictor: HubFolioPredictor,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        self.predictor = predictor
+        self.enabled = os.getenv('PREDICT_BATCHING_ENABLED', 'false').lower() == 'true'
+        self.max_batch_size = max(1, max_batch_size or int(os.getenv('PREDICT_BATCH_MAX_SIZE', 32)))
+        self.max_wait = (
+            max_wait_ms if max_wait_ms is not None else float(os.getenv('PREDICT_BATCH_MAX_WAIT_MS', 5))
+        ) / 1000.0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Métricas
+        self.batch_sizes: Counter = Counter()
+        self.items_total = 0
+        self.batches_total = 0
+        self.errors_total = 0
+        self._waits_ms = deque(maxlen=10000)      # Tempo na fila por item
+        self._inference_ms = deque(maxlen=10000)  # Duração de cada lote
+
+        logger.info(
+            f"PredictionBatcher initialized - Enabled: {self.enabled}, "
+            f"max_batch_size: {self.max_batch_size}, max_wait_ms: {self.max_wait * 1000:g}"
+        )
+
+    def start(self):
+        """Inicia o worker do lote no event loop atual"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Processa o que estiver na fila e encerra o worker"""
+        if self._worker is None:
+            return
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+    async def submit(self, dados: Dict) -> Dict:
+        """
+        Enfileira um portfólio e aguarda a predição do lote
+
+        Returns:
+            Mesmo dicionário de HubFolioPredictor.prever()
+        """
+        valido, mensagem = self.predictor.validar_entrada(dados)
+        if not valido:
+            return {"erro": mensagem, "sucesso": False}
+
+        if self._worker is None:
+            self.start()  # Sem evento de startup (ex: app montada direto no httpx.ASGITransport)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((dados, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        """Loop do worker: monta lotes e executa a inferência fora do event loop"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._execute(batch)
+
+    async def _execute(self, batch: List[Tuple[Dict, asyncio.Future, float]]):
+        """Executa um lote e resolve as futures"""
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            self._waits_ms.append((started - enqueued) * 1000)
+
+        try:
+            results = await asyncio.to_thread(self._predict, [dados for dados, _, _ in batch])
+        except Exception as e:
+            self.errors_total += 1
+            logger.error(f"❌ Erro no lote de inferência ({len(batch)} itens): {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._inference_ms.append((time.perf_counter() - started) * 1000)
+        self.batch_sizes[len(batch)] += 1
+        self.batches_total += 1
+        self.items_total += len(batch)
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():  # Requisição cancelada pelo cliente
+                future.set_result(result)
+
+    def _predict(self, items: List[Dict]) -> List[Dict]:
+        """Uma chamada vetorizada para o lote inteiro"""
+        result = self.predictor.prever_lote(pd.DataFrame(items))
+        predicted_at = datetime.utcnow().isoformat()
+        return [
+            {
+                "sucesso": True,
+                "indice_qualidade": iq,
+                "classificacao": classificacao,
+                "feedback": feedback,
+                "feedback_mask": feedback_mask,
+                "model_name": self.predictor.model_name,
+                "model_version": self.predictor.model_version,
+                "predicted_at": predicted_at
+            }
+            for iq, classificacao, feedback, feedback_mask in zip(
+                result["indice_qualidade"], result["classificacao"],
+                result["feedback"], result["feedback_mask"]
+            )
+        ]
+
+    def stats(self) -> Dict:
+        """Distribuição dos tamanhos de lote e latência adicionada pela fila"""
+        def percentiles(values) -> Dict:
+            if not values:
+                return {}
+            array = np.fromiter(values, dtype=np.float64)
+            return {
+                "p50": round(float(np.percentile(array, 50)), 3),
+                "p95": round(float(np.percentile(array, 95)), 3),
+                "p99": round(float(np.percentile(array, 99)), 3),
+                "max": round(float(array.max()), 3),
+            }
+
+        return {
+            "enabled": self.enabled,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "items_total": self.items_total,
+            "batches_total": self.batches_total,
+            "errors_total": self.errors_total,
+            "avg_batch_size": round(self.items_total / self.batches_total, 2) if self.batches_total else None,
+            "batch_size_distribution": dict(sorted(self.batch_sizes.items())),
+            "queue_wait_ms": percentiles(self._waits_ms),
+            "batch_inference_ms": percentiles(self._inference_ms),
+        }
@@ -5,13 +5,31 @@ Gerencia upload e download de dados no object storage
 import os
 import io
 import logging
-from typing import List, Dict, Optional
+import uuid
+from datetime import date
+from typing import List, Dict, Optional, Iterable, Iterator, Any, Tuple
 import boto3
 from botocore.exceptions import ClientError
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from parquet_storage import (
+    PARQUET_PREFIX, PARTITION_COLUMN, validate_table, table_to_parquet_bytes,
+    partition_path, parse_filters
+)
+from compression import ENCODINGS, compress_object, decode_object, compressor, is_compressible
+from object_cache import object_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tamanho das partes do multipart upload (S3 exige no mínimo 5 MB, exceto a última)
+MULTIPART_PART_SIZE = int(os.getenv('MINIO_MULTIPART_PART_SIZE', 8 * 1024 * 1024))
+
+# Compressão transparente dos objetos textuais (none | gzip | zstd)
+MINIO_COMPRESSION = os.getenv('MINIO_COMPRESSION', 'none').lower()
+
 
 class MinIOClient:
     """Cliente para interagir com MinIO (S3-compatible object storage)"""
@@ -21,6 +39,7 @@ class MinIOClient:
         self.access_key = os.getenv('MINIO_ACCESS_KEY', 'hubfolio_admin')
         self.secret_key = os.getenv('MINIO_SECRET_KEY', 'hubfolio_secret_2025')
         self.bucket_name = os.getenv('MINIO_BUCKET', 'hubfolio-data')
+        self.compression = MINIO_COMPRESSION if MINIO_COMPRESSION in ENCODINGS else None
         
         # Criar cliente boto3 (S3)
         self.s3_client = boto3.client(
@@ -32,7 +51,15 @@ class MinIOClient:
             region_name='us-east-1'
         )
         
-        logger.info(f"MinIO Client initialized - Endpoint: {self.endpoint}, Bucket: {self.bucket_name}")
+        self._arrow_fs = None
+        
+        # Cache local em disco (OBJECT_CACHE_ENABLED=true), compartilhado no processo
+        self.cache = object_cache if object_cache.enabled else None
+        
+        logger.info(
+            f"MinIO Client initialized - Endpoint: {self.endpoint}, Bucket: {self.bucket_name}, "
+            f"Compression: {self.compression or 'none'}"
+        )
     
     def check_connection(self) -> bool:
         """Verifica se a conexão com MinIO está OK"""
@@ -71,6 +98,9 @@ class MinIOClient:
         """
         Faz upload de arquivo para o MinIO
         
+        Com MINIO_COMPRESSION, tipos textuais são gravados comprimidos com o
+        metadado Content-Encoding; download_file devolve os bytes originais.
+        
         Args:
             file_data: Dados do arquivo em bytes
             object_name: Nome do objeto no bucket (path)
@@ -80,22 +110,123 @@ class MinIOClient:
             True se sucesso, False se erro
         """
         try:
+            body, encoding = compress_object(file_data, content_type, self.compression)
+            extra = {'ContentEncoding': encoding} if encoding else {}
             self.s3_client.put_object(
                 Bucket=self.bucket_name,
                 Key=object_name,
-                Body=file_data,
-                ContentType=content_type
+                Body=body,
+                ContentType=content_type,
+                **extra
             )
-            logger.info(f"Upload bem-sucedido: {object_name}")
+            if encoding:
+                logger.info(f"Upload bem-sucedido: {object_name} ({len(file_data)} -> {len(body)} bytes, {encoding})")
+            else:
+                logger.info(f"Upload bem-sucedido: {object_name}")
             return True
         except Exception as e:
             logger.error(f"Erro no upload de {object_name}: {e}")
             return False
     
+    def upload_stream(
+        self,
+        chunks: Iterable[bytes],
+        object_name: str,
+        content_type: str = 'application/octet-stream',
+        part_size: int = MULTIPART_PART_SIZE
+    ) -> Optional[int]:
+        """
+        Faz upload em streaming (multipart) a partir de um iterável de bytes
+
+        Os chunks são acumulados até part_size e enviados como partes, então a
+        memória usada fica limitada ao tamanho de uma parte, independente do
+        tamanho total do objeto. Com MINIO_COMPRESSION, tipos textuais são
+        comprimidos em streaming (Content-Encoding gravado no objeto).
+
+        Args:
+            chunks: Iterável com os pedaços do arquivo
+            object_name: Nome do objeto no bucket (path)
+            content_type: Tipo MIME do arquivo
+            part_size: Tamanho de cada parte (mínimo 5 MB exigido pelo S3)
+
+        Returns:
+            Total de bytes enviados (antes da compressão) ou None se erro
+        """
+        upload_id = None
+        encoding = self.compression if is_compressible(content_type) else None
+        codec = compressor(encoding) if encoding else None
+        try:
+            extra = {'ContentEncoding': encoding} if encoding else {}
+            upload = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=object_name,
+                ContentType=content_type,
+                **extra
+            )
+            upload_id = upload['UploadId']
+
+            parts = []
+            buffer = bytearray()
+            total = 0
+            stored = 0
+
+            def send_part(data: bytes):
+                part_number = len(parts) + 1
+                response = self.s3_client.upload_part(
+                    Bucket=self.bucket_name,
+                    Key=object_name,
+                    PartNumber=part_number,
+                    UploadId=upload_id,
+                    Body=data
+                )
+                parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+
+            for chunk in chunks:
+                total += len(chunk)
+                buffer.extend(codec.compress(chunk) if codec else chunk)
+                if len(buffer) >= part_size:
+                    stored += len(buffer)
+                    send_part(bytes(buffer))
+                    buffer.clear()
+
+            if codec:
+                buffer.extend(codec.flush())
+
+            # Última parte pode ser menor que 5 MB (ou a única, se o objeto for pequeno)
+            if buffer or not parts:
+                stored += len(buffer)
+                send_part(bytes(buffer))
+
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=object_name,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+            logger.info(
+                f"Upload em streaming bem-sucedido: {object_name} ({total} bytes, "
+                f"{stored} gravados, {len(parts)} partes)"
+            )
+            return total
+        except Exception as e:
+            logger.error(f"Erro no upload em streaming de {object_name}: {e}")
+            if upload_id:
+                try:
+                    self.s3_client.abort_multipart_upload(
+                        Bucket=self.bucket_name,
+                        Key=object_name,
+                        UploadId=upload_id
+                    )
+                except Exception:
+                    pass
+            return None
+
     def download_file(self, object_name: str) -> Optional[bytes]:
         """
         Baixa arquivo do MinIO
         
+        Objetos gravados com Content-Encoding gzip/zstd são descomprimidos.
+        
         Args:
             object_name: Nome do objeto no bucket
             
@@ -103,17 +234,33 @@ class MinIOClient:
             Bytes do arquivo ou None se erro
         """
         try:
-            response = self.s3_client.get_object(
-                Bucket=self.bucket_name,
-                Key=object_name
-            )
-            data = response['Body'].read()
+            data = self.get_object_bytes(object_name)
             logger.info(f"Download bem-sucedido: {object_name}")
             return data
         except Exception as e:
             logger.error(f"Erro no download de {object_name}: {e}")
             return None
     
+    def get_object_bytes(self, object_name: str) -> bytes:
+        """Conteúdo original de um objeto (descomprimido se necessário); propaga erros"""
+        return bytes(self.get_object_view(object_name))
+    
+    def get_object_view(self, object_name: str):
+        """
+        Como get_object_bytes, mas sem cópia quando possível
+        
+        Com o cache ativo, objetos grandes não comprimidos voltam como memoryview
+        de um mmap do arquivo em cache (aceito por loads, pyarrow e hashlib).
+        """
+        if self.cache is not None:
+            data, encoding = self.cache.get(self.s3_client, self.bucket_name, object_name)
+            return decode_object(data, encoding)
+        response = self.s3_client.get_object(
+            Bucket=self.bucket_name,
+            Key=object_name
+        )
+        return decode_object(response['Body'].read(), response.get('ContentEncoding'))
+    
     def list_objects(self, prefix: str = '') -> List[Dict]:
         """
         Lista objetos no bucket
@@ -162,6 +309,8 @@ class MinIOClient:
                 Bucket=self.bucket_name,
                 Key=object_name
             )
+            if self.cache is not None:
+                self.cache.invalidate(self.bucket_name, object_name)
             logger.info(f"Arquivo removido: {object_name}")
             return True
         except Exception as e:
@@ -186,9 +335,107 @@ class MinIOClient:
             return {
                 'ContentLength': response['ContentLength'],
                 'ContentType': response.get('ContentType'),
+                'ContentEncoding': response.get('ContentEncoding'),
                 'LastModified': response['LastModified'],
                 'ETag': response['ETag']
             }
         except Exception as e:
             logger.error(f"Erro ao obter metadados de {object_name}: {e}")
             return None
+    
+    # ====================================================================
+    # DATASETS PARQUET
+    # ====================================================================
+    
+    @property
+    def arrow_fs(self) -> pafs.S3FileSystem:
+        """Filesystem Arrow apontando para o MinIO (leitura com pushdown)"""
+        if self._arrow_fs is None:
+            self._arrow_fs = pafs.S3FileSystem(
+                access_key=self.access_key,
+                secret_key=self.secret_key,
+                endpoint_override=self.endpoint,
+                scheme='http',
+                region='us-east-1'
+            )
+        return self._arrow_fs
+    
+    def upload_parquet(
+        self,
+        table: pa.Table,
+        prefix: str = PARQUET_PREFIX,
+        ingest_date: Optional[date] = None
+    ) -> Optional[Dict]:
+        """
+        Grava tabela Arrow como arquivo Parquet em uma partição por data de ingestão
+        
+        Args:
+            table: Tabela com o PORTFOLIO_SCHEMA (validada antes da escrita)
+            prefix: Prefixo do dataset
+            ingest_date: Data da partição (padrão: hoje)
+            
+        Returns:
+            Dicionário com object_key e size_bytes ou None se erro
+        """
+        table = validate_table(table)
+        data = table_to_parquet_bytes(table)
+        object_key = f"{partition_path(prefix, ingest_date)}part-{uuid.uuid4().hex}.parquet"
+        
+        if not self.upload_file(data, object_key, content_type='application/vnd.apache.parquet'):
+            return None
+        return {'object_key': object_key, 'size_bytes': len(data), 'rows': table.num_rows}
+    
+    def read_parquet_dataset(
+        self,
+        prefix: str = PARQUET_PREFIX,
+        columns: Optional[List[str]] = None,
+        filters: Optional[List[Tuple[str, str, Any]]] = None,
+        partition_column: str = PARTITION_COLUMN
+    ) -> pa.Table:
+        """
+        Lê um dataset Parquet particionado com projeção de colunas e pushdown de filtros
+        
+        Args:
+            prefix: Prefixo do dataset no bucket
+            columns: Colunas a ler (None = todas)
+            filters: Filtros [(coluna, operador, valor)], ex: [('ingest_date', '>=', '2025-01-01')]
+            partition_column: Chave das partições hive do dataset (lida como string)
+            
+        Returns:
+            Tabela Arrow com as linhas/colunas selecionadas
+        """
+        dataset = self._parquet_dataset(prefix, partition_column)
+        table = dataset.to_table(columns=columns, filter=parse_filters(filters))
+        logger.info(f"Dataset Parquet lido: {prefix} ({table.num_rows} linhas, {table.num_columns} colunas)")
+        return table
+    
+    def iter_parquet_batches(
+        self,
+        prefix: str = PARQUET_PREFIX,
+        columns: Optional[List[str]] = None,
+        filters: Optional[List[Tuple[str, str, Any]]] = None,
+        batch_size: int = 5000,
+        partition_column: str = PARTITION_COLUMN
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Lê um dataset Parquet particionado em record batches (mesma projeção e filtros de read_parquet_dataset)
+        
+        Só um lote fica em memória por vez, então o custo não depende do
+        tamanho do dataset.
+        
+        Args:
+            batch_size: Máximo de linhas por lote (arquivos pequenos geram lotes menores)
+        """
+        dataset = self._parquet_dataset(prefix, partition_column)
+        yield from dataset.to_batches(columns=columns, filter=parse_filters(filters), batch_size=batch_size)
+    
+    def _parquet_dataset(self, prefix: str, partition_column: str) -> ds.Dataset:
+        return ds.dataset(
+            f"{self.bucket_name}/{prefix.rstrip('/')}",
+            filesystem=self.arrow_fs,
+            format='parquet',
+            partitioning=ds.partitioning(
+                pa.schema([pa.field(partition_column, pa.string())]),
+                flavor='hive'
+            )
+        )
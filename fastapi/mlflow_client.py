@@ -3,11 +3,17 @@ Cliente MLflow para HubFólio
 Gerencia versionamento de modelos e experimentos
 """
 import os
+import time
+import shutil
 import logging
-import pickle
-from typing import Dict, Optional, Any
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Tuple
 from datetime import datetime
+from urllib.parse import urlparse
 import mlflow
+import mlflow.artifacts
 import mlflow.sklearn
 from mlflow.tracking import MlflowClient
 import boto3
@@ -16,6 +22,13 @@ from botocore.config import Config
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cache local dos modelos do Model Registry, por versão (artefatos em disco + modelos carregados)
+MODEL_CACHE_DIR = os.getenv('MLFLOW_MODEL_CACHE_DIR', '/app/models/mlflow')
+MODEL_CACHE_VERSIONS = int(os.getenv('MLFLOW_MODEL_CACHE_VERSIONS', 3))  # Por modelo
+
+# Arquivo do modelo dentro do artefato do flavor sklearn (pickle, carregável por pickle.load)
+SKLEARN_MODEL_FILE = "model.pkl"
+
 
 class MLflowClient:
     """Cliente para interagir com MLflow"""
@@ -59,6 +72,17 @@ class MLflowClient:
         # Inicializar cliente MLflow
         self.client = MlflowClient(tracking_uri=self.tracking_uri)
         
+        # (nome, versão) -> modelo carregado, em ordem de uso
+        self._models: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._models_lock = threading.Lock()
+        # Um lock por (nome, versão): downloads simultâneos da mesma versão esperam o primeiro
+        self._version_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        # Quem serve qual versão (primário, variantes, registry): nunca sai do disco
+        self._serving: Dict[str, Tuple[str, str]] = {}
+        self.cache_hits = 0
+        self.disk_hits = 0
+        self.downloads = 0
+        
         logger.info(f"MLflow Client initialized - URI: {self.tracking_uri}")
     
     def check_connection(self) -> bool:
@@ -199,10 +223,125 @@ class MLflowClient:
             logger.error(f"❌ Erro ao registrar versão do modelo: {e}")
             return None
     
+    def resolve_version(self, model_name: str, stage: str = "Production") -> Optional[str]:
+        """
+        Versão atual de um stage (uma chamada ao Model Registry, sem baixar artefatos)
+        
+        Returns:
+            Número da versão ou None se o stage não tiver versão
+        """
+        versions = self.client.get_latest_versions(model_name, stages=[stage])
+        return str(versions[0].version) if versions else None
+    
+    def load_model_version(self, model_name: str, version: str, keep_in_memory: bool = True) -> Any:
+        """
+        Carrega uma versão específica do modelo, passando pelo cache local
+        
+        Ordem: modelo já carregado na memória → artefatos em
+        MLFLOW_MODEL_CACHE_DIR/<nome>/<versão> → download do MLflow. Uma
+        versão registrada é imutável, então o cache nunca precisa ser validado.
+        Com keep_in_memory=False o modelo não entra no cache em memória (quem
+        chama controla a residência, ex: model_registry.py). Propaga erros.
+        """
+        key = (model_name, str(version))
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.cache_hits += 1
+                return model
+        
+        with self._models_lock:
+            version_lock = self._version_locks.setdefault(key, threading.Lock())
+        model_dir = os.path.join(MODEL_CACHE_DIR, model_name)
+        local_path = os.path.join(model_dir, str(version))
+        with version_lock:
+            if os.path.exists(os.path.join(local_path, 'MLmodel')):
+                os.utime(local_path)  # Ordem de uso para o _prune_disk
+                self.disk_hits += 1
+            else:
+                os.makedirs(model_dir, exist_ok=True)
+                tmp_path = tempfile.mkdtemp(dir=model_dir, prefix=f"{version}.tmp-")
+                try:
+                    downloaded = mlflow.artifacts.download_artifacts(
+                        artifact_uri=f"models:/{model_name}/{version}",
+                        dst_path=tmp_path
+                    )
+                    # Diretório completo só aparece no lugar final depois do download
+                    shutil.rmtree(local_path, ignore_errors=True)
+                    os.replace(downloaded, local_path)
+                finally:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                self.downloads += 1
+                logger.info(f"✅ Artefatos de '{model_name}' v{version} baixados para {local_path}")
+            
+            model = mlflow.sklearn.load_model(local_path)
+        if keep_in_memory:
+            self.remember_model(model_name, version, model)
+        self._prune_disk(model_name, keep=str(version))
+        return model
+    
+    def remember_model(self, model_name: str, version: str, model: Any):
+        """Coloca no cache um modelo já carregado (ex: recém-enviado por /model/upload)"""
+        with self._models_lock:
+            self._models[(model_name, str(version))] = model
+            self._models.move_to_end((model_name, str(version)))
+            while len(self._models) > MODEL_CACHE_VERSIONS:
+                self._models.popitem(last=False)
+    
+    def serve(self, owner: str, model_name: str, version: str):
+        """Marca a versão como servida por owner (ex: 'primary', 'variant:b'); ela não sai do disco"""
+        with self._models_lock:
+            self._serving[owner] = (model_name, str(version))
+    
+    def release(self, owner: str):
+        with self._models_lock:
+            self._serving.pop(owner, None)
+    
+    def _prune_disk(self, model_name: str, keep: Optional[str] = None):
+        """Mantém em disco as MLFLOW_MODEL_CACHE_VERSIONS versões usadas mais recentemente
+
+        Nunca remove a versão recém-carregada (keep), as que estão no cache em
+        memória nem as servidas (serve); por isso o disco pode passar do limite.
+        """
+        model_dir = os.path.join(MODEL_CACHE_DIR, model_name)
+        with self._models_lock:
+            protected = {version for name, version in self._models if name == model_name}
+            protected.update(version for name, version in self._serving.values() if name == model_name)
+        if keep is not None:
+            protected.add(keep)
+        used = []
+        for name in os.listdir(model_dir):
+            try:
+                if name.isdigit():
+                    used.append((os.path.getmtime(os.path.join(model_dir, name)), name))
+            except OSError:
+                continue  # Removido por outro prune no meio da listagem
+        used.sort(reverse=True)
+        for _, version in used[MODEL_CACHE_VERSIONS:]:
+            if version not in protected:
+                shutil.rmtree(os.path.join(model_dir, version), ignore_errors=True)
+    
+    def model_cache_stats(self) -> Dict:
+        """Versões em memória e de onde vieram os carregamentos"""
+        with self._models_lock:
+            loaded = [f"{name}/v{version}" for name, version in self._models]
+        return {
+            "cache_dir": MODEL_CACHE_DIR,
+            "max_versions": MODEL_CACHE_VERSIONS,
+            "loaded": loaded,
+            "memory_hits": self.cache_hits,
+            "disk_hits": self.disk_hits,
+            "downloads": self.downloads,
+        }
+    
     def get_latest_model(self, model_name: str, stage: str = "Production") -> Optional[Any]:
         """
         Obtém o modelo mais recente de um stage específico
         
+        O stage é resolvido para uma versão concreta; os artefatos só são
+        baixados quando essa versão ainda não está no cache local.
+        
         Args:
             model_name: Nome do modelo
             stage: Stage do modelo
@@ -211,24 +350,65 @@ class MLflowClient:
             Modelo carregado ou None
         """
         try:
-            model_uri = f"models:/{model_name}/{stage}"
-            model = mlflow.sklearn.load_model(model_uri)
-            logger.info(f"✅ Modelo '{model_name}' (stage: {stage}) carregado do MLflow")
+            version = self.resolve_version(model_name, stage)
+            if version is None:
+                logger.error(f"Nenhuma versão encontrada para modelo '{model_name}' no stage '{stage}'")
+                return None
+            model = self.load_model_version(model_name, version)
+            logger.info(f"✅ Modelo '{model_name}' v{version} (stage: {stage}) carregado do MLflow")
             return model
         except Exception as e:
             logger.error(f"❌ Erro ao carregar modelo do MLflow: {e}")
             return None
     
+    def _minio_s3_client(self):
+        """Cliente boto3 do MinIO de destino das exportações"""
+        minio_endpoint = os.getenv('MINIO_ENDPOINT', 'minio:9000')
+        minio_access_key = os.getenv('MINIO_ACCESS_KEY', 'grupo_hubfolio')
+        minio_secret_key = os.getenv('MINIO_SECRET_KEY', 'horse-lock-electric')
+        
+        return boto3.client(
+            's3',
+            endpoint_url=f'http://{minio_endpoint}',
+            aws_access_key_id=minio_access_key,
+            aws_secret_access_key=minio_secret_key,
+            config=Config(signature_version='s3v4'),
+            region_name='us-east-1'
+        )
+    
+    @staticmethod
+    def _same_minio(artifact_uri: str) -> Optional[Tuple[str, str]]:
+        """
+        (bucket, key) do artefato se ele estiver no mesmo MinIO de destino
+        
+        O artifact store do MLflow (--default-artifact-root s3://mlflow-artifacts)
+        usa MLFLOW_S3_ENDPOINT_URL; se o host for o de MINIO_ENDPOINT, o export
+        pode ser uma cópia no próprio servidor.
+        """
+        parsed = urlparse(artifact_uri)
+        if parsed.scheme != 's3':
+            return None
+        artifact_host = urlparse(os.getenv('MLFLOW_S3_ENDPOINT_URL', '')).netloc
+        if artifact_host != os.getenv('MINIO_ENDPOINT', 'minio:9000'):
+            return None
+        return parsed.netloc, f"{parsed.path.lstrip('/')}/{SKLEARN_MODEL_FILE}"
+    
     def export_model_to_s3(
         self,
         model_name: str,
         stage: str = "Production",
         s3_bucket: str = "hubfolio-data",
         s3_key: str = None
-    ) -> Optional[str]:
+    ) -> Optional[Dict]:
         """
         Exporta modelo do MLflow para S3 (MinIO)
         
+        Copia o model.pkl do artefato sem desserializar o modelo:
+        - server_copy: artefato no mesmo MinIO, cópia feita pelo próprio servidor
+          (CopyObject/UploadPartCopy, nenhum byte passa pela API)
+        - local_cache: artefato já no cache local de versões, enviado do disco
+        - stream: artefato baixado para um arquivo temporário e enviado em partes
+        
         Args:
             model_name: Nome do modelo no MLflow
             stage: Stage do modelo
@@ -236,54 +416,64 @@ class MLflowClient:
             s3_key: Chave do objeto no S3 (se None, usa nome padrão)
             
         Returns:
-            S3 key do modelo exportado ou None
+            Dicionário com s3_key, versão, método, bytes e duração, ou None
         """
         try:
-            # Carregar modelo do MLflow
-            model = self.get_latest_model(model_name, stage)
-            if model is None:
-                return None
+            started = time.perf_counter()
             
-            # Obter informações da versão
-            latest_version = self.client.get_latest_versions(model_name, stages=[stage])
-            if not latest_version:
+            # Resolver o stage uma única vez
+            version = self.resolve_version(model_name, stage)
+            if version is None:
                 logger.error(f"Nenhuma versão encontrada para modelo '{model_name}' no stage '{stage}'")
                 return None
-            
-            version_info = latest_version[0]
-            version = version_info.version
+            source = self.client.get_model_version(model_name, version).source
             
             # Gerar S3 key se não fornecido
             if s3_key is None:
                 timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
                 s3_key = f"models/{model_name}/v{version}/{model_name}_v{version}_{timestamp}.pkl"
             
-            # Serializar modelo
-            model_bytes = pickle.dumps(model)
-            
-            # Upload para S3/MinIO
-            minio_endpoint = os.getenv('MINIO_ENDPOINT', 'minio:9000')
-            minio_access_key = os.getenv('MINIO_ACCESS_KEY', 'grupo_hubfolio')
-            minio_secret_key = os.getenv('MINIO_SECRET_KEY', 'horse-lock-electric')
+            s3_client = self._minio_s3_client()
+            extra_args = {'ContentType': 'application/octet-stream'}
+            cached_file = os.path.join(MODEL_CACHE_DIR, model_name, str(version), SKLEARN_MODEL_FILE)
+            same_minio = self._same_minio(source)
             
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=f'http://{minio_endpoint}',
-                aws_access_key_id=minio_access_key,
-                aws_secret_access_key=minio_secret_key,
-                config=Config(signature_version='s3v4'),
-                region_name='us-east-1'
-            )
+            if same_minio:
+                src_bucket, src_key = same_minio
+                size = s3_client.head_object(Bucket=src_bucket, Key=src_key)['ContentLength']
+                s3_client.copy(
+                    {'Bucket': src_bucket, 'Key': src_key}, s3_bucket, s3_key,
+                    ExtraArgs={**extra_args, 'MetadataDirective': 'REPLACE'}
+                )
+                method, transferred = 'server_copy', 0
+            elif os.path.exists(cached_file):
+                size = os.path.getsize(cached_file)
+                s3_client.upload_file(cached_file, s3_bucket, s3_key, ExtraArgs=extra_args)
+                method, transferred = 'local_cache', size
+            else:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    local_file = mlflow.artifacts.download_artifacts(
+                        artifact_uri=f"{source.rstrip('/')}/{SKLEARN_MODEL_FILE}",
+                        dst_path=tmp_dir
+                    )
+                    size = os.path.getsize(local_file)
+                    s3_client.upload_file(local_file, s3_bucket, s3_key, ExtraArgs=extra_args)
+                # Download + upload
+                method, transferred = 'stream', 2 * size
             
-            s3_client.put_object(
-                Bucket=s3_bucket,
-                Key=s3_key,
-                Body=model_bytes,
-                ContentType='application/octet-stream'
+            duration = time.perf_counter() - started
+            logger.info(
+                f"✅ Modelo '{model_name}' v{version} exportado para S3: s3://{s3_bucket}/{s3_key} "
+                f"({method}, {size} bytes, {duration:.2f}s)"
             )
-            
-            logger.info(f"✅ Modelo '{model_name}' v{version} exportado para S3: s3://{s3_bucket}/{s3_key}")
-            return s3_key
+            return {
+                's3_key': s3_key,
+                'version': version,
+                'method': method,
+                'bytes': size,
+                'bytes_through_api': transferred,
+                'duration_seconds': round(duration, 3)
+            }
             
         except Exception as e:
             logger.error(f"❌ Erro ao exportar modelo para S3: {e}")
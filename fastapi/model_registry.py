@@ -0,0 +1,332 @@
+"""
+Registro de vários modelos servidos lado a lado (por coorte/experimento)
+Cada requisição do /predict pode escolher um modelo pelo header X-Model ou
+pelo caminho (POST /predict/{modelo}). O modelo é carregado na primeira vez
+em que é pedido (cold load) e fica residente enquanto couber no orçamento
+MODEL_REGISTRY_MEMORY_MB; ao passar dele, os menos usados recentemente são
+descarregados (LRU) e voltam a ser carregados se pedidos de novo.
+
+Referências aceitas:
+- apelido do catálogo (MODEL_REGISTRY_CATALOG ou PUT /models/{apelido}), que
+  aponta para uma das fontes abaixo
+- mlflow:<modelo>/<versão ou stage>  (ex: mlflow:hubfolio-model/3)
+- minio:<chave do objeto .pkl>       (ex: minio:models/hubfolio-model/v3/m.pkl)
+- <modelo>/<versão>, atalho para mlflow:<modelo>/<versão>
+
+Objetos do MinIO só podem ser carregados pelo catálogo (a requisição não
+escolhe arquivos arbitrários para desserializar). A memória de cada modelo é
+estimada pelo tamanho do pickle.
+
+Stages do MLflow (ex: mlflow:hubfolio-model/Production) são resolvidos para a
+versão atual a cada MODEL_REGISTRY_STAGE_TTL segundos, e a residência é por
+modelo/versão: quando o stage muda, a próxima requisição carrega a versão nova.
+Cold loads são limitados a MODEL_REGISTRY_COLD_LOADS_PER_MINUTE (429 acima
+disso), para que o X-Model não force downloads e evicções sem parar.
+
+    MODEL_REGISTRY_CATALOG='{"coorte-a": "mlflow:hubfolio-model/3",
+                             "exp-gbr": "minio:models/gbr/v1/gbr.pkl"}'
+"""
+import os
+import time
+import pickle
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+
+from predictor import HubFolioPredictor, model_version_tag
+from serialization import loads
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_HEADER = "X-Model"
+MODEL_REGISTRY_MEMORY_MB = float(os.getenv('MODEL_REGISTRY_MEMORY_MB', 512))
+MODEL_REGISTRY_STAGE_TTL = float(os.getenv('MODEL_REGISTRY_STAGE_TTL', 30))  # Segundos
+MODEL_REGISTRY_COLD_LOADS_PER_MINUTE = int(os.getenv('MODEL_REGISTRY_COLD_LOADS_PER_MINUTE', 30))  # 0 = sem limite
+MODEL_SOURCES = ('mlflow', 'minio')
+
+
+class ModelRegistry:
+    """Modelos carregados sob demanda com residência limitada por memória (LRU)"""
+
+    def __init__(self, feedback_engine=None, memory_budget_mb: float = MODEL_REGISTRY_MEMORY_MB):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.feedback_engine = feedback_engine
+        self.mlflow_client = None
+        self.minio_client = None
+
+        self.catalog: Dict[str, str] = {}  # apelido -> fonte
+        # Chave (fonte com a versão resolvida) -> entrada, em ordem de uso
+        self._resident: "OrderedDict[str, Dict]" = OrderedDict()
+        self._resident_bytes = 0
+        self._loading: Dict[str, asyncio.Future] = {}  # Cold loads em andamento (um por chave)
+        self._stages: Dict[str, Tuple[str, float]] = {}  # <modelo>/<stage> -> (versão, resolvida em)
+        self._cold_load_times = deque()  # Início dos cold loads do último minuto
+
+        # Métricas
+        self.hits = 0
+        self.cold_loads = 0
+        self.load_errors = 0
+        self.evictions = 0
+        self.cold_loads_throttled = 0
+        self._cold_load_ms = deque(maxlen=1000)
+
+        config = os.getenv('MODEL_REGISTRY_CATALOG')
+        if config:
+            for alias, source in loads(config).items():
+                self.register(alias, source)
+
+        logger.info(
+            f"ModelRegistry initialized - budget: {memory_budget_mb:g} MB, catalog: {len(self.catalog)}"
+        )
+
+    def start(self, mlflow_client=None, minio_client=None):
+        self.mlflow_client = mlflow_client
+        self.minio_client = minio_client
+
+    # ----------------------------------------------------------------
+    # Catálogo
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def _parse(source: str) -> Tuple[str, str]:
+        kind, _, target = source.partition(':')
+        if kind not in MODEL_SOURCES or not target:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Fonte inválida: '{source}' (use mlflow:<modelo>/<versão> ou minio:<chave>)"
+            )
+        if kind == 'mlflow' and '/' not in target:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Fonte MLflow deve ser mlflow:<modelo>/<versão ou stage>: '{source}'"
+            )
+        return kind, target
+
+    def register(self, alias: str, source: str):
+        """Cadastra (ou troca) o apelido; a versão antiga é descarregada"""
+        self._parse(source)
+        previous = self.catalog.get(alias)
+        self.catalog[alias] = source
+        if previous and previous != source and previous not in self.catalog.values():
+            self._unload(previous)
+
+    def unregister(self, alias: str) -> bool:
+        source = self.catalog.pop(alias, None)
+        if source is None:
+            return False
+        if source not in self.catalog.values():
+            self._unload(source)
+        return True
+
+    def resolve(self, reference: str) -> str:
+        """Fonte de uma referência (apelido, mlflow:..., minio:... ou <modelo>/<versão>)"""
+        if reference in self.catalog:
+            return self.catalog[reference]
+        if reference.startswith('minio:'):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Modelos do MinIO só podem ser usados pelo catálogo (PUT /models/{apelido})"
+            )
+        source = reference if reference.startswith('mlflow:') else f"mlflow:{reference}"
+        try:
+            self._parse(source)
+        except HTTPException:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Modelo '{reference}' não está no catálogo"
+            )
+        return source
+
+    # ----------------------------------------------------------------
+    # Residência
+    # ----------------------------------------------------------------
+
+    async def get(self, reference: str) -> HubFolioPredictor:
+        """Preditor do modelo, carregando-o se não estiver residente"""
+        source = self.resolve(reference)
+        key = await self._resolve_stage(source)
+        entry = self._resident.get(key)
+        if entry is not None:
+            self._resident.move_to_end(key)
+            self.hits += 1
+            entry['hits'] += 1
+            return entry['predictor']
+
+        loading = self._loading.get(key)
+        if loading is not None:
+            self.hits += 1  # Carregamento já em andamento: não conta como cold load
+            return await asyncio.shield(loading)
+
+        self._throttle_cold_load()
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        started = time.perf_counter()
+        try:
+            predictor, size = await asyncio.to_thread(self._load, key)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.cold_loads += 1
+            self._cold_load_ms.append(elapsed_ms)
+            self._admit(key, source, predictor, size, elapsed_ms)
+            future.set_result(predictor)
+            return predictor
+        except Exception as e:
+            self.load_errors += 1
+            error = e if isinstance(e, HTTPException) else HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Erro ao carregar o modelo '{reference}': {e}"
+            )
+            future.set_exception(error)
+            future.exception()  # Marca como consumida (evita aviso sem aguardadores)
+            raise error
+        finally:
+            del self._loading[key]
+
+    async def _resolve_stage(self, source: str) -> str:
+        """Chave de residência: a fonte com o stage do MLflow trocado pela versão atual"""
+        kind, target = self._parse(source)
+        model_name, _, version = target.rpartition('/')
+        if kind != 'mlflow' or version.isdigit():
+            return source
+        resolved = self._stages.get(target)
+        if resolved is None or time.monotonic() - resolved[1] >= MODEL_REGISTRY_STAGE_TTL:
+            if self.mlflow_client is None:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="MLflow não está disponível"
+                )
+            try:
+                current = await asyncio.to_thread(self.mlflow_client.resolve_version, model_name, version)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail=f"Erro ao resolver o stage '{version}' de '{model_name}': {e}"
+                )
+            if current is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Nenhuma versão de '{model_name}' no stage '{version}'"
+                )
+            resolved = (current, time.monotonic())
+            self._stages[target] = resolved
+        return f"mlflow:{model_name}/{resolved[0]}"
+
+    def _throttle_cold_load(self):
+        """Recusa o cold load se o limite por minuto já foi atingido"""
+        now = time.monotonic()
+        while self._cold_load_times and now - self._cold_load_times[0] >= 60:
+            self._cold_load_times.popleft()
+        if MODEL_REGISTRY_COLD_LOADS_PER_MINUTE and len(self._cold_load_times) >= MODEL_REGISTRY_COLD_LOADS_PER_MINUTE:
+            self.cold_loads_throttled += 1
+            retry_after = max(1, int(60 - (now - self._cold_load_times[0])) + 1)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Limite de {MODEL_REGISTRY_COLD_LOADS_PER_MINUTE} carregamentos de modelo por minuto atingido",
+                headers={"Retry-After": str(retry_after)}
+            )
+        self._cold_load_times.append(now)
+
+    def _load(self, key: str) -> Tuple[HubFolioPredictor, int]:
+        """Carrega o modelo da chave (bloqueante: chamar fora do event loop)"""
+        kind, target = self._parse(key)
+        if kind == 'mlflow':
+            if self.mlflow_client is None:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="MLflow não está disponível"
+                )
+            model_name, _, version = target.rpartition('/')
+            modelo = self.mlflow_client.load_model_version(model_name, version, keep_in_memory=False)
+            model_bytes = pickle.dumps(modelo)
+            model_version = f"{model_name}_v{version}"
+        else:
+            if self.minio_client is None:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="MinIO não está disponível"
+                )
+            model_bytes = self.minio_client.get_object_bytes(target)  # Passa pelo cache local de objetos
+            modelo = pickle.loads(model_bytes)
+            model_version = model_version_tag(type(modelo).__name__, model_bytes)
+
+        predictor = HubFolioPredictor(feedback_engine=self.feedback_engine)
+        predictor.set_model(modelo, model_version=model_version)
+        return predictor, len(model_bytes)
+
+    def _admit(self, key: str, source: str, predictor: HubFolioPredictor, size: int, load_ms: float):
+        """Torna o modelo residente, descarregando os menos usados até caber no orçamento"""
+        while self._resident and self._resident_bytes + size > self.memory_budget:
+            evicted = next(iter(self._resident))
+            self._evict(evicted)
+            self.evictions += 1
+            logger.info(f"Modelo '{evicted}' descarregado (LRU)")
+        if size > self.memory_budget:
+            logger.warning(f"⚠️ Modelo '{key}' ({size} bytes) maior que o orçamento de memória")
+        kind, target = self._parse(key)
+        if kind == 'mlflow' and self.mlflow_client is not None:
+            # Residente não pode ter os artefatos removidos do cache em disco
+            model_name, _, version = target.rpartition('/')
+            self.mlflow_client.serve(f"registry:{key}", model_name, version)
+        self._resident[key] = {
+            'source': source,
+            'predictor': predictor,
+            'size_bytes': size,
+            'load_ms': round(load_ms, 3),
+            'loaded_at': time.time(),
+            'hits': 0,
+        }
+        self._resident_bytes += size
+
+    def _evict(self, key: str):
+        entry = self._resident.pop(key)
+        self._resident_bytes -= entry['size_bytes']
+        if key.startswith('mlflow:') and self.mlflow_client is not None:
+            self.mlflow_client.release(f"registry:{key}")
+
+    def _unload(self, source: str):
+        """Descarrega as versões carregadas pela fonte (um stage pode ter passado por várias)"""
+        for key in [key for key, entry in self._resident.items() if entry['source'] == source]:
+            self._evict(key)
+
+    def set_feedback_engine(self, feedback_engine):
+        """Aplica regras de feedback recarregadas aos modelos residentes"""
+        self.feedback_engine = feedback_engine
+        for entry in self._resident.values():
+            entry['predictor'].feedback_engine = feedback_engine
+
+    def stats(self) -> Dict:
+        """Catálogo, modelos residentes e métricas de hit/cold load"""
+        lookups = self.hits + self.cold_loads
+        cold = np.fromiter(self._cold_load_ms, dtype=np.float64) if self._cold_load_ms else None
+        return {
+            "memory_budget_bytes": self.memory_budget,
+            "resident_bytes": self._resident_bytes,
+            "catalog": self.catalog,
+            "resident": [
+                {
+                    "key": key,
+                    "source": entry['source'],
+                    "model_name": entry['predictor'].model_name,
+                    "model_version": entry['predictor'].model_version,
+                    "size_bytes": entry['size_bytes'],
+                    "load_ms": entry['load_ms'],
+                    "hits": entry['hits'],
+                }
+                for key, entry in reversed(self._resident.items())  # Mais recente primeiro
+            ],
+            "hits": self.hits,
+            "cold_loads": self.cold_loads,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "load_errors": self.load_errors,
+            "evictions": self.evictions,
+            "cold_loads_throttled": self.cold_loads_throttled,
+            "cold_load_ms": {
+                "p50": round(float(np.percentile(cold, 50)), 3),
+                "p95": round(float(np.percentile(cold, 95)), 3),
+                "max": round(float(cold.max()), 3),
+            } if cold is not None else {},
+        }
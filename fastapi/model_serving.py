@@ -0,0 +1,331 @@
+"""
+Serving com vários modelos: primário, A/B e shadow
+O primário é o HubFolioPredictor global (arquivo .pkl ou MLflow). Variantes
+podem ser adicionadas ao lado dele:
+
+- ab: recebe uma fração `weight` do tráfego do /predict. A escolha é
+  determinística pelo user_id (o mesmo usuário sempre cai no mesmo modelo),
+  e a resposta/predição gravada vem da variante.
+- shadow: avalia as mesmas entradas fora do caminho da requisição (em
+  background, depois da resposta) e grava a predição em shadow_predictions
+  com sua própria model_version, sem afetar a resposta. No máximo
+  SHADOW_MAX_PENDING avaliações ficam pendentes; o excedente é descartado.
+
+Para cada modelo são medidas a latência de inferência (p50/p95/p99) e, nos
+shadows, a diferença absoluta para o IQ do primário.
+
+    MODEL_VARIANTS='[{"name": "gbr", "path": "/app/models/gbr.pkl", "mode": "shadow"},
+                     {"name": "rf", "path": "/app/models/rf.pkl", "mode": "ab", "weight": 0.1}]'
+"""
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException, status
+
+from predictor import HubFolioPredictor
+from serialization import loads
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHADOW_MAX_PENDING = int(os.getenv('SHADOW_MAX_PENDING', 1000))
+SHADOW_FLUSH_SECONDS = float(os.getenv('SHADOW_FLUSH_SECONDS', 1.0))
+SHADOW_WRITE_ATTEMPTS = 5  # Flushes em que uma predição espera o portfólio existir (write-behind)
+LATENCY_SAMPLES = 10000
+
+VARIANT_MODES = ('ab', 'shadow')
+
+
+def _percentiles(values) -> Dict:
+    if not values:
+        return {}
+    array = np.fromiter(values, dtype=np.float64)
+    return {
+        "p50": round(float(np.percentile(array, 50)), 3),
+        "p95": round(float(np.percentile(array, 95)), 3),
+        "p99": round(float(np.percentile(array, 99)), 3),
+        "max": round(float(array.max()), 3),
+    }
+
+
+class ModelStats:
+    """Contadores e latências de inferência de um modelo"""
+
+    def __init__(self):
+        self.predictions = 0
+        self.errors = 0
+        self.latency_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.abs_diff = deque(maxlen=LATENCY_SAMPLES)  # |IQ do shadow - IQ do primário|
+
+    def record(self, started: float):
+        self.predictions += 1
+        self.latency_ms.append((time.perf_counter() - started) * 1000)
+
+    def describe(self) -> Dict:
+        result = {
+            "predictions": self.predictions,
+            "errors": self.errors,
+            "latency_ms": _percentiles(self.latency_ms),
+        }
+        if self.abs_diff:
+            result["abs_diff_vs_primary"] = {
+                "mean": round(float(np.mean(self.abs_diff)), 3),
+                **_percentiles(self.abs_diff),
+            }
+        return result
+
+
+class ModelVariant:
+    """Modelo servido ao lado do primário"""
+
+    def __init__(self, name: str, predictor: HubFolioPredictor, mode: str, weight: float = 0.0):
+        self.name = name
+        self.predictor = predictor
+        self.mode = mode
+        self.weight = weight
+        self.stats = ModelStats()
+
+    def describe(self) -> Dict:
+        return {
+            "name": self.name,
+            "mode": self.mode,
+            "weight": self.weight if self.mode == 'ab' else None,
+            "model_name": self.predictor.model_name,
+            "model_version": self.predictor.model_version,
+            **self.stats.describe(),
+        }
+
+
+class ModelRouter:
+    """
+    Escolhe o modelo de cada predição e agenda as avaliações shadow
+
+    Sem variantes, predict() equivale a chamar o primário diretamente.
+    """
+
+    def __init__(self, primary: HubFolioPredictor, batcher=None):
+        self.primary = primary
+        self.batcher = batcher  # PredictionBatcher do primário (usado quando ativo)
+        self.primary_stats = ModelStats()
+        self.variants: Dict[str, ModelVariant] = {}
+
+        self.pg_client = None
+        self._pending = 0
+        self._shadow_queue: List[Dict] = []  # Predições shadow aguardando gravação
+        self._queue_lock = threading.Lock()
+        self._tasks = set()
+        self._flusher: Optional[asyncio.Task] = None
+
+        # Métricas
+        self.shadow_dropped = 0
+        self.shadow_written = 0
+        self.shadow_write_errors = 0
+        self.shadow_orphaned = 0
+
+    # ----------------------------------------------------------------
+    # Variantes
+    # ----------------------------------------------------------------
+
+    def add_variant(self, name: str, modelo, mode: str, weight: float = 0.0,
+                    model_version: Optional[str] = None) -> ModelVariant:
+        """Adiciona (ou substitui) uma variante"""
+        if mode not in VARIANT_MODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"mode deve ser um de {list(VARIANT_MODES)}"
+            )
+        others = sum(v.weight for v in self.variants.values() if v.mode == 'ab' and v.name != name)
+        if mode == 'ab' and not (0 < weight <= 1 and others + weight <= 1):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"weight deve estar em (0, 1] e a soma das variantes A/B não pode passar de 1 "
+                       f"(já alocado: {others:g})"
+            )
+        predictor = HubFolioPredictor(feedback_engine=self.primary.feedback_engine)
+        predictor.set_model(modelo, model_version=model_version)
+        variant = ModelVariant(name, predictor, mode, weight if mode == 'ab' else 0.0)
+        self.variants[name] = variant
+        logger.info(f"✅ Variante '{name}' ({mode}, {predictor.model_version}) adicionada")
+        return variant
+
+    def remove_variant(self, name: str) -> bool:
+        return self.variants.pop(name, None) is not None
+
+    def set_feedback_engine(self, feedback_engine):
+        """Aplica regras de feedback recarregadas às variantes"""
+        for variant in self.variants.values():
+            variant.predictor.feedback_engine = feedback_engine
+
+    def load_from_env(self):
+        """Carrega as variantes de MODEL_VARIANTS (lista JSON com name, path, mode, weight)"""
+        config = os.getenv('MODEL_VARIANTS')
+        if not config:
+            return
+        for item in loads(config):
+            predictor = HubFolioPredictor()
+            if not predictor.load_model(item['path']):
+                logger.error(f"❌ Variante '{item['name']}' não carregada: {item['path']}")
+                continue
+            try:
+                self.add_variant(item['name'], predictor.modelo, item.get('mode', 'shadow'),
+                                 float(item.get('weight', 0.0)), predictor.model_version)
+            except HTTPException as e:
+                logger.error(f"❌ Variante '{item['name']}' inválida: {e.detail}")
+
+    # ----------------------------------------------------------------
+    # Predição
+    # ----------------------------------------------------------------
+
+    def choose(self, routing_key) -> Optional[ModelVariant]:
+        """Variante A/B do usuário (None = primário), estável para o mesmo routing_key"""
+        ab = [v for v in self.variants.values() if v.mode == 'ab']
+        if not ab:
+            return None
+        digest = hashlib.sha256(str(routing_key).encode('utf-8')).digest()
+        point = int.from_bytes(digest[:8], 'big') / 2 ** 64
+        threshold = 0.0
+        for variant in sorted(ab, key=lambda v: v.name):
+            threshold += variant.weight
+            if point < threshold:
+                return variant
+        return None
+
+    async def predict(self, dados: Dict) -> Dict:
+        """Mesmo resultado de HubFolioPredictor.prever(), com o modelo escolhido para o user_id"""
+        variant = self.choose(dados.get('user_id'))
+        started = time.perf_counter()
+        if variant is not None:
+            stats = variant.stats
+            resultado = variant.predictor.prever(dados)
+        elif self.batcher is not None and self.batcher.enabled:
+            stats = self.primary_stats  # Inclui a espera na fila do micro-batching
+            resultado = await self.batcher.submit(dados)
+        else:
+            stats = self.primary_stats
+            resultado = self.primary.prever(dados)
+        if resultado.get("sucesso"):
+            stats.record(started)
+        return resultado
+
+    def shadow(self, dados: Dict, resultado: Dict, portfolio_id: int):
+        """Agenda a avaliação dos shadows para um portfólio já gravado (não bloqueia)"""
+        shadows = [v for v in self.variants.values() if v.mode == 'shadow']
+        if not shadows or self.pg_client is None:
+            return
+        if self._pending >= SHADOW_MAX_PENDING:
+            self.shadow_dropped += len(shadows)
+            return
+        self._pending += 1
+        task = asyncio.create_task(self._run_shadows(shadows, dados, resultado, portfolio_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _run_shadows(self, shadows: List[ModelVariant], dados: Dict, resultado: Dict, portfolio_id: int):
+        try:
+            await asyncio.to_thread(self._score_shadows, shadows, dados, resultado, portfolio_id)
+        finally:
+            self._pending -= 1
+
+    def _score_shadows(self, shadows: List[ModelVariant], dados: Dict, resultado: Dict, portfolio_id: int):
+        for variant in shadows:
+            started = time.perf_counter()
+            try:
+                shadow = variant.predictor.prever(dados)
+            except Exception as e:
+                variant.stats.errors += 1
+                logger.warning(f"⚠️ Shadow '{variant.name}' falhou: {e}")
+                continue
+            if not shadow.get("sucesso"):
+                variant.stats.errors += 1
+                continue
+            variant.stats.record(started)
+            if resultado.get('model_version') == self.primary.model_version:
+                variant.stats.abs_diff.append(abs(shadow['indice_qualidade'] - resultado['indice_qualidade']))
+            record = {
+                'portfolio_id': portfolio_id,
+                'predicted_iq': shadow['indice_qualidade'],
+                'model_name': shadow['model_name'],
+                'model_version': shadow['model_version'],
+                'classification': shadow['classificacao'],
+                'feedback_mask': shadow['feedback_mask'],
+                'predicted_at': shadow['predicted_at'],
+                'attempts': 0,
+            }
+            with self._queue_lock:
+                self._shadow_queue.append(record)
+
+    # ----------------------------------------------------------------
+    # Gravação das predições shadow (em lote)
+    # ----------------------------------------------------------------
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(SHADOW_FLUSH_SECONDS)
+            await asyncio.to_thread(self.flush)
+
+    def flush(self) -> int:
+        """Grava as predições shadow pendentes; as de portfólios ainda não gravados ficam para o próximo flush"""
+        with self._queue_lock:
+            records, self._shadow_queue = self._shadow_queue, []
+        if not records:
+            return 0
+        try:
+            inserted = set(self.pg_client.save_shadow_predictions(records))
+        except Exception as e:
+            self.shadow_write_errors += 1
+            logger.error(f"❌ Erro ao gravar {len(records)} predições shadow: {e}")
+            inserted = set()
+        retry = []
+        for record in records:
+            if (record['portfolio_id'], record['model_version']) in inserted:
+                continue
+            record['attempts'] += 1
+            if record['attempts'] < SHADOW_WRITE_ATTEMPTS:
+                retry.append(record)
+            else:
+                self.shadow_orphaned += 1
+        with self._queue_lock:
+            self._shadow_queue = retry + self._shadow_queue
+        self.shadow_written += len(inserted)
+        return len(inserted)
+
+    async def stop(self):
+        """Termina as avaliações em andamento e grava o que estiver pendente"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self.pg_client is not None:
+            await asyncio.to_thread(self.flush)
+
+    def stats(self) -> Dict:
+        """Modelos servidos, divisão de tráfego e latência por modelo"""
+        ab_weight = sum(v.weight for v in self.variants.values() if v.mode == 'ab')
+        return {
+            "primary": {
+                "model_name": self.primary.model_name,
+                "model_version": self.primary.model_version,
+                "weight": round(1 - ab_weight, 6),
+                **self.primary_stats.describe(),
+            },
+            "variants": [variant.describe() for variant in self.variants.values()],
+            "shadow": {
+                "pending": self._pending,
+                "queued_writes": len(self._shadow_queue),
+                "written": self.shadow_written,
+                "dropped": self.shadow_dropped,
+                "orphaned": self.shadow_orphaned,
+                "write_errors": self.shadow_write_errors,
+                "max_pending": SHADOW_MAX_PENDING,
+            },
+        }
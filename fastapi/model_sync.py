@@ -0,0 +1,165 @@
+"""
+Sincronização do modelo servido com o Model Registry do MLflow
+Com MODEL_SYNC_ENABLED=true a API serve a versão do stage MODEL_STAGE
+(padrão Production) do modelo MODEL_REGISTRY_NAME, ou a versão fixada em
+MODEL_VERSION. A cada MODEL_POLL_SECONDS o watcher consulta apenas qual
+versão está no stage (uma chamada ao registry); os artefatos só são baixados
+e o modelo só é trocado quando a versão muda. A troca é atômica: as
+predições em andamento terminam com o modelo anterior.
+
+    POST /model/version/pin?version=3   # fixa a versão 3
+    POST /model/version/pin             # volta a seguir o stage
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_SYNC_ENABLED = os.getenv('MODEL_SYNC_ENABLED', 'false').lower() == 'true'
+MODEL_REGISTRY_NAME = os.getenv('MODEL_REGISTRY_NAME', 'hubfolio-model')
+MODEL_STAGE = os.getenv('MODEL_STAGE', 'Production')
+MODEL_POLL_SECONDS = float(os.getenv('MODEL_POLL_SECONDS', 60))
+
+
+class ModelVersionWatcher:
+    """Mantém o predictor na versão do stage (ou na versão fixada)"""
+
+    def __init__(self, predictor, model_name: str = MODEL_REGISTRY_NAME, stage: str = MODEL_STAGE,
+                 pinned_version: Optional[str] = None, poll_seconds: float = MODEL_POLL_SECONDS):
+        self.enabled = MODEL_SYNC_ENABLED
+        self.predictor = predictor
+        self.model_name = model_name
+        self.stage = stage
+        self.pinned_version = pinned_version or os.getenv('MODEL_VERSION') or None
+        self.poll_seconds = poll_seconds
+        self.mlflow_client = None
+
+        self.current_version: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        # Métricas
+        self.polls = 0
+        self.swaps = 0
+        self.poll_errors = 0
+        self.last_poll_at: Optional[float] = None
+        self.last_swap_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        logger.info(
+            f"ModelVersionWatcher initialized - Enabled: {self.enabled}, model: {model_name}, "
+            f"stage: {stage}, pinned: {self.pinned_version}, poll: {poll_seconds}s"
+        )
+
+    async def start(self, mlflow_client):
+        """Carrega a versão inicial e inicia o polling (MODEL_POLL_SECONDS > 0)"""
+        self.mlflow_client = mlflow_client
+        try:
+            await self.sync()
+        except Exception as e:
+            logger.warning(f"⚠️ Modelo do MLflow não carregado no startup: {e}")
+        if self.poll_seconds > 0 and self.pinned_version is None:
+            self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"❌ Erro ao sincronizar modelo com o MLflow: {e}")
+
+    async def sync(self) -> Dict:
+        """Resolve a versão alvo e troca o modelo se ela mudou; propaga erros"""
+        async with self._lock:
+            self.polls += 1
+            self.last_poll_at = time.time()
+            try:
+                version = self.pinned_version or await asyncio.to_thread(
+                    self.mlflow_client.resolve_version, self.model_name, self.stage
+                )
+            except Exception as e:
+                self.poll_errors += 1
+                self.last_error = str(e)
+                raise
+            if version is None:
+                logger.warning(f"⚠️ Nenhuma versão de '{self.model_name}' no stage '{self.stage}'")
+            elif version != self.current_version:
+                await self._swap(version)
+            return self.stats()
+
+    async def _swap(self, version: str):
+        model = await asyncio.to_thread(self.mlflow_client.load_model_version, self.model_name, version)
+        previous = self.current_version
+        self.predictor.set_model(model, model_version=f"{self.model_name}_v{version}")
+        self.current_version = version
+        self.mlflow_client.serve('primary', self.model_name, version)
+        self.swaps += 1
+        self.last_swap_at = time.time()
+        logger.info(f"✅ Modelo servido: '{self.model_name}' v{previous} → v{version}")
+
+    async def pin(self, version: Optional[str]) -> Dict:
+        """Fixa uma versão (None volta a seguir o stage) e aplica imediatamente"""
+        if self.mlflow_client is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="MLflow não está disponível"
+            )
+        previous = self.pinned_version
+        self.pinned_version = version
+        try:
+            await self.sync()
+        except Exception as e:
+            self.pinned_version = previous
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Versão {version} de '{self.model_name}' não pôde ser carregada: {e}"
+            )
+        if self._task is None and version is None and self.poll_seconds > 0:
+            self._task = asyncio.create_task(self._poll_loop())
+        elif self._task is not None and version is not None:
+            await self.stop()
+        return self.stats()
+
+    def adopt(self, model_name: str, version: str, model, stage: str) -> bool:
+        """Registra como servida uma versão recém-enviada (evita baixar de novo no próximo poll)
+
+        Só adota se a versão é do modelo e do stage acompanhados e nenhuma
+        versão está fixada; caso contrário o poll continua decidindo.
+        """
+        if model_name != self.model_name or stage != self.stage or self.pinned_version is not None:
+            return False
+        if self.mlflow_client is not None:
+            self.mlflow_client.remember_model(self.model_name, version, model)
+            self.mlflow_client.serve('primary', self.model_name, version)
+        self.predictor.model_version = f"{self.model_name}_v{version}"
+        self.current_version = version
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "model_name": self.model_name,
+            "stage": self.stage,
+            "pinned_version": self.pinned_version,
+            "serving_version": self.current_version,
+            "poll_seconds": self.poll_seconds if self._task is not None else 0,
+            "polls": self.polls,
+            "swaps": self.swaps,
+            "poll_errors": self.poll_errors,
+            "last_poll_at": self.last_poll_at,
+            "last_swap_at": self.last_swap_at,
+            "last_error": self.last_error,
+            "model_cache": self.mlflow_client.model_cache_stats() if self.mlflow_client else None,
+        }
@@ -0,0 +1,607 @@
+"""
+Treino do modelo HubFólio com busca de hiperparâmetros
+Lê os dados de treino direto do PostgreSQL (portfolios + portfolio_metrics) ou
+do MinIO (portfolios.json, com o IQ calculado pelas fórmulas de metrics.py),
+avalia cada combinação de hiperparâmetros com validação cruzada (KFold) em um
+pool de processos e registra todos os trials no MLflow; o melhor é registrado
+como nova versão no Model Registry.
+
+Features e folds ficam em cache (.npy em TRAINING_CACHE_DIR), identificados
+pela impressão digital dos dados: um novo treino sobre os mesmos dados não lê
+a fonte de novo, e os processos do pool abrem os arrays com mmap em vez de
+recebê-los serializados.
+
+Uso:
+    python model_training.py --source postgres --n-jobs 4
+    python model_training.py --source minio --n-iter 10 --no-register
+"""
+import os
+import sys
+import time
+import uuid
+import pickle
+import hashlib
+import logging
+import argparse
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.model_selection import KFold, ParameterGrid
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+
+from metrics import calculate_portfolio_metrics
+from model_sync import MODEL_REGISTRY_NAME
+from parquet_storage import flatten_record
+from serialization import loads
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRAINING_SOURCES = ('postgres', 'minio')
+TRAINING_SOURCE = os.getenv('TRAINING_SOURCE', 'postgres')
+TRAINING_MINIO_KEY = os.getenv('TRAINING_MINIO_KEY', 'hubfolio/data/portfolios.json')
+TRAINING_CV_FOLDS = int(os.getenv('TRAINING_CV_FOLDS', 3))
+TRAINING_N_JOBS = int(os.getenv('TRAINING_N_JOBS', os.cpu_count() or 1))
+TRAINING_STAGE = os.getenv('TRAINING_STAGE', 'Staging')
+TRAINING_CACHE_DIR = os.getenv('TRAINING_CACHE_DIR', '/app/training_cache')
+TRAINING_CACHE_DATASETS = int(os.getenv('TRAINING_CACHE_DATASETS', 5))  # Impressões digitais mantidas
+TRAINING_SEED = 42
+
+# Mesma ordem de HubFolioPredictor.features
+TRAINING_FEATURES = [
+    'projetos_min', 'habilidades_min',
+    'kw_contexto', 'kw_processo', 'kw_resultado',
+    'consistencia_visual_score',
+    'bio', 'contatos'
+]
+TARGET = 'indice_qualidade'
+
+# Estimadores aceitos na busca (os mesmos comparados no notebook ML_HubFolio)
+ESTIMATORS = {
+    'LinearRegression': LinearRegression,
+    'DecisionTreeRegressor': DecisionTreeRegressor,
+    'KNeighborsRegressor': KNeighborsRegressor,
+}
+
+DEFAULT_SEARCH_SPACE = {
+    'LinearRegression': {},
+    'DecisionTreeRegressor': {
+        'max_depth': [2, 3, 4, 5],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+    },
+    'KNeighborsRegressor': {
+        'n_neighbors': [3, 5, 7, 9, 11],
+        'weights': ['uniform', 'distance'],
+    },
+}
+
+POSTGRES_TRAINING_QUERY = f"""
+SELECT {', '.join(f'p.{feature}' for feature in TRAINING_FEATURES)}, m.{TARGET}
+FROM portfolios p
+JOIN portfolio_metrics m ON m.portfolio_id = p.portfolio_id
+ORDER BY p.portfolio_id
+"""
+
+# Jobs deste processo (mais recentes por último)
+_jobs: "OrderedDict[str, TrainingJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+MAX_TRACKED_JOBS = 50
+
+
+class TrainingJobError(Exception):
+    """Job de treino não pode ser iniciado"""
+
+
+# ====================================================================
+# DADOS DE TREINO (com cache de features e folds)
+# ====================================================================
+
+def _cache_path(name: str) -> str:
+    return os.path.join(TRAINING_CACHE_DIR, name)
+
+
+def _save_array(name: str, array: np.ndarray):
+    """Grava o .npy de forma atômica (leitores nunca veem um arquivo pela metade)"""
+    path = _cache_path(name)
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _prune_cache():
+    """Mantém só os arquivos das TRAINING_CACHE_DATASETS impressões digitais mais recentes"""
+    entries = {}
+    for name in os.listdir(TRAINING_CACHE_DIR):
+        if name.endswith('.npy'):
+            fingerprint = name.split('_', 1)[0]
+            mtime = os.path.getmtime(_cache_path(name))
+            entries[fingerprint] = max(entries.get(fingerprint, 0), mtime)
+    keep = set(sorted(entries, key=entries.get, reverse=True)[:TRAINING_CACHE_DATASETS])
+    for name in os.listdir(TRAINING_CACHE_DIR):
+        if name.endswith('.npy') and name.split('_', 1)[0] not in keep:
+            os.remove(_cache_path(name))
+
+
+def _postgres_fingerprint(pg_client) -> str:
+    """Impressão digital dos dados de treino no PostgreSQL sem ler as linhas"""
+    row = pg_client.execute_query(
+        """
+        SELECT COUNT(*) AS total, COALESCE(MAX(p.portfolio_id), 0) AS max_id,
+               MAX(GREATEST(p.updated_at, m.calculated_at)) AS last_change
+        FROM portfolios p
+        JOIN portfolio_metrics m ON m.portfolio_id = p.portfolio_id
+        """
+    )[0]
+    key = f"postgres:{row['total']}:{row['max_id']}:{row['last_change']}"
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _read_postgres(pg_client) -> Tuple[np.ndarray, np.ndarray]:
+    """Features e IQ de todos os portfólios (cursor do lado do servidor, em lotes)"""
+    conn = pg_client.get_connection()
+    try:
+        chunks = [
+            np.asarray(rows, dtype=np.float64)
+            for rows in pg_client.iter_batches(conn, POSTGRES_TRAINING_QUERY, cursor_name='training_data')
+        ]
+    finally:
+        conn.close()
+    if not chunks:
+        return np.empty((0, len(TRAINING_FEATURES))), np.empty(0)
+    data = np.concatenate(chunks)
+    return np.ascontiguousarray(data[:, :-1]), np.ascontiguousarray(data[:, -1])
+
+
+def _read_minio(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Features do portfolios.json e IQ pelas mesmas fórmulas da função SQL"""
+    df = pd.DataFrame([flatten_record(record) for record in loads(data)])
+    y = calculate_portfolio_metrics(df)[TARGET]
+    return df[TRAINING_FEATURES].to_numpy(dtype=np.float64), np.asarray(y, dtype=np.float64)
+
+
+def load_training_data(
+    source: str,
+    pg_client=None,
+    minio_client=None,
+    object_key: str = TRAINING_MINIO_KEY
+) -> Dict:
+    """
+    Carrega (ou reaproveita do cache) a matriz de features e o IQ
+
+    Returns:
+        Dicionário com fingerprint, rows, cached e os caminhos X_path/y_path
+    """
+    os.makedirs(TRAINING_CACHE_DIR, exist_ok=True)
+    if source == 'postgres':
+        fingerprint = _postgres_fingerprint(pg_client)
+        raw = None
+    else:
+        raw = minio_client.get_object_bytes(object_key)  # Passa pelo cache local de objetos
+        fingerprint = hashlib.sha256(raw).hexdigest()[:16]
+
+    x_name, y_name = f"{fingerprint}_X.npy", f"{fingerprint}_y.npy"
+    cached = os.path.exists(_cache_path(x_name)) and os.path.exists(_cache_path(y_name))
+    if cached:
+        os.utime(_cache_path(x_name))
+    else:
+        X, y = _read_postgres(pg_client) if source == 'postgres' else _read_minio(raw)
+        _save_array(x_name, X)
+        _save_array(y_name, y)
+        _prune_cache()
+
+    rows = int(np.load(_cache_path(y_name), mmap_mode='r').shape[0])
+    return {
+        "fingerprint": fingerprint,
+        "rows": rows,
+        "cached": cached,
+        "X_path": _cache_path(x_name),
+        "y_path": _cache_path(y_name),
+    }
+
+
+def fold_assignments(fingerprint: str, rows: int, folds: int, seed: int = TRAINING_SEED) -> Dict:
+    """
+    Fold de cada linha (KFold embaralhado), em cache por dados/folds/seed
+
+    Returns:
+        Dicionário com cached e folds_path (array int8 com o fold de cada linha)
+    """
+    name = f"{fingerprint}_folds_k{folds}_s{seed}.npy"
+    cached = os.path.exists(_cache_path(name))
+    if not cached:
+        assignment = np.empty(rows, dtype=np.int8)
+        splitter = KFold(n_splits=folds, shuffle=True, random_state=seed)
+        for fold, (_, test_idx) in enumerate(splitter.split(np.empty(rows))):
+            assignment[test_idx] = fold
+        _save_array(name, assignment)
+    return {"cached": cached, "folds_path": _cache_path(name)}
+
+
+# ====================================================================
+# WORKERS (executam em processos separados)
+# ====================================================================
+
+_worker_data: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+
+def _open_data(X_path: str, y_path: str, folds_path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return (
+        np.load(X_path, mmap_mode='r'),
+        np.load(y_path, mmap_mode='r'),
+        np.load(folds_path, mmap_mode='r'),
+    )
+
+
+def _init_worker(X_path: str, y_path: str, folds_path: str):
+    """Abre os arrays do cache uma vez por processo do pool (mmap: páginas compartilhadas)"""
+    global _worker_data
+    _worker_data = _open_data(X_path, y_path, folds_path)
+
+
+def build_estimator(estimator: str, params: Dict):
+    model = ESTIMATORS[estimator](**params)
+    if 'random_state' in model.get_params():
+        model.set_params(random_state=TRAINING_SEED)
+    return model
+
+
+def _evaluate(data: Tuple[np.ndarray, np.ndarray, np.ndarray], estimator: str, params: Dict) -> Dict:
+    """
+    Validação cruzada de uma combinação e re-treino com todos os dados
+
+    Returns:
+        Métricas médias dos folds (RMSE, MAE, R²) e o modelo final serializado
+    """
+    X, y, folds = data
+    started = time.perf_counter()
+    rmse, mae, r2 = [], [], []
+    for fold in range(int(folds.max()) + 1):
+        test = folds == fold
+        model = build_estimator(estimator, params).fit(X[~test], y[~test])
+        y_pred = model.predict(X[test])
+        rmse.append(np.sqrt(mean_squared_error(y[test], y_pred)))
+        mae.append(mean_absolute_error(y[test], y_pred))
+        r2.append(r2_score(y[test], y_pred))
+    # Modelo final com os nomes das colunas, como o predictor chama predict() (DataFrame)
+    final = build_estimator(estimator, params).fit(pd.DataFrame(X, columns=TRAINING_FEATURES), y)
+    return {
+        "estimator": estimator,
+        "params": params,
+        "cv_rmse": float(np.mean(rmse)),
+        "cv_rmse_std": float(np.std(rmse)),
+        "cv_mae": float(np.mean(mae)),
+        "cv_r2": float(np.mean(r2)),
+        "fit_seconds": round(time.perf_counter() - started, 4),
+        "model_bytes": pickle.dumps(final),
+    }
+
+
+def _evaluate_trial(estimator: str, params: Dict) -> Dict:
+    """Ponto de entrada do pool de processos"""
+    return _evaluate(_worker_data, estimator, params)
+
+
+# ====================================================================
+# JOB
+# ====================================================================
+
+def build_trials(search_space: Dict[str, Dict[str, list]], n_iter: Optional[int] = None,
+                 seed: int = TRAINING_SEED) -> List[Tuple[str, Dict]]:
+    """Combinações (estimador, parâmetros) da grade; n_iter sorteia um subconjunto"""
+    trials = []
+    for estimator, grid in search_space.items():
+        if estimator not in ESTIMATORS:
+            raise TrainingJobError(
+                f"Estimador '{estimator}' não suportado. Opções: {list(ESTIMATORS)}"
+            )
+        try:
+            combinations = list(ParameterGrid(grid))
+        except (TypeError, ValueError) as e:
+            raise TrainingJobError(f"Grade inválida para {estimator}: {e}")
+        for params in combinations:
+            try:
+                ESTIMATORS[estimator]().set_params(**params)
+            except ValueError as e:
+                raise TrainingJobError(f"Parâmetro inválido para {estimator}: {e}")
+            trials.append((estimator, params))
+    if not trials:
+        raise TrainingJobError("Espaço de busca vazio")
+    if n_iter and n_iter < len(trials):
+        rng = np.random.default_rng(seed)
+        trials = [trials[i] for i in sorted(rng.choice(len(trials), size=n_iter, replace=False))]
+    return trials
+
+
+class TrainingJob:
+    """Busca de hiperparâmetros com validação cruzada e registro no MLflow"""
+
+    def __init__(
+        self,
+        mlflow_client=None,
+        pg_client=None,
+        minio_client=None,
+        source: str = TRAINING_SOURCE,
+        object_key: str = TRAINING_MINIO_KEY,
+        search_space: Optional[Dict[str, Dict[str, list]]] = None,
+        n_iter: Optional[int] = None,
+        folds: int = TRAINING_CV_FOLDS,
+        n_jobs: int = TRAINING_N_JOBS,
+        register: bool = True,
+        model_name: str = MODEL_REGISTRY_NAME,
+        stage: str = TRAINING_STAGE
+    ):
+        if source not in TRAINING_SOURCES:
+            raise TrainingJobError(f"source deve ser um de {list(TRAINING_SOURCES)}")
+        if source == 'postgres' and pg_client is None:
+            raise TrainingJobError("PostgreSQL não está disponível")
+        if source == 'minio' and minio_client is None:
+            raise TrainingJobError("MinIO não está disponível")
+        if folds < 2:
+            raise TrainingJobError("folds deve ser pelo menos 2")
+
+        self.mlflow_client = mlflow_client
+        self.pg_client = pg_client
+        self.minio_client = minio_client
+        self.source = source
+        self.object_key = object_key
+        self.search_space = search_space or DEFAULT_SEARCH_SPACE
+        self.trials = build_trials(self.search_space, n_iter)
+        self.folds = folds
+        self.n_jobs = max(1, n_jobs)
+        self.register = register
+        self.model_name = model_name
+        self.stage = stage
+
+        self.job_id = uuid.uuid4().hex[:16]
+        self.status = 'pending'
+        self.phase = None
+        self.error: Optional[str] = None
+        self.data: Dict = {}
+        self.results: List[Dict] = []
+        self.best: Optional[Dict] = None
+        self.registered_version: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        with _jobs_lock:
+            _jobs[self.job_id] = self
+            while len(_jobs) > MAX_TRACKED_JOBS:
+                _jobs.popitem(last=False)
+
+    def run(self) -> Dict:
+        """Carrega os dados, executa os trials e registra o melhor modelo"""
+        with _jobs_lock:
+            running = [job.job_id for job in _jobs.values() if job.status == 'running']
+            if running:
+                self.status = 'failed'
+                self.error = f"Treino {running[0]} já está em execução"
+                raise TrainingJobError(self.error)
+            self.status = 'running'
+        self.started_at = time.time()
+
+        try:
+            self.phase = 'loading_data'
+            self.data = load_training_data(self.source, self.pg_client, self.minio_client, self.object_key)
+            if self.data['rows'] < self.folds:
+                raise TrainingJobError(
+                    f"Dados insuficientes: {self.data['rows']} portfólios para {self.folds} folds"
+                )
+            folds = fold_assignments(self.data['fingerprint'], self.data['rows'], self.folds)
+            self.data['folds_cached'] = folds['cached']
+            paths = (self.data['X_path'], self.data['y_path'], folds['folds_path'])
+
+            logger.info(
+                f"🚀 Treino {self.job_id}: {len(self.trials)} trials x {self.folds} folds sobre "
+                f"{self.data['rows']} portfólios ({self.source}, n_jobs={self.n_jobs}, "
+                f"features em cache: {self.data['cached']})"
+            )
+
+            self.phase = 'searching'
+            self._search(paths)
+
+            self.best = min(self.results, key=lambda trial: trial['cv_rmse'])
+            if self.register and self.best.get('run_id'):
+                self.phase = 'registering'
+                self.registered_version = self.mlflow_client.register_model_version(
+                    self.model_name,
+                    self.best['run_id'],
+                    stage=self.stage,
+                    description=(
+                        f"Treino {self.job_id}: {self.best['estimator']} {self.best['params']} "
+                        f"(RMSE CV {self.best['cv_rmse']:.4f})"
+                    )
+                )
+
+            self.status = 'completed'
+            logger.info(
+                f"✅ Treino {self.job_id} concluído: melhor {self.best['estimator']} {self.best['params']} "
+                f"RMSE CV {self.best['cv_rmse']:.4f} (versão registrada: {self.registered_version})"
+            )
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+            logger.error(f"❌ Erro no treino {self.job_id}: {e}")
+            raise
+        finally:
+            self.phase = None
+            self.finished_at = time.time()
+        return self.progress()
+
+    def _search(self, paths: Tuple[str, str, str]):
+        """Avalia os trials (no pool quando n_jobs > 1), registrando cada um assim que termina"""
+        if self.n_jobs == 1:
+            data = _open_data(*paths)
+            for estimator, params in self.trials:
+                self._record(_evaluate(data, estimator, params))
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=min(self.n_jobs, len(self.trials)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=paths
+        ) as pool:
+            futures = [pool.submit(_evaluate_trial, estimator, params) for estimator, params in self.trials]
+            try:
+                for future in as_completed(futures):
+                    self._record(future.result())
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _record(self, result: Dict):
+        """Registra o trial no MLflow e atualiza o progresso"""
+        model_bytes = result.pop('model_bytes')
+        trial = len(self.results) + 1
+        result['trial'] = trial
+        result['run_id'] = None
+        if self.mlflow_client is not None:
+            result['run_id'] = self.mlflow_client.log_model(
+                pickle.loads(model_bytes),
+                model_name=self.model_name,
+                metrics={
+                    'cv_rmse': result['cv_rmse'],
+                    'cv_rmse_std': result['cv_rmse_std'],
+                    'cv_mae': result['cv_mae'],
+                    'cv_r2': result['cv_r2'],
+                },
+                parameters={
+                    **result['params'],
+                    'estimator': result['estimator'],
+                    'cv_folds': self.folds,
+                    'training_rows': self.data['rows'],
+                    'features_count': len(TRAINING_FEATURES),
+                },
+                tags={
+                    'training_job_id': self.job_id,
+                    'trial': trial,
+                    'data_source': self.source,
+                    'data_fingerprint': self.data['fingerprint'],
+                }
+            )
+        self.results.append(result)
+        logger.info(
+            f"📦 Treino {self.job_id}: trial {trial}/{len(self.trials)} {result['estimator']} "
+            f"{result['params']} RMSE CV {result['cv_rmse']:.4f}"
+        )
+
+    def progress(self, include_trials: bool = False) -> Dict:
+        """Estado do job: fase, trials concluídos, melhor até agora e estimativa de término"""
+        done = len(self.results)
+        total = len(self.trials)
+        best = self.best or (min(self.results, key=lambda trial: trial['cv_rmse']) if self.results else None)
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        searching = self.status == 'running' and self.phase == 'searching' and done
+        info = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "phase": self.phase,
+            "error": self.error,
+            "source": self.source,
+            "model_name": self.model_name,
+            "folds": self.folds,
+            "n_jobs": self.n_jobs,
+            "data": {key: value for key, value in self.data.items() if not key.endswith('_path')},
+            "trials_total": total,
+            "trials_done": done,
+            "progress_percent": round(100 * done / total, 2),
+            "elapsed_seconds": round(elapsed, 2),
+            "eta_seconds": round(elapsed / done * (total - done), 2) if searching else None,
+            "best": best,
+            "registered_version": self.registered_version,
+            "stage": self.stage if self.register else None,
+        }
+        if include_trials:
+            info["trials"] = sorted(self.results, key=lambda trial: trial['cv_rmse'])
+        return info
+
+
+def get_training_job(job_id: str) -> Optional[TrainingJob]:
+    return _jobs.get(job_id)
+
+
+def running_training_job() -> Optional[TrainingJob]:
+    with _jobs_lock:
+        return next((job for job in _jobs.values() if job.status == 'running'), None)
+
+
+def list_training_jobs(limit: int = 20) -> List[Dict]:
+    """Jobs de treino deste processo, mais recentes primeiro"""
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+    return [job.progress() for job in reversed(jobs[-limit:])]
+
+
+def main():
+    """Executa o treino pela linha de comando"""
+    parser = argparse.ArgumentParser(description="Treino e busca de hiperparâmetros do modelo HubFólio")
+    parser.add_argument("--source", choices=TRAINING_SOURCES, default=TRAINING_SOURCE, help="Origem dos dados")
+    parser.add_argument("--object-key", default=TRAINING_MINIO_KEY, help="Objeto do MinIO (--source minio)")
+    parser.add_argument("--folds", type=int, default=TRAINING_CV_FOLDS, help="Folds da validação cruzada")
+    parser.add_argument("--n-jobs", type=int, default=TRAINING_N_JOBS, help="Processos da busca (1 = sem pool)")
+    parser.add_argument("--n-iter", type=int, default=None, help="Sorteia n combinações da grade (padrão: todas)")
+    parser.add_argument("--search-space", default=None, help="Arquivo JSON {estimador: {parâmetro: [valores]}}")
+    parser.add_argument("--stage", default=TRAINING_STAGE, help="Stage da versão registrada")
+    parser.add_argument("--no-register", action="store_true", help="Só registra os trials, sem nova versão")
+    parser.add_argument("--no-mlflow", action="store_true", help="Não registra nada no MLflow")
+    args = parser.parse_args()
+
+    search_space = None
+    if args.search_space:
+        with open(args.search_space, 'rb') as f:
+            search_space = loads(f.read())
+
+    pg_client = minio_client = mlflow_client = None
+    if args.source == 'postgres':
+        from postgres_client import PostgreSQLClient
+        pg_client = PostgreSQLClient()
+    else:
+        from minio_client import MinIOClient
+        minio_client = MinIOClient()
+    if not args.no_mlflow:
+        from mlflow_client import MLflowClient
+        mlflow_client = MLflowClient()
+
+    try:
+        job = TrainingJob(
+            mlflow_client, pg_client, minio_client,
+            source=args.source,
+            object_key=args.object_key,
+            search_space=search_space,
+            n_iter=args.n_iter,
+            folds=args.folds,
+            n_jobs=args.n_jobs,
+            register=not args.no_register and not args.no_mlflow,
+            stage=args.stage
+        )
+        result = job.run()
+    except TrainingJobError as e:
+        print(f"❌ {e}")
+        return 1
+
+    best = result['best']
+    print(f"\n{'=' * 60}")
+    print(f"Job: {job.job_id}")
+    print(f"Portfólios: {result['data']['rows']} (features em cache: {result['data']['cached']})")
+    print(f"Trials: {result['trials_done']} em {result['elapsed_seconds']}s")
+    print(f"Melhor: {best['estimator']} {best['params']}")
+    print(f"RMSE CV: {best['cv_rmse']:.4f} (± {best['cv_rmse_std']:.4f}), R² CV: {best['cv_r2']:.4f}")
+    print(f"Versão registrada: {result['registered_version']}")
+    print(f"{'=' * 60}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+Cache local em disco (read-through) dos objetos do MinIO
+Cada objeto baixado fica em OBJECT_CACHE_DIR com seu ETag. Nas leituras
+seguintes o MinIOClient faz um GET condicional (If-None-Match): se o objeto
+não mudou, o MinIO responde 304 sem corpo e o conteúdo vem do disco. Objetos
+a partir de OBJECT_CACHE_MMAP_MIN_BYTES são devolvidos como memoryview de um
+mmap (sem cópia para a memória do processo). O total em disco é limitado a
+OBJECT_CACHE_MAX_BYTES, com despejo do menos usado (LRU).
+
+Layout: <sha256(bucket/key)>.data (bytes como estão no MinIO, inclusive
+comprimidos) + <sha256>.json (bucket, key, ETag, tamanho, Content-Encoding).
+O índice é reconstruído a partir dos .json na inicialização.
+"""
+import os
+import json
+import mmap
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+from botocore.exceptions import ClientError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+Buffer = Union[bytes, memoryview]
+
+
+class ObjectCache:
+    """
+    Cache LRU em disco de objetos S3, validado por ETag
+
+    Desativado por padrão (OBJECT_CACHE_ENABLED=false). Seguro para uso por
+    várias threads; downloads simultâneos do mesmo objeto gravam arquivos
+    temporários distintos e o último os.replace vence.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        mmap_min_bytes: Optional[int] = None
+    ):
+        self.enabled = os.getenv('OBJECT_CACHE_ENABLED', 'false').lower() == 'true'
+        self.cache_dir = cache_dir or os.getenv('OBJECT_CACHE_DIR', '/app/object_cache')
+        self.max_bytes = max_bytes or int(os.getenv('OBJECT_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+        self.mmap_min_bytes = (
+            mmap_min_bytes if mmap_min_bytes is not None
+            else int(os.getenv('OBJECT_CACHE_MMAP_MIN_BYTES', 8 * 1024 * 1024))
+        )
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()  # digest -> metadados, em ordem de uso
+        self._size = 0
+
+        # Métricas
+        self.hits = 0              # 304: conteúdo servido do disco
+        self.misses = 0            # Objeto fora do cache
+        self.refreshes = 0         # ETag mudou: objeto baixado de novo
+        self.evictions = 0
+        self.bytes_from_cache = 0
+        self.bytes_downloaded = 0
+
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_index()
+
+        logger.info(
+            f"ObjectCache initialized - Enabled: {self.enabled}, dir: {self.cache_dir}, "
+            f"max_bytes: {self.max_bytes}, entries: {len(self._entries)}"
+        )
+
+    # ----------------------------------------------------------------
+    # Leitura
+    # ----------------------------------------------------------------
+
+    def get(self, s3_client, bucket: str, key: str) -> Tuple[Buffer, Optional[str]]:
+        """
+        Lê um objeto passando pelo cache
+
+        Returns:
+            (conteúdo como gravado no MinIO, Content-Encoding do objeto)
+        """
+        digest = self._digest(bucket, key)
+        with self._lock:
+            entry = self._entries.get(digest)
+
+        params = {'Bucket': bucket, 'Key': key}
+        if entry:
+            params['IfNoneMatch'] = entry['etag']
+        try:
+            response = s3_client.get_object(**params)
+        except ClientError as e:
+            if entry and self._not_modified(e):
+                data = self._read(digest, entry)
+                if data is not None:
+                    with self._lock:
+                        self.hits += 1
+                        self.bytes_from_cache += entry['size']
+                        if digest in self._entries:
+                            self._entries.move_to_end(digest)
+                    self._touch(digest)
+                    return data, entry.get('content_encoding')
+                # Arquivo sumiu do disco: baixa de novo sem condição
+                self._remove(digest)
+                return self.get(s3_client, bucket, key)
+            raise
+
+        with self._lock:
+            if entry:
+                self.refreshes += 1
+            else:
+                self.misses += 1
+        return self._store(digest, bucket, key, response)
+
+    @staticmethod
+    def _not_modified(error: ClientError) -> bool:
+        code = str(error.response.get('Error', {}).get('Code', ''))
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        return code in ('304', 'NotModified') or status == 304
+
+    def _read(self, digest: str, entry: Dict) -> Optional[Buffer]:
+        path = self._data_path(digest)
+        try:
+            with open(path, 'rb') as f:
+                if entry['size'] >= self.mmap_min_bytes and entry['size'] > 0:
+                    # O mapeamento continua válido mesmo se o arquivo for substituído/removido
+                    return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # ----------------------------------------------------------------
+    # Escrita e despejo
+    # ----------------------------------------------------------------
+
+    def _store(self, digest: str, bucket: str, key: str, response: Dict) -> Tuple[Buffer, Optional[str]]:
+        """Grava o corpo da resposta no disco em pedaços (memória constante) e registra a entrada"""
+        encoding = response.get('ContentEncoding')
+        size = response.get('ContentLength', 0)
+        if size > self.max_bytes:
+            data = response['Body'].read()  # Maior que o cache inteiro: não armazena
+            with self._lock:
+                self.bytes_downloaded += len(data)
+            return data, encoding
+
+        tmp_path = os.path.join(self.cache_dir, f".{digest}.{uuid.uuid4().hex}.tmp")
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in response['Body'].iter_chunks(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, self._data_path(digest))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        entry = {
+            'bucket': bucket,
+            'key': key,
+            'etag': response['ETag'],
+            'size': size,
+            'content_encoding': encoding,
+            'cached_at': time.time(),
+        }
+        with open(self._meta_path(digest), 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+
+        with self._lock:
+            previous = self._entries.pop(digest, None)
+            if previous:
+                self._size -= previous['size']
+            self._entries[digest] = entry
+            self._size += size
+            self.bytes_downloaded += size
+            evicted = self._evict()
+        for old in evicted:
+            self._delete_files(old)
+
+        data = self._read(digest, entry)
+        if data is None:  # Despejado logo em seguida por outra thread
+            raise RuntimeError(f"Objeto {bucket}/{key} removido do cache durante a leitura")
+        return data, encoding
+
+    def _evict(self) -> list:
+        """Remove do índice as entradas menos usadas até caber no limite (chamar com o lock)"""
+        evicted = []
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            digest, entry = self._entries.popitem(last=False)
+            self._size -= entry['size']
+            self.evictions += 1
+            evicted.append(digest)
+        return evicted
+
+    def invalidate(self, bucket: str, key: str):
+        """Descarta a cópia local de um objeto (ex: após delete_file)"""
+        self._remove(self._digest(bucket, key))
+
+    def _remove(self, digest: str):
+        with self._lock:
+            entry = self._entries.pop(digest, None)
+            if entry:
+                self._size -= entry['size']
+        if entry:
+            self._delete_files(digest)
+
+    def clear(self):
+        """Esvazia o cache"""
+        with self._lock:
+            digests = list(self._entries)
+            self._entries.clear()
+            self._size = 0
+        for digest in digests:
+            self._delete_files(digest)
+
+    # ----------------------------------------------------------------
+    # Arquivos e índice
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def _digest(bucket: str, key: str) -> str:
+        return hashlib.sha256(f"{bucket}/{key}".encode('utf-8')).hexdigest()
+
+    def _data_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.data")
+
+    def _meta_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _delete_files(self, digest: str):
+        for path in (self._data_path(digest), self._meta_path(digest)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _touch(self, digest: str):
+        """Atualiza o mtime do .json (ordem LRU preservada entre reinícios)"""
+        try:
+            os.utime(self._meta_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self):
+        """Reconstrói o índice a partir dos .json, do menos para o mais recentemente usado"""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp'):
+                os.remove(path)  # Download interrompido
+                continue
+            if not name.endswith('.json'):
+                continue
+            digest = name[:-len('.json')]
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                if os.path.getsize(self._data_path(digest)) != entry['size']:
+                    raise ValueError("tamanho divergente")
+            except (OSError, ValueError, KeyError):
+                self._delete_files(digest)
+                continue
+            found.append((os.path.getmtime(path), digest, entry))
+
+        for _, digest, entry in sorted(found):
+            self._entries[digest] = entry
+            self._size += entry['size']
+        for digest in self._evict():
+            self._delete_files(digest)
+
+    def stats(self) -> Dict:
+        """Ocupação do cache e quanto tráfego foi evitado"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.refreshes
+            return {
+                "enabled": self.enabled,
+                "cache_dir": self.cache_dir,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "mmap_min_bytes": self.mmap_min_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "bytes_from_cache": self.bytes_from_cache,
+                "bytes_downloaded": self.bytes_downloaded,
+            }
+
+
+# Instância compartilhada pelos MinIOClient do processo (API e ETL)
+object_cache = ObjectCache()
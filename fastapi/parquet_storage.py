@@ -0,0 +1,247 @@
+"""
+Armazenamento colunar (Parquet/Arrow) dos portfólios HubFólio
+Define o schema dos datasets Parquet e converte o JSON de ingestão para Arrow
+"""
+import io
+import json
+import time
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Tuple, Any
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+PARQUET_PREFIX = "hubfolio/parquet/portfolios/"
+PARTITION_COLUMN = "ingest_date"
+
+# Schema achatado dos portfólios (mesmos nomes de coluna da tabela portfolios)
+PORTFOLIO_SCHEMA = pa.schema([
+    pa.field('user_id', pa.int64(), nullable=False),
+    pa.field('nome', pa.string(), nullable=False),
+    pa.field('bio', pa.bool_(), nullable=False),
+    pa.field('projetos_min', pa.int32(), nullable=False),
+    pa.field('habilidades_min', pa.int32(), nullable=False),
+    pa.field('contatos', pa.bool_(), nullable=False),
+    pa.field('kw_contexto', pa.int32(), nullable=False),
+    pa.field('kw_processo', pa.int32(), nullable=False),
+    pa.field('kw_resultado', pa.int32(), nullable=False),
+    pa.field('consistencia_visual_score', pa.float64(), nullable=False),
+])
+
+# Arquivo das partições antigas de predictions (retenção, ver partition_manager.py)
+PREDICTIONS_ARCHIVE_PREFIX = "hubfolio/parquet/predictions_archive/"
+PREDICTIONS_SCHEMA = pa.schema([
+    pa.field('prediction_id', pa.int32(), nullable=False),
+    pa.field('portfolio_id', pa.int32(), nullable=False),
+    pa.field('predicted_iq', pa.float64(), nullable=False),
+    pa.field('model_name', pa.string(), nullable=False),
+    pa.field('model_version', pa.string()),
+    pa.field('classification', pa.string()),
+    pa.field('feedback_suggestions', pa.list_(pa.string())),
+    pa.field('feedback_mask', pa.int32()),
+    pa.field('predicted_at', pa.timestamp('us'), nullable=False),
+])
+
+# Caminho de cada coluna no JSON aninhado do hubfolio_mock_data.json
+JSON_PATHS = {
+    'user_id': (None, 'user_id'),
+    'nome': (None, 'nome'),
+    'bio': ('secoes_preenchidas', 'bio'),
+    'projetos_min': ('secoes_preenchidas', 'projetos_min'),
+    'habilidades_min': ('secoes_preenchidas', 'habilidades_min'),
+    'contatos': ('secoes_preenchidas', 'contatos'),
+    'kw_contexto': ('palavras_chave_clareza', 'contexto'),
+    'kw_processo': ('palavras_chave_clareza', 'processo'),
+    'kw_resultado': ('palavras_chave_clareza', 'resultado'),
+    'consistencia_visual_score': (None, 'consistencia_visual_score'),
+}
+
+# Colunas lidas pelo ETL: user_id/nome para a tabela users e as features da
+# tabela portfolios. A partição ingest_date e colunas que o schema ganhar
+# depois não são lidas
+ETL_COLUMNS = [
+    'user_id', 'nome', 'bio', 'projetos_min', 'habilidades_min', 'contatos',
+    'kw_contexto', 'kw_processo', 'kw_resultado', 'consistencia_visual_score',
+]
+
+
+def flatten_record(record: Dict) -> Dict:
+    """Converte um portfólio do JSON aninhado para as colunas achatadas do schema"""
+    return {
+        name: (record[section][key] if section else record[key])
+        for name, (section, key) in JSON_PATHS.items()
+    }
+
+
+class SchemaValidationError(ValueError):
+    """Dados não respeitam o PORTFOLIO_SCHEMA"""
+
+
+# Tipos aceitos em um registro JSON (bool não conta como inteiro)
+_COUNT_COLUMNS = ('projetos_min', 'habilidades_min', 'kw_contexto', 'kw_processo', 'kw_resultado')
+_INT32_MAX = 2 ** 31 - 1
+
+
+def validate_record(record: Any) -> Dict:
+    """
+    Valida um único portfólio no formato aninhado e devolve as colunas achatadas
+
+    Mesmas regras de records_to_table/validate_table, aplicadas registro a
+    registro (ingestão em streaming, onde um registro ruim não descarta o lote).
+    """
+    if not isinstance(record, dict):
+        raise SchemaValidationError("Registro não é um objeto JSON")
+    try:
+        row = flatten_record(record)
+    except (KeyError, TypeError) as e:
+        raise SchemaValidationError(f"Registro fora do schema: campo ausente {e}")
+
+    for name, value in row.items():
+        if value is None:
+            raise SchemaValidationError(f"Campo '{name}' nulo")
+    if not isinstance(row['user_id'], int) or isinstance(row['user_id'], bool):
+        raise SchemaValidationError("user_id deve ser inteiro")
+    if not isinstance(row['nome'], str):
+        raise SchemaValidationError("nome deve ser texto")
+    for name in ('bio', 'contatos'):
+        if not isinstance(row[name], bool):
+            raise SchemaValidationError(f"{name} deve ser booleano")
+    for name in _COUNT_COLUMNS:
+        value = row[name]
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise SchemaValidationError(f"{name} deve ser inteiro")
+        if not 0 <= value <= _INT32_MAX:
+            raise SchemaValidationError(f"{name} fora do intervalo 0-{_INT32_MAX}")
+    visual = row['consistencia_visual_score']
+    if not isinstance(visual, (int, float)) or isinstance(visual, bool):
+        raise SchemaValidationError("consistencia_visual_score deve ser numérico")
+    if not 0 <= visual <= 100:
+        raise SchemaValidationError("consistencia_visual_score fora do intervalo 0-100")
+    return row
+
+
+def records_to_table(records: List[Dict]) -> pa.Table:
+    """
+    Converte registros no formato do hubfolio_mock_data.json em tabela Arrow
+
+    O schema é imposto: campos ausentes, nulos, com tipo incompatível ou
+    valores negativos/fora de 0-100 geram SchemaValidationError.
+
+    Args:
+        records: Lista de portfólios no formato aninhado
+
+    Returns:
+        Tabela Arrow com o PORTFOLIO_SCHEMA
+    """
+    columns: Dict[str, List[Any]] = {name: [] for name in JSON_PATHS}
+    try:
+        for record in records:
+            for name, (section, key) in JSON_PATHS.items():
+                columns[name].append(record[section][key] if section else record[key])
+    except (KeyError, TypeError) as e:
+        raise SchemaValidationError(f"Registro fora do schema: campo ausente {e}")
+
+    try:
+        table = pa.Table.from_pydict(columns, schema=PORTFOLIO_SCHEMA)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise SchemaValidationError(f"Tipo inválido: {e}")
+
+    return validate_table(table)
+
+
+def validate_table(table: pa.Table) -> pa.Table:
+    """
+    Valida tabela Arrow contra o schema e as constraints da tabela portfolios
+
+    Returns:
+        Tabela convertida para o PORTFOLIO_SCHEMA
+    """
+    missing = [name for name in PORTFOLIO_SCHEMA.names if name not in table.column_names]
+    if missing:
+        raise SchemaValidationError(f"Colunas ausentes: {missing}")
+
+    table = table.select(PORTFOLIO_SCHEMA.names)
+    for name in PORTFOLIO_SCHEMA.names:
+        if table.column(name).null_count:
+            raise SchemaValidationError(f"Coluna '{name}' contém nulos")
+
+    try:
+        table = table.cast(PORTFOLIO_SCHEMA)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise SchemaValidationError(f"Tipo inválido: {e}")
+
+    for name in ('projetos_min', 'habilidades_min', 'kw_contexto', 'kw_processo', 'kw_resultado'):
+        if table.num_rows and pc.min(table.column(name)).as_py() < 0:
+            raise SchemaValidationError(f"Coluna '{name}' contém valores negativos")
+
+    visual = table.column('consistencia_visual_score')
+    if table.num_rows and (pc.min(visual).as_py() < 0 or pc.max(visual).as_py() > 100):
+        raise SchemaValidationError("consistencia_visual_score fora do intervalo 0-100")
+
+    return table
+
+
+def table_to_parquet_bytes(table: pa.Table, row_group_size: int = 128 * 1024) -> bytes:
+    """Serializa tabela em Parquet (snappy, estatísticas por row group para pushdown)"""
+    buffer = io.BytesIO()
+    pq.write_table(
+        table,
+        buffer,
+        compression='snappy',
+        row_group_size=row_group_size,
+        write_statistics=True
+    )
+    return buffer.getvalue()
+
+
+def partition_path(prefix: str = PARQUET_PREFIX, ingest_date: Optional[date] = None) -> str:
+    """Caminho da partição no formato hive (ex: .../ingest_date=2025-01-31/)"""
+    ingest_date = ingest_date or date.today()
+    return f"{prefix}{PARTITION_COLUMN}={ingest_date.isoformat()}/"
+
+
+def compare_formats(json_bytes: bytes, parquet_bytes: bytes) -> Dict:
+    """
+    Compara tamanho e tempo de parse entre JSON e Parquet do mesmo dataset
+
+    Returns:
+        Dicionário com tamanhos (bytes) e tempos de parse (ms)
+    """
+    start = time.perf_counter()
+    json.loads(json_bytes)
+    json_parse = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pq.read_table(io.BytesIO(parquet_bytes))
+    parquet_parse = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pq.read_table(io.BytesIO(parquet_bytes), columns=['user_id', 'projetos_min'])
+    parquet_projection = time.perf_counter() - start
+
+    return {
+        "json_size_bytes": len(json_bytes),
+        "parquet_size_bytes": len(parquet_bytes),
+        "size_ratio": round(len(parquet_bytes) / len(json_bytes), 4) if json_bytes else None,
+        "json_parse_ms": round(json_parse * 1000, 3),
+        "parquet_parse_ms": round(parquet_parse * 1000, 3),
+        "parquet_projection_parse_ms": round(parquet_projection * 1000, 3),
+    }
+
+
+def parse_filters(filters: Optional[List[Tuple[str, str, Any]]]):
+    """
+    Converte filtros no formato [(coluna, operador, valor), ...] em expressão Arrow
+
+    Os filtros são combinados com AND e aplicados com pushdown: partições
+    (ingest_date) e row groups cujas estatísticas não atendem são ignorados.
+    """
+    if not filters:
+        return None
+    return pq.filters_to_expression([tuple(f) for f in filters])
@@ -0,0 +1,291 @@
+"""
+Manutenção das partições mensais da tabela predictions
+Cria partições futuras e aplica a retenção: partições antigas viram Parquet no
+MinIO (com resumo em predictions_monthly_rollup) e saem do PostgreSQL. Também
+remove os agregados por minuto/hora antigos de predictions_rollup.
+
+Uso:
+    python partition_manager.py --list
+    python partition_manager.py --retention-months 12
+"""
+import os
+import re
+import sys
+import logging
+import argparse
+from datetime import date
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from minio_client import MinIOClient
+from postgres_client import PostgreSQLClient
+from parquet_storage import PREDICTIONS_ARCHIVE_PREFIX, PREDICTIONS_SCHEMA
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = int(os.getenv('PREDICTIONS_PARTITION_MONTHS_AHEAD', 3))
+RETENTION_MONTHS = int(os.getenv('PREDICTIONS_RETENTION_MONTHS', 12))
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv('PARTITION_MAINTENANCE_INTERVAL_HOURS', 24))
+
+# Retenção dos agregados finos de predictions_rollup (os diários são mantidos)
+ROLLUP_RETENTION_DAYS = {
+    'minute': int(os.getenv('ROLLUP_MINUTE_RETENTION_DAYS', 7)),
+    'hour': int(os.getenv('ROLLUP_HOUR_RETENTION_DAYS', 90)),
+}
+
+PARTITION_NAME = re.compile(r'^predictions_(\d{4})_(\d{2})$')
+
+
+def month_start(value: date, months_back: int = 0) -> date:
+    """Primeiro dia do mês de value, recuado months_back meses"""
+    index = value.year * 12 + value.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class PredictionPartitionManager:
+    """Cria e arquiva partições mensais de predictions"""
+
+    def __init__(self, pg_client: PostgreSQLClient, minio_client: MinIOClient):
+        self.pg_client = pg_client
+        self.minio_client = minio_client
+
+    def ensure_future_partitions(self, months_ahead: int = PARTITION_MONTHS_AHEAD) -> int:
+        """
+        Cria as partições do mês atual até months_ahead meses à frente
+
+        Returns:
+            Quantidade de partições criadas
+        """
+        conn = self.pg_client.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT create_predictions_partitions(%s)", (months_ahead,))
+            created = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+        if created:
+            logger.info(f"📅 {created} partições de predictions criadas")
+        return created
+
+    def list_partitions(self) -> List[Dict]:
+        """Lista as partições de predictions com limites, linhas estimadas e tamanho"""
+        query = """
+        SELECT
+            c.relname AS partition,
+            pg_get_expr(c.relpartbound, c.oid) AS bounds,
+            c.reltuples::BIGINT AS estimated_rows,
+            pg_total_relation_size(c.oid) AS size_bytes
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'predictions'::regclass
+        ORDER BY c.relname
+        """
+        partitions = self.pg_client.execute_query(query)
+        for partition in partitions:
+            match = PARTITION_NAME.match(partition['partition'])
+            partition['month'] = (
+                date(int(match.group(1)), int(match.group(2)), 1).isoformat() if match else None
+            )
+        return partitions
+
+    def archive_old_partitions(
+        self,
+        retention_months: int = RETENTION_MONTHS,
+        today: Optional[date] = None
+    ) -> List[Dict]:
+        """
+        Arquiva as partições com mais de retention_months meses
+
+        Para cada partição: grava o resumo mensal, exporta as linhas para
+        Parquet no MinIO, confere a contagem e só então faz DETACH + DROP.
+        Se algo falhar a partição continua anexada e é tentada de novo na
+        próxima execução.
+
+        Returns:
+            Lista com o resultado de cada partição arquivada
+        """
+        if retention_months <= 0:
+            return []
+
+        cutoff = month_start(today or date.today(), retention_months)
+        archived = []
+        for partition in self.list_partitions():
+            if partition['month'] is None or date.fromisoformat(partition['month']) >= cutoff:
+                continue
+            try:
+                archived.append(self.archive_partition(partition['partition'], partition['month']))
+            except Exception as e:
+                logger.error(f"❌ Erro ao arquivar {partition['partition']}: {e}")
+                archived.append({'partition': partition['partition'], 'error': str(e)})
+        return archived
+
+    def archive_partition(self, partition: str, month: str) -> Dict:
+        """Exporta uma partição para Parquet e a remove do PostgreSQL"""
+        if not PARTITION_NAME.match(partition):
+            raise ValueError(f"Partição inválida: {partition}")
+
+        object_key = f"{PREDICTIONS_ARCHIVE_PREFIX}month={month[:7]}/{partition}.parquet"
+
+        # Resumo mensal (mantém o histórico consultável após remover as linhas)
+        conn = self.pg_client.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM {partition}")
+            expected_rows = cursor.fetchone()[0]
+            cursor.execute(
+                f"""
+                INSERT INTO predictions_monthly_rollup (
+                    month, model_name, model_version, classification,
+                    predictions_count, avg_iq, min_iq, max_iq, archive_key
+                )
+                SELECT
+                    %s::DATE, model_name, COALESCE(model_version, ''), COALESCE(classification, ''),
+                    COUNT(*), AVG(predicted_iq), MIN(predicted_iq), MAX(predicted_iq), %s
+                FROM {partition}
+                GROUP BY model_name, COALESCE(model_version, ''), COALESCE(classification, '')
+                ON CONFLICT (month, model_name, model_version, classification) DO UPDATE SET
+                    predictions_count = EXCLUDED.predictions_count,
+                    avg_iq = EXCLUDED.avg_iq,
+                    min_iq = EXCLUDED.min_iq,
+                    max_iq = EXCLUDED.max_iq,
+                    archive_key = EXCLUDED.archive_key
+                """,
+                (month, object_key)
+            )
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+        # Linhas originais em Parquet, escritas em streaming direto no MinIO
+        written_rows = self._export_parquet(partition, object_key)
+        if written_rows != expected_rows:
+            raise RuntimeError(
+                f"Parquet com {written_rows} linhas, partição com {expected_rows}; partição mantida"
+            )
+
+        conn = self.pg_client.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"ALTER TABLE predictions DETACH PARTITION {partition}")
+            cursor.execute(f"DROP TABLE {partition}")
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+        logger.info(f"🗄️ Partição {partition} arquivada em {object_key} ({written_rows} linhas)")
+        return {'partition': partition, 'month': month, 'rows': written_rows, 'object_key': object_key}
+
+    def _export_parquet(self, partition: str, object_key: str) -> int:
+        """Grava as linhas da partição em Parquet (um row group por lote lido)"""
+        columns = PREDICTIONS_SCHEMA.names
+        # O arquivo guarda o texto das sugestões (legível sem o feedback_catalog)
+        select = [
+            "COALESCE(feedback_suggestions, feedback_messages(feedback_mask))"
+            if name == 'feedback_suggestions' else name
+            for name in columns
+        ]
+        batches = self.pg_client.stream_batches(
+            f"SELECT {', '.join(select)} FROM {partition} ORDER BY prediction_id"
+        )
+        total = 0
+        path = f"{self.minio_client.bucket_name}/{object_key}"
+        with self.minio_client.arrow_fs.open_output_stream(path) as sink:
+            with pq.ParquetWriter(sink, PREDICTIONS_SCHEMA, compression='snappy') as writer:
+                for _, rows in batches:
+                    writer.write_table(pa.Table.from_pydict(
+                        {name: [row[i] for row in rows] for i, name in enumerate(columns)},
+                        schema=PREDICTIONS_SCHEMA
+                    ))
+                    total += len(rows)
+        return total
+
+    def prune_rollups(self) -> Dict[str, int]:
+        """
+        Remove buckets de minuto/hora mais antigos que ROLLUP_RETENTION_DAYS
+
+        Returns:
+            Buckets removidos por granularidade
+        """
+        pruned = {}
+        conn = self.pg_client.get_connection()
+        try:
+            cursor = conn.cursor()
+            for granularity, days in ROLLUP_RETENTION_DAYS.items():
+                if days <= 0:
+                    continue
+                cursor.execute(
+                    "DELETE FROM predictions_rollup WHERE granularity = %s "
+                    "AND bucket < CURRENT_TIMESTAMP - make_interval(days => %s)",
+                    (granularity, days)
+                )
+                pruned[granularity] = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        return pruned
+
+    def prune_shadow_predictions(self, retention_months: int = RETENTION_MONTHS) -> int:
+        """Remove predições shadow mais antigas que retention_months meses (0 = sem retenção)"""
+        if retention_months <= 0:
+            return 0
+        conn = self.pg_client.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM shadow_predictions WHERE predicted_at < %s",
+                (month_start(date.today(), retention_months),)
+            )
+            pruned = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        return pruned
+
+    def run_maintenance(
+        self,
+        months_ahead: int = PARTITION_MONTHS_AHEAD,
+        retention_months: int = RETENTION_MONTHS
+    ) -> Dict:
+        """Cria partições futuras e aplica a retenção (partições e agregados)"""
+        return {
+            'partitions_created': self.ensure_future_partitions(months_ahead),
+            'archived': self.archive_old_partitions(retention_months),
+            'rollups_pruned': self.prune_rollups(),
+            'shadow_pruned': self.prune_shadow_predictions(retention_months),
+        }
+
+
+def main():
+    """Executa a manutenção de partições pela linha de comando"""
+    parser = argparse.ArgumentParser(description="Partições e retenção da tabela predictions")
+    parser.add_argument("--list", action="store_true", help="Apenas lista as partições")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD, help="Partições futuras a manter")
+    parser.add_argument("--retention-months", type=int, default=RETENTION_MONTHS, help="Meses mantidos no PostgreSQL (0 = sem retenção)")
+    args = parser.parse_args()
+
+    manager = PredictionPartitionManager(PostgreSQLClient(), MinIOClient())
+
+    if not args.list:
+        result = manager.run_maintenance(args.months_ahead, args.retention_months)
+        print(f"Partições criadas: {result['partitions_created']}")
+        for item in result['archived']:
+            status = f"erro: {item['error']}" if 'error' in item else f"{item['rows']} linhas → {item['object_key']}"
+            print(f"Arquivada {item['partition']}: {status}")
+
+    for partition in manager.list_partitions():
+        print(f"{partition['partition']:24s} {partition['estimated_rows']:>10} linhas  {partition['size_bytes']:>12} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,14 +3,43 @@ Cliente PostgreSQL para HubFólio
 Gerencia operações de banco de dados
 """
 import os
+import io
+import csv
+import uuid
 import logging
-from typing import List, Dict, Optional, Any
+from datetime import datetime
+from typing import List, Dict, Mapping, Optional, Any, Iterator, Iterable, Sequence, Tuple
 import psycopg2
-from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.extras import execute_values
+
+from metrics import METRIC_INPUTS, metrics_rows
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Linhas por ida ao servidor nas leituras em streaming (cursor nomeado)
+STREAM_BATCH_SIZE = int(os.getenv('POSTGRES_STREAM_BATCH_SIZE', 2000))
+
+# Upsert de portfolio_metrics com valores calculados em Python (metrics.py)
+UPSERT_METRICS_QUERY = """
+INSERT INTO portfolio_metrics (portfolio_id, completude_score, clareza_score, indice_qualidade)
+VALUES %s
+ON CONFLICT (portfolio_id) DO UPDATE SET
+    completude_score = EXCLUDED.completude_score,
+    clareza_score = EXCLUDED.clareza_score,
+    indice_qualidade = EXCLUDED.indice_qualidade,
+    calculated_at = CURRENT_TIMESTAMP
+"""
+
+# Granularidades de predictions_rollup
+ROLLUP_GRANULARITIES = ('minute', 'hour', 'day')
+
+# Datasets exportáveis em streaming (nome -> query com ordem estável)
+EXPORT_QUERIES = {
+    'portfolio_summary': "SELECT * FROM portfolio_summary ORDER BY portfolio_id",
+    'predictions': "SELECT * FROM predictions_with_feedback ORDER BY prediction_id",
+}
+
 
 class PostgreSQLClient:
     """Cliente para interagir com PostgreSQL"""
@@ -63,18 +92,20 @@ class PostgreSQLClient:
         """
         try:
             conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor()
             
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
             
-            results = cursor.fetchall()
+            # Dicionários montados direto das tuplas (sem cópia intermediária RealDictRow)
+            columns = [col[0] for col in cursor.description]
+            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
             cursor.close()
             conn.close()
             
-            return [dict(row) for row in results]
+            return results
         except Exception as e:
             logger.error(f"Erro ao executar query: {e}")
             return []
@@ -117,12 +148,15 @@ class PostgreSQLClient:
     
     def get_tables(self) -> List[str]:
         """Retorna lista de tabelas no banco"""
+        # Partições (ex: predictions_2025_01) ficam de fora; a tabela pai já soma as linhas
         query = """
-        SELECT table_name 
-        FROM information_schema.tables 
-        WHERE table_schema = 'public' 
-        AND table_type = 'BASE TABLE'
-        ORDER BY table_name
+        SELECT c.relname AS table_name
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+        AND c.relkind IN ('r', 'p')
+        AND NOT c.relispartition
+        ORDER BY c.relname
         """
         results = self.execute_query(query)
         return [row['table_name'] for row in results]
@@ -232,6 +266,88 @@ class PostgreSQLClient:
             logger.error(f"Erro ao inserir predição: {e}")
             return None
     
+    def load_portfolio_batch(self, records: List[Dict], page_size: int = 1000) -> Dict[str, int]:
+        """
+        Grava um lote de portfólios com métricas em uma única transação
+        
+        Usuários e portfólios são inseridos com execute_values (um comando por
+        página em vez de um por linha) e as métricas são calculadas em lote
+        por metrics.calculate_portfolio_metrics e gravadas da mesma forma,
+        sem chamar calculate_portfolio_metrics no banco para cada portfólio.
+        
+        Args:
+            records: Portfólios achatados (user_id, nome e colunas de METRIC_INPUTS)
+            page_size: Linhas por comando INSERT
+            
+        Returns:
+            Dicionário com users, portfolios e metrics gravados
+        """
+        columns = {
+            name: [record[name] for record in records]
+            for name in ('user_id', 'nome', *METRIC_INPUTS)
+        }
+        return self.load_portfolio_columns(columns, page_size=page_size)
+    
+    def load_portfolio_columns(self, columns: Mapping[str, Sequence[Any]], page_size: int = 1000) -> Dict[str, int]:
+        """
+        Mesmo que load_portfolio_batch, com o lote em colunas
+        
+        Aceita listas ou arrays Arrow (colunas de um RecordBatch), então o ETL
+        do Parquet não monta um dicionário por portfólio.
+        
+        Args:
+            columns: Colunas user_id, nome e METRIC_INPUTS
+            page_size: Linhas por comando INSERT
+            
+        Returns:
+            Dicionário com users, portfolios e metrics gravados
+        """
+        columns = {
+            name: column.to_pylist() if hasattr(column, 'to_pylist') else list(column)
+            for name, column in ((name, columns[name]) for name in ('user_id', 'nome', *METRIC_INPUTS))
+        }
+        if not columns['user_id']:
+            return {"users": 0, "portfolios": 0, "metrics": 0}
+        
+        # ON CONFLICT DO UPDATE não aceita a mesma chave duas vezes no comando
+        users = dict(zip(columns['user_id'], columns['nome']))
+        
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            execute_values(
+                cursor,
+                """
+                INSERT INTO users (user_id, nome) VALUES %s
+                ON CONFLICT (user_id) DO UPDATE SET nome = EXCLUDED.nome
+                """,
+                list(users.items()),
+                page_size=page_size
+            )
+            
+            # RETURNING com fetch=True devolve os IDs na ordem dos registros
+            portfolio_ids = execute_values(
+                cursor,
+                f"INSERT INTO portfolios (user_id, {', '.join(METRIC_INPUTS)}) VALUES %s RETURNING portfolio_id",
+                list(zip(columns['user_id'], *[columns[name] for name in METRIC_INPUTS])),
+                page_size=page_size,
+                fetch=True
+            )
+            portfolio_ids = [row[0] for row in portfolio_ids]
+            
+            rows = metrics_rows(portfolio_ids, columns)
+            execute_values(cursor, UPSERT_METRICS_QUERY, rows, page_size=page_size)
+            
+            conn.commit()
+            cursor.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return {"users": len(users), "portfolios": len(portfolio_ids), "metrics": len(rows)}
+    
     def get_portfolio_summary(self, limit: int = 100) -> List[Dict]:
         """Retorna sumário de portfólios"""
         query = f"SELECT * FROM portfolio_summary ORDER BY indice_qualidade DESC LIMIT {limit}"
@@ -248,6 +364,74 @@ class PostgreSQLClient:
         query = f"SELECT * FROM top_portfolios LIMIT {limit}"
         return self.execute_query(query)
     
+    def get_prediction_timeseries(
+        self,
+        granularity: str,
+        start: datetime,
+        end: datetime,
+        model_version: Optional[str] = None,
+        by_model_version: bool = False
+    ) -> List[Dict]:
+        """
+        Série temporal de predicted_iq a partir dos agregados pré-calculados
+        
+        Lê predictions_rollup (um registro por bucket e versão do modelo), então o
+        custo depende do número de buckets e não do número de predições.
+        
+        Args:
+            granularity: 'minute', 'hour' ou 'day'
+            start: Início da janela (inclusivo)
+            end: Fim da janela (exclusivo)
+            model_version: Filtra uma versão do modelo
+            by_model_version: Se True, uma série por versão; senão soma as versões
+            
+        Returns:
+            Lista de buckets com count, mean, min, max e histograma de classificação
+        """
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"Granularidade inválida: {granularity}. Opções: {list(ROLLUP_GRANULARITIES)}")
+        
+        version_column = "model_version" if by_model_version else "NULL::VARCHAR AS model_version"
+        group_by = "bucket, model_version" if by_model_version else "bucket"
+        query = f"""
+        SELECT
+            bucket,
+            {version_column},
+            SUM(predictions_count) AS count,
+            SUM(iq_sum) / SUM(predictions_count) AS mean_iq,
+            MIN(iq_min) AS min_iq,
+            MAX(iq_max) AS max_iq,
+            SUM(count_excelente) AS excelente,
+            SUM(count_bom) AS bom,
+            SUM(count_regular) AS regular,
+            SUM(count_precisa_melhorar) AS precisa_melhorar
+        FROM predictions_rollup
+        WHERE granularity = %s
+        AND bucket >= %s AND bucket < %s
+        AND (%s::VARCHAR IS NULL OR model_version = %s)
+        GROUP BY {group_by}
+        ORDER BY {group_by}
+        """
+        rows = self.execute_query(query, (granularity, start, end, model_version, model_version))
+        
+        return [
+            {
+                "bucket": row['bucket'].isoformat(),
+                **({"model_version": row['model_version']} if by_model_version else {}),
+                "count": int(row['count']),
+                "mean_iq": round(float(row['mean_iq']), 2),
+                "min_iq": round(float(row['min_iq']), 2),
+                "max_iq": round(float(row['max_iq']), 2),
+                "classifications": {
+                    "Excelente": int(row['excelente']),
+                    "Bom": int(row['bom']),
+                    "Regular": int(row['regular']),
+                    "Precisa Melhorar": int(row['precisa_melhorar'])
+                }
+            }
+            for row in rows
+        ]
+    
     def user_exists(self, user_id: int) -> bool:
         """
         Verifica se um usuário existe no banco de dados
@@ -293,8 +477,6 @@ class PostgreSQLClient:
         RETURNING portfolio_id
         """
         
-        metrics_query = "SELECT calculate_portfolio_metrics(%s)"
-        
         conn = None
         cursor = None
         try:
@@ -305,8 +487,12 @@ class PostgreSQLClient:
             cursor.execute(portfolio_query, portfolio_data)
             portfolio_id = cursor.fetchone()[0]
             
-            # Calcular métricas automaticamente
-            cursor.execute(metrics_query, (portfolio_id,))
+            # Calcular métricas em Python (mesmo resultado de calculate_portfolio_metrics, sem re-SELECT)
+            execute_values(
+                cursor,
+                UPSERT_METRICS_QUERY,
+                metrics_rows([portfolio_id], {name: [portfolio_data[name]] for name in METRIC_INPUTS})
+            )
             
             conn.commit()
             cursor.close()
@@ -330,7 +516,9 @@ class PostgreSQLClient:
             raise  # Re-raise para debug no main.py
     
     def save_prediction(self, portfolio_id: int, predicted_iq: float, model_name: str, 
-                       classification: str = None, feedback: List[str] = None) -> Optional[int]:
+                       classification: str = None, feedback: List[str] = None,
+                       feedback_mask: Optional[int] = None,
+                       model_version: Optional[str] = None) -> Optional[int]:
         """
         Salva predição no banco de dados COM portfolio_id
         
@@ -339,7 +527,9 @@ class PostgreSQLClient:
             predicted_iq: IQ previsto pelo modelo
             model_name: Nome do modelo usado
             classification: Classificação (Excelente, Bom, etc.)
-            feedback: Lista de sugestões de melhoria
+            feedback: Lista de sugestões de melhoria (usada só sem feedback_mask)
+            feedback_mask: Sugestões como bitmask de feedback_catalog (não grava o texto)
+            model_version: Versão do modelo (padrão: "<model_name>_v1")
             
         Returns:
             ID da predição inserida ou None
@@ -347,16 +537,16 @@ class PostgreSQLClient:
         query = """
         INSERT INTO predictions (
             portfolio_id, predicted_iq, model_name, model_version,
-            classification, feedback_suggestions
+            classification, feedback_suggestions, feedback_mask
         )
-        VALUES (%s, %s, %s, %s, %s, %s)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
         RETURNING prediction_id
         """
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            model_version = f"{model_name}_v1"
+            model_version = model_version or f"{model_name}_v1"
             
             cursor.execute(query, (
                 portfolio_id, 
@@ -364,7 +554,8 @@ class PostgreSQLClient:
                 model_name, 
                 model_version,
                 classification,
-                feedback if feedback else []
+                None if feedback_mask is not None else (feedback if feedback else []),
+                feedback_mask
             ))
             prediction_id = cursor.fetchone()[0]
             
@@ -377,3 +568,302 @@ class PostgreSQLClient:
         except Exception as e:
             logger.error(f"❌ Erro ao salvar predição: {e}")
             return None
+    
+    # ====================================================================
+    # OPERAÇÕES EM LOTE
+    # ====================================================================
+    
+    def reserve_ids(self, table: str, column: str, count: int) -> List[int]:
+        """
+        Reserva IDs da sequência de uma coluna SERIAL (um comando para o bloco todo)
+        
+        Usado pelo write-behind para devolver portfolio_id/prediction_id antes
+        de gravar as linhas. IDs reservados e não usados viram lacunas.
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+                (table, column, count)
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        return ids
+    
+    def load_prediction_batch(self, records: List[Dict], page_size: int = 1000) -> Dict[str, int]:
+        """
+        Grava portfólios, métricas e predições de um lote em uma única transação
+        
+        Os registros já trazem portfolio_id e prediction_id (ver reserve_ids),
+        então regravar o mesmo lote (replay do log do write-behind) não duplica
+        linhas: os INSERTs usam ON CONFLICT DO NOTHING.
+        
+        Args:
+            records: Registros com user_id, METRIC_INPUTS, portfolio_id e os campos da predição
+            page_size: Linhas por comando INSERT
+            
+        Returns:
+            Dicionário com portfolios e predictions efetivamente inseridos
+        """
+        if not records:
+            return {"portfolios": 0, "predictions": 0}
+        
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            inserted = execute_values(
+                cursor,
+                f"""
+                INSERT INTO portfolios (portfolio_id, user_id, {', '.join(METRIC_INPUTS)}) VALUES %s
+                ON CONFLICT (portfolio_id) DO NOTHING RETURNING portfolio_id
+                """,
+                [
+                    (record['portfolio_id'], record['user_id'], *[record[name] for name in METRIC_INPUTS])
+                    for record in records
+                ],
+                page_size=page_size,
+                fetch=True
+            )
+            
+            columns = {name: [record[name] for record in records] for name in METRIC_INPUTS}
+            rows = metrics_rows([record['portfolio_id'] for record in records], columns)
+            execute_values(cursor, UPSERT_METRICS_QUERY, rows, page_size=page_size)
+            
+            predictions = execute_values(
+                cursor,
+                """
+                INSERT INTO predictions (
+                    prediction_id, portfolio_id, predicted_iq, model_name, model_version,
+                    classification, feedback_mask, predicted_at
+                ) VALUES %s
+                ON CONFLICT (prediction_id, predicted_at) DO NOTHING RETURNING prediction_id
+                """,
+                [
+                    (
+                        record['prediction_id'], record['portfolio_id'], record['predicted_iq'],
+                        record['model_name'], record['model_version'], record['classification'],
+                        record['feedback_mask'], record['predicted_at']
+                    )
+                    for record in records
+                ],
+                page_size=page_size,
+                fetch=True
+            )
+            
+            conn.commit()
+            cursor.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return {"portfolios": len(inserted), "predictions": len(predictions)}
+    
+    def save_shadow_predictions(self, records: List[Dict], page_size: int = 1000) -> List[Tuple[int, str]]:
+        """
+        Grava em lote predições de modelos shadow para portfólios já avaliados
+        
+        As linhas vão para shadow_predictions, e não para predictions, para não
+        entrar em predictions_rollup nem nas contagens e médias do primário.
+        Só entram as linhas cujo portfólio já existe (com write-behind, o
+        portfólio pode ainda estar no log); as demais podem ser reenviadas.
+        
+        Args:
+            records: Registros com portfolio_id, predicted_iq, model_name, model_version,
+                     classification, feedback_mask e predicted_at
+            
+        Returns:
+            (portfolio_id, model_version) das linhas inseridas
+        """
+        if not records:
+            return []
+        
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            inserted = execute_values(
+                cursor,
+                """
+                INSERT INTO shadow_predictions (
+                    portfolio_id, predicted_iq, model_name, model_version,
+                    classification, feedback_mask, predicted_at
+                )
+                SELECT v.portfolio_id, v.predicted_iq, v.model_name, v.model_version,
+                       v.classification, v.feedback_mask, v.predicted_at
+                FROM (VALUES %s) AS v(
+                    portfolio_id, predicted_iq, model_name, model_version,
+                    classification, feedback_mask, predicted_at
+                )
+                WHERE EXISTS (SELECT 1 FROM portfolios p WHERE p.portfolio_id = v.portfolio_id)
+                RETURNING portfolio_id, model_version
+                """,
+                [
+                    (
+                        record['portfolio_id'], record['predicted_iq'], record['model_name'],
+                        record['model_version'], record['classification'], record['feedback_mask'],
+                        record['predicted_at']
+                    )
+                    for record in records
+                ],
+                template="(%s::INTEGER, %s::FLOAT, %s, %s, %s, %s::INTEGER, %s::TIMESTAMP)",
+                page_size=page_size,
+                fetch=True
+            )
+            conn.commit()
+            cursor.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return [(row[0], row[1]) for row in inserted]
+    
+    def iter_batches(
+        self,
+        conn,
+        query: str,
+        params: tuple = None,
+        batch_size: int = STREAM_BATCH_SIZE,
+        cursor_name: str = 'hubfolio_batches',
+        with_columns: bool = False
+    ) -> Iterator:
+        """
+        Itera sobre o resultado de uma query em lotes usando cursor do lado do servidor
+        
+        O PostgreSQL mantém o resultado e envia batch_size linhas por vez, então a
+        memória do cliente fica limitada a um lote mesmo em tabelas grandes.
+        A conexão deve ficar dedicada à leitura até o fim da iteração (um COMMIT
+        nela fecha o cursor).
+        
+        Args:
+            conn: Conexão aberta (ver get_connection)
+            query: Query SQL SELECT
+            params: Parâmetros da query
+            batch_size: Linhas por lote (itersize do cursor)
+            cursor_name: Nome do cursor no servidor
+            with_columns: Se True, produz (colunas, linhas) em vez de só as linhas
+            
+        Yields:
+            Listas de tuplas com até batch_size linhas
+        """
+        cursor = conn.cursor(name=cursor_name)
+        cursor.itersize = batch_size
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if with_columns:
+                    yield [col[0] for col in cursor.description], rows
+                else:
+                    yield rows
+        finally:
+            cursor.close()
+    
+    def stream_batches(
+        self,
+        query: str,
+        params: tuple = None,
+        batch_size: int = STREAM_BATCH_SIZE
+    ) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """
+        Executa query em streaming com conexão própria, produzindo lotes de tuplas
+        
+        A conexão é fechada ao fim da iteração ou quando o gerador é descartado
+        (ex: cliente HTTP desconectou no meio de uma exportação).
+        
+        Yields:
+            (nomes das colunas, lista de tuplas com até batch_size linhas)
+        """
+        conn = self.get_connection()
+        try:
+            yield from self.iter_batches(
+                conn, query, params,
+                batch_size=batch_size,
+                cursor_name=f"stream_{uuid.uuid4().hex[:12]}",
+                with_columns=True
+            )
+        finally:
+            conn.rollback()
+            conn.close()
+    
+    def stream_query(
+        self,
+        query: str,
+        params: tuple = None,
+        batch_size: int = STREAM_BATCH_SIZE
+    ) -> Iterator[Dict]:
+        """
+        Versão em streaming do execute_query: produz um dicionário por linha
+        
+        Apenas um lote de batch_size linhas fica em memória por vez.
+        """
+        for columns, rows in self.stream_batches(query, params, batch_size):
+            for row in rows:
+                yield dict(zip(columns, row))
+    
+    def export_dataset(
+        self,
+        dataset: str,
+        batch_size: int = STREAM_BATCH_SIZE
+    ) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """
+        Exporta um dataset de EXPORT_QUERIES em lotes (ver stream_batches)
+        
+        Args:
+            dataset: 'portfolio_summary' ou 'predictions'
+            batch_size: Linhas por lote
+        """
+        if dataset not in EXPORT_QUERIES:
+            raise ValueError(f"Dataset inválido: {dataset}. Opções: {sorted(EXPORT_QUERIES)}")
+        return self.stream_batches(EXPORT_QUERIES[dataset], batch_size=batch_size)
+    
+    @staticmethod
+    def copy_rows(cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+        """
+        Insere linhas com COPY ... FROM STDIN (CSV), sem commit
+        
+        Muito mais rápido que INSERTs individuais para lotes grandes. Listas
+        Python viram arrays do PostgreSQL (ex: TEXT[]).
+        
+        Args:
+            cursor: Cursor da transação que fará o commit
+            table: Tabela de destino
+            columns: Colunas na ordem dos valores de cada linha
+            rows: Linhas a inserir
+            
+        Returns:
+            Quantidade de linhas enviadas
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        count = 0
+        for row in rows:
+            writer.writerow([
+                to_pg_array(value) if isinstance(value, (list, tuple)) else
+                (r'\N' if value is None else value)
+                for value in row
+            ])
+            count += 1
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer
+        )
+        return count
+
+
+def to_pg_array(values: Iterable[Any]) -> str:
+    """Formata uma lista como literal de array do PostgreSQL (ex: {"a","b"})"""
+    items = (
+        '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+        for value in values
+    )
+    return '{' + ','.join(items) + '}'
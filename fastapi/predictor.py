@@ -0,0 +1,145 @@
+"""
+Inferência do Índice de Qualidade (IQ) dos portfólios HubFólio
+Usado pela API (/predict) e pelos jobs offline (re-score em lote)
+"""
+import pickle
+import hashlib
+from typing import List, Dict, Optional
+from datetime import datetime
+
+import pandas as pd
+import numpy as np
+
+from feedback_rules import FeedbackEngine
+
+
+def model_version_tag(model_name: str, model_bytes: bytes) -> str:
+    """Versão derivada do conteúdo do modelo (mesmo .pkl => mesma versão)"""
+    return f"{model_name}_{hashlib.sha256(model_bytes).hexdigest()[:12]}"
+
+
+class HubFolioPredictor:
+    """Classe para realizar inferências do Índice de Qualidade"""
+
+    def __init__(self, modelo=None, feedback_engine: FeedbackEngine = None):
+        self.modelo = modelo
+        self.feedback_engine = feedback_engine or FeedbackEngine()
+        self.features = [
+            'projetos_min', 'habilidades_min',
+            'kw_contexto', 'kw_processo', 'kw_resultado',
+            'consistencia_visual_score',
+            'bio', 'contatos'
+        ]
+        self.model_name = "LinearRegression"  # Padrão
+        self.model_version = None  # Gravado em predictions.model_version
+        if modelo is not None:
+            self.set_model(modelo)
+
+    def set_model(self, modelo, model_version: Optional[str] = None, model_bytes: Optional[bytes] = None):
+        """
+        Troca o modelo servido (atribuições simples: predições em andamento terminam com o anterior)
+
+        Args:
+            modelo: Estimador com predict()
+            model_version: Versão explícita (ex: do Model Registry); padrão: hash do conteúdo
+            model_bytes: Pickle do modelo, se já disponível (evita serializar de novo)
+        """
+        model_name = type(modelo).__name__
+        if model_version is None:
+            model_version = model_version_tag(model_name, model_bytes or pickle.dumps(modelo))
+        self.modelo = modelo
+        self.model_name = model_name
+        self.model_version = model_version
+
+    def load_model(self, model_path: str):
+        """Carrega modelo salvo do disco"""
+        try:
+            with open(model_path, 'rb') as f:
+                model_bytes = f.read()
+            self.set_model(pickle.loads(model_bytes), model_bytes=model_bytes)
+            print(f"✅ Modelo carregado: {model_path} ({self.model_version})")
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao carregar modelo: {e}")
+            return False
+
+    def validar_entrada(self, dados: dict):
+        """Valida se todos os campos obrigatórios estão presentes"""
+        campos_faltantes = [f for f in self.features if f not in dados]
+        if campos_faltantes:
+            return False, f"Campos obrigatórios faltando: {campos_faltantes}"
+        return True, "OK"
+
+    def preprocessar(self, dados: dict):
+        """Converte dados de entrada para formato do modelo"""
+        # Converter booleanos para int
+        if isinstance(dados.get('bio'), bool):
+            dados['bio'] = int(dados['bio'])
+        if isinstance(dados.get('contatos'), bool):
+            dados['contatos'] = int(dados['contatos'])
+
+        # Criar DataFrame com as features na ordem correta
+        df_input = pd.DataFrame([dados])[self.features].astype(float)
+        return df_input
+
+    def prever(self, dados_portfolio: dict):
+        """Realiza a predição do Índice de Qualidade"""
+        # Validar entrada
+        valido, mensagem = self.validar_entrada(dados_portfolio)
+        if not valido:
+            return {"erro": mensagem, "sucesso": False}
+
+        # Preprocessar e prever
+        X_input = self.preprocessar(dados_portfolio)
+        iq_previsto = self.modelo.predict(X_input)[0]
+
+        # Limitar entre 0 e 100
+        iq_previsto = max(0, min(100, iq_previsto))
+
+        # Gerar feedback baseado nos dados (bitmask das regras violadas)
+        feedback_mask = self.feedback_engine.mask(dados_portfolio)
+
+        return {
+            "sucesso": True,
+            "indice_qualidade": round(float(iq_previsto), 2),
+            "classificacao": self._classificar_iq(iq_previsto),
+            "feedback": self.feedback_engine.decode(feedback_mask),
+            "feedback_mask": feedback_mask,
+            "model_name": self.model_name,
+            "model_version": self.model_version,
+            "predicted_at": datetime.utcnow().isoformat()
+        }
+
+    def prever_lote(self, df: pd.DataFrame) -> Dict[str, list]:
+        """
+        Predição vetorizada para muitos portfólios de uma vez
+
+        Mesmo resultado de prever() linha a linha, mas com uma única chamada
+        ao modelo e classificação/feedback avaliados por coluna no FeedbackEngine.
+
+        Args:
+            df: DataFrame com as colunas de self.features (bio/contatos bool ou int)
+
+        Returns:
+            Dicionário com listas 'indice_qualidade', 'classificacao', 'feedback'
+            e 'feedback_mask'
+        """
+        X = df[self.features].astype(float)
+        iq = np.clip(self.modelo.predict(X), 0, 100)
+
+        masks = self.feedback_engine.masks(X)
+
+        return {
+            "indice_qualidade": np.round(iq, 2).tolist(),
+            "classificacao": self.feedback_engine.classify(iq).tolist(),
+            "feedback": self.feedback_engine.suggestions(masks),
+            "feedback_mask": masks.tolist(),
+        }
+
+    def _classificar_iq(self, iq: float) -> str:
+        """Classifica o IQ em categorias"""
+        return self.feedback_engine.classify_one(iq)
+
+    def _gerar_feedback(self, iq: float, dados: dict) -> List[str]:
+        """Gera feedback personalizado baseado nos dados"""
+        return self.feedback_engine.decode(self.feedback_engine.mask(dados))
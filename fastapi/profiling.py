@@ -0,0 +1,149 @@
+"""
+Profiling opcional de requisições e execuções de ETL
+Captura stacks com cProfile e armazena os resultados no MinIO (prefixo profiles/)
+"""
+import os
+import io
+import random
+import pstats
+import marshal
+import cProfile
+import tempfile
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Optional
+
+from minio_client import MinIOClient
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+PROFILE_HEADER = "X-Profile"
+PROFILES_PREFIX = "profiles/"
+
+
+class RequestProfiler:
+    """
+    Profiler opcional baseado em cProfile
+
+    Desativado por padrão (PROFILING_ENABLED=false): nesse caso o middleware
+    nem é registrado na aplicação e o custo por requisição é zero. Quando ativo,
+    uma requisição é perfilada se enviar o header X-Profile: 1 ou se for
+    sorteada pela taxa de amostragem (PROFILING_SAMPLE_RATE, 0.0 a 1.0).
+
+    Só uma execução é perfilada por vez. Numa requisição, o cProfile mede a
+    thread do event loop inteira: o que outras corrotinas executarem durante
+    os awaits também entra no profile. Para um profile limpo, perfile com
+    pouco tráfego concorrente.
+    """
+
+    def __init__(self, minio_client: MinIOClient):
+        self.minio_client = minio_client
+        self.enabled = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+        self.sample_rate = float(os.getenv('PROFILING_SAMPLE_RATE', 0.0))
+        self.top_n = int(os.getenv('PROFILING_TOP_N', 40))
+
+        # cProfile só suporta um profiler ativo por thread; requisições
+        # concorrentes que chegarem durante uma captura não são perfiladas
+        self._lock = threading.Lock()
+
+        logger.info(f"Profiler initialized - Enabled: {self.enabled}, Sample rate: {self.sample_rate}")
+
+    def should_profile(self, forced: bool = False) -> bool:
+        """Decide se a execução atual deve ser perfilada"""
+        if not self.enabled:
+            return False
+        if forced:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def capture(self, forced: bool = False):
+        """
+        Context manager que perfila o bloco, sem salvar (ver store)
+
+        Args:
+            forced: Perfila mesmo fora da amostragem (ex: header X-Profile)
+
+        Yields:
+            cProfile.Profile, ou None se não perfilado (ou outra captura em andamento)
+        """
+        if not self.should_profile(forced) or not self._lock.acquire(blocking=False):
+            yield None
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                yield profiler
+            finally:
+                profiler.disable()
+        finally:
+            self._lock.release()
+
+    @contextmanager
+    def profile(self, name: str, kind: str = "request", forced: bool = False):
+        """
+        Context manager que perfila o bloco e salva o resultado no MinIO
+
+        O upload é bloqueante: no event loop, use capture e store via
+        asyncio.to_thread.
+
+        Args:
+            name: Identificador da execução (ex: 'POST /predict')
+            kind: Categoria usada no prefixo (request, etl)
+            forced: Perfila mesmo fora da amostragem (ex: header X-Profile)
+
+        Yields:
+            Dicionário preenchido com 'object_key' ao final, ou None se não perfilado
+        """
+        with self.capture(forced) as profiler:
+            if profiler is None:
+                yield None
+                return
+            result = {}
+            yield result
+        result['object_key'] = self.store(profiler, name, kind)
+
+    def store(self, profiler: cProfile.Profile, name: str, kind: str) -> Optional[str]:
+        """Serializa o profile (formato pstats) e envia para o MinIO (bloqueante)"""
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
+        safe_name = "".join(c if c.isalnum() else "_" for c in name).strip("_")
+        object_key = f"{PROFILES_PREFIX}{kind}/{timestamp}_{safe_name}.prof"
+
+        try:
+            profiler.create_stats()
+            data = marshal.dumps(profiler.stats)
+        except Exception as e:
+            logger.error(f"Erro ao serializar profile de {name}: {e}")
+            return None
+
+        if self.minio_client.upload_file(data, object_key, content_type='application/octet-stream'):
+            logger.info(f"🔬 Profile salvo: {object_key}")
+            return object_key
+        return None
+
+    def list_profiles(self, kind: str = "") -> List[Dict]:
+        """Lista profiles armazenados no MinIO"""
+        prefix = f"{PROFILES_PREFIX}{kind}/" if kind else PROFILES_PREFIX
+        return self.minio_client.list_objects(prefix=prefix)
+
+    def download_profile(self, object_key: str) -> Optional[bytes]:
+        """Baixa o profile bruto (carregável com pstats/snakeviz)"""
+        if not object_key.startswith(PROFILES_PREFIX):
+            return None
+        return self.minio_client.download_file(object_key)
+
+    def render_text(self, data: bytes, sort_by: str = "cumulative") -> str:
+        """Converte um profile bruto em relatório texto do pstats"""
+        with tempfile.NamedTemporaryFile(suffix='.prof') as tmp:
+            tmp.write(data)
+            tmp.flush()
+            output = io.StringIO()
+            stats = pstats.Stats(tmp.name, stream=output)
+            stats.sort_stats(sort_by).print_stats(self.top_n)
+        return output.getvalue()
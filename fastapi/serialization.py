@@ -0,0 +1,52 @@
+"""
+Serialização JSON com orjson para respostas da API, ingestão e ETL
+dumps/loads trabalham com bytes (sem passar por str) e entendem os tipos que
+aparecem nas respostas: datetime/date (ISO 8601, como isoformat()), escalares
+e arrays NumPy (ex: predicted_iq vindo de model.predict), Decimal do
+PostgreSQL (AVG/ROUND) e modelos pydantic. Chaves não-string (ex: contagens
+por tamanho de lote) viram string, como no json da biblioteca padrão.
+
+    from serialization import ORJSONResponse, dumps, loads
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    return ORJSONResponse(rows)  # pula o jsonable_encoder do FastAPI
+"""
+from decimal import Decimal
+from typing import Any, Callable, Optional
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+JSONDecodeError = orjson.JSONDecodeError  # Subclasse de json.JSONDecodeError (ValueError)
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """Tipos que o orjson não serializa sozinho (mesmo resultado do jsonable_encoder)"""
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json')
+    if hasattr(value, 'item'):  # Escalares NumPy fora do OPT_SERIALIZE_NUMPY (ex: np.bool_ em dtypes object)
+        return value.item()
+    return jsonable_encoder(value)
+
+
+def dumps(value: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """Serializa para bytes UTF-8"""
+    return orjson.dumps(value, default=default or _default, option=OPTIONS)
+
+
+def loads(data) -> Any:
+    """Desserializa bytes, bytearray, memoryview ou str"""
+    return orjson.loads(data)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse renderizada com orjson (NaN/inf viram null)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,169 @@
+"""
+Ingestão em streaming de portfólios em NDJSON (POST /ingest/stream)
+Lê o corpo da requisição pedaço a pedaço (chunked), valida cada linha contra
+o schema do hubfolio_mock_data.json (secoes_preenchidas/palavras_chave_clareza)
+assim que ela chega e grava lotes de STREAM_INGEST_BATCH_SIZE registros como
+arquivos Parquet no dataset particionado do MinIO. Opcionalmente cada lote
+também é carregado no PostgreSQL logo após ser gravado (ETL incremental).
+
+A memória fica limitada a um lote em montagem + um lote sendo gravado + uma
+linha incompleta, independente do tamanho do corpo.
+"""
+import os
+import time
+import asyncio
+import logging
+from datetime import date
+from typing import AsyncIterable, Dict, List, Optional
+
+import pyarrow as pa
+
+from parquet_storage import PORTFOLIO_SCHEMA, SchemaValidationError, validate_record
+from serialization import loads
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STREAM_INGEST_BATCH_SIZE = int(os.getenv('STREAM_INGEST_BATCH_SIZE', 10000))
+STREAM_INGEST_MAX_LINE_BYTES = int(os.getenv('STREAM_INGEST_MAX_LINE_BYTES', 1024 * 1024))
+MAX_REPORTED_ERRORS = 20  # Exemplos de linhas inválidas devolvidos na resposta
+
+
+class StreamIngestError(Exception):
+    """Corpo inválido que interrompe a ingestão (linha grande demais)"""
+
+
+class NDJSONStreamIngestor:
+    """
+    Valida e grava em lotes um fluxo NDJSON de portfólios
+
+    Linhas inválidas não interrompem a ingestão: são contadas e as primeiras
+    MAX_REPORTED_ERRORS aparecem no resultado com o número da linha.
+    """
+
+    def __init__(
+        self,
+        minio_client,
+        pg_client=None,
+        batch_size: int = STREAM_INGEST_BATCH_SIZE,
+        run_etl: bool = False,
+        ingest_date: Optional[date] = None,
+        max_line_bytes: int = STREAM_INGEST_MAX_LINE_BYTES
+    ):
+        self.minio_client = minio_client
+        self.pg_client = pg_client
+        self.batch_size = batch_size
+        self.run_etl = run_etl
+        self.ingest_date = ingest_date
+        self.max_line_bytes = max_line_bytes
+
+        self._rows: List[Dict] = []
+        self._pending: Optional[asyncio.Task] = None  # Lote sendo gravado (no máximo um)
+
+        self.bytes_received = 0
+        self.lines = 0
+        self.valid_records = 0
+        self.invalid_records = 0
+        self.errors: List[Dict] = []
+        self.objects: List[str] = []
+        self.etl = {"users": 0, "portfolios": 0, "metrics": 0, "failed_batches": 0}
+
+    async def ingest(self, chunks: AsyncIterable[bytes]) -> Dict:
+        """
+        Consome o corpo NDJSON e grava os lotes
+
+        Args:
+            chunks: Pedaços do corpo (ex: request.stream()), sem alinhamento com as linhas
+
+        Returns:
+            Resumo da ingestão (registros, objetos gravados, registros/s)
+        """
+        started = time.perf_counter()
+        buffer = bytearray()
+        try:
+            async for chunk in chunks:
+                self.bytes_received += len(chunk)
+                buffer.extend(chunk)
+                start = 0
+                while True:
+                    end = buffer.find(b'\n', start)
+                    if end < 0:
+                        break
+                    self._process_line(buffer[start:end])
+                    start = end + 1
+                    if len(self._rows) >= self.batch_size:
+                        await self._rotate()
+                del buffer[:start]
+                if len(buffer) > self.max_line_bytes:
+                    raise StreamIngestError(
+                        f"Linha {self.lines + 1} excede {self.max_line_bytes} bytes sem quebra de linha"
+                    )
+
+            if buffer.strip():
+                self._process_line(buffer)  # Última linha sem '\n'
+            if self._rows:
+                await self._rotate()
+        finally:
+            if self._pending is not None:
+                await self._pending  # Propaga erro do último lote
+
+        duration = time.perf_counter() - started
+        return self.summary(duration)
+
+    def _process_line(self, line: bytes):
+        self.lines += 1
+        if not line.strip():
+            return
+        try:
+            self._rows.append(validate_record(loads(line)))
+            self.valid_records += 1
+        except ValueError as e:  # JSONDecodeError e SchemaValidationError são ValueError
+            self.invalid_records += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                message = str(e) if isinstance(e, SchemaValidationError) else f"JSON inválido: {e}"
+                self.errors.append({"line": self.lines, "error": message})
+
+    async def _rotate(self):
+        """Fecha o lote atual e inicia sua gravação, depois de terminar a do anterior"""
+        rows, self._rows = self._rows, []
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            await pending
+        self._pending = asyncio.create_task(asyncio.to_thread(self._write_batch, rows))
+
+    def _write_batch(self, rows: List[Dict]):
+        """Grava um lote como Parquet no MinIO e, com run_etl, no PostgreSQL"""
+        table = pa.Table.from_pylist(rows, schema=PORTFOLIO_SCHEMA)
+        result = self.minio_client.upload_parquet(table, ingest_date=self.ingest_date)
+        if not result:
+            raise RuntimeError(f"Falha ao gravar lote de {len(rows)} registros no MinIO")
+        self.objects.append(result['object_key'])
+
+        if self.run_etl:
+            try:
+                loaded = self.pg_client.load_portfolio_batch(rows)
+            except Exception as e:
+                # O lote continua no MinIO e pode ser recarregado por /etl/run?source=parquet
+                self.etl["failed_batches"] += 1
+                logger.error(f"❌ ETL incremental falhou para {result['object_key']}: {e}")
+                return
+            for name in ("users", "portfolios", "metrics"):
+                self.etl[name] += loaded[name]
+
+    def summary(self, duration: Optional[float] = None) -> Dict:
+        result = {
+            "lines": self.lines,
+            "valid_records": self.valid_records,
+            "invalid_records": self.invalid_records,
+            "errors": self.errors,
+            "batches_written": len(self.objects),
+            "objects": self.objects,
+            "bytes_received": self.bytes_received,
+        }
+        if duration is not None:
+            result["duration_seconds"] = round(duration, 3)
+            result["records_per_sec"] = round(self.valid_records / duration) if duration > 0 else None
+            result["mb_per_sec"] = round(self.bytes_received / duration / 1e6, 2) if duration > 0 else None
+        if self.run_etl:
+            result["etl"] = self.etl
+        return result
@@ -0,0 +1,353 @@
+"""
+Gerador de Dados Sintéticos HubFólio
+Gera portfólios no schema do hubfolio_mock_data.json em escala (10M+ registros),
+com distribuições estimadas do dataset de exemplo, e grava em JSON, NDJSON ou
+shards Parquet direto no MinIO (multipart upload em streaming) ou em disco
+"""
+import os
+import json
+import time
+import logging
+import argparse
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from minio_client import MinIOClient
+from parquet_storage import PORTFOLIO_SCHEMA
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+REFERENCE_FILE = os.getenv('SYNTHETIC_REFERENCE_FILE', '/data/archive/hubfolio_mock_data.json')
+
+# Colunas numéricas/booleanas e seu caminho no JSON de origem
+FIELDS = {
+    'bio': ('secoes_preenchidas', 'bio'),
+    'projetos_min': ('secoes_preenchidas', 'projetos_min'),
+    'habilidades_min': ('secoes_preenchidas', 'habilidades_min'),
+    'contatos': ('secoes_preenchidas', 'contatos'),
+    'kw_contexto': ('palavras_chave_clareza', 'contexto'),
+    'kw_processo': ('palavras_chave_clareza', 'processo'),
+    'kw_resultado': ('palavras_chave_clareza', 'resultado'),
+    'consistencia_visual_score': (None, 'consistencia_visual_score'),
+}
+
+BOOLEAN_FIELDS = ('bio', 'contatos')
+
+
+class SyntheticPortfolioGenerator:
+    """
+    Gerador vetorizado de portfólios sintéticos
+
+    Cada campo é amostrado da distribuição empírica do arquivo de referência.
+    Contagens usam a PMF observada com suavização de Laplace no intervalo
+    [0, máximo observado + 2], para produzir também valores raros; o score
+    visual recebe um ruído contínuo em torno dos valores observados.
+    """
+
+    def __init__(self, reference_file: str = REFERENCE_FILE, seed: int = 42):
+        self.rng = np.random.default_rng(seed)
+
+        with open(reference_file, 'r', encoding='utf-8') as f:
+            reference = json.load(f)
+
+        self.distributions: Dict[str, Dict] = {}
+        for field, (section, key) in FIELDS.items():
+            values = np.array([
+                (record[section][key] if section else record[key]) for record in reference
+            ], dtype=float)
+
+            if field in BOOLEAN_FIELDS:
+                self.distributions[field] = {'p_true': float(values.mean())}
+            elif field == 'consistencia_visual_score':
+                self.distributions[field] = {'values': values, 'jitter': 2.5}
+            else:
+                support = np.arange(0, int(values.max()) + 3)
+                counts = np.bincount(values.astype(int), minlength=len(support))[:len(support)] + 0.5
+                self.distributions[field] = {'support': support, 'pmf': counts / counts.sum()}
+
+        # Nomes combinam primeiros nomes e sobrenomes do arquivo de referência
+        parts = [record['nome'].split(' ', 1) for record in reference]
+        self.first_names = np.array(sorted({p[0] for p in parts}))
+        self.last_names = np.array(sorted({p[1] for p in parts if len(p) > 1}))
+        self._first_json = [json.dumps(n, ensure_ascii=False)[:-1] for n in self.first_names]
+        self._last_json = [' ' + json.dumps(n, ensure_ascii=False)[1:] for n in self.last_names]
+
+        logger.info(f"Gerador sintético inicializado a partir de {reference_file} ({len(reference)} registros)")
+
+    def generate_columns(self, n: int, start_id: int = 1) -> Dict[str, np.ndarray]:
+        """
+        Gera um bloco de n registros em formato colunar
+
+        Args:
+            n: Número de registros
+            start_id: Primeiro user_id do bloco
+
+        Returns:
+            Dicionário coluna -> np.ndarray
+        """
+        columns = {'user_id': np.arange(start_id, start_id + n, dtype=np.int64)}
+
+        for field, dist in self.distributions.items():
+            if field in BOOLEAN_FIELDS:
+                columns[field] = self.rng.random(n) < dist['p_true']
+            elif field == 'consistencia_visual_score':
+                base = self.rng.choice(dist['values'], size=n)
+                noisy = base + self.rng.normal(0, dist['jitter'], size=n)
+                columns[field] = np.clip(np.rint(noisy), 0, 100).astype(np.int64)
+            else:
+                columns[field] = self.rng.choice(dist['support'], size=n, p=dist['pmf']).astype(np.int64)
+
+        columns['first_name_idx'] = self.rng.integers(0, len(self.first_names), size=n)
+        columns['last_name_idx'] = self.rng.integers(0, len(self.last_names), size=n)
+        return columns
+
+    def names(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """Monta os nomes completos de um bloco"""
+        first = self.first_names[columns['first_name_idx']].astype(object)
+        last = self.last_names[columns['last_name_idx']].astype(object)
+        return first + ' ' + last
+
+    def to_json_lines(self, columns: Dict[str, np.ndarray]) -> List[str]:
+        """Serializa um bloco como linhas JSON no schema aninhado do mock"""
+        first = [self._first_json[i] for i in columns['first_name_idx'].tolist()]
+        last = [self._last_json[i] for i in columns['last_name_idx'].tolist()]
+        bools = {True: 'true', False: 'false'}
+
+        return [
+            f'{{"user_id": {uid}, "nome": {fn}{ln}, '
+            f'"secoes_preenchidas": {{"bio": {bools[bio]}, "projetos_min": {proj}, '
+            f'"habilidades_min": {hab}, "contatos": {bools[cont]}}}, '
+            f'"palavras_chave_clareza": {{"contexto": {ctx}, "processo": {proc}, "resultado": {res}}}, '
+            f'"consistencia_visual_score": {vis}}}'
+            for uid, fn, ln, bio, proj, hab, cont, ctx, proc, res, vis in zip(
+                columns['user_id'].tolist(), first, last,
+                columns['bio'].tolist(), columns['projetos_min'].tolist(),
+                columns['habilidades_min'].tolist(), columns['contatos'].tolist(),
+                columns['kw_contexto'].tolist(), columns['kw_processo'].tolist(),
+                columns['kw_resultado'].tolist(), columns['consistencia_visual_score'].tolist()
+            )
+        ]
+
+    def to_table(self, columns: Dict[str, np.ndarray]) -> pa.Table:
+        """Converte um bloco para uma tabela Arrow no PORTFOLIO_SCHEMA (colunas achatadas)"""
+        return pa.table({
+            'user_id': columns['user_id'],
+            'nome': self.names(columns),
+            **{field: columns[field] for field in FIELDS},
+        }).cast(PORTFOLIO_SCHEMA)
+
+    def iter_blocks(self, total: int, block_size: int, start_id: int = 1) -> Iterator[Dict[str, np.ndarray]]:
+        """Itera sobre blocos colunares até completar total registros"""
+        generated = 0
+        while generated < total:
+            n = min(block_size, total - generated)
+            yield self.generate_columns(n, start_id + generated)
+            generated += n
+
+
+# ====================================================================
+# ESCRITA (MinIO ou disco)
+# ====================================================================
+
+def iter_encoded(generator: SyntheticPortfolioGenerator, fmt: str, total: int,
+                 block_size: int, start_id: int) -> Iterator[bytes]:
+    """Gera os bytes de um objeto JSON/NDJSON bloco a bloco"""
+    first = True
+    if fmt == 'json':
+        yield b'['
+    for columns in generator.iter_blocks(total, block_size, start_id):
+        lines = generator.to_json_lines(columns)
+        if fmt == 'json':
+            body = ',\n'.join(lines)
+            yield (('\n' if first else ',\n') + body).encode('utf-8')
+        else:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+        first = False
+    if fmt == 'json':
+        yield b'\n]\n'
+
+
+class _ChunkSink:
+    """Destino do ParquetWriter que entrega os bytes escritos a cada row group"""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_parquet(generator: SyntheticPortfolioGenerator, total: int,
+                 block_size: int, start_id: int) -> Iterator[bytes]:
+    """Gera os bytes de um arquivo Parquet com um row group por bloco"""
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode='w'), PORTFOLIO_SCHEMA,
+                          compression='snappy', write_statistics=True) as writer:
+        for columns in generator.iter_blocks(total, block_size, start_id):
+            writer.write_table(generator.to_table(columns), row_group_size=block_size)
+            yield sink.drain()
+    yield sink.drain()  # Rodapé
+
+
+def write_dataset(
+    generator: SyntheticPortfolioGenerator,
+    fmt: str,
+    total: int,
+    prefix: str,
+    records_per_shard: int,
+    block_size: int = 100_000,
+    start_id: int = 1,
+    minio_client: Optional[MinIOClient] = None,
+    output_dir: Optional[str] = None,
+    object_name: Optional[str] = None,
+) -> Dict:
+    """
+    Gera e grava o dataset em shards
+
+    Args:
+        generator: Gerador configurado
+        fmt: 'json', 'ndjson' ou 'parquet'
+        total: Número total de registros
+        prefix: Prefixo dos objetos (ex: 'hubfolio/synthetic/')
+        records_per_shard: Registros por shard (0 = um único objeto)
+        block_size: Registros gerados por bloco em memória (e por row group no Parquet)
+        start_id: Primeiro user_id
+        minio_client: Cliente MinIO (quando output_dir não é informado)
+        output_dir: Diretório local de saída
+        object_name: Nome exato do objeto único (ex: 'hubfolio/data/portfolios.json')
+
+    Returns:
+        Estatísticas da geração
+
+    Raises:
+        ValueError: total, records_per_shard ou block_size inválidos
+    """
+    if total < 0:
+        raise ValueError(f"total deve ser >= 0: {total}")
+    if records_per_shard < 0:
+        raise ValueError(f"records_per_shard deve ser >= 1 (ou 0 para um único objeto): {records_per_shard}")
+    if block_size < 1:
+        raise ValueError(f"block_size deve ser >= 1: {block_size}")
+    extension = {'json': 'json', 'ndjson': 'ndjson', 'parquet': 'parquet'}[fmt]
+    content_type = {'json': 'application/json', 'ndjson': 'application/x-ndjson',
+                    'parquet': 'application/vnd.apache.parquet'}[fmt]
+    shard_size = max(total if object_name else (records_per_shard or total), 1)
+    start_time = time.perf_counter()
+    shards = []
+    total_bytes = 0
+
+    for shard_index, shard_start in enumerate(range(0, total, shard_size)):
+        shard_total = min(shard_size, total - shard_start)
+        shard_id = start_id + shard_start
+        name = object_name or f"{prefix}part-{shard_index:05d}.{extension}"
+
+        if fmt == 'parquet':
+            chunks = iter_parquet(generator, shard_total, block_size, shard_id)
+        else:
+            chunks = iter_encoded(generator, fmt, shard_total, block_size, shard_id)
+
+        if output_dir:
+            path = os.path.join(output_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            size = 0
+            with open(path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+        else:
+            size = minio_client.upload_stream(chunks, name, content_type=content_type)
+            if size is None:
+                raise RuntimeError(f"Falha no upload de {name}")
+
+        total_bytes += size
+        shards.append({'object_name': name, 'records': shard_total, 'size_bytes': size})
+        logger.info(f"✓ {name}: {shard_total} registros, {size / 1e6:.1f} MB")
+
+    duration = time.perf_counter() - start_time
+    return {
+        'format': fmt,
+        'records': total,
+        'shards': shards,
+        'size_bytes': total_bytes,
+        'duration_seconds': round(duration, 3),
+        'records_per_second': round(total / duration, 1) if duration > 0 else None,
+    }
+
+
+def main():
+    """Função principal para geração via CLI"""
+    parser = argparse.ArgumentParser(description="Gerador de dados sintéticos HubFólio")
+    parser.add_argument("--records", type=int, default=1_000_000, help="Número de registros (default: 1M)")
+    parser.add_argument("--format", choices=["json", "ndjson", "parquet"], default="ndjson", help="Formato de saída")
+    parser.add_argument("--prefix", default="hubfolio/synthetic/", help="Prefixo dos objetos no MinIO")
+    parser.add_argument("--records-per-shard", type=int, default=1_000_000, help="Registros por shard (0 = objeto único)")
+    parser.add_argument("--object-name", default=None, help="Grava um único objeto com este nome (ignora --prefix)")
+    parser.add_argument("--block-size", type=int, default=100_000, help="Registros gerados por bloco em memória")
+    parser.add_argument("--start-id", type=int, default=1, help="Primeiro user_id")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador")
+    parser.add_argument("--reference", default=REFERENCE_FILE, help="Arquivo de referência das distribuições")
+    parser.add_argument("--output-dir", default=None, help="Grava em disco em vez do MinIO")
+    args = parser.parse_args()
+    if args.records < 0:
+        parser.error("--records deve ser >= 0")
+    if args.records_per_shard < 0:
+        parser.error("--records-per-shard deve ser >= 1 (ou 0 para um único objeto)")
+    if args.block_size < 1:
+        parser.error("--block-size deve ser >= 1")
+
+    generator = SyntheticPortfolioGenerator(reference_file=args.reference, seed=args.seed)
+
+    minio_client = None
+    if not args.output_dir:
+        minio_client = MinIOClient()
+        if not minio_client.check_connection():
+            logger.error("❌ MinIO não está acessível")
+            return 1
+        minio_client.create_bucket_if_not_exists()
+
+    stats = write_dataset(
+        generator,
+        fmt=args.format,
+        total=args.records,
+        prefix=args.prefix,
+        records_per_shard=args.records_per_shard,
+        block_size=args.block_size,
+        start_id=args.start_id,
+        minio_client=minio_client,
+        output_dir=args.output_dir,
+        object_name=args.object_name,
+    )
+
+    logger.info("=" * 60)
+    logger.info(f"🎉 {stats['records']} registros gerados em {len(stats['shards'])} shard(s)")
+    logger.info(f"   Tamanho: {stats['size_bytes'] / 1e6:.1f} MB")
+    logger.info(f"   Tempo: {stats['duration_seconds']}s ({stats['records_per_second']} registros/s)")
+    logger.info("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,5 @@
+"""Os módulos da API são importados pelo nome (como no container), a partir de fastapi/"""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
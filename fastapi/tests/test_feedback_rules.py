@@ -0,0 +1,131 @@
+"""
+Equivalência do FeedbackEngine com as regras originais do preditor
+
+_gerar_feedback e _classificar_iq abaixo são as cadeias de if do
+HubFolioPredictor antes das regras virarem dados; o engine com as regras
+padrão deve produzir exatamente as mesmas mensagens e classes.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from feedback_rules import FeedbackEngine, FeedbackRulesError, DEFAULT_OK_MESSAGE
+
+
+def _gerar_feedback(dados: dict) -> list:
+    sugestoes = []
+    if dados.get('projetos_min', 0) < 3:
+        sugestoes.append("Adicione mais projetos ao seu portfólio (mínimo 3 recomendado)")
+    if dados.get('habilidades_min', 0) < 5:
+        sugestoes.append("Liste mais habilidades técnicas (mínimo 5)")
+    if not dados.get('bio'):
+        sugestoes.append("Adicione uma bio/sobre você")
+    if not dados.get('contatos'):
+        sugestoes.append("Inclua informações de contato")
+    if (dados.get('kw_contexto', 0) + dados.get('kw_processo', 0) + dados.get('kw_resultado', 0)) < 9:
+        sugestoes.append("Melhore a narrativa dos projetos (contexto, processo, resultado)")
+    if dados.get('consistencia_visual_score', 0) < 70:
+        sugestoes.append("Trabalhe na consistência visual do portfólio")
+    return sugestoes if sugestoes else ["Seu portfólio está bem estruturado!"]
+
+
+def _classificar_iq(iq: float) -> str:
+    if iq >= 80:
+        return "Excelente"
+    elif iq >= 60:
+        return "Bom"
+    elif iq >= 40:
+        return "Regular"
+    else:
+        return "Precisa Melhorar"
+
+
+BOUNDARY_IQS = [
+    0.0, 100.0, 80.0, 60.0, 40.0,
+    *[np.nextafter(limit, direction) for limit in (80.0, 60.0, 40.0) for direction in (0.0, 100.0)],
+    79.99, 59.99, 39.99, 80.01,
+]
+
+
+def _portfolios(n: int = 20000, seed: int = 42) -> pd.DataFrame:
+    """Portfólios aleatórios concentrados nos limiares das regras"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'bio': rng.random(n) < 0.5,
+        'projetos_min': rng.integers(0, 6, n),
+        'habilidades_min': rng.integers(2, 9, n),
+        'contatos': rng.random(n) < 0.5,
+        'kw_contexto': rng.integers(0, 6, n),
+        'kw_processo': rng.integers(0, 6, n),
+        'kw_resultado': rng.integers(0, 6, n),
+        'consistencia_visual_score': np.where(
+            rng.random(n) < 0.2, rng.choice([69.99, 70.0, 70.01], n), rng.uniform(0, 100, n)
+        ),
+    })
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return FeedbackEngine()
+
+
+@pytest.fixture(scope="module")
+def portfolios():
+    return _portfolios()
+
+
+def test_mask_and_decode_match_original(engine, portfolios):
+    for dados in portfolios.to_dict('records'):
+        assert engine.decode(engine.mask(dados)) == _gerar_feedback(dados)
+
+
+def test_vectorized_masks_match_single(engine, portfolios):
+    masks = engine.masks(portfolios)
+    assert masks.dtype == np.int32
+    assert masks.tolist() == [engine.mask(dados) for dados in portfolios.to_dict('records')]
+    expected = [_gerar_feedback(dados) for dados in portfolios.to_dict('records')]
+    assert engine.suggestions(masks) == expected
+
+
+def test_int_features_and_missing_keys(engine):
+    """bio/contatos como 0/1 (DataFrame do preditor) e features ausentes"""
+    dados = {'bio': 1, 'contatos': 0, 'projetos_min': 3, 'habilidades_min': 5,
+             'kw_contexto': 3, 'kw_processo': 3, 'kw_resultado': 3, 'consistencia_visual_score': 70}
+    assert engine.decode(engine.mask(dados)) == _gerar_feedback(dados)
+    assert engine.decode(engine.mask({})) == _gerar_feedback({})
+    assert engine.mask(dict(dados, contatos=1)) == 0
+    assert engine.decode(0) == [DEFAULT_OK_MESSAGE]
+
+
+@pytest.mark.parametrize("iq", BOUNDARY_IQS)
+def test_classify_one_boundaries(engine, iq):
+    assert engine.classify_one(iq) == _classificar_iq(iq)
+
+
+def test_classify_vectorized(engine):
+    rng = np.random.default_rng(7)
+    iqs = np.concatenate([BOUNDARY_IQS, rng.uniform(0, 100, 20000)])
+    assert engine.classify(iqs).tolist() == [_classificar_iq(iq) for iq in iqs]
+    assert engine.classify(BOUNDARY_IQS).tolist() == [engine.classify_one(iq) for iq in BOUNDARY_IQS]
+
+
+def test_rules_sorted_by_code_and_validated():
+    engine = FeedbackEngine(rules=[
+        {"code": 3, "message": "b", "features": ["x"], "operator": ">", "threshold": 1},
+        {"code": 1, "message": "a", "features": ["x"], "operator": ">", "threshold": 0},
+    ])
+    assert engine.decode(engine.mask({'x': 2})) == ["a", "b"]
+    with pytest.raises(FeedbackRulesError):
+        FeedbackEngine(rules=[{"code": 1, "message": "a", "features": ["x"], "operator": "~", "threshold": 0}])
+    with pytest.raises(FeedbackRulesError):
+        FeedbackEngine(classifications=[{"label": "A", "min_iq": 10}])
+
+
+def test_config_file_matches_defaults(engine):
+    path = os.path.join(os.path.dirname(__file__), '..', 'config', 'feedback_rules.json')
+    from_file = FeedbackEngine.from_file(path).describe()
+    defaults = engine.describe()
+    for key in ('rules', 'classifications', 'ok_message'):
+        assert from_file[key] == defaults[key]
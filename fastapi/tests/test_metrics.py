@@ -0,0 +1,130 @@
+"""
+Paridade de metrics.calculate_portfolio_metrics com a função SQL
+
+SQL_OUTPUTS foi gerada executando calculate_portfolio_metrics (postgres/init.sql)
+no PostgreSQL 16 e guarda os valores gravados em portfolio_metrics. As linhas
+com consistencia_visual_score NULL vieram de um banco sem as restrições NOT
+NULL: a função SQL devolve IQ NULL, que em NumPy corresponde a NaN.
+
+Com um PostgreSQL com o schema (variáveis POSTGRES_*), METRICS_PARITY_POSTGRES=true
+também roda a verificação ao vivo de metrics.py --check-parity.
+"""
+import os
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics import METRIC_INPUTS, calculate_portfolio_metrics, metrics_rows
+
+# (bio, projetos_min, habilidades_min, contatos, kw_contexto, kw_processo, kw_resultado,
+#  consistencia_visual_score) -> (completude_score, clareza_score, indice_qualidade) da função SQL
+SQL_OUTPUTS = [
+    (False, 0, 0, False, 0, 0, 0, 0.0, 0.0, 0.0, 0.0),
+    (True, 10, 10, True, 10, 10, 10, 100.0, 100.0, 100.0, 100.0),
+    (True, 0, 4, False, 1, 0, 0, 50.0, 25.0, 6.666666666666667, 22.666666666666668),
+    (False, 1, 5, True, 0, 1, 0, 50.0, 75.0, 6.666666666666667, 42.666666666666664),
+    (True, 1, 6, False, 0, 0, 1, 50.0, 75.0, 6.666666666666667, 42.666666666666664),
+    (False, 2, 4, True, 5, 5, 4, 69.99, 50.0, 93.33333333333333, 71.33133333333333),
+    (True, 3, 5, True, 5, 5, 5, 70.0, 100.0, 100.0, 94.0),
+    (False, 0, 5, False, 6, 5, 5, 70.0, 25.0, 100.0, 64.0),
+    (True, 1, 0, True, 3, 2, 2, 33.333333333333336, 75.0, 46.666666666666664, 55.33333333333334),
+    (False, 1, 7, False, 1, 1, 1, 0.1, 50.0, 20.0, 28.02),
+    (True, 5, 3, False, 2, 2, 3, 99.99999999999999, 50.0, 46.666666666666664, 58.66666666666667),
+    (False, 3, 9, True, 4, 4, 4, 12.345678901234567, 75.0, 80.0, 64.46913578024692),
+    (True, 0, 0, True, 0, 0, 0, 0.0, 50.0, 0.0, 20.0),
+    (False, 0, 0, False, 0, 0, 0, None, 0.0, 0.0, None),
+    (True, 1, 5, True, 5, 5, 5, None, 100.0, 100.0, None),
+    (True, 1, 5, False, 1, 8, 1, 36.56889169125856, 75.0, 66.66666666666666, 63.98044500491838),
+    (True, 4, 3, True, 6, 6, 1, 24.066300012702502, 75.0, 86.66666666666667, 69.47992666920717),
+    (False, 0, 8, False, 3, 0, 6, 4.9589313389771466, 25.0, 60.0, 34.991786267795426),
+    (True, 4, 8, True, 6, 2, 8, 11.779223807836836, 100.0, 100.0, 82.35584476156737),
+    (True, 1, 2, False, 3, 5, 1, 54.77444657095578, 50.0, 60.0, 54.954889314191156),
+    (True, 0, 6, True, 8, 6, 5, 46.5601865839674, 75.0, 100.0, 79.31203731679348),
+    (False, 2, 4, True, 2, 3, 1, 57.442371025867104, 50.0, 40.0, 47.48847420517342),
+    (False, 2, 7, True, 1, 1, 8, 41.81228217852272, 75.0, 66.66666666666666, 65.02912310237122),
+    (False, 1, 5, True, 1, 8, 5, 34.01223621911955, 75.0, 93.33333333333333, 74.13578057715725),
+    (True, 3, 6, False, 1, 1, 4, 47.40983374196445, 75.0, 40.0, 55.48196674839289),
+    (False, 0, 7, False, 7, 4, 6, 88.70402922380917, 25.0, 100.0, 67.74080584476184),
+    (True, 3, 4, True, 1, 7, 0, 21.820777481967944, 75.0, 53.333333333333336, 55.69748882972692),
+    (True, 1, 5, True, 7, 1, 2, 44.9187400949331, 100.0, 66.66666666666666, 75.65041468565327),
+    (False, 1, 8, True, 8, 4, 6, 98.6467081001186, 75.0, 100.0, 89.72934162002372),
+    (False, 3, 3, True, 2, 2, 3, 65.85166769723301, 50.0, 46.666666666666664, 51.837000206113274),
+    (True, 4, 3, True, 0, 2, 6, 53.45909623001036, 75.0, 53.333333333333336, 62.02515257933541),
+    (False, 2, 3, False, 8, 0, 7, 89.95330100579521, 25.0, 100.0, 67.99066020115905),
+    (False, 4, 5, True, 6, 1, 7, 63.428956568570904, 75.0, 93.33333333333333, 80.01912464704752),
+    (True, 0, 3, True, 1, 5, 0, 10.23795977252221, 50.0, 40.0, 38.04759195450444),
+    (False, 4, 2, False, 0, 1, 3, 61.406898778847875, 25.0, 26.666666666666668, 32.94804642243624),
+    (True, 2, 4, False, 7, 1, 1, 84.8936926484615, 50.0, 60.0, 60.9787385296923),
+    (False, 3, 5, True, 1, 2, 1, 74.96739204424308, 75.0, 26.666666666666668, 55.66014507551529),
+    (False, 3, 8, False, 8, 0, 3, 95.09855728747021, 50.0, 73.33333333333333, 68.35304479082737),
+    (False, 1, 7, False, 0, 8, 4, 97.85012427189727, 50.0, 80.0, 71.57002485437945),
+    (False, 2, 6, True, 2, 5, 3, 53.2592397492879, 75.0, 66.66666666666666, 67.31851461652424),
+]
+
+METRIC_NAMES = ['completude_score', 'clareza_score', 'indice_qualidade']
+
+
+def _columns(rows):
+    return {name: [row[i] for row in rows] for i, name in enumerate(METRIC_INPUTS)}
+
+
+def _assert_same(values, expected):
+    """Igualdade exata de float64; NULL da função SQL equivale a NaN"""
+    for value, sql in zip(values.tolist(), expected):
+        if sql is None:
+            assert math.isnan(value)
+        else:
+            assert value == sql
+
+
+@pytest.mark.parametrize("index, name", list(enumerate(METRIC_NAMES)))
+def test_matches_sql_outputs(index, name):
+    metrics = calculate_portfolio_metrics(_columns(SQL_OUTPUTS))
+    assert metrics[name].dtype == np.float64
+    _assert_same(metrics[name], [row[8 + index] for row in SQL_OUTPUTS])
+
+
+def test_dataframe_and_numpy_inputs():
+    """Colunas de DataFrame (ETL) e arrays NumPy (bool/int) dão o mesmo resultado"""
+    rows = [row for row in SQL_OUTPUTS if row[7] is not None]
+    frame = pd.DataFrame(_columns(rows))
+    arrays = {name: frame[name].to_numpy() for name in METRIC_INPUTS}
+    assert arrays['bio'].dtype == np.bool_
+    for columns in (frame, arrays):
+        metrics = calculate_portfolio_metrics(columns)
+        for index, name in enumerate(METRIC_NAMES):
+            _assert_same(metrics[name], [row[8 + index] for row in rows])
+
+
+def test_boundaries():
+    """Limites: 1 projeto, 5 habilidades e 15 palavras-chave"""
+    rows = [
+        (False, 0, 4, False, 5, 5, 4, 0.0),
+        (False, 1, 5, False, 5, 5, 5, 0.0),
+        (False, 1, 6, False, 6, 5, 5, 0.0),
+    ]
+    metrics = calculate_portfolio_metrics(_columns(rows))
+    assert metrics['completude_score'].tolist() == [0.0, 50.0, 50.0]
+    assert metrics['clareza_score'].tolist() == [14 / 15.0 * 100, 100.0, 100.0]
+
+
+def test_metrics_rows():
+    rows = SQL_OUTPUTS[:3]
+    result = metrics_rows(np.array([10, 11, 12]), _columns(rows))
+    assert result == [(10 + i, *row[8:]) for i, row in enumerate(rows)]
+    assert all(type(value) is int for value, *_ in result)
+
+
+@pytest.mark.skipif(
+    os.getenv('METRICS_PARITY_POSTGRES', 'false').lower() != 'true',
+    reason="requer PostgreSQL com o schema (METRICS_PARITY_POSTGRES=true)"
+)
+def test_live_sql_parity():
+    from metrics import check_sql_parity
+    from postgres_client import PostgreSQLClient
+
+    result = check_sql_parity(PostgreSQLClient(), sample_size=500)
+    assert result['compared'] > 0
+    assert result['mismatches'] == 0, result['examples']
@@ -0,0 +1,467 @@
+"""
+Persistência write-behind das predições do /predict
+A predição é confirmada ao cliente assim que o registro entra em um log local
+append-only (JSON por linha). Uma thread de flush grava os registros
+acumulados em portfolios/portfolio_metrics/predictions em uma transação por
+lote (execute_values) e apaga os segmentos do log já gravados. Ao iniciar, os
+segmentos que sobraram de uma queda são regravados (replay idempotente).
+Um segmento que falha WRITE_BEHIND_MAX_ATTEMPTS vezes seguidas é gravado
+dividindo os lotes ao meio até isolar os registros rejeitados pelo banco, que
+vão para o arquivo de quarentena (dead-letter.jsonl); os demais seguem. Linhas
+corrompidas (JSON inválido) vão direto para a quarentena. As linhas já em
+quarentena ficam anotadas ao lado do segmento (<segmento>.quarantined) para
+não serem repetidas se o segmento precisar ser regravado.
+
+Durabilidade por requisição (header X-Durability):
+    sync  - fsync do log antes de responder (fsyncs concorrentes são agrupados)
+    async - responde após escrever no log; o fsync fica para o próximo flush
+"""
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import psycopg2
+
+from postgres_client import PostgreSQLClient
+from metrics import METRIC_INPUTS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DURABILITY_HEADER = "X-Durability"
+DURABILITY_MODES = ('sync', 'async')
+
+SEGMENT_PREFIX = "predictions-"
+SEGMENT_SUFFIX = ".log"
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+QUARANTINED_SUFFIX = ".quarantined"  # Linhas do segmento já enviadas para a quarentena
+
+# Erros causados pelo conteúdo do registro (quarentena); os demais, como queda
+# da conexão, mantêm o segmento para a próxima tentativa
+RECORD_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError, KeyError, TypeError, ValueError)
+
+
+class IdAllocator:
+    """Entrega IDs de uma coluna SERIAL reservados em blocos (reserve_ids)"""
+
+    def __init__(self, pg_client: PostgreSQLClient, table: str, column: str, block_size: int):
+        self.pg_client = pg_client
+        self.table = table
+        self.column = column
+        self.block_size = block_size
+        self._ids: List[int] = []
+        self._lock = threading.Lock()
+
+    def next(self) -> int:
+        with self._lock:
+            if not self._ids:
+                self._ids = self.pg_client.reserve_ids(self.table, self.column, self.block_size)
+                self._ids.reverse()
+            return self._ids.pop()
+
+
+class PredictionWriteBehind:
+    """
+    Log local + flush agrupado das predições
+
+    Desativado por padrão (WRITE_BEHIND_ENABLED=false): o /predict grava
+    portfólio e predição na própria requisição. Os dados ficam visíveis no
+    PostgreSQL após o próximo flush (WRITE_BEHIND_FLUSH_INTERVAL_MS).
+    """
+
+    def __init__(self, pg_client: Optional[PostgreSQLClient] = None, log_dir: Optional[str] = None):
+        self.pg_client = pg_client
+        self.enabled = os.getenv('WRITE_BEHIND_ENABLED', 'false').lower() == 'true'
+        self.log_dir = log_dir or os.getenv('WRITE_BEHIND_DIR', '/app/write_behind')
+        self.flush_interval = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL_MS', 200)) / 1000.0
+        self.max_batch = int(os.getenv('WRITE_BEHIND_MAX_BATCH', 5000))
+        self.id_block_size = int(os.getenv('WRITE_BEHIND_ID_BLOCK', 1000))
+        self.default_durability = os.getenv('WRITE_BEHIND_DURABILITY', 'sync')
+        self.max_attempts = int(os.getenv('WRITE_BEHIND_MAX_ATTEMPTS', 3))
+        self.dead_letter_path = os.path.join(self.log_dir, DEAD_LETTER_FILE)
+
+        self._portfolio_ids: Optional[IdAllocator] = None
+        self._prediction_ids: Optional[IdAllocator] = None
+
+        # Segmento aberto do log; _write_lock protege a escrita e _fsync_lock o
+        # fsync e a rotação (ordem de aquisição: _fsync_lock -> _write_lock)
+        self._write_lock = threading.Lock()
+        self._fsync_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._segment_seq = 0
+        self._segment_file = None
+        self._segment_path: Optional[str] = None
+        self._segment_records = 0
+        self._written = 0  # Registros escritos no segmento aberto
+        self._synced = 0   # Registros do segmento aberto já com fsync
+
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._segment_failures: Dict[str, int] = {}  # Falhas seguidas por segmento
+
+        # Métricas
+        self.records_enqueued = 0
+        self.records_flushed = 0
+        self.records_replayed = 0
+        self.flushes_total = 0
+        self.flush_errors = 0
+        self.fsyncs_total = 0
+        self.records_quarantined = 0
+        self.last_flush: Dict = {}
+        self.last_error: Optional[str] = None
+
+        logger.info(
+            f"PredictionWriteBehind initialized - Enabled: {self.enabled}, dir: {self.log_dir}, "
+            f"flush_interval_ms: {self.flush_interval * 1000:g}, durability: {self.default_durability}"
+        )
+
+    # ----------------------------------------------------------------
+    # Ciclo de vida
+    # ----------------------------------------------------------------
+
+    @property
+    def active(self) -> bool:
+        """Log aberto e thread de flush em execução"""
+        return self._flusher is not None
+
+    def start(self, pg_client: Optional[PostgreSQLClient] = None):
+        """Regrava segmentos pendentes (replay), abre o log e inicia a thread de flush"""
+        if self._flusher is not None:
+            return
+        self.pg_client = pg_client or self.pg_client
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        self._portfolio_ids = IdAllocator(self.pg_client, 'portfolios', 'portfolio_id', self.id_block_size)
+        self._prediction_ids = IdAllocator(self.pg_client, 'predictions', 'prediction_id', self.id_block_size)
+
+        pending = self._closed_segments()
+        if pending:
+            self._segment_seq = self._segment_number(pending[-1])
+            logger.info(f"🔁 Replay de {len(pending)} segmento(s) do write-behind")
+            self.records_replayed += self._flush_segments(pending)
+
+        with self._write_lock:
+            self._open_segment()
+
+        self._stop.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name="write-behind-flusher", daemon=True)
+        self._flusher.start()
+        logger.info(f"✅ Write-behind ativo em {self.log_dir}")
+
+    def stop(self):
+        """Grava tudo o que está no log e encerra a thread de flush"""
+        if self._flusher is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._flusher.join()
+        self._flusher = None
+        self.flush()
+        with self._write_lock:
+            self._segment_file.close()
+            self._segment_file = None
+            if self._segment_records == 0:
+                os.remove(self._segment_path)
+
+    # ----------------------------------------------------------------
+    # Enfileiramento
+    # ----------------------------------------------------------------
+
+    def enqueue(self, dados: Dict, resultado: Dict, durability: Optional[str] = None) -> Dict:
+        """
+        Registra portfólio + predição no log e devolve os IDs reservados
+
+        Chamada bloqueante (escrita/fsync do log e, a cada bloco, a reserva de
+        IDs no PostgreSQL): no event loop, use asyncio.to_thread.
+
+        Args:
+            dados: Portfólio validado (user_id + features)
+            resultado: Resultado de HubFolioPredictor.prever()
+            durability: 'sync' ou 'async' (padrão WRITE_BEHIND_DURABILITY)
+
+        Returns:
+            Dicionário com portfolio_id e prediction_id
+        """
+        durability = durability or self.default_durability
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Durabilidade inválida: {durability}. Opções: {list(DURABILITY_MODES)}")
+
+        record = {
+            'portfolio_id': self._portfolio_ids.next(),
+            'prediction_id': self._prediction_ids.next(),
+            'user_id': dados['user_id'],
+            **{name: dados[name] for name in METRIC_INPUTS},
+            'predicted_iq': resultado['indice_qualidade'],
+            'model_name': resultado['model_name'],
+            'model_version': resultado.get('model_version') or f"{resultado['model_name']}_v1",
+            'classification': resultado.get('classificacao'),
+            'feedback_mask': resultado.get('feedback_mask'),
+            'predicted_at': resultado.get('predicted_at') or datetime.utcnow().isoformat(),
+        }
+        line = json.dumps(record, separators=(',', ':')) + "\n"
+
+        with self._write_lock:
+            self._segment_file.write(line)
+            self._segment_file.flush()
+            self._segment_records += 1
+            self._written += 1
+            self.records_enqueued += 1
+            position = (self._segment_seq, self._written)
+            full = self._segment_records >= self.max_batch
+
+        if durability == 'sync':
+            self._sync(position)
+        if full:
+            self._wakeup.set()
+        return {'portfolio_id': record['portfolio_id'], 'prediction_id': record['prediction_id']}
+
+    def _sync(self, position: tuple):
+        """
+        fsync do log até a posição informada
+
+        Group commit: quem pega o lock faz um fsync que cobre todas as linhas
+        escritas até ali, e as requisições que esperavam e já foram cobertas
+        saem sem outro fsync.
+        """
+        segment_seq, written = position
+        with self._fsync_lock:
+            with self._write_lock:
+                if self._segment_seq != segment_seq:
+                    return  # Segmento rotacionado: o fsync foi feito na rotação
+                if self._synced >= written:
+                    return
+                target = self._written
+                fileno = self._segment_file.fileno()
+            # Fora do _write_lock: outras requisições continuam escrevendo durante o fsync
+            os.fsync(fileno)
+            self.fsyncs_total += 1
+            with self._write_lock:
+                self._synced = max(self._synced, target)
+
+    # ----------------------------------------------------------------
+    # Flush
+    # ----------------------------------------------------------------
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Erro no flush do write-behind: {e}")
+
+    def flush(self) -> int:
+        """Fecha o segmento aberto e grava todos os segmentos fechados no PostgreSQL"""
+        with self._flush_lock:
+            with self._fsync_lock, self._write_lock:
+                if self._segment_records:
+                    self._rotate()
+            return self._flush_segments(self._closed_segments())
+
+    def _flush_segments(self, segments: List[str]) -> int:
+        """Grava os segmentos em ordem; um segmento só é apagado após o commit"""
+        flushed = 0
+        for path in segments:
+            lines, corrupt = self._read_segment(path)
+            done = self._quarantined_lines(path)
+            start = time.perf_counter()
+            quarantined = 0
+            for number, raw, error in corrupt:
+                if number not in done:
+                    self._quarantine(raw, path, number, error)
+                quarantined += 1
+            pending = [(number, record) for number, record in lines if number not in done]
+            quarantined += len(lines) - len(pending)
+            for offset in range(0, len(pending), self.max_batch):
+                batch = pending[offset:offset + self.max_batch]
+                try:
+                    if self._segment_failures.get(path, 0) >= self.max_attempts:
+                        quarantined += self._load_isolating(batch, path)
+                    else:
+                        self.pg_client.load_prediction_batch([record for _, record in batch])
+                except Exception as e:
+                    self.flush_errors += 1
+                    self.last_error = str(e)
+                    failures = self._segment_failures[path] = self._segment_failures.get(path, 0) + 1
+                    logger.error(
+                        f"❌ Flush de {os.path.basename(path)} falhou ({failures}/{self.max_attempts}), "
+                        f"nova tentativa no próximo ciclo: {e}"
+                    )
+                    return flushed
+            total = len(lines) + len(corrupt)
+            os.remove(path)
+            if os.path.exists(path + QUARANTINED_SUFFIX):
+                os.remove(path + QUARANTINED_SUFFIX)
+            self._segment_failures.pop(path, None)
+            flushed += total - quarantined
+            self.records_flushed += total - quarantined
+            self.flushes_total += 1
+            self.last_flush = {
+                'segment': os.path.basename(path),
+                'records': total,
+                'quarantined': quarantined,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+                'at': datetime.utcnow().isoformat(),
+            }
+        return flushed
+
+    def _load_isolating(self, batch: List[Tuple[int, Dict]], path: str) -> int:
+        """
+        Grava o lote dividindo-o ao meio até isolar os registros rejeitados
+
+        Cada registro rejeitado sozinho com um erro de RECORD_ERRORS vai para a
+        quarentena; qualquer outro erro é propagado e o segmento fica para o
+        próximo ciclo (a regravação é idempotente).
+
+        Args:
+            batch: Pares (número da linha no segmento, registro)
+
+        Returns:
+            Quantidade de registros enviados para a quarentena
+        """
+        try:
+            self.pg_client.load_prediction_batch([record for _, record in batch])
+            return 0
+        except RECORD_ERRORS as e:
+            if len(batch) == 1:
+                number, record = batch[0]
+                self._quarantine(record, path, number, e)
+                return 1
+        middle = len(batch) // 2
+        return self._load_isolating(batch[:middle], path) + self._load_isolating(batch[middle:], path)
+
+    def _quarantine(self, record: Union[Dict, str], path: str, number: int, error: Exception):
+        """
+        Acrescenta o registro rejeitado ao arquivo de quarentena (com fsync)
+
+        record é o registro decodificado ou, para linhas corrompidas, o texto
+        da linha. O número da linha é anotado em <segmento>.quarantined.
+        """
+        entry = {
+            'segment': os.path.basename(path),
+            'line': number,
+            'error': f"{type(error).__name__}: {error}",
+            'quarantined_at': datetime.utcnow().isoformat(),
+            'record': record,
+        }
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, separators=(',', ':'), default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        with open(path + QUARANTINED_SUFFIX, 'a', encoding='utf-8') as f:
+            f.write(f"{number}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.records_quarantined += 1
+        record_id = record.get('prediction_id') if isinstance(record, dict) else None
+        logger.warning(
+            f"⚠️ Linha {number} (prediction_id={record_id}) de {os.path.basename(path)} "
+            f"enviada para a quarentena: {error}"
+        )
+
+    @staticmethod
+    def _quarantined_lines(path: str) -> Set[int]:
+        """Linhas do segmento que já estão na quarentena (de uma tentativa anterior)"""
+        try:
+            with open(path + QUARANTINED_SUFFIX, 'r', encoding='utf-8') as f:
+                return {int(line) for line in f if line.strip().isdigit()}
+        except FileNotFoundError:
+            return set()
+
+    # ----------------------------------------------------------------
+    # Segmentos do log
+    # ----------------------------------------------------------------
+
+    def _segment_name(self, seq: int) -> str:
+        return os.path.join(self.log_dir, f"{SEGMENT_PREFIX}{seq:012d}{SEGMENT_SUFFIX}")
+
+    @staticmethod
+    def _segment_number(path: str) -> int:
+        return int(os.path.basename(path)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+    def _open_segment(self):
+        """Abre o próximo segmento (chamar com _write_lock)"""
+        self._segment_seq += 1
+        self._segment_path = self._segment_name(self._segment_seq)
+        self._segment_file = open(self._segment_path, 'a', encoding='utf-8')
+        self._segment_records = 0
+        self._written = 0
+        self._synced = 0
+
+    def _rotate(self):
+        """Fecha o segmento aberto com fsync e abre outro (chamar com _fsync_lock e _write_lock)"""
+        self._segment_file.flush()
+        os.fsync(self._segment_file.fileno())
+        self._segment_file.close()
+        self._open_segment()
+
+    def _closed_segments(self) -> List[str]:
+        """Segmentos no diretório, exceto o aberto, em ordem de criação"""
+        if not os.path.isdir(self.log_dir):
+            return []
+        segments = [
+            os.path.join(self.log_dir, name)
+            for name in os.listdir(self.log_dir)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        ]
+        return sorted(
+            (path for path in segments if path != self._segment_path),
+            key=self._segment_number
+        )
+
+    @staticmethod
+    def _read_segment(path: str) -> Tuple[List[Tuple[int, Dict]], List[Tuple[int, str, Exception]]]:
+        """
+        Lê um segmento ignorando a última linha se ela ficou incompleta (queda na escrita)
+
+        Returns:
+            (pares (número da linha, registro), linhas corrompidas (número, texto, erro))
+        """
+        records, corrupt = [], []
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for number, line in enumerate(f, start=1):
+                if not line.endswith("\n"):
+                    logger.warning(f"⚠️ Linha incompleta ignorada no fim de {os.path.basename(path)}")
+                    break
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError(f"esperado objeto JSON, encontrado {type(record).__name__}")
+                except ValueError as e:
+                    corrupt.append((number, line.rstrip("\n"), e))
+                    continue
+                records.append((number, record))
+        return records, corrupt
+
+    def stats(self) -> Dict:
+        """Estado do log e do flush"""
+        pending_segments = self._closed_segments()
+        with self._write_lock:
+            open_records = self._segment_records
+        return {
+            'enabled': self.enabled,
+            'active': self.active,
+            'log_dir': self.log_dir,
+            'default_durability': self.default_durability,
+            'pending_records': open_records,
+            'pending_segments': len(pending_segments),
+            'records_enqueued': self.records_enqueued,
+            'records_flushed': self.records_flushed,
+            'records_replayed': self.records_replayed,
+            'flushes_total': self.flushes_total,
+            'flush_errors': self.flush_errors,
+            'fsyncs_total': self.fsyncs_total,
+            'max_attempts': self.max_attempts,
+            'records_quarantined': self.records_quarantined,
+            'dead_letter_path': self.dead_letter_path,
+            'last_flush': self.last_flush,
+            'last_error': self.last_error,
+        }
@@ -94,9 +94,11 @@ COMMENT ON COLUMN portfolio_metrics.indice_qualidade IS 'Índice de Qualidade fi
 -- ====================================================================
 -- TABELA: predictions
 -- Armazena predições do modelo de ML
+-- Particionada por mês em predicted_at: consultas por janela de tempo só
+-- leem as partições do período (ver create_predictions_partitions)
 -- ====================================================================
 CREATE TABLE IF NOT EXISTS predictions (
-    prediction_id SERIAL PRIMARY KEY,
+    prediction_id SERIAL,
     portfolio_id INTEGER NOT NULL REFERENCES portfolios(portfolio_id) ON DELETE CASCADE,
     
     -- Resultado da Predição
@@ -109,18 +111,164 @@ CREATE TABLE IF NOT EXISTS predictions (
     
     -- Feedback Gerado
     feedback_suggestions TEXT[],
+    feedback_mask INTEGER,
     
     -- Metadados
-    predicted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    predicted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     
-    CONSTRAINT check_predicted_iq CHECK (predicted_iq >= 0 AND predicted_iq <= 100)
-);
+    CONSTRAINT check_predicted_iq CHECK (predicted_iq >= 0 AND predicted_iq <= 100),
+    PRIMARY KEY (prediction_id, predicted_at)
+) PARTITION BY RANGE (predicted_at);
+
+-- Recebe linhas fora das partições mensais (não deve acumular dados)
+CREATE TABLE IF NOT EXISTS predictions_default PARTITION OF predictions DEFAULT;
 
 COMMENT ON TABLE predictions IS 'Predições do modelo de Machine Learning';
 COMMENT ON COLUMN predictions.predicted_iq IS 'Índice de Qualidade previsto pelo modelo';
 COMMENT ON COLUMN predictions.model_name IS 'Nome do modelo usado (ex: LinearRegression, DecisionTree)';
 COMMENT ON COLUMN predictions.classification IS 'Classificação (Excelente, Bom, Regular, Precisa Melhorar)';
 COMMENT ON COLUMN predictions.feedback_suggestions IS 'Array de sugestões de melhoria';
+COMMENT ON COLUMN predictions.feedback_mask IS 'Sugestões como bitmask (bit = feedback_catalog.code; 0 = nenhuma)';
+
+-- ====================================================================
+-- TABELA: predictions_monthly_rollup
+-- Agregados mensais das partições arquivadas (retenção de predictions)
+-- ====================================================================
+CREATE TABLE IF NOT EXISTS predictions_monthly_rollup (
+    month DATE NOT NULL,
+    model_name VARCHAR(100) NOT NULL,
+    model_version VARCHAR(50) NOT NULL DEFAULT '',
+    classification VARCHAR(50) NOT NULL DEFAULT '',
+    predictions_count BIGINT NOT NULL,
+    avg_iq FLOAT,
+    min_iq FLOAT,
+    max_iq FLOAT,
+    archive_key TEXT,
+    PRIMARY KEY (month, model_name, model_version, classification)
+);
+
+COMMENT ON TABLE predictions_monthly_rollup IS 'Resumo mensal das predições movidas para Parquet no MinIO';
+COMMENT ON COLUMN predictions_monthly_rollup.archive_key IS 'Objeto Parquet com as linhas originais do mês';
+
+-- ====================================================================
+-- TABELA: predictions_rollup
+-- Agregados de predicted_iq por minuto/hora/dia e versão do modelo,
+-- mantidos incrementalmente pelo trigger trg_predictions_rollup
+-- ====================================================================
+CREATE TABLE IF NOT EXISTS predictions_rollup (
+    granularity VARCHAR(6) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    predictions_count BIGINT NOT NULL,
+    iq_sum DOUBLE PRECISION NOT NULL,
+    iq_min FLOAT NOT NULL,
+    iq_max FLOAT NOT NULL,
+    count_excelente BIGINT NOT NULL DEFAULT 0,
+    count_bom BIGINT NOT NULL DEFAULT 0,
+    count_regular BIGINT NOT NULL DEFAULT 0,
+    count_precisa_melhorar BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, model_version, bucket),
+    CONSTRAINT check_rollup_granularity CHECK (granularity IN ('minute', 'hour', 'day'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_predictions_rollup_bucket ON predictions_rollup(granularity, bucket);
+
+COMMENT ON TABLE predictions_rollup IS 'Séries temporais pré-agregadas de predicted_iq (dashboards)';
+COMMENT ON COLUMN predictions_rollup.bucket IS 'Início do intervalo (date_trunc da granularidade)';
+COMMENT ON COLUMN predictions_rollup.model_version IS 'model_version da predição (ou model_name quando nula)';
+COMMENT ON COLUMN predictions_rollup.iq_sum IS 'Soma de predicted_iq; média = iq_sum / predictions_count';
+
+-- ====================================================================
+-- TABELA: feedback_catalog
+-- Regras de feedback das predições (fastapi/feedback_rules.py)
+-- ====================================================================
+CREATE TABLE IF NOT EXISTS feedback_catalog (
+    code SMALLINT PRIMARY KEY,
+    message TEXT NOT NULL,
+    features TEXT[],
+    operator VARCHAR(2),
+    threshold FLOAT,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    
+    CONSTRAINT check_feedback_code CHECK (code BETWEEN -1 AND 30),
+    CONSTRAINT check_feedback_operator CHECK (operator IN ('<', '<=', '>', '>=', '==', '!=')),
+    CONSTRAINT check_feedback_rule CHECK (code = -1 OR (features IS NOT NULL AND operator IS NOT NULL AND threshold IS NOT NULL))
+);
+
+COMMENT ON TABLE feedback_catalog IS 'Regras de feedback: sugestão quando soma(features) <operator> threshold';
+COMMENT ON COLUMN feedback_catalog.code IS 'Bit da regra em predictions.feedback_mask (não reaproveitar); -1 = mensagem de feedback_mask 0';
+
+INSERT INTO feedback_catalog (code, message, features, operator, threshold) VALUES
+    (-1, 'Seu portfólio está bem estruturado!', NULL, NULL, NULL),
+    (0, 'Adicione mais projetos ao seu portfólio (mínimo 3 recomendado)', ARRAY['projetos_min'], '<', 3),
+    (1, 'Liste mais habilidades técnicas (mínimo 5)', ARRAY['habilidades_min'], '<', 5),
+    (2, 'Adicione uma bio/sobre você', ARRAY['bio'], '==', 0),
+    (3, 'Inclua informações de contato', ARRAY['contatos'], '==', 0),
+    (4, 'Melhore a narrativa dos projetos (contexto, processo, resultado)', ARRAY['kw_contexto', 'kw_processo', 'kw_resultado'], '<', 9),
+    (5, 'Trabalhe na consistência visual do portfólio', ARRAY['consistencia_visual_score'], '<', 70)
+ON CONFLICT (code) DO NOTHING;
+
+-- ====================================================================
+-- TABELA: shadow_predictions
+-- Predições dos modelos shadow (fastapi/model_serving.py). Ficam fora de
+-- predictions para não entrar nas contagens, nos agregados nem nas views
+-- ====================================================================
+CREATE TABLE IF NOT EXISTS shadow_predictions (
+    shadow_prediction_id BIGSERIAL PRIMARY KEY,
+    portfolio_id INTEGER NOT NULL REFERENCES portfolios(portfolio_id) ON DELETE CASCADE,
+    predicted_iq FLOAT NOT NULL,
+    model_name VARCHAR(100) NOT NULL,
+    model_version VARCHAR(50) NOT NULL,
+    classification VARCHAR(50),
+    feedback_mask INTEGER,
+    predicted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_shadow_predictions_portfolio_id ON shadow_predictions(portfolio_id);
+CREATE INDEX IF NOT EXISTS idx_shadow_predictions_version_at ON shadow_predictions(model_version, predicted_at);
+
+COMMENT ON TABLE shadow_predictions IS 'Predições de modelos shadow (fora de predictions e de predictions_rollup)';
+
+-- ====================================================================
+-- TABELA: scoring_jobs
+-- Checkpoint dos jobs de re-score em lote (fastapi/bulk_scoring.py)
+-- ====================================================================
+CREATE TABLE IF NOT EXISTS scoring_jobs (
+    job_id VARCHAR(64) PRIMARY KEY,
+    model_name VARCHAR(100) NOT NULL,
+    model_version VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    last_portfolio_id INTEGER NOT NULL DEFAULT 0,
+    max_portfolio_id INTEGER NOT NULL DEFAULT 0,
+    portfolios_total INTEGER NOT NULL DEFAULT 0,
+    portfolios_scored INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE scoring_jobs IS 'Progresso dos jobs de re-score em lote';
+COMMENT ON COLUMN scoring_jobs.last_portfolio_id IS 'Último portfolio_id com predição gravada (ponto de retomada)';
+COMMENT ON COLUMN scoring_jobs.max_portfolio_id IS 'Maior portfolio_id existente quando o job foi criado';
+
+-- ====================================================================
+-- TABELA: idempotency_keys
+-- Respostas guardadas por Idempotency-Key (fastapi/idempotency.py)
+-- ====================================================================
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope VARCHAR(50) NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    response JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, idempotency_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+
+COMMENT ON TABLE idempotency_keys IS 'Respostas de /predict, /ingest/hubfolio e /etl/run devolvidas a retries da mesma chave';
+COMMENT ON COLUMN idempotency_keys.request_hash IS 'SHA-256 do payload da primeira requisição (outro payload com a mesma chave = 422)';
 
 -- ====================================================================
 -- VIEWS: Queries úteis pré-computadas
@@ -182,6 +330,39 @@ LIMIT 20;
 
 COMMENT ON VIEW top_portfolios IS 'Top 20 portfólios com maior Índice de Qualidade';
 
+-- Função: Mensagens de um feedback_mask (bit = feedback_catalog.code)
+-- Regras desativadas continuam no catálogo, então máscaras antigas são sempre legíveis
+CREATE OR REPLACE FUNCTION feedback_messages(p_mask INTEGER)
+RETURNS TEXT[] AS $$
+    SELECT CASE
+        WHEN p_mask IS NULL THEN NULL
+        WHEN p_mask = 0 THEN ARRAY(SELECT message FROM feedback_catalog WHERE code = -1)
+        ELSE ARRAY(
+            SELECT message FROM feedback_catalog
+            WHERE code >= 0 AND (p_mask >> code) & 1 = 1
+            ORDER BY code
+        )
+    END
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION feedback_messages IS 'Reconstrói o texto das sugestões a partir do bitmask';
+
+-- View: Predições com o texto das sugestões (bitmask ou array legado)
+CREATE OR REPLACE VIEW predictions_with_feedback AS
+SELECT 
+    prediction_id,
+    portfolio_id,
+    predicted_iq,
+    model_name,
+    model_version,
+    classification,
+    COALESCE(feedback_suggestions, feedback_messages(feedback_mask)) AS feedback_suggestions,
+    feedback_mask,
+    predicted_at
+FROM predictions;
+
+COMMENT ON VIEW predictions_with_feedback IS 'Predições com feedback_suggestions em texto para leitura';
+
 -- ====================================================================
 -- ÍNDICES para otimização de queries
 -- ====================================================================
@@ -190,6 +371,9 @@ CREATE INDEX idx_portfolios_user_id ON portfolios(user_id);
 CREATE INDEX idx_portfolio_metrics_portfolio_id ON portfolio_metrics(portfolio_id);
 CREATE INDEX idx_predictions_portfolio_id ON predictions(portfolio_id);
 CREATE INDEX idx_predictions_model_name ON predictions(model_name);
+CREATE INDEX idx_predictions_model_version ON predictions(model_version);
+-- BRIN: predictions é append-only em ordem de predicted_at, então o índice é minúsculo
+CREATE INDEX idx_predictions_predicted_at_brin ON predictions USING BRIN (predicted_at);
 CREATE INDEX idx_portfolio_metrics_iq ON portfolio_metrics(indice_qualidade DESC);
 
 -- ====================================================================
@@ -256,6 +440,82 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Cria partições mensais de predictions do mês de p_from até p_months_ahead meses à frente
+CREATE OR REPLACE FUNCTION create_predictions_partitions(
+    p_months_ahead INTEGER DEFAULT 3,
+    p_from DATE DEFAULT CURRENT_DATE
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_month DATE := date_trunc('month', p_from)::DATE;
+    v_last DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => p_months_ahead))::DATE;
+    v_name TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    WHILE v_month <= v_last LOOP
+        v_name := 'predictions_' || to_char(v_month, 'YYYY_MM');
+        IF to_regclass(v_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF predictions FOR VALUES FROM (%L) TO (%L)',
+                v_name, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+            v_created := v_created + 1;
+        END IF;
+        v_month := (v_month + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION create_predictions_partitions IS 'Cria partições mensais futuras de predictions (idempotente)';
+
+SELECT create_predictions_partitions(3);
+
+-- Atualiza predictions_rollup com as linhas inseridas no statement (INSERT ou COPY).
+-- Um upsert por bucket afetado, não por linha; ORDER BY fixa a ordem dos locks.
+CREATE OR REPLACE FUNCTION update_predictions_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO predictions_rollup AS r (
+        granularity, bucket, model_version, predictions_count, iq_sum, iq_min, iq_max,
+        count_excelente, count_bom, count_regular, count_precisa_melhorar
+    )
+    SELECT
+        g.granularity,
+        date_trunc(g.granularity, n.predicted_at),
+        COALESCE(n.model_version, n.model_name),
+        COUNT(*),
+        SUM(n.predicted_iq),
+        MIN(n.predicted_iq),
+        MAX(n.predicted_iq),
+        COUNT(*) FILTER (WHERE n.classification = 'Excelente'),
+        COUNT(*) FILTER (WHERE n.classification = 'Bom'),
+        COUNT(*) FILTER (WHERE n.classification = 'Regular'),
+        COUNT(*) FILTER (WHERE n.classification = 'Precisa Melhorar')
+    FROM new_predictions n
+    CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS g(granularity)
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 3, 2
+    ON CONFLICT (granularity, model_version, bucket) DO UPDATE SET
+        predictions_count = r.predictions_count + EXCLUDED.predictions_count,
+        iq_sum = r.iq_sum + EXCLUDED.iq_sum,
+        iq_min = LEAST(r.iq_min, EXCLUDED.iq_min),
+        iq_max = GREATEST(r.iq_max, EXCLUDED.iq_max),
+        count_excelente = r.count_excelente + EXCLUDED.count_excelente,
+        count_bom = r.count_bom + EXCLUDED.count_bom,
+        count_regular = r.count_regular + EXCLUDED.count_regular,
+        count_precisa_melhorar = r.count_precisa_melhorar + EXCLUDED.count_precisa_melhorar;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_predictions_rollup
+AFTER INSERT ON predictions
+REFERENCING NEW TABLE AS new_predictions
+FOR EACH STATEMENT EXECUTE FUNCTION update_predictions_rollup();
+
+COMMENT ON FUNCTION update_predictions_rollup IS 'Mantém predictions_rollup a cada INSERT/COPY em predictions';
+
 -- Adicionar UNIQUE constraint para evitar duplicatas
 ALTER TABLE portfolio_metrics ADD CONSTRAINT unique_portfolio_id UNIQUE (portfolio_id);
 
@@ -0,0 +1,98 @@
+-- ====================================================================
+-- MIGRAÇÃO 001: predictions particionada por predicted_at
+-- Para bancos criados antes do particionamento (o init.sql já cria a
+-- tabela particionada). Executar uma vez:
+--   docker-compose exec -T postgres psql -U hubfolio_user -d hubfolio < postgres/migrations/001_partition_predictions.sql
+-- ====================================================================
+
+BEGIN;
+
+ALTER TABLE predictions RENAME TO predictions_legacy;
+ALTER TABLE predictions_legacy RENAME CONSTRAINT predictions_pkey TO predictions_legacy_pkey;
+ALTER INDEX IF EXISTS idx_predictions_portfolio_id RENAME TO idx_predictions_legacy_portfolio_id;
+ALTER INDEX IF EXISTS idx_predictions_model_name RENAME TO idx_predictions_legacy_model_name;
+ALTER INDEX IF EXISTS idx_predictions_model_version RENAME TO idx_predictions_legacy_model_version;
+
+CREATE TABLE predictions (
+    prediction_id SERIAL,
+    portfolio_id INTEGER NOT NULL REFERENCES portfolios(portfolio_id) ON DELETE CASCADE,
+    predicted_iq FLOAT NOT NULL,
+    model_name VARCHAR(100) NOT NULL,
+    model_version VARCHAR(50),
+    classification VARCHAR(50),
+    feedback_suggestions TEXT[],
+    predicted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT check_predicted_iq CHECK (predicted_iq >= 0 AND predicted_iq <= 100),
+    PRIMARY KEY (prediction_id, predicted_at)
+) PARTITION BY RANGE (predicted_at);
+
+CREATE TABLE predictions_default PARTITION OF predictions DEFAULT;
+
+CREATE OR REPLACE FUNCTION create_predictions_partitions(
+    p_months_ahead INTEGER DEFAULT 3,
+    p_from DATE DEFAULT CURRENT_DATE
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_month DATE := date_trunc('month', p_from)::DATE;
+    v_last DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => p_months_ahead))::DATE;
+    v_name TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    WHILE v_month <= v_last LOOP
+        v_name := 'predictions_' || to_char(v_month, 'YYYY_MM');
+        IF to_regclass(v_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF predictions FOR VALUES FROM (%L) TO (%L)',
+                v_name, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+            v_created := v_created + 1;
+        END IF;
+        v_month := (v_month + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partições desde a predição mais antiga até 3 meses à frente
+SELECT create_predictions_partitions(
+    3,
+    COALESCE((SELECT MIN(predicted_at)::DATE FROM predictions_legacy), CURRENT_DATE)
+);
+
+INSERT INTO predictions (
+    prediction_id, portfolio_id, predicted_iq, model_name, model_version,
+    classification, feedback_suggestions, predicted_at
+)
+SELECT
+    prediction_id, portfolio_id, predicted_iq, model_name, model_version,
+    classification, feedback_suggestions, COALESCE(predicted_at, CURRENT_TIMESTAMP)
+FROM predictions_legacy;
+
+SELECT setval(
+    pg_get_serial_sequence('predictions', 'prediction_id'),
+    COALESCE((SELECT MAX(prediction_id) FROM predictions), 0) + 1,
+    false
+);
+
+DROP TABLE predictions_legacy;
+
+CREATE INDEX idx_predictions_portfolio_id ON predictions(portfolio_id);
+CREATE INDEX idx_predictions_model_name ON predictions(model_name);
+CREATE INDEX idx_predictions_model_version ON predictions(model_version);
+CREATE INDEX idx_predictions_predicted_at_brin ON predictions USING BRIN (predicted_at);
+
+CREATE TABLE IF NOT EXISTS predictions_monthly_rollup (
+    month DATE NOT NULL,
+    model_name VARCHAR(100) NOT NULL,
+    model_version VARCHAR(50) NOT NULL DEFAULT '',
+    classification VARCHAR(50) NOT NULL DEFAULT '',
+    predictions_count BIGINT NOT NULL,
+    avg_iq FLOAT,
+    min_iq FLOAT,
+    max_iq FLOAT,
+    archive_key TEXT,
+    PRIMARY KEY (month, model_name, model_version, classification)
+);
+
+COMMIT;
@@ -0,0 +1,95 @@
+-- ====================================================================
+-- MIGRAÇÃO 002: séries temporais pré-agregadas (predictions_rollup)
+-- Cria a tabela e o trigger do init.sql e preenche os agregados com as
+-- predições já existentes. Executar uma vez (após a 001):
+--   docker-compose exec -T postgres psql -U hubfolio_user -d hubfolio < postgres/migrations/002_predictions_rollup.sql
+-- ====================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS predictions_rollup (
+    granularity VARCHAR(6) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    predictions_count BIGINT NOT NULL,
+    iq_sum DOUBLE PRECISION NOT NULL,
+    iq_min FLOAT NOT NULL,
+    iq_max FLOAT NOT NULL,
+    count_excelente BIGINT NOT NULL DEFAULT 0,
+    count_bom BIGINT NOT NULL DEFAULT 0,
+    count_regular BIGINT NOT NULL DEFAULT 0,
+    count_precisa_melhorar BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, model_version, bucket),
+    CONSTRAINT check_rollup_granularity CHECK (granularity IN ('minute', 'hour', 'day'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_predictions_rollup_bucket ON predictions_rollup(granularity, bucket);
+
+-- Bloqueia inserts durante o backfill para não contar linhas duas vezes
+LOCK TABLE predictions IN SHARE ROW EXCLUSIVE MODE;
+
+TRUNCATE predictions_rollup;
+
+INSERT INTO predictions_rollup (
+    granularity, bucket, model_version, predictions_count, iq_sum, iq_min, iq_max,
+    count_excelente, count_bom, count_regular, count_precisa_melhorar
+)
+SELECT
+    g.granularity,
+    date_trunc(g.granularity, p.predicted_at),
+    COALESCE(p.model_version, p.model_name),
+    COUNT(*),
+    SUM(p.predicted_iq),
+    MIN(p.predicted_iq),
+    MAX(p.predicted_iq),
+    COUNT(*) FILTER (WHERE p.classification = 'Excelente'),
+    COUNT(*) FILTER (WHERE p.classification = 'Bom'),
+    COUNT(*) FILTER (WHERE p.classification = 'Regular'),
+    COUNT(*) FILTER (WHERE p.classification = 'Precisa Melhorar')
+FROM predictions p
+CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS g(granularity)
+GROUP BY 1, 2, 3;
+
+CREATE OR REPLACE FUNCTION update_predictions_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO predictions_rollup AS r (
+        granularity, bucket, model_version, predictions_count, iq_sum, iq_min, iq_max,
+        count_excelente, count_bom, count_regular, count_precisa_melhorar
+    )
+    SELECT
+        g.granularity,
+        date_trunc(g.granularity, n.predicted_at),
+        COALESCE(n.model_version, n.model_name),
+        COUNT(*),
+        SUM(n.predicted_iq),
+        MIN(n.predicted_iq),
+        MAX(n.predicted_iq),
+        COUNT(*) FILTER (WHERE n.classification = 'Excelente'),
+        COUNT(*) FILTER (WHERE n.classification = 'Bom'),
+        COUNT(*) FILTER (WHERE n.classification = 'Regular'),
+        COUNT(*) FILTER (WHERE n.classification = 'Precisa Melhorar')
+    FROM new_predictions n
+    CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS g(granularity)
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 3, 2
+    ON CONFLICT (granularity, model_version, bucket) DO UPDATE SET
+        predictions_count = r.predictions_count + EXCLUDED.predictions_count,
+        iq_sum = r.iq_sum + EXCLUDED.iq_sum,
+        iq_min = LEAST(r.iq_min, EXCLUDED.iq_min),
+        iq_max = GREATEST(r.iq_max, EXCLUDED.iq_max),
+        count_excelente = r.count_excelente + EXCLUDED.count_excelente,
+        count_bom = r.count_bom + EXCLUDED.count_bom,
+        count_regular = r.count_regular + EXCLUDED.count_regular,
+        count_precisa_melhorar = r.count_precisa_melhorar + EXCLUDED.count_precisa_melhorar;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_predictions_rollup ON predictions;
+CREATE TRIGGER trg_predictions_rollup
+AFTER INSERT ON predictions
+REFERENCING NEW TABLE AS new_predictions
+FOR EACH STATEMENT EXECUTE FUNCTION update_predictions_rollup();
+
+COMMIT;
@@ -0,0 +1,36 @@
+-- ====================================================================
+-- MIGRAÇÃO 003: regras de feedback como dados (feedback_catalog)
+-- Cria a tabela de regras do init.sql e a coluna predictions.feedback_mask,
+-- onde as novas predições gravam as sugestões como bitmask. Executar uma vez:
+--   docker-compose exec -T postgres psql -U hubfolio_user -d hubfolio < postgres/migrations/003_feedback_catalog.sql
+-- ====================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS feedback_catalog (
+    code SMALLINT PRIMARY KEY,
+    message TEXT NOT NULL,
+    features TEXT[],
+    operator VARCHAR(2),
+    threshold FLOAT,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    
+    CONSTRAINT check_feedback_code CHECK (code BETWEEN -1 AND 30),
+    CONSTRAINT check_feedback_operator CHECK (operator IN ('<', '<=', '>', '>=', '==', '!=')),
+    CONSTRAINT check_feedback_rule CHECK (code = -1 OR (features IS NOT NULL AND operator IS NOT NULL AND threshold IS NOT NULL))
+);
+
+INSERT INTO feedback_catalog (code, message, features, operator, threshold) VALUES
+    (-1, 'Seu portfólio está bem estruturado!', NULL, NULL, NULL),
+    (0, 'Adicione mais projetos ao seu portfólio (mínimo 3 recomendado)', ARRAY['projetos_min'], '<', 3),
+    (1, 'Liste mais habilidades técnicas (mínimo 5)', ARRAY['habilidades_min'], '<', 5),
+    (2, 'Adicione uma bio/sobre você', ARRAY['bio'], '==', 0),
+    (3, 'Inclua informações de contato', ARRAY['contatos'], '==', 0),
+    (4, 'Melhore a narrativa dos projetos (contexto, processo, resultado)', ARRAY['kw_contexto', 'kw_processo', 'kw_resultado'], '<', 9),
+    (5, 'Trabalhe na consistência visual do portfólio', ARRAY['consistencia_visual_score'], '<', 70)
+ON CONFLICT (code) DO NOTHING;
+
+-- Coluna nula nas linhas existentes (sem reescrever a tabela)
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS feedback_mask INTEGER;
+
+COMMIT;
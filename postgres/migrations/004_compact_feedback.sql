@@ -0,0 +1,79 @@
+-- ====================================================================
+-- MIGRAÇÃO 004: feedback das predições como bitmask
+-- Converte o feedback_suggestions (TEXT[]) das predições existentes para
+-- feedback_mask usando o feedback_catalog e cria a view
+-- predictions_with_feedback, que devolve o texto para os leitores.
+-- Linhas com alguma mensagem fora do catálogo mantêm o texto original.
+-- A mensagem de "nenhuma sugestão" passa a ser a linha code = -1 do catálogo.
+-- Executar uma vez (após a 003):
+--   docker-compose exec -T postgres psql -U hubfolio_user -d hubfolio < postgres/migrations/004_compact_feedback.sql
+-- ====================================================================
+
+BEGIN;
+
+-- Catálogos criados pela 003 antes da linha code = -1
+ALTER TABLE feedback_catalog
+    ALTER COLUMN features DROP NOT NULL,
+    ALTER COLUMN operator DROP NOT NULL,
+    ALTER COLUMN threshold DROP NOT NULL,
+    DROP CONSTRAINT IF EXISTS check_feedback_code,
+    DROP CONSTRAINT IF EXISTS check_feedback_rule;
+ALTER TABLE feedback_catalog
+    ADD CONSTRAINT check_feedback_code CHECK (code BETWEEN -1 AND 30),
+    ADD CONSTRAINT check_feedback_rule CHECK (code = -1 OR (features IS NOT NULL AND operator IS NOT NULL AND threshold IS NOT NULL));
+
+INSERT INTO feedback_catalog (code, message) VALUES (-1, 'Seu portfólio está bem estruturado!')
+ON CONFLICT (code) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION feedback_messages(p_mask INTEGER)
+RETURNS TEXT[] AS $$
+    SELECT CASE
+        WHEN p_mask IS NULL THEN NULL
+        WHEN p_mask = 0 THEN ARRAY(SELECT message FROM feedback_catalog WHERE code = -1)
+        ELSE ARRAY(
+            SELECT message FROM feedback_catalog
+            WHERE code >= 0 AND (p_mask >> code) & 1 = 1
+            ORDER BY code
+        )
+    END
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE VIEW predictions_with_feedback AS
+SELECT 
+    prediction_id,
+    portfolio_id,
+    predicted_iq,
+    model_name,
+    model_version,
+    classification,
+    COALESCE(feedback_suggestions, feedback_messages(feedback_mask)) AS feedback_suggestions,
+    feedback_mask,
+    predicted_at
+FROM predictions;
+
+-- Tamanho antes da conversão (comparar com o resultado do final)
+SELECT pg_size_pretty(SUM(pg_total_relation_size(inhrelid))) AS predictions_size_before
+FROM pg_inherits WHERE inhparent = 'predictions'::regclass;
+
+UPDATE predictions p
+SET feedback_mask = COALESCE((
+        SELECT bit_or(1 << c.code)
+        FROM feedback_catalog c
+        WHERE c.code >= 0 AND c.message = ANY(p.feedback_suggestions)
+    ), 0),
+    feedback_suggestions = NULL
+WHERE p.feedback_mask IS NULL
+  AND p.feedback_suggestions IS NOT NULL
+  AND NOT EXISTS (
+      SELECT 1 FROM unnest(p.feedback_suggestions) AS s(message)
+      WHERE s.message NOT IN (SELECT message FROM feedback_catalog)
+  );
+
+COMMIT;
+
+-- O UPDATE deixa as versões antigas das linhas como tuplas mortas; o VACUUM
+-- libera o espaço para reuso (VACUUM FULL devolve ao disco, mas bloqueia a tabela)
+VACUUM (ANALYZE) predictions;
+
+SELECT pg_size_pretty(SUM(pg_total_relation_size(inhrelid))) AS predictions_size_after
+FROM pg_inherits WHERE inhparent = 'predictions'::regclass;
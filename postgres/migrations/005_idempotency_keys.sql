@@ -0,0 +1,25 @@
+-- ====================================================================
+-- MIGRAÇÃO 005: chaves de idempotência (header Idempotency-Key)
+-- Cria a tabela idempotency_keys do init.sql, usada pela API com
+-- IDEMPOTENCY_POSTGRES=true (a API também a cria no startup). Executar uma vez:
+--   docker-compose exec -T postgres psql -U hubfolio_user -d hubfolio < postgres/migrations/005_idempotency_keys.sql
+-- ====================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope VARCHAR(50) NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    response JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, idempotency_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+
+COMMENT ON TABLE idempotency_keys IS 'Respostas de /predict, /ingest/hubfolio e /etl/run devolvidas a retries da mesma chave';
+COMMENT ON COLUMN idempotency_keys.request_hash IS 'SHA-256 do payload da primeira requisição (outro payload com a mesma chave = 422)';
+
+COMMIT;
@@ -0,0 +1,28 @@
+-- ====================================================================
+-- MIGRAÇÃO 006: predições shadow em tabela própria (shadow_predictions)
+-- Cria a tabela do init.sql; a partir dela a API deixa de gravar as
+-- predições shadow em predictions (e em predictions_rollup). Linhas shadow
+-- gravadas antes desta migração não são distinguíveis das do primário e
+-- continuam em predictions. Executar uma vez:
+--   docker-compose exec -T postgres psql -U hubfolio_user -d hubfolio < postgres/migrations/006_shadow_predictions.sql
+-- ====================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS shadow_predictions (
+    shadow_prediction_id BIGSERIAL PRIMARY KEY,
+    portfolio_id INTEGER NOT NULL REFERENCES portfolios(portfolio_id) ON DELETE CASCADE,
+    predicted_iq FLOAT NOT NULL,
+    model_name VARCHAR(100) NOT NULL,
+    model_version VARCHAR(50) NOT NULL,
+    classification VARCHAR(50),
+    feedback_mask INTEGER,
+    predicted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_shadow_predictions_portfolio_id ON shadow_predictions(portfolio_id);
+CREATE INDEX IF NOT EXISTS idx_shadow_predictions_version_at ON shadow_predictions(model_version, predicted_at);
+
+COMMENT ON TABLE shadow_predictions IS 'Predições de modelos shadow (fora de predictions e de predictions_rollup)';
+
+COMMIT;
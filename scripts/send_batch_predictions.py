@@ -4,10 +4,13 @@ Lê o arquivo data/hubfolio_mock_data.json e envia cada item.
 """
 
 import json
+import uuid
+import time
 import requests
 
 URL = "http://localhost:8001/predict"
 DATA_PATH = "data/hubfolio_mock_data.json"
+RETRIES = 3  # Tentativas extras em timeout/erro de conexão (mesma Idempotency-Key)
 
 
 def normalize_item(item, idx):
@@ -34,11 +37,21 @@ def main():
 
     for i, item in enumerate(data):
         payload = normalize_item(item, i)
-        try:
-            r = requests.post(URL, json=payload, timeout=10)
-            print(f"{i:04d} status={r.status_code} body={r.text}")
-        except Exception as e:
-            print(f"{i:04d} error={e}")
+        # Mesma chave em todas as tentativas: a API não grava a predição duas vezes
+        headers = {"Idempotency-Key": str(uuid.uuid4())}
+        for attempt in range(RETRIES + 1):
+            try:
+                r = requests.post(URL, json=payload, headers=headers, timeout=10)
+                print(f"{i:04d} status={r.status_code} body={r.text}")
+                break
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if attempt == RETRIES:
+                    print(f"{i:04d} error={e}")
+                else:
+                    time.sleep(0.5 * 2 ** attempt)
+            except Exception as e:
+                print(f"{i:04d} error={e}")
+                break
 
 
 if __name__ == "__main__":
@@ -9,12 +9,14 @@ import json
 import time
 import argparse
 import random
+import uuid
 import requests
 from pathlib import Path
 
 # Caminhos/URLs padrão
 DATA_PATH = Path("data/hubfolio_mock_data.json")
 API_URL = "http://localhost:8001/predict"
+RETRIES = 3  # Tentativas extras em timeout/erro de conexão (mesma Idempotency-Key)
 
 
 def load_data(path: Path, limit: int | None = None) -> list[dict]:
@@ -58,12 +60,24 @@ def map_item(item: dict, idx: int) -> dict:
     }
 
 
-def send_prediction(payload: dict) -> tuple[int, str]:
-    try:
-        r = requests.post(API_URL, json=payload, timeout=10)
-        return r.status_code, r.text
-    except Exception as e:
-        return 0, str(e)
+def send_prediction(payload: dict, retries: int = RETRIES) -> tuple[int, str]:
+    """Envia o payload, repetindo com a mesma Idempotency-Key em caso de timeout.
+
+    A API devolve a resposta da primeira tentativa que chegou a ela, então um
+    retry não cria outro portfólio/predição.
+    """
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    for attempt in range(retries + 1):
+        try:
+            r = requests.post(API_URL, json=payload, headers=headers, timeout=10)
+            return r.status_code, r.text
+        except (requests.Timeout, requests.ConnectionError) as e:
+            if attempt == retries:
+                return 0, str(e)
+            print(f"⚠️ Tentativa {attempt + 1} falhou ({e.__class__.__name__}), repetindo...")
+            time.sleep(0.5 * 2 ** attempt)
+        except Exception as e:
+            return 0, str(e)
 
 
 def main():